@@ -0,0 +1,264 @@
+# auditoria/escritor.py
+"""
+Escritor en lote para la bitácora.
+
+En modo ``AUDITORIA_ESCRITURA = "lote"``, ``registrar_evento`` no inserta en
+la petición: encola el registro en memoria (uno por proceso) y este se
+escribe con un único ``bulk_create`` cuando:
+
+- el buffer llega a ``AUDITORIA_LOTE_TAMANO`` registros,
+- pasan ``AUDITORIA_LOTE_SEGUNDOS`` desde el primer registro pendiente, o
+- termina (commit) la transacción en la que se registraron los eventos.
+
+Cada registro encolado se añade también a un fichero de *spill* (JSON por
+línea) que se vacía tras cada escritura correcta. El fichero es de cada
+escritor (``bitacora-<pid>-<id>.jsonl``, con un id nuevo en cada arranque):
+un proceso reiniciado con el mismo pid no reutiliza el de su antecesor. Si
+el proceso muere con registros pendientes, ``recuperar_spill`` (al crear el
+escritor, o el comando ``recuperar_bitacora``) los inserta desde los
+ficheros de procesos muertos y de arranques anteriores del mismo pid,
+reclamando cada uno con un ``os.rename`` para no insertarlo dos veces.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_SPILL = "bitacora-"
+
+
+def _directorio_spill():
+    return Path(getattr(settings, "AUDITORIA_SPILL_DIR", Path(settings.BASE_DIR) / "var" / "auditoria"))
+
+
+def _a_modelos(registros):
+    from .models import Bitacora
+
+    return [
+        Bitacora(
+            timestamp=parse_datetime(r["timestamp"]),
+            usuario_id=r["usuario_id"],
+            ip_address=r["ip_address"],
+            accion=r["accion"],
+            descripcion=r["descripcion"],
+        )
+        for r in registros
+    ]
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _pid_del_spill(fichero):
+    # bitacora-<pid>-<id>.jsonl (o bitacora-<pid>.jsonl, nombre anterior)
+    try:
+        return int(fichero.stem[len(PREFIJO_SPILL):].split("-")[0])
+    except ValueError:
+        return None
+
+
+def _pid_del_reclamo(fichero):
+    # bitacora-<pid>-<id>.jsonl.<pid que lo reclamó>-<id>.claimed
+    try:
+        return int(fichero.name.rsplit(".jsonl.", 1)[1].split("-")[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def _reclamar(fichero):
+    """
+    Renombra ``fichero`` a un nombre propio de esta llamada. ``os.rename`` es
+    atómico: si dos procesos recuperan a la vez, solo uno lo consigue y el
+    otro recibe ``FileNotFoundError``. Devuelve la ruta nueva o None.
+    """
+    original = fichero.name.split(".jsonl", 1)[0] + ".jsonl"
+    reclamado = fichero.with_name(f"{original}.{os.getpid()}-{uuid.uuid4().hex[:12]}.claimed")
+    try:
+        os.rename(fichero, reclamado)
+    except OSError:
+        return None
+    return reclamado
+
+
+def recuperar_spill(directorio=None, propio=None):
+    """
+    Inserta los registros que quedaron en ficheros de spill de procesos que
+    ya no existen, o de arranques anteriores de este mismo pid, y borra esos
+    ficheros. ``propio`` es el fichero del escritor actual (por defecto el
+    del escritor del proceso), que nunca se toca. Devuelve cuántos registros
+    insertó.
+
+    Cada fichero se reclama antes de leerlo (``_reclamar``), así dos procesos
+    que arrancan a la vez no insertan dos veces el mismo spill. Los
+    ``.claimed`` de un proceso que murió a mitad de la recuperación se vuelven
+    a reclamar.
+    """
+    from .models import Bitacora
+
+    directorio = Path(directorio or _directorio_spill())
+    if not directorio.is_dir():
+        return 0
+    if propio is None and _escritor is not None and _escritor.pid == os.getpid():
+        propio = _escritor.ruta_spill
+    candidatos = []
+    for fichero in directorio.glob(f"{PREFIJO_SPILL}*.jsonl"):
+        pid = _pid_del_spill(fichero)
+        if pid is None or fichero == propio:
+            continue
+        # Con el pid de este proceso solo puede ser de un arranque anterior
+        if pid != os.getpid() and _proceso_vivo(pid):
+            continue
+        candidatos.append(fichero)
+    for fichero in directorio.glob(f"{PREFIJO_SPILL}*.jsonl.*.claimed"):
+        pid = _pid_del_reclamo(fichero)
+        # Los de este proceso pueden estar recuperándose en otro hilo
+        if pid is None or pid == os.getpid() or _proceso_vivo(pid):
+            continue
+        candidatos.append(fichero)
+
+    total = 0
+    for fichero in candidatos:
+        reclamado = _reclamar(fichero)
+        if reclamado is None:
+            # Ya lo reclamó otro proceso
+            continue
+        registros = []
+        with reclamado.open(encoding="utf-8") as f:
+            for numero, linea in enumerate(f, start=1):
+                try:
+                    registros.append(json.loads(linea))
+                except ValueError:
+                    # Línea a medio escribir cuando murió el proceso
+                    logger.warning("Spill %s: línea %s ilegible, se descarta", fichero, numero)
+        if registros:
+            Bitacora.objects.bulk_create(_a_modelos(registros), batch_size=500)
+            total += len(registros)
+        reclamado.unlink()
+    return total
+
+
+class EscritorBitacora:
+    """Buffer de registros de bitácora de un proceso."""
+
+    def __init__(self, tamano_lote=None, segundos=None, directorio=None, fsync=None):
+        self.tamano_lote = tamano_lote or getattr(settings, "AUDITORIA_LOTE_TAMANO", 200)
+        self.segundos = segundos or getattr(settings, "AUDITORIA_LOTE_SEGUNDOS", 2.0)
+        self.fsync = getattr(settings, "AUDITORIA_SPILL_FSYNC", False) if fsync is None else fsync
+        self.directorio = Path(directorio or _directorio_spill())
+        self.pid = os.getpid()
+        # Distingue este escritor de uno anterior que tuvo el mismo pid
+        self.instancia = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._pendientes = []
+        self._timer = None
+        self._spill = None
+
+    @property
+    def ruta_spill(self):
+        return self.directorio / f"{PREFIJO_SPILL}{self.pid}-{self.instancia}.jsonl"
+
+    def pendientes(self):
+        with self._lock:
+            return len(self._pendientes)
+
+    def encolar(self, registros):
+        """Añade registros (dicts) al buffer y vacía si se llenó."""
+        with self._lock:
+            self._escribir_spill(registros)
+            self._pendientes.extend(registros)
+            lleno = len(self._pendientes) >= self.tamano_lote
+            if not lleno:
+                self._programar_vaciado()
+        if lleno:
+            self.vaciar()
+
+    def vaciar(self):
+        """Escribe todo lo pendiente con un ``bulk_create``. Devuelve cuántos."""
+        from .models import Bitacora
+
+        with self._lock:
+            self._cancelar_timer()
+            lote, self._pendientes = self._pendientes, []
+            if not lote:
+                return 0
+            try:
+                Bitacora.objects.bulk_create(_a_modelos(lote), batch_size=500)
+            except Exception:
+                # Se conservan (en memoria y en el spill) para el próximo intento
+                logger.exception("No se pudo escribir un lote de %s registros de bitácora", len(lote))
+                self._pendientes = lote + self._pendientes
+                self._programar_vaciado()
+                return 0
+            self._truncar_spill()
+            return len(lote)
+
+    # --- Internos (con el lock tomado) ---
+
+    def _programar_vaciado(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.segundos, self._vaciar_en_hilo)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _cancelar_timer(self):
+        if self._timer is not None:
+            if self._timer is not threading.current_thread():
+                self._timer.cancel()
+            self._timer = None
+
+    def _vaciar_en_hilo(self):
+        try:
+            self.vaciar()
+        finally:
+            close_old_connections()
+
+    def _escribir_spill(self, registros):
+        try:
+            if self._spill is None:
+                self.directorio.mkdir(parents=True, exist_ok=True)
+                self._spill = self.ruta_spill.open("a", encoding="utf-8")
+            self._spill.write("".join(json.dumps(r) + "\n" for r in registros))
+            self._spill.flush()
+            if self.fsync:
+                os.fsync(self._spill.fileno())
+        except OSError:
+            logger.exception("No se pudo escribir el spill de bitácora en %s", self.directorio)
+
+    def _truncar_spill(self):
+        if self._spill is not None:
+            self._spill.seek(0)
+            self._spill.truncate()
+
+
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def escritor():
+    """Escritor del proceso actual (se recrea tras un ``fork``)."""
+    global _escritor
+    with _escritor_lock:
+        if _escritor is None or _escritor.pid != os.getpid():
+            _escritor = EscritorBitacora()
+            atexit.register(_escritor.vaciar)
+            try:
+                recuperar_spill(_escritor.directorio, propio=_escritor.ruta_spill)
+            except Exception:
+                logger.exception("No se pudo recuperar el spill de bitácora")
+        return _escritor
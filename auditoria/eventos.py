@@ -206,20 +206,23 @@ class EventoNotificador:
     
     @staticmethod
     def _notificar_todos_usuarios(evento_tipo: str, detalles: Dict[str, Any]):
-        """Notifica a todos los usuarios del condominio"""
-        usuarios = User.objects.filter(is_active=True)
+        """
+        Notifica a todos los usuarios del condominio. El envío masivo se hace
+        en un worker (notificaciones.notificar_todos) con prioridad alta.
+        """
+        from tareas.registro import encolar
+
         titulo, mensaje = EventoNotificador._generar_mensaje_seguridad(evento_tipo, detalles)
-        
-        for usuario in usuarios:
-            notificar_usuario(
-                user=usuario,
-                title=titulo,
-                body=mensaje,
-                data={
-                    "tipo_evento": evento_tipo,
-                    "detalles": detalles or {}
-                }
-            )
+        encolar(
+            "notificaciones.notificar_todos",
+            prioridad=10,
+            titulo=titulo,
+            mensaje=mensaje,
+            data={
+                "tipo_evento": evento_tipo,
+                "detalles": detalles or {}
+            },
+        )
 
 
 # Funciones de conveniencia para usar en las vistas
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from auditoria.escritor import recuperar_spill
+
+
+class Command(BaseCommand):
+    help = (
+        "Inserta en la bitácora los registros que quedaron en los ficheros de "
+        "spill de procesos caídos (modo AUDITORIA_ESCRITURA=lote)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directorio",
+            type=str,
+            help="Directorio de spill. Por defecto: settings.AUDITORIA_SPILL_DIR."
+        )
+
+    def handle(self, *args, **opts):
+        recuperados = recuperar_spill(opts.get("directorio"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Recuperados {recuperados} registros de bitácora."
+        ))
@@ -1,4 +1,12 @@
 # en auditoria/middleware.py
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import perfilado
+
 
 class IPMiddleware:
     def __init__(self, get_response):
@@ -17,4 +25,74 @@ class IPMiddleware:
         request.ip_address = ip
 
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
+
+class PerfiladoMiddleware:
+    """
+    Mide cada petición y la registra por nombre de URL en
+    ``auditoria.perfilado.registro``. Añade la cabecera ``Server-Timing`` con
+    el desglose (total, SQL, serialización, render) para verlo en el navegador:
+    a todos con ``PERFILADO_SERVER_TIMING`` (por defecto, solo con ``DEBUG``) y
+    siempre a los usuarios staff. El resto no ve consultas ni tiempos.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        perfilado.instalar_medicion_serializers()
+
+    def __call__(self, request):
+        muestra, token = perfilado.iniciar_muestra()
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(self._medir_sql(muestra)))
+                response = self.get_response(request)
+        finally:
+            perfilado.terminar_muestra(token)
+        muestra.total_ms = (time.perf_counter() - inicio) * 1000
+
+        match = getattr(request, "resolver_match", None)
+        muestra.ruta = (match.view_name if match else None) or "<sin ruta>"
+        if not response.streaming:
+            muestra.bytes = len(response.content)
+        perfilado.registro.registrar(muestra)
+
+        # DRF deja en request.user el usuario autenticado por token
+        usuario = getattr(request, "user", None)
+        if getattr(settings, "PERFILADO_SERVER_TIMING", False) or getattr(usuario, "is_staff", False):
+            response["Server-Timing"] = self._server_timing(muestra)
+        return response
+
+    def process_template_response(self, request, response):
+        # Las respuestas DRF se renderizan después de la vista: medimos el render
+        muestra = perfilado.muestra_actual()
+        if muestra is not None:
+            inicio = time.perf_counter()
+
+            def fin_render(rendered):
+                muestra.render_ms += (time.perf_counter() - inicio) * 1000
+
+            response.add_post_render_callback(fin_render)
+        return response
+
+    @staticmethod
+    def _medir_sql(muestra):
+        def envoltura(execute, sql, params, many, context):
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                muestra.db_ms += (time.perf_counter() - inicio) * 1000
+                muestra.consultas += 1
+        return envoltura
+
+    @staticmethod
+    def _server_timing(muestra):
+        return ", ".join([
+            f"total;dur={muestra.total_ms:.1f}",
+            f'db;dur={muestra.db_ms:.1f};desc="{muestra.consultas} consultas"',
+            f"ser;dur={muestra.serializer_ms:.1f}",
+            f"render;dur={muestra.render_ms:.1f}",
+            f'resp;desc="{muestra.bytes} bytes"',
+        ])
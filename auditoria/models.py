@@ -2,12 +2,15 @@
 
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class Bitacora(models.Model):
     """
     Modelo para registrar eventos importantes en el sistema.
     """
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Fecha y Hora")
+    # default (y no auto_now_add) para conservar la hora del evento cuando el
+    # escritor en lote lo inserta más tarde
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Fecha y Hora")
     usuario = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
         on_delete=models.SET_NULL, 
@@ -23,6 +26,10 @@ class Bitacora(models.Model):
         verbose_name = "Registro de Bitácora"
         verbose_name_plural = "Registros de Bitácora"
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp', 'usuario'], name='bitacora_ts_usuario_idx'),
+            models.Index(fields=['usuario', 'timestamp'], name='bitacora_usuario_ts_idx'),
+        ]
 
     def __str__(self):
         user_info = self.usuario.username if self.usuario else "Sistema"
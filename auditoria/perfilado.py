@@ -0,0 +1,195 @@
+# auditoria/perfilado.py
+"""
+Perfilado de peticiones en memoria.
+
+``PerfiladoMiddleware`` mide cada petición (tiempo total, tiempo y número de
+consultas SQL, tiempo de serialización DRF, tiempo de render y bytes de la
+respuesta) y la registra aquí, agrupada por nombre de URL. Por ruta se guarda:
+
+- un histograma acumulado de latencias con cubetas fijas, y
+- un buffer circular con las últimas muestras, del que salen los percentiles.
+
+Los datos viven en el proceso (cada worker tiene los suyos) y se pierden al
+reiniciar; son para diagnosticar, no para métricas históricas.
+"""
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Límites superiores (ms) de las cubetas del histograma; la última es +inf
+CUBETAS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_muestra_actual = ContextVar("perfilado_muestra", default=None)
+
+
+class Muestra:
+    """Mediciones de una petición."""
+    __slots__ = ("ruta", "total_ms", "db_ms", "consultas", "serializer_ms", "render_ms", "bytes", "_profundidad")
+
+    def __init__(self):
+        self.ruta = None
+        self.total_ms = 0.0
+        self.db_ms = 0.0
+        self.consultas = 0
+        self.serializer_ms = 0.0
+        self.render_ms = 0.0
+        self.bytes = 0
+        self._profundidad = 0
+
+    def como_dict(self):
+        return {
+            "total_ms": round(self.total_ms, 2),
+            "db_ms": round(self.db_ms, 2),
+            "consultas": self.consultas,
+            "serializer_ms": round(self.serializer_ms, 2),
+            "render_ms": round(self.render_ms, 2),
+            "bytes": self.bytes,
+        }
+
+
+def muestra_actual():
+    return _muestra_actual.get()
+
+
+def iniciar_muestra():
+    muestra = Muestra()
+    return muestra, _muestra_actual.set(muestra)
+
+
+def terminar_muestra(token):
+    _muestra_actual.reset(token)
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return None
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return round(ordenados[indice], 2)
+
+
+class PerfilRuta:
+    """Histograma acumulado y buffer circular de muestras para una ruta."""
+
+    def __init__(self, capacidad):
+        self.peticiones = 0
+        self.cubetas = [0] * (len(CUBETAS_MS) + 1)
+        self.suma_total_ms = 0.0
+        self.suma_db_ms = 0.0
+        self.suma_serializer_ms = 0.0
+        self.suma_consultas = 0
+        self.suma_bytes = 0
+        self.recientes = deque(maxlen=capacidad)
+
+    def agregar(self, muestra):
+        self.peticiones += 1
+        indice = len(CUBETAS_MS)
+        for i, limite in enumerate(CUBETAS_MS):
+            if muestra.total_ms <= limite:
+                indice = i
+                break
+        self.cubetas[indice] += 1
+        self.suma_total_ms += muestra.total_ms
+        self.suma_db_ms += muestra.db_ms
+        self.suma_serializer_ms += muestra.serializer_ms
+        self.suma_consultas += muestra.consultas
+        self.suma_bytes += muestra.bytes
+        self.recientes.append(muestra.como_dict())
+
+    def resumen(self):
+        n = self.peticiones or 1
+        recientes = list(self.recientes)
+        totales = sorted(m["total_ms"] for m in recientes)
+        db = sorted(m["db_ms"] for m in recientes)
+        etiquetas = [f"<={limite}ms" for limite in CUBETAS_MS] + [f">{CUBETAS_MS[-1]}ms"]
+        return {
+            "peticiones": self.peticiones,
+            "promedio": {
+                "total_ms": round(self.suma_total_ms / n, 2),
+                "db_ms": round(self.suma_db_ms / n, 2),
+                "serializer_ms": round(self.suma_serializer_ms / n, 2),
+                "consultas": round(self.suma_consultas / n, 2),
+                "bytes": round(self.suma_bytes / n),
+            },
+            "percentiles_recientes": {
+                "muestras": len(recientes),
+                "total_ms": {f"p{p}": _percentil(totales, p) for p in (50, 95, 99)},
+                "db_ms": {f"p{p}": _percentil(db, p) for p in (50, 95, 99)},
+            },
+            "histograma_total_ms": dict(zip(etiquetas, self.cubetas)),
+            "ultimas": recientes[-10:],
+        }
+
+
+class RegistroPerfiles:
+    """Perfiles por ruta, seguro para varios hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rutas = {}
+
+    @property
+    def capacidad(self):
+        return getattr(settings, "PERFILADO_MUESTRAS_POR_RUTA", 500)
+
+    def registrar(self, muestra):
+        with self._lock:
+            perfil = self._rutas.get(muestra.ruta)
+            if perfil is None:
+                perfil = self._rutas[muestra.ruta] = PerfilRuta(self.capacidad)
+            perfil.agregar(muestra)
+
+    def resumen(self, ruta=None):
+        with self._lock:
+            if ruta is not None:
+                perfil = self._rutas.get(ruta)
+                return {ruta: perfil.resumen()} if perfil else {}
+            return {nombre: perfil.resumen() for nombre, perfil in sorted(self._rutas.items())}
+
+    def reiniciar(self):
+        with self._lock:
+            self._rutas.clear()
+
+
+registro = RegistroPerfiles()
+
+
+# --- Medición de serializers DRF ---
+
+_instalado = False
+
+
+def _medir(metodo):
+    def envoltura(self, *args, **kwargs):
+        muestra = _muestra_actual.get()
+        if muestra is None:
+            return metodo(self, *args, **kwargs)
+        # Solo cuenta el serializer más externo (los anidados ya están dentro)
+        muestra._profundidad += 1
+        inicio = time.perf_counter()
+        try:
+            return metodo(self, *args, **kwargs)
+        finally:
+            muestra._profundidad -= 1
+            if muestra._profundidad == 0:
+                muestra.serializer_ms += (time.perf_counter() - inicio) * 1000
+    envoltura.__wrapped__ = metodo
+    return envoltura
+
+
+def instalar_medicion_serializers():
+    """
+    Envuelve ``to_representation`` de los serializers DRF para sumar el tiempo
+    de serialización a la muestra activa. Fuera de una petición perfilada no
+    hace nada. Es idempotente.
+    """
+    global _instalado
+    if _instalado:
+        return
+    from rest_framework import serializers
+
+    for clase in (serializers.Serializer, serializers.ListSerializer):
+        clase.to_representation = _medir(clase.to_representation)
+    _instalado = True
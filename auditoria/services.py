@@ -1,14 +1,71 @@
 # en auditoria/services.py
 
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
 from .models import Bitacora
 
+def _modo_lote():
+    return getattr(settings, "AUDITORIA_ESCRITURA", "directo") == "lote"
+
+
 def registrar_evento(usuario, ip_address, accion, descripcion=""):
     """
     Crea un nuevo registro en la Bitácora.
+
+    En modo lote (``AUDITORIA_ESCRITURA = "lote"``) el registro se encola en ``auditoria.escritor`` y se
+    inserta junto con otros; si hay una transacción abierta, solo se encola
+    cuando esta hace commit.
+    """
+    if not _modo_lote():
+        Bitacora.objects.create(
+            usuario=usuario,
+            ip_address=ip_address,
+            accion=accion,
+            descripcion=descripcion
+        )
+        return
+
+    registro = {
+        "timestamp": timezone.now().isoformat(),
+        "usuario_id": getattr(usuario, "pk", usuario),
+        "ip_address": ip_address,
+        "accion": accion,
+        "descripcion": descripcion,
+    }
+    if connection.in_atomic_block:
+        _pendientes_de_transaccion().append(registro)
+    else:
+        from .escritor import escritor
+        escritor().encolar([registro])
+
+
+def _pendientes_de_transaccion():
+    """
+    Registros de la transacción en curso. Se entregan al escritor en un solo
+    bloque (y se vacía) en el commit; si hay rollback se descartan, igual que
+    lo habría hecho el ``create`` directo.
     """
-    Bitacora.objects.create(
-        usuario=usuario,
-        ip_address=ip_address,
-        accion=accion,
-        descripcion=descripcion
-    )
\ No newline at end of file
+    pendientes = getattr(connection, "_bitacora_pendientes", None)
+    vigente = pendientes is not None and any(
+        callback is pendientes.al_commit for _, callback, _ in connection.run_on_commit
+    )
+    if not vigente:
+        pendientes = _PendientesTransaccion()
+        connection._bitacora_pendientes = pendientes
+        transaction.on_commit(pendientes.al_commit)
+    return pendientes
+
+
+class _PendientesTransaccion(list):
+
+    def al_commit(self):
+        from .escritor import escritor
+
+        if connection.__dict__.get("_bitacora_pendientes") is self:
+            del connection._bitacora_pendientes
+        if self:
+            escritor().encolar(list(self))
+            escritor().vaciar()
+
@@ -1,3 +1,213 @@
-from django.test import TestCase
+# auditoria/tests.py
 
-# Create your tests here.
+import json
+import os
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from . import escritor as escritor_mod, perfilado
+from .services import registrar_evento
+from .models import Bitacora
+
+
+class BitacoraPaginacionTests(APITestCase):
+
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='admin', password='password123', is_staff=True)
+        self.client.force_authenticate(user=self.admin_user)
+        self.url = reverse('bitacora-list')
+        Bitacora.objects.bulk_create([
+            Bitacora(usuario=self.admin_user, accion=f"Evento {i}") for i in range(7)
+        ])
+
+    def test_recorre_todas_las_paginas_con_cursor(self):
+        """El cursor devuelve cada registro una sola vez y en el orden de la vista."""
+        vistos = []
+        response = self.client.get(self.url, {'page_size': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 7)
+        self.assertFalse(response.data['count_is_estimate'])
+        self.assertIsNone(response.data['previous'])
+        while True:
+            vistos += [item['id'] for item in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        esperados = list(Bitacora.objects.order_by('-timestamp', '-pk').values_list('id', flat=True))
+        self.assertEqual(vistos, esperados)
+
+        anterior = self.client.get(response.data['previous'])
+        self.assertEqual([item['id'] for item in anterior.data['results']], esperados[3:6])
+
+    def test_page_size_tiene_tope(self):
+        response = self.client.get(self.url, {'page_size': 100000})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 7)
+
+    def test_cursor_manipulado_es_rechazado(self):
+        response = self.client.get(self.url, {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_modo_offset_para_panel_admin(self):
+        response = self.client.get(self.url, {'page': 2, 'page_size': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+
+
+class PerfiladoMiddlewareTests(APITestCase):
+
+    def setUp(self):
+        perfilado.registro.reiniciar()
+        self.admin_user = User.objects.create_user(username='admin', password='password123', is_staff=True)
+        self.client.force_authenticate(user=self.admin_user)
+        Bitacora.objects.create(usuario=self.admin_user, accion="Evento")
+
+    def test_cabecera_server_timing(self):
+        response = self.client.get(reverse('bitacora-list'))
+        cabecera = response['Server-Timing']
+        for metrica in ('total;dur=', 'db;dur=', 'ser;dur=', 'render;dur=', 'resp;desc='):
+            self.assertIn(metrica, cabecera)
+
+    @override_settings(PERFILADO_SERVER_TIMING=False)
+    def test_server_timing_solo_para_staff(self):
+        self.assertIn('Server-Timing', self.client.get(reverse('bitacora-list')))
+        usuario = User.objects.create_user(username='vecino', password='password123')
+        self.client.force_authenticate(user=usuario)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('perfil-rendimiento')))
+
+    def test_registra_perfil_por_ruta(self):
+        for _ in range(3):
+            self.client.get(reverse('bitacora-list'))
+        response = self.client.get(reverse('perfil-rendimiento'), {'ruta': 'bitacora-list'})
+        perfil = response.data['bitacora-list']
+        self.assertEqual(perfil['peticiones'], 3)
+        self.assertEqual(sum(perfil['histograma_total_ms'].values()), 3)
+        self.assertGreater(perfil['promedio']['consultas'], 0)
+        self.assertGreater(perfil['promedio']['serializer_ms'], 0)
+        self.assertGreater(perfil['promedio']['bytes'], 0)
+
+    def test_endpoint_solo_admin(self):
+        usuario = User.objects.create_user(username='vecino', password='password123')
+        self.client.force_authenticate(user=usuario)
+        response = self.client.get(reverse('perfil-rendimiento'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class EscritorBitacoraTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        ajustes = override_settings(
+            AUDITORIA_ESCRITURA='lote', AUDITORIA_SPILL_DIR=self.tmp.name,
+            AUDITORIA_LOTE_TAMANO=5, AUDITORIA_LOTE_SEGUNDOS=3600,
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        escritor_mod._escritor = None
+        self.addCleanup(self._descartar_escritor)
+        self.usuario = User.objects.create_user(username='guardia', password='x')
+
+    def _descartar_escritor(self):
+        if escritor_mod._escritor is not None:
+            escritor_mod._escritor._cancelar_timer()
+        escritor_mod._escritor = None
+
+    def _registro(self, accion):
+        return {
+            "timestamp": timezone.now().isoformat(), "usuario_id": self.usuario.pk,
+            "ip_address": "10.0.0.1", "accion": accion, "descripcion": "",
+        }
+
+    def test_vacia_al_llenar_el_lote_y_trunca_el_spill(self):
+        escritor = escritor_mod.escritor()
+        escritor.encolar([self._registro(f"Evento {i}") for i in range(4)])
+        self.assertEqual(Bitacora.objects.count(), 0)
+        self.assertEqual(len(escritor.ruta_spill.read_text().splitlines()), 4)
+
+        with self.assertNumQueries(1):
+            escritor.encolar([self._registro("Evento 4")])
+        self.assertEqual(Bitacora.objects.count(), 5)
+        self.assertEqual(escritor.ruta_spill.read_text(), "")
+
+    def test_transaccion_escribe_un_lote_al_hacer_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for i in range(3):
+                    registrar_evento(self.usuario, "10.0.0.1", f"Pago {i}")
+                self.assertEqual(Bitacora.objects.count(), 0)
+        self.assertEqual(Bitacora.objects.count(), 3)
+        self.assertEqual(escritor_mod.escritor().pendientes(), 0)
+
+    def test_rollback_descarta_los_eventos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    registrar_evento(self.usuario, "10.0.0.1", "Revertido")
+                    raise ValueError
+            except ValueError:
+                pass
+            with transaction.atomic():
+                registrar_evento(self.usuario, "10.0.0.1", "Confirmado")
+        self.assertEqual(list(Bitacora.objects.values_list('accion', flat=True)), ["Confirmado"])
+
+    def test_recupera_spill_de_proceso_caido(self):
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        registro = dict(self._registro("Antes de caer"), timestamp=hace_una_hora.isoformat())
+        spill = Path(self.tmp.name) / "bitacora-999999999.jsonl"
+        spill.write_text(json.dumps(registro) + "\n" + '{"incomple')
+
+        with self.assertLogs('auditoria.escritor', 'WARNING'):
+            self.assertEqual(escritor_mod.recuperar_spill(), 1)
+        self.assertFalse(spill.exists())
+        bitacora = Bitacora.objects.get()
+        self.assertEqual(bitacora.accion, "Antes de caer")
+        self.assertEqual(bitacora.timestamp, hace_una_hora)
+
+    def test_spill_reclamado_por_otro_proceso_no_se_inserta_dos_veces(self):
+        spill = Path(self.tmp.name) / "bitacora-999999999-caido.jsonl"
+        spill.write_text(json.dumps(self._registro("Una sola vez")) + "\n")
+        renombrar = os.rename
+
+        def gana_otro_proceso(origen, destino):
+            # Otro proceso lo renombra justo antes que este
+            renombrar(origen, Path(self.tmp.name) / "bitacora-999999999-caido.jsonl.1-otro.claimed")
+            return renombrar(origen, destino)
+
+        # El pid 1 (el que lo reclamó) sigue vivo
+        with mock.patch.object(escritor_mod.os, 'rename', side_effect=gana_otro_proceso):
+            self.assertEqual(escritor_mod.recuperar_spill(), 0)
+        self.assertEqual(Bitacora.objects.count(), 0)
+
+        # El reclamo de un proceso que murió a mitad se vuelve a reclamar
+        with mock.patch.object(escritor_mod, '_proceso_vivo', return_value=False):
+            self.assertEqual(escritor_mod.recuperar_spill(), 1)
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+        self.assertEqual(Bitacora.objects.get().accion, "Una sola vez")
+
+    def test_reinicio_con_el_mismo_pid_recupera_el_spill_anterior(self):
+        anterior = Path(self.tmp.name) / f"bitacora-{os.getpid()}-caido.jsonl"
+        anterior.write_text(json.dumps(self._registro("Sin vaciar")) + "\n")
+
+        escritor = escritor_mod.escritor()
+        self.assertNotEqual(escritor.ruta_spill, anterior)
+        self.assertFalse(anterior.exists())
+        self.assertEqual(list(Bitacora.objects.values_list('accion', flat=True)), ["Sin vaciar"])
+
+        # El fichero del escritor vivo no se recupera
+        escritor.encolar([self._registro("Pendiente")])
+        self.assertEqual(escritor_mod.recuperar_spill(), 0)
+        self.assertEqual(escritor.pendientes(), 1)
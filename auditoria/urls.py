@@ -1,11 +1,12 @@
 # auditoria/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import BitacoraViewSet
+from .views import BitacoraViewSet, PerfilRendimientoView
 
 router = DefaultRouter()
 router.register(r'bitacora', BitacoraViewSet, basename='bitacora')
 
 urlpatterns = [
+    path('rendimiento/', PerfilRendimientoView.as_view(), name='perfil-rendimiento'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,8 +1,12 @@
 # auditoria/views.py
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as django_filters
+from config.exportacion import ExportacionMixin
+from . import perfilado
 from .models import Bitacora
 from .serializers import BitacoraSerializer
 
@@ -18,7 +22,7 @@ class BitacoraFilter(django_filters.FilterSet):
         model = Bitacora
         fields = ['usuario', 'accion__icontains', 'timestamp__gte', 'timestamp__lte', 'ip_address']
 
-class BitacoraViewSet(viewsets.ReadOnlyModelViewSet):
+class BitacoraViewSet(ExportacionMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet de solo lectura para consultar la bitácora de auditoría.
     Solo administradores pueden acceder.
@@ -30,4 +34,25 @@ class BitacoraViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = BitacoraFilter
     search_fields = ['accion', 'descripcion', 'usuario__username']
     ordering_fields = ['timestamp', 'usuario', 'accion']
-    ordering = ['-timestamp']  # Más recientes primero
\ No newline at end of file
+    ordering = ['-timestamp']  # Más recientes primero
+    columnas_exportacion = (
+        ('id', 'id'), ('timestamp', 'timestamp'), ('usuario', 'usuario__username'),
+        ('ip_address', 'ip_address'), ('accion', 'accion'), ('descripcion', 'descripcion'),
+    )
+
+
+class PerfilRendimientoView(APIView):
+    """
+    Perfiles de rendimiento por ruta del proceso actual (solo administradores).
+
+    GET ?ruta=<nombre de url> -> resumen (promedios, percentiles, histograma).
+    DELETE -> reinicia los contadores.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        return Response(perfilado.registro.resumen(request.query_params.get("ruta")))
+
+    def delete(self, request):
+        perfilado.registro.reiniciar()
+        return Response(status=status.HTTP_204_NO_CONTENT)
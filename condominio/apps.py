@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CondominioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'condominio'
+
+    def ready(self):
+        import condominio.signals
@@ -48,6 +48,21 @@ class Aviso(models.Model):
     def __str__(self):
         return self.titulo
 
+    @staticmethod
+    def conteo_residentes_por_destino():
+        """
+        Residentes por valor de ``dirigido_a`` en una sola consulta.
+        Los listados lo calculan una vez y lo reutilizan para todos los avisos.
+        """
+        from django.db.models import Count, Q
+        from usuarios.models import Residente
+
+        return Residente.objects.aggregate(
+            TODOS=Count('id'),
+            PROPIETARIOS=Count('id', filter=Q(rol='propietario')),
+            INQUILINOS=Count('id', filter=Q(rol='inquilino')),
+        )
+
     def total_residentes_objetivo(self):
         """Retorna el total de residentes a los que está dirigido el aviso"""
         from usuarios.models import Residente
@@ -66,11 +81,15 @@ class Aviso(models.Model):
 
     def total_lecturas(self):
         """Retorna el número total de lecturas"""
+        # Los querysets de AvisoViewSet ya traen el conteo anotado
+        if hasattr(self, 'num_lecturas'):
+            return self.num_lecturas
         return self.lecturas.count()
 
-    def porcentaje_lectura(self):
+    def porcentaje_lectura(self, total_objetivo=None):
         """Retorna el porcentaje de residentes que leyeron el aviso"""
-        total_objetivo = self.total_residentes_objetivo()
+        if total_objetivo is None:
+            total_objetivo = self.total_residentes_objetivo()
         if total_objetivo == 0:
             return 0
         return round((self.total_lecturas() / total_objetivo) * 100, 2)
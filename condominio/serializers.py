@@ -26,10 +26,34 @@ class AreaComunSerializer(serializers.ModelSerializer):
         model = AreaComun
         fields = ['id', 'nombre', 'descripcion', 'capacidad', 'costo_reserva', 'horario_apertura', 'horario_cierre']
 
-class AvisoSerializer(serializers.ModelSerializer):
-    total_lecturas = serializers.ReadOnlyField()
-    porcentaje_lectura = serializers.ReadOnlyField()
-    total_residentes_objetivo = serializers.ReadOnlyField()
+class _ConteosAvisoMixin:
+    """
+    Calcula los conteos de lectura sin consultas por aviso: las lecturas
+    vienen anotadas (``num_lecturas``) y el total de residentes por destino se
+    consulta una vez y se guarda en el contexto compartido del serializer.
+    """
+
+    def _conteo_residentes(self):
+        conteo = self.context.get('conteo_residentes')
+        if conteo is None:
+            conteo = Aviso.conteo_residentes_por_destino()
+            self.context['conteo_residentes'] = conteo
+        return conteo
+
+    def get_total_residentes_objetivo(self, obj):
+        return self._conteo_residentes().get(obj.dirigido_a, 0)
+
+    def get_total_lecturas(self, obj):
+        return obj.total_lecturas()
+
+    def get_porcentaje_lectura(self, obj):
+        return obj.porcentaje_lectura(total_objetivo=self.get_total_residentes_objetivo(obj))
+
+
+class AvisoSerializer(_ConteosAvisoMixin, serializers.ModelSerializer):
+    total_lecturas = serializers.SerializerMethodField()
+    porcentaje_lectura = serializers.SerializerMethodField()
+    total_residentes_objetivo = serializers.SerializerMethodField()
     
     class Meta:
         model = Aviso
@@ -62,12 +86,12 @@ class LecturaAvisoSerializer(serializers.ModelSerializer):
             'propiedad': obj.residente.propiedad.numero_casa if obj.residente.propiedad else None
         }
 
-class AvisoDetalleSerializer(serializers.ModelSerializer):
+class AvisoDetalleSerializer(_ConteosAvisoMixin, serializers.ModelSerializer):
     """Serializer detallado con información de lecturas"""
     lecturas = LecturaAvisoSerializer(many=True, read_only=True)
-    total_lecturas = serializers.ReadOnlyField()
-    porcentaje_lectura = serializers.ReadOnlyField()
-    total_residentes_objetivo = serializers.ReadOnlyField()
+    total_lecturas = serializers.SerializerMethodField()
+    porcentaje_lectura = serializers.SerializerMethodField()
+    total_residentes_objetivo = serializers.SerializerMethodField()
     residentes_sin_leer = serializers.SerializerMethodField()
     
     class Meta:
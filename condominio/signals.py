@@ -0,0 +1,12 @@
+# condominio/signals.py
+
+from django.contrib.auth.models import User
+
+from config.cache_condicional import versionar_modelos
+from usuarios.models import Residente
+from .models import AreaComun, Aviso, LecturaAviso, Propiedad, Regla
+
+# Versiones para el GET condicional de los catálogos (config.cache_condicional).
+# User: PropiedadSerializer incluye los datos del propietario.
+# LecturaAviso y Residente: AvisoSerializer incluye los conteos de lectura.
+versionar_modelos(Regla, AreaComun, Propiedad, Aviso, LecturaAviso, Residente, User)
@@ -2,9 +2,13 @@
 
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from django.test import override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
-from .models import Propiedad, AreaComun
+from django.core.cache import cache
+from config.testing import PresupuestoConsultasMixin
+from usuarios.models import Residente
+from .models import Propiedad, AreaComun, Aviso, LecturaAviso, Regla
 
 class CondominioAPITests(APITestCase):
 
@@ -40,5 +44,115 @@ class CondominioAPITests(APITestCase):
         response = self.client.get(self.areacomun_list_url)
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['nombre'], 'Salón de Eventos')
\ No newline at end of file
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['nombre'], 'Salón de Eventos')
+
+
+class PresupuestoConsultasCondominioTests(PresupuestoConsultasMixin, APITestCase):
+    """Los listados de condominio no deben crecer en consultas con los datos."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.client.force_authenticate(user=self.admin)
+        self.creados = 0
+
+    def _residente(self):
+        self.creados += 1
+        usuario = User.objects.create_user(username=f'res{self.creados}', password='x')
+        propiedad = Propiedad.objects.create(numero_casa=f'P-{self.creados}', propietario=usuario, metros_cuadrados=80)
+        rol = 'propietario' if self.creados % 2 else 'inquilino'
+        return Residente.objects.create(usuario=usuario, propiedad=propiedad, rol=rol)
+
+    def _sembrar_avisos(self, n):
+        for _ in range(n):
+            residente = self._residente()
+            aviso = Aviso.objects.create(titulo='Aviso', contenido='...', dirigido_a='TODOS')
+            LecturaAviso.objects.create(aviso=aviso, residente=residente)
+
+    def test_presupuesto_propiedades(self):
+        self.assertPresupuestoConsultas('propiedad-list', lambda n: [self._residente() for _ in range(n)])
+
+    def test_presupuesto_avisos(self):
+        self.assertPresupuestoConsultas('aviso-list', self._sembrar_avisos)
+
+    def test_presupuesto_detalle_aviso(self):
+        aviso = Aviso.objects.create(titulo='Asamblea', contenido='...', dirigido_a='TODOS')
+
+        def sembrar(n):
+            for _ in range(n):
+                LecturaAviso.objects.create(aviso=aviso, residente=self._residente())
+
+        self.assertPresupuestoConsultas('aviso-detail', sembrar, kwargs={'pk': aviso.pk})
+
+    def test_presupuesto_lecturas(self):
+        self.assertPresupuestoConsultas('lectura-aviso-list', self._sembrar_avisos)
+
+    def test_presupuesto_resumen_lecturas(self):
+        self.assertPresupuestoConsultas('lectura-aviso-resumen-general', self._sembrar_avisos)
+
+
+@override_settings(CATALOGO_CACHE_TTL=600)
+class CacheCondicionalCatalogosTests(APITestCase):
+    """ETag / Last-Modified y caché de cuerpos en los catálogos."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.client.force_authenticate(user=self.admin)
+        Regla.objects.create(codigo='R-1', titulo='Ruido', descripcion='Silencio desde las 22h', categoria='CONVIVENCIA')
+        self.url = reverse('regla-list')
+
+    def test_if_none_match_devuelve_304_sin_consultas(self):
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        etag = respuesta['ETag']
+        self.assertIn('Last-Modified', respuesta)
+
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(respuesta['ETag'], etag)
+        self.assertFalse(respuesta.content)
+
+    def test_cuerpo_cacheado_hasta_que_cambia_el_modelo(self):
+        primera = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            segunda = self.client.get(self.url)
+        self.assertEqual(segunda.content, primera.content)
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+
+        Regla.objects.create(codigo='R-2', titulo='Mascotas', descripcion='Con correa', categoria='MASCOTAS')
+        tercera = self.client.get(self.url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(tercera.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(tercera['ETag'], primera['ETag'])
+        self.assertEqual(len(tercera.json()['results']), 2)
+
+    def test_etag_distinto_por_rol(self):
+        etag_admin = self.client.get(self.url)['ETag']
+        residente = User.objects.create_user(username='res', password='x')
+        self.client.force_authenticate(user=residente)
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag_admin)
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(respuesta['ETag'], etag_admin)
+
+    @override_settings(CATALOGO_CACHE_TTL=0)
+    def test_sin_cache_compartida_no_hay_get_condicional(self):
+        etag = self.client.get(self.url).get('ETag')
+        self.assertIsNone(etag)
+        Regla.objects.create(codigo='R-2', titulo='Mascotas', descripcion='Con correa', categoria='MASCOTAS')
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(respuesta.json()['results']), 2)
+
+    def test_aviso_se_invalida_con_una_lectura(self):
+        propietario = User.objects.create_user(username='dueno', password='x')
+        propiedad = Propiedad.objects.create(numero_casa='A-1', propietario=propietario, metros_cuadrados=80)
+        residente = Residente.objects.create(usuario=propietario, propiedad=propiedad, rol='propietario')
+        aviso = Aviso.objects.create(titulo='Corte de agua', contenido='Martes', dirigido_a='TODOS')
+        url = reverse('aviso-list')
+
+        etag = self.client.get(url)['ETag']
+        LecturaAviso.objects.create(aviso=aviso, residente=residente)
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertEqual(respuesta.json()['results'][0]['total_lecturas'], 1)
@@ -4,14 +4,22 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.contrib.auth.models import User
+from django.db.models import Count, Prefetch
+from config.cache_condicional import CacheCondicionalMixin
+from config.presupuestos import presupuesto_consultas
+from usuarios.contexto import contexto_de
+from usuarios.models import Residente
 from .models import Propiedad, AreaComun, Aviso, Regla, LecturaAviso
 from .serializers import (
     PropiedadSerializer, AreaComunSerializer, AvisoSerializer, 
     ReglaSerializer, LecturaAvisoSerializer, AvisoDetalleSerializer
 )
 
-class PropiedadViewSet(viewsets.ModelViewSet):
-    queryset = Propiedad.objects.all().order_by('numero_casa')
+@presupuesto_consultas(2, 'propiedad-list')
+class PropiedadViewSet(CacheCondicionalMixin, viewsets.ModelViewSet):
+    modelos_cacheados = (Propiedad, User)
+    queryset = Propiedad.objects.select_related('propietario').order_by('numero_casa')
     serializer_class = PropiedadSerializer
     # Filtros avanzados
     filterset_fields = {
@@ -23,7 +31,8 @@ class PropiedadViewSet(viewsets.ModelViewSet):
     ordering_fields = ['numero_casa', 'metros_cuadrados']
     ordering = ['numero_casa']
 
-class AreaComunViewSet(viewsets.ReadOnlyModelViewSet):
+class AreaComunViewSet(CacheCondicionalMixin, viewsets.ReadOnlyModelViewSet):
+    modelos_cacheados = (AreaComun,)
     queryset = AreaComun.objects.all()
     serializer_class = AreaComunSerializer
     # Filtros avanzados
@@ -36,8 +45,13 @@ class AreaComunViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['nombre', 'capacidad', 'costo_reserva']
     ordering = ['nombre']
 
-class AvisoViewSet(viewsets.ModelViewSet):
-    queryset = Aviso.objects.all()
+@presupuesto_consultas(3, 'aviso-list')
+@presupuesto_consultas(5, 'aviso-detail')
+class AvisoViewSet(CacheCondicionalMixin, viewsets.ModelViewSet):
+    # El detalle lista las lecturas una a una; solo se cachea el listado
+    modelos_cacheados = (Aviso, LecturaAviso, Residente)
+    acciones_cacheadas = ('list',)
+    queryset = Aviso.objects.annotate(num_lecturas=Count('lecturas'))
     # Filtros avanzados
     filterset_fields = {
         'titulo': ['icontains'],
@@ -49,6 +63,15 @@ class AvisoViewSet(viewsets.ModelViewSet):
     ordering_fields = ['fecha_publicacion', 'titulo']
     ordering = ['-fecha_publicacion']
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('retrieve', 'estadisticas_lectura'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'lecturas',
+                queryset=LecturaAviso.objects.select_related('residente__usuario', 'residente__propiedad'),
+            ))
+        return queryset
+
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return AvisoDetalleSerializer
@@ -63,22 +86,20 @@ class AvisoViewSet(viewsets.ModelViewSet):
         aviso = self.get_object()
         
         # Verificar que el usuario es un residente
-        try:
-            from usuarios.models import Residente
-            residente = Residente.objects.get(usuario=request.user)
-        except Residente.DoesNotExist:
+        ctx = contexto_de(request)
+        if not ctx.residente_id:
             return Response(
                 {'error': 'Solo los residentes pueden marcar avisos como leídos'}, 
                 status=status.HTTP_403_FORBIDDEN
             )
         
         # Verificar si el aviso está dirigido a este residente
-        if aviso.dirigido_a == 'PROPIETARIOS' and residente.rol != 'propietario':
+        if aviso.dirigido_a == 'PROPIETARIOS' and ctx.rol_residente != 'propietario':
             return Response(
                 {'error': 'Este aviso no está dirigido a inquilinos'}, 
                 status=status.HTTP_403_FORBIDDEN
             )
-        elif aviso.dirigido_a == 'INQUILINOS' and residente.rol != 'inquilino':
+        elif aviso.dirigido_a == 'INQUILINOS' and ctx.rol_residente != 'inquilino':
             return Response(
                 {'error': 'Este aviso no está dirigido a propietarios'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -87,7 +108,7 @@ class AvisoViewSet(viewsets.ModelViewSet):
         # Crear o actualizar la lectura
         lectura, created = LecturaAviso.objects.get_or_create(
             aviso=aviso,
-            residente=residente,
+            residente_id=ctx.residente_id,
             defaults={
                 'ip_lectura': self.get_client_ip(request)
             }
@@ -132,25 +153,23 @@ class AvisoViewSet(viewsets.ModelViewSet):
         GET /api/condominio/avisos/mis_avisos_pendientes/
         """
         # Verificar que el usuario es un residente
-        try:
-            from usuarios.models import Residente
-            residente = Residente.objects.get(usuario=request.user)
-        except Residente.DoesNotExist:
+        ctx = contexto_de(request)
+        if not ctx.residente_id:
             return Response(
                 {'error': 'Solo los residentes pueden consultar avisos pendientes'}, 
                 status=status.HTTP_403_FORBIDDEN
             )
         
         # Filtrar avisos según el rol del residente
-        avisos_query = Aviso.objects.filter(activo=True)
+        avisos_query = Aviso.objects.filter(activo=True).annotate(num_lecturas=Count('lecturas'))
         
-        if residente.rol == 'propietario':
+        if ctx.rol_residente == 'propietario':
             avisos_query = avisos_query.filter(dirigido_a__in=['TODOS', 'PROPIETARIOS'])
-        elif residente.rol == 'inquilino':
+        elif ctx.rol_residente == 'inquilino':
             avisos_query = avisos_query.filter(dirigido_a__in=['TODOS', 'INQUILINOS'])
         
         # Excluir avisos ya leídos
-        avisos_leidos = LecturaAviso.objects.filter(residente=residente).values_list('aviso_id', flat=True)
+        avisos_leidos = LecturaAviso.objects.filter(residente_id=ctx.residente_id).values_list('aviso_id', flat=True)
         avisos_pendientes = avisos_query.exclude(id__in=avisos_leidos)
         
         serializer = AvisoSerializer(avisos_pendientes, many=True)
@@ -169,12 +188,14 @@ class AvisoViewSet(viewsets.ModelViewSet):
             ip = request.META.get('REMOTE_ADDR')
         return ip
 
+@presupuesto_consultas(2, 'lectura-aviso-list')
+@presupuesto_consultas(2, 'lectura-aviso-resumen-general')
 class LecturaAvisoViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet para consultar las lecturas de avisos.
     Solo lectura - las lecturas se crean a través del endpoint marcar_como_leido
     """
-    queryset = LecturaAviso.objects.all()
+    queryset = LecturaAviso.objects.select_related('aviso', 'residente__usuario', 'residente__propiedad')
     serializer_class = LecturaAvisoSerializer
     
     # Filtros avanzados
@@ -218,23 +239,23 @@ class LecturaAvisoViewSet(viewsets.ReadOnlyModelViewSet):
         Resumen general de lecturas de todos los avisos activos.
         GET /api/condominio/lecturas-avisos/resumen_general/
         """
-        from django.db.models import Count
-        
         avisos_con_stats = Aviso.objects.filter(activo=True).annotate(
-            total_lecturas=Count('lecturas')
+            num_lecturas=Count('lecturas')
         ).order_by('-fecha_publicacion')
+        conteo_residentes = Aviso.conteo_residentes_por_destino()
         
         resumen = []
         for aviso in avisos_con_stats:
+            objetivo = conteo_residentes.get(aviso.dirigido_a, 0)
             resumen.append({
                 'aviso_id': aviso.id,
                 'titulo': aviso.titulo,
                 'dirigido_a': aviso.dirigido_a,
                 'fecha_publicacion': aviso.fecha_publicacion,
-                'total_residentes_objetivo': aviso.total_residentes_objetivo(),
-                'total_lecturas': aviso.total_lecturas(),
-                'porcentaje_lectura': aviso.porcentaje_lectura(),
-                'pendientes': aviso.total_residentes_objetivo() - aviso.total_lecturas()
+                'total_residentes_objetivo': objetivo,
+                'total_lecturas': aviso.num_lecturas,
+                'porcentaje_lectura': aviso.porcentaje_lectura(total_objetivo=objetivo),
+                'pendientes': objetivo - aviso.num_lecturas
             })
         
         return Response({
@@ -242,11 +263,12 @@ class LecturaAvisoViewSet(viewsets.ReadOnlyModelViewSet):
             'total_avisos_activos': len(resumen)
         })
 
-class ReglaViewSet(viewsets.ReadOnlyModelViewSet):
+class ReglaViewSet(CacheCondicionalMixin, viewsets.ReadOnlyModelViewSet):
     """
     Endpoint de API para visualizar las reglas del condominio.
     Es de solo lectura. Las reglas se gestionan desde el panel de administrador.
     """
+    modelos_cacheados = (Regla,)
     queryset = Regla.objects.filter(activa=True)
     serializer_class = ReglaSerializer
     # Filtros avanzados
@@ -0,0 +1,185 @@
+# config/cache_condicional.py
+"""
+GET condicional (ETag / Last-Modified) y caché de respuestas para catálogos.
+
+Los catálogos (reglas, áreas comunes, propiedades, avisos) cambian poco pero
+la app móvil los pide cada vez que abre una pantalla. ``CacheCondicionalMixin``
+evita repetir el trabajo:
+
+- cada modelo tiene un número de versión en la caché que se incrementa en
+  ``post_save``/``post_delete`` (``versionar_modelos``);
+- el ETag de una respuesta se calcula con las versiones de los modelos de los
+  que depende, la variante (rol del usuario), la URL completa y el formato,
+  sin tocar la base de datos;
+- si coincide con ``If-None-Match`` (o no hubo cambios desde
+  ``If-Modified-Since``) se responde 304 sin consultar ni serializar;
+- si no, el cuerpo ya renderizado se guarda en caché con el ETag como clave y
+  lo reutilizan las siguientes peticiones de la misma variante.
+
+Las operaciones masivas que no disparan señales (``update()``,
+``bulk_create``) deben llamar a ``invalidar_modelo``.
+
+Solo se activa con una caché compartida (``CATALOGO_CACHE_TTL`` es 0 sin
+``REDIS_URL``): con la de memoria local la invalidación de un proceso no la
+ven los demás, que seguirían respondiendo 304 o el cuerpo viejo.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from usuarios.contexto import contexto_de
+
+
+def _clave_version(modelo):
+    return f"catalogo:version:{modelo._meta.label_lower}"
+
+
+def _clave_modificado(modelo):
+    return f"catalogo:modificado:{modelo._meta.label_lower}"
+
+
+def invalidar_modelo(modelo):
+    """Incrementa la versión de ``modelo``: deja obsoletos sus ETag y cuerpos en caché."""
+    clave = _clave_version(modelo)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        # Sin versión (primera vez o expulsada de la caché): se parte de la
+        # hora actual para no repetir un número ya usado en un ETag anterior.
+        cache.set(clave, time.time_ns(), None)
+    cache.set(_clave_modificado(modelo), int(time.time()), None)
+
+
+def _invalidar_por_senal(sender, **kwargs):
+    invalidar_modelo(sender)
+
+
+def versionar_modelos(*modelos):
+    """Conecta las señales que incrementan la versión de cada modelo."""
+    for modelo in modelos:
+        uid = f"cache_condicional:{modelo._meta.label_lower}"
+        post_save.connect(_invalidar_por_senal, sender=modelo, dispatch_uid=uid)
+        post_delete.connect(_invalidar_por_senal, sender=modelo, dispatch_uid=uid)
+
+
+def versiones(modelos):
+    """``(versiones, ultima_modificacion)`` de ``modelos`` leídas de la caché."""
+    claves = [_clave_version(m) for m in modelos] + [_clave_modificado(m) for m in modelos]
+    valores = cache.get_many(claves)
+    faltantes = [m for m in modelos if _clave_version(m) not in valores]
+    if faltantes:
+        for modelo in faltantes:
+            invalidar_modelo(modelo)
+        valores = cache.get_many(claves)
+    numeros = tuple(valores.get(_clave_version(m)) for m in modelos)
+    modificado = max((valores.get(_clave_modificado(m)) or 0) for m in modelos)
+    return numeros, modificado
+
+
+class CacheCondicionalMixin:
+    """
+    Para ViewSets de solo lectura frecuente. Declarar:
+
+    - ``modelos_cacheados``: modelos cuyo cambio altera la respuesta (deben
+      estar registrados con ``versionar_modelos``);
+    - ``acciones_cacheadas``: acciones afectadas (por defecto list y retrieve).
+
+    La variante por defecto es el rol del usuario; sobrescribir
+    ``variante_cache`` si la respuesta depende de algo más.
+    """
+    modelos_cacheados = ()
+    acciones_cacheadas = ('list', 'retrieve')
+    # Solo se guardan cuerpos JSON; el navegador de la API incluye datos de la sesión
+    formatos_cacheados = ('json',)
+
+    def variante_cache(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            return 'anonimo'
+        if user.is_staff or user.is_superuser:
+            return 'staff'
+        # Con CachedTokenAuthentication el contexto ya viene resuelto (sin consulta)
+        return contexto_de(request).rol or 'autenticado'
+
+    def _etag(self, request, numeros):
+        formato = getattr(request.accepted_renderer, 'format', '')
+        base = '|'.join([
+            repr(numeros),
+            self.variante_cache(request),
+            request.get_full_path(),
+            formato,
+        ])
+        return '"%s"' % hashlib.sha1(base.encode()).hexdigest()
+
+    def _con_cache(self, accion, request, *args, **kwargs):
+        ttl = getattr(settings, 'CATALOGO_CACHE_TTL', 600)
+        if request.method not in ('GET', 'HEAD') or not self.modelos_cacheados or not ttl:
+            return accion(request, *args, **kwargs)
+
+        numeros, modificado = versiones(self.modelos_cacheados)
+        etag = self._etag(request, numeros)
+        validadores = {'ETag': etag, 'Last-Modified': http_date(modificado)}
+
+        if self._no_modificado(request, etag, modificado):
+            return self._cabeceras(Response(status=status.HTTP_304_NOT_MODIFIED), validadores)
+
+        formato = getattr(request.accepted_renderer, 'format', None)
+        cacheable = formato in self.formatos_cacheados
+        clave_cuerpo = f"catalogo:cuerpo:{etag}"
+        if cacheable:
+            guardado = cache.get(clave_cuerpo)
+            if guardado is not None:
+                contenido, tipo = guardado
+                return self._cabeceras(HttpResponse(contenido, content_type=tipo), validadores)
+
+        respuesta = accion(request, *args, **kwargs)
+        if respuesta.status_code != status.HTTP_200_OK:
+            return respuesta
+        if cacheable:
+            respuesta.accepted_renderer = request.accepted_renderer
+            respuesta.accepted_media_type = request.accepted_media_type
+            respuesta.renderer_context = self.get_renderer_context()
+            respuesta.render()
+            cache.set(
+                clave_cuerpo,
+                (respuesta.rendered_content, respuesta['Content-Type']),
+                ttl,
+            )
+        return self._cabeceras(respuesta, validadores)
+
+    @staticmethod
+    def _no_modificado(request, etag, modificado):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            # Comparación débil, como manda RFC 9110 para If-None-Match
+            return '*' in etags or etag in [e.removeprefix('W/') for e in etags]
+        desde = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return desde is not None and modificado <= desde
+
+    @staticmethod
+    def _cabeceras(respuesta, validadores):
+        for nombre, valor in validadores.items():
+            respuesta[nombre] = valor
+        # El cliente puede guardarla pero debe revalidar siempre; varía por usuario
+        patch_cache_control(respuesta, private=True, no_cache=True)
+        patch_vary_headers(respuesta, ('Authorization',))
+        return respuesta
+
+    def list(self, request, *args, **kwargs):
+        if 'list' not in self.acciones_cacheadas:
+            return super().list(request, *args, **kwargs)
+        return self._con_cache(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if 'retrieve' not in self.acciones_cacheadas:
+            return super().retrieve(request, *args, **kwargs)
+        return self._con_cache(super().retrieve, request, *args, **kwargs)
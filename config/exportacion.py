@@ -0,0 +1,139 @@
+# config/exportacion.py
+"""
+Exportación masiva (CSV o NDJSON) de las tablas de los ViewSets.
+
+``ExportacionMixin`` agrega ``GET …/exportar/`` a un ViewSet. La exportación
+usa el mismo ``get_queryset`` y los mismos filtros, búsqueda y orden que el
+listado (``?fecha_hora__gte=…&search=…``), así que exporta exactamente lo que
+el listado mostraría sin paginar. Declarar::
+
+    class EventoSeguridadViewSet(ExportacionMixin, viewsets.ModelViewSet):
+        columnas_exportacion = (
+            ('id', 'id'),
+            ('fecha_hora', 'fecha_hora'),
+            ('vehiculo', 'vehiculo_registrado__placa'),   # cualquier lookup de values_list
+        )
+
+Las filas se leen con ``values_list(...).iterator(chunk_size=…)`` (en
+PostgreSQL, un cursor del lado del servidor) y se envían con
+``StreamingHttpResponse`` en bloques de ~64 KB, comprimidos al vuelo con
+``?gzip=1``: un año de eventos se exporta en memoria constante y los primeros
+bytes salen en cuanto la base devuelve las primeras filas.
+"""
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+
+TAMANO_BLOQUE = 2000
+# Bytes que se acumulan antes de enviar un pedazo de la respuesta
+TAMANO_ENVIO = 64 * 1024
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+class _Eco:
+    """Pseudo-archivo para ``csv.writer``: devuelve la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(encabezados, filas):
+    """Una línea CSV (texto) por fila, empezando por los encabezados; también la usa finanzas.morosidad."""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(encabezados)
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+def lineas_ndjson(encabezados, filas):
+    for fila in filas:
+        yield json.dumps(dict(zip(encabezados, fila)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def _en_bloques(lineas):
+    """Agrupa las líneas en pedazos de ~``TAMANO_ENVIO`` bytes; la primera sale sola, enseguida."""
+    lineas = iter(lineas)
+    for linea in lineas:
+        yield linea.encode('utf-8')
+        break
+    bloque, tamano = [], 0
+    for linea in lineas:
+        datos = linea.encode('utf-8')
+        bloque.append(datos)
+        tamano += len(datos)
+        if tamano >= TAMANO_ENVIO:
+            yield b''.join(bloque)
+            bloque, tamano = [], 0
+    if bloque:
+        yield b''.join(bloque)
+
+
+def _comprimido(bloques):
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # formato gzip
+    for bloque in bloques:
+        if datos := compresor.compress(bloque):
+            yield datos
+    yield compresor.flush()
+
+
+def respuesta_exportacion(encabezados, filas, nombre, formato='csv', gzip=False):
+    """``StreamingHttpResponse`` con ``filas`` (iterable de tuplas) como CSV o NDJSON."""
+    tipo, extension = FORMATOS[formato]
+    lineas = (lineas_csv if formato == 'csv' else lineas_ndjson)(encabezados, filas)
+    contenido = _en_bloques(lineas)
+    nombre = f"{nombre}.{extension}"
+    if gzip:
+        contenido, tipo, nombre = _comprimido(contenido), 'application/gzip', f"{nombre}.gz"
+    respuesta = StreamingHttpResponse(contenido, content_type=tipo)
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return respuesta
+
+
+class ExportacionMixin:
+    """
+    Agrega la acción ``exportar`` (solo administradores por defecto). Declarar
+    ``columnas_exportacion``: pares ``(encabezado, lookup de values_list)``.
+    """
+    columnas_exportacion = ()
+    # Nombre del archivo descargado (ASCII); por defecto el del modelo
+    nombre_exportacion = None
+    permisos_exportacion = [IsAdminUser]
+
+    def get_permissions(self):
+        if getattr(self, 'action', None) == 'exportar':
+            return [permiso() for permiso in self.permisos_exportacion]
+        return super().get_permissions()
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='formato', type=str, required=False, enum=list(FORMATOS),
+                             description='csv (por defecto) o ndjson (un objeto JSON por línea)'),
+            OpenApiParameter(name='gzip', type=bool, required=False, description='Comprimir la descarga con gzip'),
+        ],
+        responses={(200, 'text/csv'): OpenApiTypes.BINARY, (200, 'application/x-ndjson'): OpenApiTypes.BINARY},
+    )
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def exportar(self, request, *args, **kwargs):
+        """Descarga todas las filas del listado (mismos filtros) como CSV o NDJSON, en streaming."""
+        formato = request.query_params.get('formato', 'csv').lower()
+        if formato not in FORMATOS:
+            formato = 'csv'
+        gzip = request.query_params.get('gzip', '').lower() in ('1', 'true', 'si')
+
+        encabezados = [encabezado for encabezado, _ in self.columnas_exportacion]
+        lookups = [lookup for _, lookup in self.columnas_exportacion]
+        queryset = self.filter_queryset(self.get_queryset())
+        filas = queryset.values_list(*lookups).iterator(chunk_size=TAMANO_BLOQUE)
+        nombre = self.nombre_exportacion or queryset.model._meta.model_name
+        return respuesta_exportacion(encabezados, filas, nombre, formato, gzip)
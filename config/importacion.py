@@ -0,0 +1,287 @@
+# config/importacion.py
+"""
+Importación masiva de CSV (gastos, egresos, vehículos, residentes…).
+
+Cada tabla declara su importador en el módulo ``importadores.py`` de su app
+(se cargan solos la primera vez que se pide uno)::
+
+    @registrar
+    class ImportadorVehiculos(Importador):
+        tipo = 'vehiculos'
+        columnas = ('placa', 'numero_casa')
+
+        def preparar(self, filas):      # consultas de todo el lote
+            return {'casas': mapa(Propiedad, 'numero_casa', filas)}
+
+        def convertir(self, fila, lote):  # una fila -> objeto, o FilaInvalida
+            ...
+
+        def guardar(self, objetos):     # bulk_create; devuelve cuántas filas creó
+            ...
+
+``importar`` lee el archivo en streaming con ``csv.DictReader`` y lo procesa
+en lotes de ``TAMANO_LOTE`` filas:
+
+1. ``preparar`` valida el lote completo de una vez: una consulta por lote
+   para cada clave foránea (``numero_casa`` -> propiedad) y para los
+   duplicados contra la base. Los duplicados dentro del archivo se detectan
+   con los valores ya vistos en lotes anteriores (estado del importador).
+2. Las filas válidas del lote se escriben con ``bulk_create`` en su propia
+   transacción. Una fila con error no frena a las demás: se informa con su
+   número de línea en el archivo.
+
+Cada lote confirmado avanza ``ResultadoImportacion.ultima_linea``; si la
+importación se corta, ``desde_linea`` (``--desde-linea`` en el comando)
+retoma justo después del último lote guardado, sin duplicar filas.
+"""
+import csv
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, transaction
+from django.utils.module_loading import autodiscover_modules
+
+TAMANO_LOTE = 1000
+# Errores que se devuelven en el resultado (el total se informa aparte)
+MAX_ERRORES = 1000
+
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y')
+
+IMPORTADORES = {}
+
+
+class ImportacionInvalida(ValueError):
+    """El archivo no se puede importar (p. ej. le faltan columnas)."""
+
+
+class ImportacionInterrumpida(Exception):
+    """Falló la escritura de un lote; ``resultado`` dice desde dónde retomar."""
+
+    def __init__(self, resultado, error):
+        self.resultado = resultado
+        super().__init__(
+            f"La importación se detuvo en el lote que empieza en la línea {resultado.ultima_linea + 1}: {error}"
+        )
+
+
+class FilaInvalida(ValueError):
+    """Error de una fila; se informa con su número de línea."""
+
+
+class Fila(dict):
+    """Valores de una fila del CSV (sin espacios alrededor) y su línea en el archivo."""
+
+    def __init__(self, linea, datos):
+        super().__init__((clave.strip(), (valor or '').strip()) for clave, valor in datos.items() if clave)
+        self.linea = linea
+
+
+@dataclass
+class ResultadoImportacion:
+    tipo: str
+    leidas: int = 0
+    creadas: int = 0
+    # (línea, mensaje)
+    errores: list = field(default_factory=list)
+    # Última línea del último lote guardado: se retoma desde la siguiente
+    ultima_linea: int = 0
+    simulacion: bool = False
+    segundos: float = 0
+
+    @property
+    def por_segundo(self):
+        return self.leidas / self.segundos if self.segundos else 0
+
+    def como_dict(self):
+        return {
+            'tipo': self.tipo,
+            'leidas': self.leidas,
+            'creadas': self.creadas,
+            'total_errores': len(self.errores),
+            'errores': [{'linea': linea, 'error': error} for linea, error in self.errores[:MAX_ERRORES]],
+            'ultima_linea': self.ultima_linea,
+            'simulacion': self.simulacion,
+            'segundos': round(self.segundos, 2),
+        }
+
+
+# ---------------------------------------------------------------------------
+# Registro
+# ---------------------------------------------------------------------------
+
+def registrar(clase):
+    """Registra la clase decorada como importador de ``clase.tipo``."""
+    IMPORTADORES[clase.tipo] = clase
+    return clase
+
+
+def tipos():
+    autodiscover_modules('importadores')
+    return sorted(IMPORTADORES)
+
+
+def importador(tipo):
+    """Una instancia nueva del importador de ``tipo`` (guarda el estado de una importación)."""
+    autodiscover_modules('importadores')
+    try:
+        return IMPORTADORES[tipo]()
+    except KeyError:
+        raise LookupError(f"No hay importador '{tipo}'. Disponibles: {', '.join(sorted(IMPORTADORES))}") from None
+
+
+# ---------------------------------------------------------------------------
+# Validación de valores (lanzan FilaInvalida)
+# ---------------------------------------------------------------------------
+
+def obligatorio(fila, columna):
+    if not fila.get(columna):
+        raise FilaInvalida(f"Falta '{columna}'.")
+    return fila[columna]
+
+
+def monto(fila, columna='monto', max_digitos=10, decimales=2):
+    """Monto positivo con a lo sumo ``decimales`` decimales; acepta coma decimal (``1500,50``)."""
+    texto = obligatorio(fila, columna)
+    if ',' in texto and '.' not in texto:
+        texto = texto.replace(',', '.')
+    try:
+        valor = Decimal(texto)
+    except InvalidOperation:
+        raise FilaInvalida(f"'{columna}' no es un número: {fila[columna]!r}.") from None
+    if not valor.is_finite() or valor <= 0:
+        raise FilaInvalida(f"'{columna}' debe ser mayor que cero: {fila[columna]!r}.")
+    if valor != valor.quantize(Decimal(1).scaleb(-decimales)):
+        raise FilaInvalida(f"'{columna}' tiene más de {decimales} decimales: {fila[columna]!r}.")
+    if valor >= Decimal(10) ** (max_digitos - decimales):
+        raise FilaInvalida(f"'{columna}' es demasiado grande: {fila[columna]!r}.")
+    return valor
+
+
+def fecha(fila, columna, requerida=True):
+    """Fecha ``AAAA-MM-DD`` o ``DD/MM/AAAA``; None si no es requerida y está vacía."""
+    texto = obligatorio(fila, columna) if requerida else fila.get(columna)
+    if not texto:
+        return None
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise FilaInvalida(f"'{columna}' no es una fecha (AAAA-MM-DD o DD/MM/AAAA): {texto!r}.")
+
+
+def opcion(fila, columna, opciones):
+    """Valor de ``opciones`` (claves de ``choices``), sin distinguir mayúsculas."""
+    texto = obligatorio(fila, columna)
+    por_clave = {clave.lower(): clave for clave in opciones}
+    try:
+        return por_clave[texto.lower()]
+    except KeyError:
+        raise FilaInvalida(f"'{columna}' debe ser una de {', '.join(opciones)}: {texto!r}.") from None
+
+
+def mapa(modelo, campo, filas, columna=None, valor='pk'):
+    """
+    ``{campo: valor}`` de las filas del lote que existen en ``modelo``, en
+    una sola consulta (p. ej. ``numero_casa`` -> id de la propiedad).
+    """
+    claves = {fila.get(columna or campo) for fila in filas} - {None, ''}
+    if not claves:
+        return {}
+    return dict(modelo.objects.filter(**{f"{campo}__in": claves}).values_list(campo, valor))
+
+
+def buscar(mapa_lote, fila, columna, nombre):
+    """El valor de ``mapa_lote`` para la columna de la fila, o FilaInvalida."""
+    clave = obligatorio(fila, columna)
+    try:
+        return mapa_lote[clave]
+    except KeyError:
+        raise FilaInvalida(f"No existe {nombre} '{clave}'.") from None
+
+
+# ---------------------------------------------------------------------------
+# Importación
+# ---------------------------------------------------------------------------
+
+class Importador:
+    tipo = None
+    # Columnas obligatorias del encabezado y columnas que se leen si están
+    columnas = ()
+    opcionales = ()
+
+    def validar_encabezados(self, encabezados):
+        faltan = [columna for columna in self.columnas if columna not in {(e or '').strip() for e in encabezados or ()}]
+        if faltan:
+            raise ImportacionInvalida(f"Faltan columnas en el encabezado: {', '.join(faltan)}.")
+
+    def preparar(self, filas):
+        """Consultas del lote completo (mapas de claves foráneas, duplicados en la base)."""
+        return None
+
+    def convertir(self, fila, lote):
+        """Objeto a guardar a partir de la fila, o ``FilaInvalida``."""
+        raise NotImplementedError
+
+    def guardar(self, objetos):
+        """Escribe los objetos del lote (ya dentro de una transacción); devuelve cuántos creó."""
+        raise NotImplementedError
+
+
+def _lotes(lector, desde_linea, tamano):
+    lote = []
+    for datos in lector:
+        # line_num es la línea física donde terminó la fila (un campo puede ocupar varias)
+        if lector.line_num < desde_linea or not any(datos.values()):
+            continue
+        lote.append(Fila(lector.line_num, datos))
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def importar(archivo, tipo, desde_linea=1, delimitador=',', simular=False, tamano_lote=None, progreso=None):
+    """
+    Importa el CSV ``archivo`` (texto; abrirlo con ``newline=''`` y
+    ``encoding='utf-8-sig'``) con el importador de ``tipo``.
+
+    ``desde_linea`` salta las filas anteriores (para retomar), ``simular``
+    solo valida, y ``progreso(resultado)`` se llama después de cada lote.
+    Lanza ``ImportacionInvalida`` si el encabezado no sirve e
+    ``ImportacionInterrumpida`` si falla la escritura de un lote.
+    """
+    imp = importador(tipo)
+    lector = csv.DictReader(archivo, delimiter=delimitador)
+    imp.validar_encabezados(lector.fieldnames)
+    resultado = ResultadoImportacion(tipo=tipo, simulacion=simular, ultima_linea=max(desde_linea - 1, 1))
+    inicio = time.monotonic()
+
+    for filas in _lotes(lector, desde_linea, tamano_lote or TAMANO_LOTE):
+        lote = imp.preparar(filas)
+        objetos = []
+        for fila in filas:
+            try:
+                objetos.append(imp.convertir(fila, lote))
+            except FilaInvalida as error:
+                resultado.errores.append((fila.linea, str(error)))
+
+        if objetos and not simular:
+            try:
+                with transaction.atomic():
+                    creadas = imp.guardar(objetos)
+            except DatabaseError as error:
+                resultado.segundos = time.monotonic() - inicio
+                raise ImportacionInterrumpida(resultado, error) from error
+            resultado.creadas += creadas
+        resultado.leidas += len(filas)
+        resultado.ultima_linea = filas[-1].linea
+        resultado.segundos = time.monotonic() - inicio
+        if progreso:
+            progreso(resultado)
+
+    resultado.segundos = time.monotonic() - inicio
+    return resultado
@@ -0,0 +1,307 @@
+# config/pagination.py
+"""
+Paginación por defecto de la API.
+
+Todas las listas se paginan por *keyset* (cursor) sobre el ``ordering`` de
+cada ViewSet: en lugar de ``OFFSET n`` se filtra por los valores de la última
+fila entregada, así que pedir la página 10.000 de la bitácora cuesta lo mismo
+que pedir la primera. Los cursores son opacos y van firmados.
+
+El panel React puede seguir usando paginación clásica enviando ``?page=N``.
+"""
+import datetime
+import json
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core import signing
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+CURSOR_SALT = "config.pagination.cursor"
+
+
+def estimar_total(queryset, limite_exacto):
+    """
+    Devuelve ``(total, es_estimado)`` sin hacer un ``COUNT(*)`` completo.
+
+    Cuenta como mucho ``limite_exacto + 1`` filas; si hay más, en PostgreSQL
+    se usa la estimación del planificador (``EXPLAIN``) y en otros motores se
+    devuelve el límite como cota inferior.
+    """
+    queryset = queryset.order_by()
+    total = queryset[:limite_exacto + 1].count()
+    if total <= limite_exacto:
+        return total, False
+
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        try:
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            total = max(int(plan[0]["Plan"]["Plan Rows"]), total)
+        except Exception:
+            pass
+    return total, True
+
+
+def _serializar_valor(valor):
+    if isinstance(valor, (datetime.datetime, datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, (Decimal, uuid.UUID)):
+        return str(valor)
+    return valor
+
+
+class _PaginatorEstimado(Paginator):
+    """Paginator de Django que usa ``estimar_total`` en lugar de ``COUNT(*)``."""
+    limite_conteo_exacto = 10000
+
+    @cached_property
+    def count(self):
+        total, self.count_is_estimate = estimar_total(self.object_list, self.limite_conteo_exacto)
+        return total
+
+
+class OffsetPagination(PageNumberPagination):
+    """Paginación por número de página (opt-in con ``?page=N``)."""
+    django_paginator_class = _PaginatorEstimado
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("count", self.page.paginator.count),
+            ("count_is_estimate", getattr(self.page.paginator, "count_is_estimate", False)),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación keyset sobre el ordering de la vista, con desempate por ``pk``.
+
+    - ``?cursor=`` opaco (firmado) con los valores de la fila frontera.
+    - ``?page_size=`` limitado por ``max_page_size``.
+    - ``count`` exacto hasta ``limite_conteo_exacto`` y estimado por encima.
+    - ``?page=N`` activa la paginación por offset (``OffsetPagination``).
+
+    Si el ordering pedido incluye un campo nullable se usa offset, porque la
+    comparación por rango no es fiable con ``NULL``.
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    offset_query_param = "page"
+    limite_conteo_exacto = 10000
+    offset_pagination_class = OffsetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self._offset = None
+
+        ordering = self.get_ordering(request, queryset, view)
+        if self.offset_query_param in request.query_params or not self._es_keyset_valido(queryset.model, ordering):
+            self._offset = self.offset_pagination_class()
+            self._offset.page_size = self.page_size
+            self._offset.max_page_size = self.max_page_size
+            return self._offset.paginate_queryset(queryset.order_by(*ordering), request, view)
+
+        self.ordering = ordering
+        self.count, self.count_is_estimate = estimar_total(queryset, self.limite_conteo_exacto)
+
+        cursor = self.decode_cursor(request)
+        hacia_atras = cursor is not None and cursor["d"] == "p"
+        orden = [self._invertir(campo) for campo in ordering] if hacia_atras else list(ordering)
+
+        queryset = queryset.order_by(*orden)
+        if cursor is not None:
+            queryset = queryset.filter(self._filtro_posterior(orden, cursor["v"]))
+
+        filas = list(queryset[:self.page_size + 1])
+        hay_mas = len(filas) > self.page_size
+        filas = filas[:self.page_size]
+        if hacia_atras:
+            filas.reverse()
+
+        self.page = filas
+        self.has_next = hay_mas if not hacia_atras else True
+        self.has_previous = hay_mas if hacia_atras else cursor is not None
+        if not filas:
+            self.has_next = False
+            self.has_previous = cursor is not None and not hacia_atras
+        return filas
+
+    def get_paginated_response(self, data):
+        if self._offset is not None:
+            return self._offset.get_paginated_response(data)
+        return Response(OrderedDict([
+            ("count", self.count),
+            ("count_is_estimate", self.count_is_estimate),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer", "example": 123},
+                "count_is_estimate": {"type": "boolean", "example": False},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Cursor opaco devuelto en `next`/`previous`.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"Resultados por página (máximo {self.max_page_size}).",
+                "schema": {"type": "integer"},
+            },
+            {
+                "name": self.offset_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Número de página; activa la paginación por offset.",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+    # --- Parámetros de la petición ---
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Ordering de la vista (respetando ``?ordering=``), o el del modelo, con
+        ``pk`` al final para que cada fila tenga una posición única.
+        """
+        ordering = None
+        for backend in getattr(view, "filter_backends", []):
+            if hasattr(backend, "get_ordering"):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        if not ordering:
+            ordering = getattr(view, "ordering", None) or queryset.query.order_by or queryset.model._meta.ordering
+        if isinstance(ordering, str):
+            ordering = [ordering]
+        ordering = [campo for campo in ordering if isinstance(campo, str)] or ["-pk"]
+
+        nombres = {campo.lstrip("-") for campo in ordering}
+        if not nombres & {"pk", "id"}:
+            ordering.append("-pk" if ordering[0].startswith("-") else "pk")
+        return tuple(ordering)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = signing.loads(encoded, salt=CURSOR_SALT)
+            if cursor["d"] not in ("n", "p") or len(cursor["v"]) != len(self.ordering):
+                raise ValueError
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            raise NotFound("Cursor inválido.")
+        return cursor
+
+    def encode_cursor(self, fila, direccion):
+        valores = [_serializar_valor(self._valor(fila, campo.lstrip("-"))) for campo in self.ordering]
+        encoded = signing.dumps({"v": valores, "d": direccion}, salt=CURSOR_SALT, compress=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], "n")
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], "p")
+
+    # --- Construcción del filtro keyset ---
+
+    @staticmethod
+    def _invertir(campo):
+        return campo[1:] if campo.startswith("-") else f"-{campo}"
+
+    @staticmethod
+    def _campo_modelo(model, ruta):
+        campo = None
+        for parte in ruta.split("__"):
+            campo = model._meta.pk if parte == "pk" else model._meta.get_field(parte)
+            if campo.is_relation:
+                model = campo.related_model
+        return campo
+
+    def _es_keyset_valido(self, model, ordering):
+        try:
+            campos = [self._campo_modelo(model, campo.lstrip("-")) for campo in ordering]
+        except Exception:
+            return False
+        return not any(getattr(campo, "null", False) for campo in campos)
+
+    def _valor(self, fila, ruta):
+        partes = ruta.split("__")
+        for parte in partes[:-1]:
+            fila = getattr(fila, parte)
+        ultimo = partes[-1]
+        if ultimo == "pk":
+            return fila.pk
+        campo = fila._meta.get_field(ultimo)
+        return getattr(fila, campo.attname)
+
+    @staticmethod
+    def _filtro_posterior(orden, valores):
+        """
+        ``(a, b, pk) > (va, vb, vpk)`` respetando la dirección de cada campo:
+        ``a > va OR (a = va AND b > vb) OR (a = va AND b = vb AND pk > vpk)``.
+        """
+        filtro = Q()
+        iguales = Q()
+        for campo, valor in zip(orden, valores):
+            nombre = campo.lstrip("-")
+            lookup = "lt" if campo.startswith("-") else "gt"
+            filtro |= iguales & Q(**{f"{nombre}__{lookup}": valor})
+            iguales &= Q(**{nombre: valor})
+        return filtro
@@ -0,0 +1,31 @@
+# config/presupuestos.py
+"""
+Presupuesto de consultas SQL por endpoint.
+
+Cada vista declara, junto a su código, cuántas consultas puede lanzar como
+máximo para cada nombre de URL::
+
+    @presupuesto_consultas(4, "aviso-list")
+    class AvisoViewSet(viewsets.ModelViewSet):
+        ...
+
+Los tests (``config.testing.PresupuestoConsultasMixin``) comprueban que el
+endpoint no supera el máximo y que el número de consultas no crece al pasar
+de N a 10×N filas, de modo que un N+1 nuevo rompe el build.
+"""
+
+PRESUPUESTOS = {}
+
+
+def presupuesto_consultas(maximo, *nombres_url):
+    """Registra ``maximo`` consultas para cada nombre de URL dado."""
+    def decorador(vista):
+        for nombre in nombres_url:
+            PRESUPUESTOS[nombre] = maximo
+        return vista
+    return decorador
+
+
+def presupuesto_de(nombre_url):
+    """Máximo registrado para ``nombre_url`` (``KeyError`` si no tiene)."""
+    return PRESUPUESTOS[nombre_url]
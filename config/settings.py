@@ -27,6 +27,7 @@ if RENDER_EXTERNAL_HOSTNAME:
     ALLOWED_HOSTS.append(RENDER_EXTERNAL_HOSTNAME)
 # --- Apps ---
 INSTALLED_APPS = [
+    'daphne',  # runserver ASGI (WebSockets); debe ir antes de staticfiles
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
     'mantenimiento',
     
     'auditoria.apps.AuditoriaConfig',  # Asegúrate de usar la configuración correcta
+    'tareas',
     # Terceros
     'rest_framework',
     'rest_framework.authtoken',
@@ -49,6 +51,7 @@ INSTALLED_APPS = [
     'drf_spectacular',
     'drf_spectacular_sidecar',
     'django_filters',  # Añadido para filtros avanzados
+    'channels',
     "notificaciones",
 ]
 FCM_SERVER_KEY = 'xhdePFTJ5JCcWRkbXXaGoEq_6XUOTlFBWa7GomXTt_0'
@@ -60,6 +63,7 @@ NOTIF_FAKE_SEND = True
 MIDDLEWARE = [
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'auditoria.middleware.IPMiddleware', 
+    'auditoria.middleware.PerfiladoMiddleware',
 
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # bien aquí
@@ -67,6 +71,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'usuarios.contexto.ContextoUsuarioMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -90,6 +95,7 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 # Si usas ASGI (Daphne), mantén también config.asgi:application en tu comando.
+ASGI_APPLICATION = 'config.asgi.application'
 
 import dj_database_url
 
@@ -189,9 +195,22 @@ USE_TZ = True
 PAGOSNET_API_URL = 'https://servicios.pagosnet.com/api/v2/' # URL de prueba
 PAGOSNET_EMAIL = 'tu_email_de_comercio@empresa.com'
 PAGOSNET_PASSWORD = 'tu_password_de_comercio'
+# Cliente de la pasarela (finanzas.pagosnet): timeouts en segundos, reintentos
+# de errores transitorios y circuito que falla enseguida si la pasarela cae
+PAGOSNET_TIMEOUT_CONEXION = config('PAGOSNET_TIMEOUT_CONEXION', default=3, cast=float)
+PAGOSNET_TIMEOUT_LECTURA = config('PAGOSNET_TIMEOUT_LECTURA', default=10, cast=float)
+PAGOSNET_REINTENTOS = config('PAGOSNET_REINTENTOS', default=2, cast=int)
+PAGOSNET_CIRCUITO_FALLOS = config('PAGOSNET_CIRCUITO_FALLOS', default=5, cast=int)
+PAGOSNET_CIRCUITO_ESPERA = config('PAGOSNET_CIRCUITO_ESPERA', default=30, cast=int)
+# Vigencia del token si la pasarela no la informa
+PAGOSNET_TOKEN_TTL = config('PAGOSNET_TOKEN_TTL', default=3000, cast=int)
 # --- Static ---
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Archivos generados por el servidor (p. ej. PDFs de tareas en segundo plano)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = config('MEDIA_ROOT', default=str(BASE_DIR / 'var' / 'media'))
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage' # <--- AÑADE ESTA LÍNEA
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -201,7 +220,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     # Autenticación: usamos Token primero para que los tests con "HTTP_AUTHORIZATION: Token <key>" funcionen siempre
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "usuarios.authentication.CachedTokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
 
@@ -217,6 +236,10 @@ REST_FRAMEWORK = {
         "rest_framework.filters.OrderingFilter",
     ],
 
+    # Paginación keyset (cursor) en todas las listas; ?page=N activa offset para el panel React
+    "DEFAULT_PAGINATION_CLASS": "config.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
+
     # Throttling de alcance (ScopedRateThrottle) para los endpoints de seguridad
     "DEFAULT_THROTTLE_CLASSES": [
         "rest_framework.throttling.ScopedRateThrottle",
@@ -244,6 +267,101 @@ SPECTACULAR_SETTINGS = {
 
 AWS_REKOGNITION_COLLECTION_ID = "condominio_residentes"
 
+# --- CACHÉ ---
+# Redis compartido en producción (REDIS_URL); memoria local en desarrollo/tests.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# --- CAPA DE CANALES (WebSockets, seguridad.consumers) ---
+# Redis para repartir eventos entre procesos; en memoria (un solo proceso) en desarrollo/tests.
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
+# --- TOKENS DE AUTENTICACIÓN (usuarios.authentication) ---
+# Solo con caché compartida: sin REDIS_URL (memoria local, una por proceso) 0 desactiva la caché de tokens
+AUTH_TOKEN_CACHE_TTL = config('AUTH_TOKEN_CACHE_TTL', default=300 if REDIS_URL else 0, cast=int)
+# Segundos de validez del token (vacío = sin expiración, como DRF por defecto)
+AUTH_TOKEN_EXPIRACION = config('AUTH_TOKEN_EXPIRACION', default=None, cast=lambda v: int(v) if v else None)
+AUTH_TOKEN_DESLIZANTE = config('AUTH_TOKEN_DESLIZANTE', default=False, cast=bool)
+AUTH_TOKEN_RENOVAR_CADA = config('AUTH_TOKEN_RENOVAR_CADA', default=3600, cast=int)
+
+# --- GET CONDICIONAL DE CATÁLOGOS (config.cache_condicional) ---
+# Segundos que se guarda en caché el cuerpo renderizado de cada variante.
+# Solo con caché compartida: sin REDIS_URL cada proceso tendría sus propias
+# versiones y serviría ETags y cuerpos obsoletos; 0 desactiva el GET condicional
+CATALOGO_CACHE_TTL = config('CATALOGO_CACHE_TTL', default=600 if REDIS_URL else 0, cast=int)
+
+# --- TAREAS EN SEGUNDO PLANO (tareas, comando run_workers) ---
+# Espera (s) de un worker cuando la cola está vacía
+TAREAS_INTERVALO = config('TAREAS_INTERVALO', default=1.0, cast=float)
+# Plazo (s) sin latido de una tarea EN_CURSO antes de darla por abandonada y reencolarla
+TAREAS_DURACION_MAXIMA = config('TAREAS_DURACION_MAXIMA', default=900, cast=int)
+# Cada cuántos segundos el worker renueva el plazo de la tarea que está ejecutando
+TAREAS_LATIDO = config('TAREAS_LATIDO', default=30, cast=int)
+# Reintentos: espera base * 2^(intento-1), con tope
+TAREAS_BACKOFF_BASE = config('TAREAS_BACKOFF_BASE', default=10, cast=int)
+TAREAS_BACKOFF_MAX = config('TAREAS_BACKOFF_MAX', default=3600, cast=int)
+
+# --- PERFILADO DE PETICIONES (auditoria.middleware.PerfiladoMiddleware) ---
+# Cabecera Server-Timing para todos (en producción solo la reciben los usuarios staff)
+PERFILADO_SERVER_TIMING = config('PERFILADO_SERVER_TIMING', default=DEBUG, cast=bool)
+PERFILADO_MUESTRAS_POR_RUTA = config('PERFILADO_MUESTRAS_POR_RUTA', default=500, cast=int)
+
+# --- BITÁCORA DE AUDITORÍA (auditoria.escritor) ---
+# "directo": un INSERT por evento. "lote": buffer por proceso + bulk_create.
+AUDITORIA_ESCRITURA = config('AUDITORIA_ESCRITURA', default='directo')
+AUDITORIA_LOTE_TAMANO = config('AUDITORIA_LOTE_TAMANO', default=200, cast=int)
+AUDITORIA_LOTE_SEGUNDOS = config('AUDITORIA_LOTE_SEGUNDOS', default=2.0, cast=float)
+AUDITORIA_SPILL_DIR = config('AUDITORIA_SPILL_DIR', default=str(BASE_DIR / 'var' / 'auditoria'))
+AUDITORIA_SPILL_FSYNC = config('AUDITORIA_SPILL_FSYNC', default=False, cast=bool)
+
+# --- RECIBOS EN PDF (finanzas.recibos) ---
+# Caché en disco de los recibos dibujados, por huella de su contenido
+RECIBOS_CACHE_DIR = config('RECIBOS_CACHE_DIR', default=str(BASE_DIR / 'var' / 'recibos'))
+# Procesos para dibujar recibos en lote (1 = sin pool)
+RECIBOS_PROCESOS = config('RECIBOS_PROCESOS', default=4, cast=int)
+# Procesos para dibujar los estados de cuenta de fin de mes (finanzas.estados_mensuales)
+ESTADOS_CUENTA_PROCESOS = config('ESTADOS_CUENTA_PROCESOS', default=4, cast=int)
+
+# --- BANDERA DE MOROSIDAD (finanzas.morosos) ---
+# Segundos que la bandera de un usuario vive en la caché compartida; las
+# escrituras de deudas y pagos la borran antes, y el comando nocturno
+# actualizar_morosos la refresca cuando vencen gastos. Solo con caché
+# compartida: sin REDIS_URL el borrado no llega a los demás procesos; 0 la desactiva.
+MOROSOS_CACHE_TTL = config('MOROSOS_CACHE_TTL', default=3600 if REDIS_URL else 0, cast=int)
+
+# Recargos por mora sobre gastos vencidos (finanzas.recargos, comando
+# aplicar_recargos): 'diario' o 'mensual', tasa sobre el saldo por día o
+# por mes de atraso, tope acumulado como fracción del saldo ('' sin tope)
+RECARGOS_TIPO = config('RECARGOS_TIPO', default='mensual')
+RECARGOS_TASA = config('RECARGOS_TASA', default='0.02')
+RECARGOS_DIAS_GRACIA = config('RECARGOS_DIAS_GRACIA', default=5, cast=int)
+RECARGOS_TOPE = config('RECARGOS_TOPE', default='0.20')
+RECARGOS_MINIMO = config('RECARGOS_MINIMO', default='1.00')
+
 # --- CLAVE DE API PARA LA CÁMARA DE IA ---
 SECURITY_API_KEY = "MI_CLAVE_SUPER_SECRETA_12345"
 
@@ -252,5 +370,10 @@ SECURITY_API_KEY = "MI_CLAVE_SUPER_SECRETA_12345"
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET')
+# Cliente compartido (finanzas.stripe_service): timeouts en segundos y
+# reintentos de red (la librería los hace con idempotency key y espera aleatoria)
+STRIPE_TIMEOUT_CONEXION = config('STRIPE_TIMEOUT_CONEXION', default=3, cast=float)
+STRIPE_TIMEOUT_LECTURA = config('STRIPE_TIMEOUT_LECTURA', default=20, cast=float)
+STRIPE_REINTENTOS = config('STRIPE_REINTENTOS', default=2, cast=int)
 
 # La configuración de stripe.api_key se hace en las vistas para evitar errores de importación
\ No newline at end of file
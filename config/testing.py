@@ -0,0 +1,131 @@
+# config/testing.py
+"""
+Utilidades para los tests de rendimiento de la API.
+
+``PlanDeConsultasMixin`` ejecuta un bloque, captura las consultas que lanza y
+pide al motor el plan de cada ``SELECT``. Si alguna recorre una tabla completa
+(``SCAN tabla`` en SQLite, ``Seq Scan`` en PostgreSQL) el test falla mostrando
+la consulta y su plan.
+
+``PresupuestoConsultasMixin`` comprueba el presupuesto de consultas declarado
+para cada endpoint en ``config.presupuestos``.
+"""
+import json
+import re
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from config.presupuestos import presupuesto_de
+
+_SCAN_SQLITE = re.compile(r"^SCAN (?P<tabla>[\w\"]+)(?P<resto>.*)$")
+_SUBCONSULTA_SQLITE = ("CO-ROUTINE ", "MATERIALIZE ")
+
+
+def plan_de_consulta(sql):
+    """Devuelve el plan de ``sql`` como lista de líneas legibles."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return list(_nodos_postgres(plan[0]["Plan"]))
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [fila[-1] for fila in cursor.fetchall()]
+
+
+def _nodos_postgres(nodo):
+    relacion = nodo.get("Relation Name")
+    yield f"{nodo['Node Type']} {relacion}" if relacion else nodo["Node Type"]
+    for hijo in nodo.get("Plans", []):
+        yield from _nodos_postgres(hijo)
+
+
+def escaneos_completos(plan):
+    """
+    Líneas del plan que recorren una tabla entera sin índice. Recorrer una
+    subconsulta (``CO-ROUTINE d`` / ``MATERIALIZE d`` seguido de ``SCAN d``
+    en SQLite) no cuenta: sus tablas aparecen en el plan por separado.
+    """
+    subconsultas = {linea.split(" ", 1)[1] for linea in plan if linea.startswith(_SUBCONSULTA_SQLITE)}
+    encontrados = []
+    for linea in plan:
+        if linea.startswith("Seq Scan"):
+            encontrados.append(linea)
+            continue
+        coincidencia = _SCAN_SQLITE.match(linea)
+        if (coincidencia and "USING" not in coincidencia.group("resto")
+                and coincidencia.group("tabla") not in subconsultas):
+            encontrados.append(linea)
+    return encontrados
+
+
+class PlanDeConsultasMixin:
+    """Mixin para ``TestCase`` con ``assertSinEscaneoCompleto``."""
+
+    @contextmanager
+    def assertSinEscaneoCompleto(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            yield capturadas
+
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Con tablas de test diminutas el planificador prefiere Seq Scan;
+                # lo desactivamos para comprobar que existe un índice utilizable.
+                cursor.execute("SET enable_seqscan = off")
+        try:
+            problemas = []
+            for consulta in capturadas.captured_queries:
+                sql = consulta["sql"]
+                if not sql.lstrip().upper().startswith("SELECT"):
+                    continue
+                plan = plan_de_consulta(sql)
+                if escaneos_completos(plan):
+                    problemas.append(f"{sql}\n    " + "\n    ".join(plan))
+        finally:
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("RESET enable_seqscan")
+
+        if problemas:
+            self.fail("Consultas con escaneo completo de tabla:\n\n" + "\n\n".join(problemas))
+
+
+class PresupuestoConsultasMixin:
+    """
+    Mixin para ``TestCase`` que verifica el presupuesto de consultas de un
+    endpoint (ver ``config.presupuestos``).
+
+    ``sembrar(n)`` debe crear ``n`` filas más de lo que lista el endpoint; el
+    endpoint se pide con N y con 10×N filas y ambas peticiones deben lanzar el
+    mismo número de consultas, sin pasar del máximo registrado.
+    """
+    filas_base = 3
+
+    def _contar_consultas(self, url, metodo, datos, cabeceras):
+        with CaptureQueriesContext(connection) as capturadas:
+            response = getattr(self.client, metodo)(url, datos, format="json", **cabeceras)
+        self.assertLess(response.status_code, 400, f"{url} respondió {response.status_code}")
+        return len(capturadas.captured_queries), capturadas
+
+    def assertPresupuestoConsultas(self, nombre_url, sembrar, kwargs=None, metodo="get", datos=None, **cabeceras):
+        maximo = presupuesto_de(nombre_url)
+        url = reverse(nombre_url, kwargs=kwargs)
+
+        sembrar(self.filas_base)
+        con_n, _ = self._contar_consultas(url, metodo, datos, cabeceras)
+        sembrar(self.filas_base * 9)
+        con_10n, capturadas = self._contar_consultas(url, metodo, datos, cabeceras)
+
+        detalle = "\n".join(f"  {q['sql']}" for q in capturadas.captured_queries)
+        self.assertEqual(
+            con_n, con_10n,
+            f"{nombre_url}: {con_n} consultas con N filas y {con_10n} con 10×N (¿N+1?)\n{detalle}",
+        )
+        self.assertLessEqual(
+            con_10n, maximo,
+            f"{nombre_url}: {con_10n} consultas, presupuesto {maximo}\n{detalle}",
+        )
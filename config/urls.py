@@ -7,7 +7,7 @@ from django.shortcuts import redirect
 
 from django.conf.urls.static import static
 from rest_framework.authtoken.views import obtain_auth_token
-from usuarios.views import RegistroView, RegistrarDispositivoView
+from usuarios.views import LoginView, LogoutView, RegistroView, RegistrarDispositivoView
 from rest_framework.authtoken.views import obtain_auth_token
 from django.urls import path, include
 from drf_spectacular.views import (
@@ -31,7 +31,8 @@ urlpatterns = [
     path('api/', APIWelcomeView.as_view(), name='api_welcome'),
 
     # Autenticación y registro de usuarios (se quedan en la raíz de la API)
-    path('api/login/', obtain_auth_token, name='api_token_auth'),
+    path('api/login/', LoginView.as_view(), name='api_token_auth'),
+    path('api/logout/', LogoutView.as_view(), name='api_logout'),
     path('api/registro/', RegistroView.as_view(), name='api_registro'),
     path('api/dispositivos/registrar/', RegistrarDispositivoView.as_view(), name='registrar_dispositivo'),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -45,6 +46,7 @@ urlpatterns = [
     path("api/seguridad/", include(("seguridad.urls", "seguridad"), namespace="seguridad")),
     path('api/mantenimiento/', include('mantenimiento.urls')), # <-- AHORA TIENE SU PREFIJO
     path('api/auditoria/', include('auditoria.urls')), # <-- NUEVO: URLs de auditoría
+    path('api/tareas/', include('tareas.urls')),
 
     # URLs para la API navegable
     path('api-auth/', include('rest_framework.urls')),
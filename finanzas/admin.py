@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.utils import timezone
 from .models import Gasto, Pago, Multa, PagoMulta, Reserva
-from .models import Gasto, Pago, Multa, Reserva, Egreso, Ingreso
+from .models import Gasto, Pago, Multa, Reserva, Egreso, Ingreso, SaldoPropiedad
+from .models import ResumenMensualEgreso, ResumenMensualIngreso, EventoStripe, ClienteStripe
 
 @admin.register(Gasto)
 class GastoAdmin(admin.ModelAdmin):
@@ -56,6 +57,14 @@ class ReservaAdmin(admin.ModelAdmin):
     search_fields = ('area_comun__nombre', 'usuario__username')
 
 
+@admin.register(SaldoPropiedad)
+class SaldoPropiedadAdmin(admin.ModelAdmin):
+    list_display = ('propiedad', 'gastos_pendientes', 'saldo_gastos', 'multas_pendientes', 'saldo_multas',
+                    'vencimiento_mas_antiguo', 'moroso', 'moroso_calculado', 'actualizado')
+    list_filter = ('moroso',)
+    search_fields = ('propiedad__numero_casa',)
+    readonly_fields = [f.name for f in SaldoPropiedad._meta.fields]
+
 
 @admin.register(Egreso)
 class EgresoAdmin(admin.ModelAdmin):
@@ -69,3 +78,32 @@ class IngresoAdmin(admin.ModelAdmin):
     list_filter = ('fecha',)
     search_fields = ('concepto', 'descripcion')
 
+
+@admin.register(ResumenMensualIngreso)
+class ResumenMensualIngresoAdmin(admin.ModelAdmin):
+    list_display = ('anio', 'mes', 'concepto', 'total', 'cantidad')
+    list_filter = ('anio', 'mes')
+    search_fields = ('concepto',)
+    readonly_fields = [f.name for f in ResumenMensualIngreso._meta.fields]
+
+
+@admin.register(ResumenMensualEgreso)
+class ResumenMensualEgresoAdmin(admin.ModelAdmin):
+    list_display = ('anio', 'mes', 'categoria', 'total', 'cantidad')
+    list_filter = ('anio', 'mes', 'categoria')
+    readonly_fields = [f.name for f in ResumenMensualEgreso._meta.fields]
+
+
+@admin.register(EventoStripe)
+class EventoStripeAdmin(admin.ModelAdmin):
+    list_display = ('evento_id', 'tipo', 'estado', 'payment_intent_id', 'pago', 'recibido', 'procesado')
+    list_filter = ('estado', 'tipo')
+    search_fields = ('evento_id', 'payment_intent_id')
+    readonly_fields = [f.name for f in EventoStripe._meta.fields]
+
+
+@admin.register(ClienteStripe)
+class ClienteStripeAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'customer_id', 'creado')
+    search_fields = ('customer_id', 'usuario__username', 'usuario__email')
+    raw_id_fields = ('usuario',)
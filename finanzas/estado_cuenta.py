@@ -0,0 +1,231 @@
+# finanzas/estado_cuenta.py
+"""
+Estado de cuenta por propiedad.
+
+- ``SaldoPropiedad`` guarda, por propiedad, cuántos gastos y multas tiene sin
+  pagar, cuánto suman sus saldos y el vencimiento más antiguo. Las escrituras
+  de deudas y pagos llaman a ``marcar_propiedades``/``marcar_deudas``; dentro
+  de una transacción las propiedades se acumulan y se recalculan una sola vez
+  en el commit (una generación masiva no recalcula fila por fila). Con el
+  saldo se recalcula la bandera de morosidad (ver ``finanzas.morosos``).
+- ``movimientos_pendientes`` devuelve el detalle (gastos, multas y reservas
+  sin pagar) con una sola consulta ``UNION ALL`` paginada por keyset.
+"""
+from datetime import date
+
+from django.core import signing
+from django.db import connection, transaction
+from django.db.models import CharField, Count, F, IntegerField, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+
+from condominio.models import Propiedad
+
+from . import morosos
+from .models import Gasto, Multa, Reserva, SaldoPropiedad
+
+CURSOR_SALT = "finanzas.estado_cuenta.cursor"
+
+
+# ---------------------------------------------------------------------------
+# Mantenimiento de SaldoPropiedad
+# ---------------------------------------------------------------------------
+
+def recalcular_saldos(propiedades_ids=None):
+    """
+    Recalcula la fila de ``SaldoPropiedad`` de cada propiedad (de todas si
+    ``propiedades_ids`` es None): una consulta agrupada por tipo de deuda y
+    un upsert en bloque. Devuelve cuántas filas escribió.
+    """
+    propiedades = Propiedad.objects.order_by()
+    if propiedades_ids is not None:
+        propiedades_ids = set(propiedades_ids) - {None}
+        if not propiedades_ids:
+            return 0
+        propiedades = propiedades.filter(pk__in=propiedades_ids)
+
+    propietarios = dict(propiedades.values_list('pk', 'propietario_id'))
+    saldos = {pk: SaldoPropiedad(propiedad_id=pk) for pk in propietarios}
+    for modelo, cantidad, saldo in ((Gasto, 'gastos_pendientes', 'saldo_gastos'),
+                                    (Multa, 'multas_pendientes', 'saldo_multas')):
+        pendientes = modelo.objects.filter(pagado=False)
+        if propiedades_ids is not None:
+            pendientes = pendientes.filter(propiedad_id__in=propiedades_ids)
+        filas = (pendientes.order_by().values('propiedad_id')
+                 .annotate(n=Count('id'), total=Sum('saldo'), vence=Min('fecha_vencimiento')))
+        for fila in filas:
+            fila_saldo = saldos.get(fila['propiedad_id'])
+            if fila_saldo is None:
+                continue
+            setattr(fila_saldo, cantidad, fila['n'])
+            setattr(fila_saldo, saldo, fila['total'] or 0)
+            if fila['vence'] and (fila_saldo.vencimiento_mas_antiguo is None or fila['vence'] < fila_saldo.vencimiento_mas_antiguo):
+                fila_saldo.vencimiento_mas_antiguo = fila['vence']
+            if modelo is Gasto:
+                fila_saldo.vencimiento_gasto_mas_antiguo = fila['vence']
+
+    hoy, ahora = timezone.localdate(), timezone.now()
+    for fila_saldo in saldos.values():
+        fila_saldo.moroso = morosos.es_moroso(fila_saldo.vencimiento_gasto_mas_antiguo, hoy)
+        fila_saldo.moroso_calculado = ahora
+
+    SaldoPropiedad.objects.bulk_create(
+        saldos.values(),
+        update_conflicts=True,
+        unique_fields=['propiedad'],
+        update_fields=['gastos_pendientes', 'saldo_gastos', 'multas_pendientes', 'saldo_multas',
+                       'vencimiento_mas_antiguo', 'vencimiento_gasto_mas_antiguo', 'moroso', 'moroso_calculado',
+                       'actualizado'],
+        batch_size=1000,
+    )
+    morosos.invalidar_usuarios(propietarios.values())
+    return len(saldos)
+
+
+class _Pendientes:
+    """Propiedades y deudas a recalcular al hacer commit la transacción en curso."""
+
+    def __init__(self):
+        self.propiedades = set()
+        self.deudas = {}
+
+    def al_commit(self):
+        if connection.__dict__.get('_saldos_pendientes') is self:
+            del connection._saldos_pendientes
+        propiedades = set(self.propiedades)
+        for modelo, ids in self.deudas.items():
+            propiedades.update(modelo.objects.filter(pk__in=ids).values_list('propiedad_id', flat=True))
+        recalcular_saldos(propiedades)
+
+
+def _pendientes():
+    pendientes = getattr(connection, '_saldos_pendientes', None)
+    vigente = pendientes is not None and any(
+        callback is pendientes.al_commit for _, callback, _ in connection.run_on_commit
+    )
+    if not vigente:
+        pendientes = _Pendientes()
+        connection._saldos_pendientes = pendientes
+        transaction.on_commit(pendientes.al_commit)
+    return pendientes
+
+
+def marcar_propiedades(propiedades_ids):
+    """Recalcula (ahora o al commit) el saldo de esas propiedades."""
+    propiedades_ids = set(propiedades_ids) - {None}
+    if not propiedades_ids:
+        return
+    if not connection.in_atomic_block:
+        recalcular_saldos(propiedades_ids)
+        return
+    _pendientes().propiedades.update(propiedades_ids)
+
+
+def marcar_deudas(modelo, ids):
+    """Como ``marcar_propiedades``, a partir de ids de ``Gasto``/``Multa``."""
+    ids = set(ids)
+    if not ids:
+        return
+    if not connection.in_atomic_block:
+        recalcular_saldos(modelo.objects.filter(pk__in=ids).values_list('propiedad_id', flat=True))
+        return
+    _pendientes().deudas.setdefault(modelo, set()).update(ids)
+
+
+# ---------------------------------------------------------------------------
+# Lectura: resumen y detalle
+# ---------------------------------------------------------------------------
+
+def resumen_de_cuenta(propiedades_ids, usuario):
+    """Totales del estado de cuenta: filas de ``SaldoPropiedad`` y reservas del usuario."""
+    saldos = list(SaldoPropiedad.objects.filter(propiedad_id__in=propiedades_ids))
+    reservas = Reserva.objects.filter(usuario=usuario, pagada=False).aggregate(
+        n=Count('id'), total=Sum('costo_total'),
+    )
+    vencimientos = [s.vencimiento_mas_antiguo for s in saldos if s.vencimiento_mas_antiguo]
+    resumen = {
+        'gastos_pendientes': sum(s.gastos_pendientes for s in saldos),
+        'saldo_gastos': sum((s.saldo_gastos for s in saldos), 0),
+        'multas_pendientes': sum(s.multas_pendientes for s in saldos),
+        'saldo_multas': sum((s.saldo_multas for s in saldos), 0),
+        'reservas_pendientes': reservas['n'],
+        'saldo_reservas': reservas['total'] or 0,
+        'vencimiento_mas_antiguo': min(vencimientos) if vencimientos else None,
+    }
+    resumen['items_pendientes'] = (
+        resumen['gastos_pendientes'] + resumen['multas_pendientes'] + resumen['reservas_pendientes']
+    )
+    resumen['total_pendiente'] = resumen['saldo_gastos'] + resumen['saldo_multas'] + resumen['saldo_reservas']
+    return resumen
+
+
+# Columnas de cada rama del UNION, en el mismo orden en todas
+COLUMNAS = ('tipo_deuda', 'item_id', 'prop_id', 'importe', 'pendiente', 'detalle', 'emision', 'vence')
+# Orden del detalle: primero lo que vence antes; el tipo y el id desempatan
+ORDEN = ('vence', 'tipo_deuda', 'item_id')
+
+
+def _rama(queryset, tipo, *, propiedad, monto, saldo, descripcion, emision, vence):
+    return queryset.order_by().annotate(
+        tipo_deuda=Value(tipo, output_field=CharField()),
+        item_id=F('pk'),
+        prop_id=propiedad,
+        importe=monto,
+        pendiente=saldo,
+        detalle=descripcion,
+        emision=emision,
+        vence=vence,
+    )
+
+
+def _despues_de(rama, tipo, cursor):
+    """Filtra la rama a las filas posteriores a ``cursor`` según ``ORDEN``."""
+    if cursor is None:
+        return rama
+    vence, tipo_cursor, item_id = cursor
+    if tipo > tipo_cursor:
+        return rama.filter(vence__gte=vence)
+    if tipo < tipo_cursor:
+        return rama.filter(vence__gt=vence)
+    return rama.filter(Q(vence__gt=vence) | Q(vence=vence, item_id__gt=item_id))
+
+
+def movimientos_pendientes(propiedades_ids, usuario, limite, cursor=None):
+    """
+    Hasta ``limite`` deudas pendientes (gastos y multas de las propiedades,
+    reservas del usuario) posteriores a ``cursor``, con un solo UNION ALL.
+    Cada fila es un dict con las ``COLUMNAS``.
+    """
+    ramas = [
+        ('gasto', _rama(
+            Gasto.objects.filter(propiedad_id__in=propiedades_ids, pagado=False), 'gasto',
+            propiedad=F('propiedad_id'), monto=F('monto'), saldo=F('saldo'), descripcion=F('descripcion'),
+            emision=F('fecha_emision'), vence=Coalesce('fecha_vencimiento', 'fecha_emision'),
+        )),
+        ('multa', _rama(
+            Multa.objects.filter(propiedad_id__in=propiedades_ids, pagado=False), 'multa',
+            propiedad=F('propiedad_id'), monto=F('monto'), saldo=F('saldo'), descripcion=F('concepto'),
+            emision=F('fecha_emision'), vence=Coalesce('fecha_vencimiento', 'fecha_emision'),
+        )),
+        ('reserva', _rama(
+            Reserva.objects.filter(usuario=usuario, pagada=False), 'reserva',
+            propiedad=Value(None, output_field=IntegerField()), monto=F('costo_total'), saldo=F('costo_total'),
+            descripcion=F('area_comun__nombre'), emision=F('fecha_reserva'), vence=F('fecha_reserva'),
+        )),
+    ]
+    consultas = [_despues_de(rama, tipo, cursor).values(*COLUMNAS) for tipo, rama in ramas]
+    union = consultas[0].union(*consultas[1:], all=True).order_by(*ORDEN)
+    return list(union[:limite])
+
+
+def codificar_cursor(fila):
+    return signing.dumps([fila['vence'].isoformat(), fila['tipo_deuda'], fila['item_id']], salt=CURSOR_SALT)
+
+
+def decodificar_cursor(valor):
+    try:
+        vence, tipo, item_id = signing.loads(valor, salt=CURSOR_SALT)
+        return date.fromisoformat(vence), str(tipo), int(item_id)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise NotFound("Cursor inválido.")
@@ -0,0 +1,274 @@
+# finanzas/estados_mensuales.py
+"""
+Estados de cuenta de fin de mes para todas las propiedades.
+
+1. ``datos_del_periodo`` junta en cinco consultas (propiedades, gastos,
+   multas, pagos y pagos de multas) todo lo que necesita el estado de cada
+   propiedad: deudas emitidas en el mes o aún pendientes y pagos del mes. El
+   resultado son datos simples (dicts, tuplas, Decimal), listos para pasar a
+   otro proceso.
+2. ``generar_estados`` reparte las propiedades en particiones entre un
+   ``ProcessPoolExecutor``; cada proceso dibuja sus PDF con ReportLab y los
+   escribe en el directorio de salida. Al terminar se escribe
+   ``manifiesto.json`` (archivo, huella y totales de cada propiedad) y, si se
+   pidió, se empaqueta todo en un ZIP.
+
+``progreso(hechos, total, segundos)`` se llama al terminar cada partición.
+"""
+import hashlib
+import json
+import re
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import CharField, F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from condominio.models import Propiedad
+
+from .models import Gasto, Multa, Pago, PagoMulta
+
+MANIFIESTO = "manifiesto.json"
+TAMANO_PARTICION = 100
+TAMANO_BLOQUE = 2000
+
+
+@dataclass
+class ResultadoEstados:
+    mes: int
+    anio: int
+    generados: int = 0
+    segundos: float = 0.0
+    # Directorio con los PDF y el manifiesto, o el ZIP si se pidió
+    salida: str = ''
+    manifiesto: list = field(default_factory=list)
+
+    @property
+    def por_segundo(self):
+        return self.generados / self.segundos if self.segundos else 0.0
+
+    def como_dict(self):
+        return {
+            'mes': self.mes,
+            'anio': self.anio,
+            'generados': self.generados,
+            'segundos': round(self.segundos, 2),
+            'por_segundo': round(self.por_segundo, 1),
+            'salida': self.salida,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Datos
+# ---------------------------------------------------------------------------
+
+def datos_del_periodo(mes, anio, propiedades_ids=None):
+    """
+    Lista de estados (uno por propiedad, por número de casa) con ``deudas``
+    ``(tipo, id, descripcion, emision, vence, monto, saldo)`` y ``pagos``
+    ``(fecha, concepto, monto)``.
+    """
+    inicio, fin = date(anio, mes, 1), date(anio + mes // 12, mes % 12 + 1, 1)
+
+    propiedades = Propiedad.objects.order_by('numero_casa')
+    if propiedades_ids is not None:
+        propiedades = propiedades.filter(pk__in=propiedades_ids)
+    estados = {}
+    for fila in propiedades.values('id', 'numero_casa', 'propietario__username',
+                                   'propietario__first_name', 'propietario__last_name').iterator(chunk_size=TAMANO_BLOQUE):
+        nombre = f"{fila['propietario__first_name']} {fila['propietario__last_name']}".strip()
+        estados[fila['id']] = {
+            'propiedad_id': fila['id'],
+            'numero_casa': fila['numero_casa'],
+            'propietario': nombre or fila['propietario__username'],
+            'mes': mes,
+            'anio': anio,
+            'deudas': [],
+            'pagos': [],
+        }
+
+    def _de_las_propiedades(queryset, campo):
+        if propiedades_ids is not None:
+            queryset = queryset.filter(**{f'{campo}__in': propiedades_ids})
+        return queryset.order_by()
+
+    # Lo emitido en el mes y lo que sigue pendiente de meses anteriores
+    del_periodo = Q(mes=mes, anio=anio) | Q(pagado=False, fecha_emision__lt=fin)
+    for tipo, modelo, descripcion in (('gasto', Gasto, 'descripcion'), ('multa', Multa, 'concepto')):
+        filas = (_de_las_propiedades(modelo.objects.filter(del_periodo), 'propiedad_id')
+                 .values_list('propiedad_id', 'id', descripcion, 'fecha_emision', 'fecha_vencimiento', 'monto', 'saldo'))
+        for propiedad_id, *deuda in filas.iterator(chunk_size=TAMANO_BLOQUE):
+            if propiedad_id in estados:
+                estados[propiedad_id]['deudas'].append((tipo, *deuda))
+
+    en_el_mes = {'fecha_pago__gte': inicio, 'fecha_pago__lt': fin}
+    # Un Pago puede imputarse a un gasto o a una multa
+    pagos = (Pago.objects.filter(Q(gasto__isnull=False) | Q(multa__isnull=False), **en_el_mes)
+             .annotate(prop_id=Coalesce('gasto__propiedad_id', 'multa__propiedad_id'),
+                       concepto=Coalesce('gasto__descripcion', 'multa__concepto', output_field=CharField())))
+    pagos_multa = PagoMulta.objects.filter(**en_el_mes).annotate(
+        prop_id=F('multa__propiedad_id'), concepto=F('multa__concepto'),
+    )
+    for queryset in (pagos, pagos_multa):
+        filas = _de_las_propiedades(queryset, 'prop_id').values_list('prop_id', 'fecha_pago', 'concepto', 'monto_pagado')
+        for propiedad_id, *pago in filas.iterator(chunk_size=TAMANO_BLOQUE):
+            if propiedad_id in estados:
+                estados[propiedad_id]['pagos'].append(tuple(pago))
+
+    for estado in estados.values():
+        estado['deudas'].sort(key=lambda d: (d[3], d[1]))
+        estado['pagos'].sort(key=lambda p: p[0])
+        estado['total_pendiente'] = sum((d[6] for d in estado['deudas'] if d[6] > 0), Decimal('0'))
+        estado['total_pagado'] = sum((p[2] for p in estado['pagos']), Decimal('0'))
+    return list(estados.values())
+
+
+# ---------------------------------------------------------------------------
+# Dibujo (corre en los procesos del pool: sin acceso a la base de datos)
+# ---------------------------------------------------------------------------
+
+def nombre_de_archivo(estado):
+    # El id hace único el nombre: "A/1" y "A.1" quedan ambas como "A_1"
+    casa = re.sub(r'[^\w-]+', '_', estado['numero_casa']).strip('_')
+    return f"estado_{estado['propiedad_id']}{'_' + casa if casa else ''}_{estado['anio']}_{estado['mes']:02d}.pdf"
+
+
+def dibujar_estado(estado):
+    """PDF (bytes) del estado de cuenta de una propiedad."""
+    import io
+
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    lienzo = canvas.Canvas(buffer, pagesize=letter)
+    _, alto = letter
+    y = alto - 72
+
+    def renglon(texto, fuente="Helvetica", tamano=10, salto=14):
+        nonlocal y
+        if y < 72:
+            lienzo.showPage()
+            y = alto - 72
+        lienzo.setFont(fuente, tamano)
+        lienzo.drawString(72, y, texto)
+        y -= salto
+
+    renglon(f"Estado de cuenta {estado['mes']:02d}/{estado['anio']}", "Helvetica-Bold", 16, 24)
+    renglon(f"Casa N° {estado['numero_casa']} - {estado['propietario']}", "Helvetica", 12, 22)
+
+    renglon("Deudas", "Helvetica-Bold", 12, 18)
+    for tipo, deuda_id, descripcion, emision, vence, monto, saldo in estado['deudas']:
+        renglon(f"{emision}  {tipo} #{deuda_id}  {descripcion[:45]}  vence {vence or '-'}  "
+                f"monto {monto}  saldo {saldo}")
+    if not estado['deudas']:
+        renglon("Sin deudas en el periodo.")
+
+    y -= 8
+    renglon("Pagos del mes", "Helvetica-Bold", 12, 18)
+    for fecha, concepto, monto in estado['pagos']:
+        renglon(f"{fecha}  {(concepto or '')[:60]}  {monto}")
+    if not estado['pagos']:
+        renglon("Sin pagos en el mes.")
+
+    y -= 8
+    renglon(f"Total pagado en el mes: {estado['total_pagado']}", "Helvetica-Bold", 11)
+    renglon(f"Total pendiente: {estado['total_pendiente']}", "Helvetica-Bold", 11)
+    lienzo.showPage()
+    lienzo.save()
+    return buffer.getvalue()
+
+
+def dibujar_particion(directorio, estados):
+    """Escribe el PDF de cada estado en ``directorio``; devuelve sus entradas del manifiesto."""
+    entradas = []
+    for estado in estados:
+        contenido = dibujar_estado(estado)
+        archivo = nombre_de_archivo(estado)
+        (Path(directorio) / archivo).write_bytes(contenido)
+        entradas.append({
+            'propiedad_id': estado['propiedad_id'],
+            'numero_casa': estado['numero_casa'],
+            'archivo': archivo,
+            'sha256': hashlib.sha256(contenido).hexdigest(),
+            'total_pendiente': estado['total_pendiente'],
+            'total_pagado': estado['total_pagado'],
+        })
+    return entradas
+
+
+# ---------------------------------------------------------------------------
+# Orquestación
+# ---------------------------------------------------------------------------
+
+def _particiones(estados, tamano):
+    return [estados[i:i + tamano] for i in range(0, len(estados), tamano)]
+
+
+def _dibujar_todo(directorio, estados, procesos, tamano_particion, progreso, inicio):
+    entradas, total = [], len(estados)
+    particiones = _particiones(estados, tamano_particion)
+    if procesos > 1 and len(particiones) > 1:
+        with ProcessPoolExecutor(max_workers=min(procesos, len(particiones))) as pool:
+            futuros = [pool.submit(dibujar_particion, str(directorio), particion) for particion in particiones]
+            for futuro in as_completed(futuros):
+                entradas += futuro.result()
+                if progreso:
+                    progreso(len(entradas), total, time.monotonic() - inicio)
+    else:
+        for particion in particiones:
+            entradas += dibujar_particion(str(directorio), particion)
+            if progreso:
+                progreso(len(entradas), total, time.monotonic() - inicio)
+    return sorted(entradas, key=lambda e: e['numero_casa'])
+
+
+def generar_estados(mes, anio, *, directorio=None, zip_destino=None, procesos=None,
+                    propiedades_ids=None, tamano_particion=TAMANO_PARTICION, progreso=None):
+    """
+    Genera los estados de cuenta del periodo en ``directorio`` o, con
+    ``zip_destino``, en ese archivo ZIP (PDFs + manifiesto). Devuelve un
+    ``ResultadoEstados``.
+    """
+    if (directorio is None) == (zip_destino is None):
+        raise ValueError("Indique un directorio o un zip_destino.")
+    procesos = procesos or getattr(settings, 'ESTADOS_CUENTA_PROCESOS', 1)
+    inicio = time.monotonic()
+    estados = datos_del_periodo(mes, anio, propiedades_ids)
+    resultado = ResultadoEstados(mes=mes, anio=anio)
+
+    with tempfile.TemporaryDirectory() as temporal:
+        destino = Path(directorio) if directorio is not None else Path(temporal)
+        destino.mkdir(parents=True, exist_ok=True)
+        resultado.manifiesto = _dibujar_todo(destino, estados, procesos, tamano_particion, progreso, inicio)
+        resultado.generados = len(resultado.manifiesto)
+        manifiesto = json.dumps({
+            'mes': mes,
+            'anio': anio,
+            'generado': timezone.now(),
+            'total': resultado.generados,
+            'estados': resultado.manifiesto,
+        }, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2)
+        (destino / MANIFIESTO).write_text(manifiesto, encoding='utf-8')
+
+        if zip_destino is not None:
+            # Los PDF ya van comprimidos; solo el manifiesto se comprime
+            with zipfile.ZipFile(zip_destino, 'w', compression=zipfile.ZIP_STORED) as archivo_zip:
+                archivo_zip.writestr(MANIFIESTO, manifiesto, compress_type=zipfile.ZIP_DEFLATED)
+                for entrada in resultado.manifiesto:
+                    archivo_zip.write(destino / entrada['archivo'], entrada['archivo'])
+            resultado.salida = str(zip_destino)
+        else:
+            resultado.salida = str(destino)
+
+    resultado.segundos = time.monotonic() - inicio
+    return resultado
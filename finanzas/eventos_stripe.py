@@ -0,0 +1,143 @@
+# finanzas/eventos_stripe.py
+"""
+Bandeja de entrada de los webhooks de Stripe.
+
+El webhook solo verifica la firma y guarda el evento crudo en
+``EventoStripe`` con ``INSERT … ON CONFLICT DO NOTHING`` sobre su id: los
+reintentos de Stripe no duplican nada y la respuesta 200 sale enseguida. La
+primera entrega de cada evento lo pasa de RECIBIDO a ENCOLADO (un UPDATE que
+solo puede ganar una petición) y encola la tarea ``finanzas.evento_stripe``,
+que lo procesa en un worker y lo vincula con su ``Pago`` por
+``stripe_payment_intent_id``. Procesar dos veces el mismo evento no cambia
+nada: el pago se busca antes de crearse.
+
+``manage.py reprocesar_eventos_stripe`` vuelve a encolar eventos, y
+``evento_firmado`` arma un evento con firma válida para pruebas locales.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from tareas.registro import encolar
+
+from .models import EventoStripe, Pago
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Recepción
+# ---------------------------------------------------------------------------
+
+def registrar(evento):
+    """
+    Guarda el evento (dict ya verificado) si no estaba y encola su
+    procesamiento. Devuelve True si esta entrega fue la que lo encoló.
+    """
+    objeto = evento.get('data', {}).get('object', {})
+    intent = objeto.get('id') if objeto.get('object') == 'payment_intent' else objeto.get('payment_intent')
+    EventoStripe.objects.bulk_create([EventoStripe(
+        evento_id=evento['id'],
+        tipo=evento.get('type', ''),
+        payment_intent_id=intent or None,
+        payload=evento,
+    )], ignore_conflicts=True)
+    return encolar_evento(evento['id'])
+
+
+def encolar_evento(evento_id):
+    """Encola el evento si está RECIBIDO; False si otra entrega ya lo hizo."""
+    with transaction.atomic():
+        tomado = EventoStripe.objects.filter(evento_id=evento_id, estado=EventoStripe.Estado.RECIBIDO).update(
+            estado=EventoStripe.Estado.ENCOLADO,
+        )
+        if tomado:
+            encolar("finanzas.evento_stripe", evento_id=evento_id, prioridad=5)
+    return bool(tomado)
+
+
+# ---------------------------------------------------------------------------
+# Procesamiento (en el worker)
+# ---------------------------------------------------------------------------
+
+def _pago_exitoso(intent):
+    pago = Pago.objects.filter(stripe_payment_intent_id=intent['id']).first()
+    if pago is None:
+        metadata = intent.get('metadata') or {}
+        usuario = get_user_model().objects.filter(pk=metadata.get('user_id')).first() if metadata.get('user_id') else None
+        if usuario is None:
+            return None
+        pago = Pago(
+            usuario=usuario,
+            monto_pagado=Decimal(intent['amount']) / 100,  # Stripe trabaja en centavos
+            descripcion=metadata.get('description', ''),
+            stripe_payment_intent_id=intent['id'],
+            stripe_customer_id=intent.get('customer'),
+        )
+    if pago.estado_pago != 'COMPLETADO':
+        pago.estado = pago.estado_pago = 'COMPLETADO'
+        pago.save()
+    return pago
+
+
+def _pago_fallido(intent):
+    pago = Pago.objects.filter(stripe_payment_intent_id=intent['id']).first()
+    if pago is not None and pago.estado_pago == 'PENDIENTE':
+        pago.estado = pago.estado_pago = 'FALLIDO'
+        pago.save()
+    logger.warning("Pago fallido en Stripe: %s", intent['id'])
+    return pago
+
+
+MANEJADORES = {
+    'payment_intent.succeeded': _pago_exitoso,
+    'payment_intent.payment_failed': _pago_fallido,
+}
+
+
+def procesar(evento_id):
+    """Aplica el evento; no hace nada si ya se procesó. Devuelve su estado."""
+    with transaction.atomic():
+        evento = EventoStripe.objects.select_for_update().get(evento_id=evento_id)
+        if evento.estado in (EventoStripe.Estado.PROCESADO, EventoStripe.Estado.IGNORADO):
+            return evento.estado
+        manejador = MANEJADORES.get(evento.tipo)
+        if manejador is None:
+            evento.estado = EventoStripe.Estado.IGNORADO
+        else:
+            evento.pago = manejador(evento.payload['data']['object'])
+            evento.estado = EventoStripe.Estado.PROCESADO
+        evento.procesado = timezone.now()
+        evento.save(update_fields=['estado', 'pago', 'procesado'])
+    return evento.estado
+
+
+# ---------------------------------------------------------------------------
+# Pruebas locales
+# ---------------------------------------------------------------------------
+
+def evento_firmado(tipo, objeto, secreto=None, evento_id=None, momento=None):
+    """
+    ``(payload, cabecera)`` de un evento de Stripe con la firma que espera
+    ``stripe.Webhook.construct_event`` (cabecera ``Stripe-Signature``).
+    """
+    secreto = secreto or settings.STRIPE_WEBHOOK_SECRET
+    momento = int(momento or time.time())
+    payload = json.dumps({
+        'id': evento_id or f"evt_local_{uuid.uuid4().hex}",
+        'object': 'event',
+        'type': tipo,
+        'created': momento,
+        'data': {'object': objeto},
+    }).encode()
+    firma = hmac.new(secreto.encode(), f"{momento}.".encode() + payload, hashlib.sha256).hexdigest()
+    return payload, f"t={momento},v1={firma}"
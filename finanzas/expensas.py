@@ -0,0 +1,112 @@
+# finanzas/expensas.py
+"""
+Generación masiva de expensas mensuales.
+
+Se inserta una fila por propiedad con un solo ``bulk_create`` contra la
+restricción ``gasto_expensa_unica_periodo`` (propiedad, mes, año entre las
+expensas mensuales): repetir la generación de un periodo, o dos clics
+seguidos, no duplica cargos; las propiedades que ya tenían su expensa se
+cuentan como omitidas. Las propiedades se bloquean (``SELECT … FOR
+UPDATE``) mientras dura la generación: dos generaciones simultáneas se
+turnan y cada una cuenta y notifica solo las filas que insertó. Como ``bulk_create`` no dispara ``post_save``, el
+saldo de las propiedades nuevas se marca a mano y se recalcula al commit.
+"""
+import json
+from dataclasses import dataclass
+from datetime import date
+
+from django.db import transaction
+
+from auditoria.services import registrar_evento
+from condominio.models import Propiedad
+
+from .estado_cuenta import marcar_propiedades
+from .models import Gasto
+
+
+@dataclass(frozen=True)
+class ResultadoExpensas:
+    mes: int
+    anio: int
+    creados: int
+    omitidos: int
+    # Propiedades a las que se les cargó la expensa en esta ejecución
+    propiedades_ids: tuple
+    # Propiedades que ya tenían la expensa del periodo
+    omitidas_ids: tuple = ()
+
+    def como_dict(self):
+        return {"mes": self.mes, "anio": self.anio, "creados": self.creados, "omitidos": self.omitidos}
+
+
+def generar_expensas(monto, descripcion, fecha_emision=None, fecha_vencimiento=None, *,
+                     usuario=None, ip_address=None, accion="Generación Manual de Expensas",
+                     notificar=True):
+    """
+    Crea la expensa del periodo de ``fecha_emision`` (hoy por defecto) para
+    todas las propiedades que aún no la tienen. Registra un solo evento de
+    auditoría y encola una sola notificación para los afectados.
+    """
+    fecha_emision = fecha_emision or date.today()
+    mes, anio = fecha_emision.month, fecha_emision.year
+    del_periodo = Gasto.objects.filter(expensa_mensual=True, mes=mes, anio=anio)
+
+    with transaction.atomic():
+        # Otra generación (de cualquier periodo) espera a que esta termine: al
+        # leer las existentes ya ve lo que insertó la anterior
+        todas = list(Propiedad.objects.select_for_update().order_by('id').values_list('id', flat=True))
+        existentes = set(del_periodo.order_by().values_list('propiedad_id', flat=True))
+        nuevas = [pk for pk in todas if pk not in existentes]
+        # bulk_create no llama a save(): mes y año van explícitos
+        Gasto.objects.bulk_create(
+            [
+                Gasto(
+                    propiedad_id=pk,
+                    monto=monto,
+                    fecha_emision=fecha_emision,
+                    fecha_vencimiento=fecha_vencimiento,
+                    descripcion=descripcion,
+                    pagado=False,
+                    mes=mes,
+                    anio=anio,
+                    expensa_mensual=True,
+                )
+                for pk in nuevas
+            ],
+            # Con las propiedades bloqueadas no debería haber conflictos; si los hay, no se duplica
+            ignore_conflicts=True,
+        )
+        # bulk_create no dispara post_save: el saldo de las propiedades se recalcula al commit
+        marcar_propiedades(nuevas)
+
+    resultado = ResultadoExpensas(
+        mes=mes,
+        anio=anio,
+        creados=len(nuevas),
+        omitidos=len(todas) - len(nuevas),
+        propiedades_ids=tuple(nuevas),
+        omitidas_ids=tuple(pk for pk in todas if pk in existentes),
+    )
+
+    registrar_evento(
+        usuario=usuario,
+        accion=accion,
+        ip_address=ip_address,
+        descripcion=json.dumps({
+            **resultado.como_dict(),
+            "monto_individual": monto,
+            "descripcion": descripcion,
+        }, indent=4, default=str)
+    )
+
+    if notificar and resultado.creados:
+        from tareas.registro import encolar
+
+        encolar(
+            "notificaciones.notificar_propiedades",
+            propiedades_ids=list(resultado.propiedades_ids),
+            titulo="📋 Nueva Expensa",
+            mensaje=f"Se ha emitido la expensa {mes:02d}/{anio} por ${monto}. Descripción: {descripcion}",
+            data={"tipo_evento": "GASTO_ASIGNADO", "mes": mes, "anio": anio},
+        )
+    return resultado
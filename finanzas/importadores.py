@@ -0,0 +1,81 @@
+# finanzas/importadores.py
+"""Importadores de CSV de finanzas (ver config.importacion)."""
+from collections import defaultdict
+
+from condominio.models import Propiedad
+from config.importacion import FilaInvalida, Importador, buscar, fecha, mapa, monto, opcion, registrar
+
+from .estado_cuenta import marcar_propiedades
+from .models import Egreso, Gasto
+from .resumenes import marcar_periodos
+
+
+@registrar
+class ImportadorGastos(Importador):
+    """Gastos extraordinarios: ``numero_casa,monto,fecha_emision[,fecha_vencimiento,descripcion]``."""
+    tipo = 'gastos'
+    columnas = ('numero_casa', 'monto', 'fecha_emision')
+    opcionales = ('fecha_vencimiento', 'descripcion')
+
+    def preparar(self, filas):
+        return mapa(Propiedad, 'numero_casa', filas)
+
+    def convertir(self, fila, casas):
+        propiedad_id = buscar(casas, fila, 'numero_casa', 'la casa')
+        valor = monto(fila)
+        emision = fecha(fila, 'fecha_emision')
+        vencimiento = fecha(fila, 'fecha_vencimiento', requerida=False)
+        if vencimiento and vencimiento < emision:
+            raise FilaInvalida("'fecha_vencimiento' es anterior a 'fecha_emision'.")
+        # bulk_create no pasa por Gasto.save: el periodo se completa aquí
+        return Gasto(
+            propiedad_id=propiedad_id,
+            monto=valor,
+            fecha_emision=emision,
+            fecha_vencimiento=vencimiento,
+            descripcion=fila.get('descripcion', ''),
+            mes=emision.month,
+            anio=emision.year,
+        )
+
+    def guardar(self, gastos):
+        Gasto.objects.bulk_create(gastos)
+        # Sin señales: los saldos de las propiedades se recalculan al commit del lote
+        marcar_propiedades({gasto.propiedad_id for gasto in gastos})
+        return len(gastos)
+
+
+@registrar
+class ImportadorEgresos(Importador):
+    """Egresos: ``concepto,monto,categoria[,fecha,descripcion]`` (sin fecha: hoy)."""
+    tipo = 'egresos'
+    columnas = ('concepto', 'monto', 'categoria')
+    opcionales = ('fecha', 'descripcion')
+    categorias = [clave for clave, _ in Egreso.CATEGORIA_CHOICES]
+
+    def convertir(self, fila, lote):
+        concepto = fila['concepto']
+        if not concepto:
+            raise FilaInvalida("Falta 'concepto'.")
+        if len(concepto) > Egreso._meta.get_field('concepto').max_length:
+            raise FilaInvalida("'concepto' es demasiado largo.")
+        egreso = Egreso(
+            concepto=concepto,
+            monto=monto(fila),
+            categoria=opcion(fila, 'categoria', self.categorias),
+            descripcion=fila.get('descripcion') or None,
+        )
+        return egreso, fecha(fila, 'fecha', requerida=False)
+
+    def guardar(self, filas):
+        creados = Egreso.objects.bulk_create([egreso for egreso, _ in filas])
+        # ``fecha`` es auto_now_add: bulk_create le pone hoy. Las fechas del
+        # archivo se aplican después con un UPDATE por fecha distinta del lote.
+        por_fecha = defaultdict(list)
+        for egreso, dia in filas:
+            por_fecha[dia or egreso.fecha].append(egreso)
+        for dia, egresos in por_fecha.items():
+            if dia != egresos[0].fecha:
+                Egreso.objects.filter(pk__in=[egreso.pk for egreso in egresos]).update(fecha=dia)
+        marcar_periodos(Egreso, {(dia.year, dia.month) for dia in por_fecha})
+        return len(creados)
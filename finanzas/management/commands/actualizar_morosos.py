@@ -0,0 +1,13 @@
+# finanzas/management/commands/actualizar_morosos.py
+
+from django.core.management.base import BaseCommand
+
+from finanzas.morosos import actualizar_morosos
+
+
+class Command(BaseCommand):
+    help = "Actualiza la bandera de morosidad de las propiedades cuyos gastos vencieron (correr una vez por noche)."
+
+    def handle(self, *args, **opts):
+        cambiadas = actualizar_morosos()
+        self.stdout.write(self.style.SUCCESS(f"{cambiadas} banderas de morosidad actualizadas."))
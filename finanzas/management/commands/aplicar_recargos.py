@@ -0,0 +1,46 @@
+# finanzas/management/commands/aplicar_recargos.py
+
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finanzas.recargos import TIPOS, Regla, aplicar_recargos
+
+
+class Command(BaseCommand):
+    help = (
+        "Cobra los recargos por mora de los gastos vencidos a la fecha de corte (una vez por mes o por noche). "
+        "Repetir el corte de un mes no duplica recargos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corte", type=date.fromisoformat, help="Fecha de corte AAAA-MM-DD (por defecto hoy).")
+        parser.add_argument("--tipo", choices=TIPOS, help="Recargo diario o mensual (por defecto RECARGOS_TIPO).")
+        parser.add_argument("--tasa", type=Decimal, help="Tasa por día o por mes sobre el saldo, p. ej. 0.02.")
+        parser.add_argument("--dias-gracia", type=int, help="Días de atraso sin recargo.")
+        parser.add_argument("--tope", type=Decimal, help="Máximo acumulado por gasto, como fracción del saldo.")
+        parser.add_argument("--simular", action="store_true", help="Solo calcular, sin crear multas.")
+        parser.add_argument("--sin-notificar", action="store_true", help="No enviar la notificación a los afectados.")
+
+    def handle(self, *args, **opts):
+        try:
+            regla = Regla.desde_ajustes(
+                tipo=opts["tipo"], tasa=opts["tasa"], dias_gracia=opts["dias_gracia"], tope=opts["tope"],
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        resultado = aplicar_recargos(
+            opts["corte"], regla, notificar=not opts["sin_notificar"], simular=opts["simular"],
+        )
+        if opts["simular"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Simulación al {resultado.corte}: {resultado.evaluados} gastos con recargo, total {resultado.total} "
+                f"({regla.describir()})."
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Corte {resultado.corte}: {resultado.creados} recargos creados, {resultado.omitidos} ya existían, "
+            f"total {resultado.total}, {len(resultado.propiedades_ids)} propiedades ({regla.describir()})."
+        ))
@@ -0,0 +1,44 @@
+# finanzas/management/commands/generar_estados_de_cuenta.py
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finanzas.estados_mensuales import generar_estados
+
+
+class Command(BaseCommand):
+    help = "Genera el estado de cuenta en PDF de cada propiedad para un mes, en un directorio o un ZIP con manifiesto."
+
+    def add_arguments(self, parser):
+        hoy = date.today()
+        parser.add_argument("--mes", type=int, default=hoy.month, help="Mes del estado (1-12, por defecto el actual).")
+        parser.add_argument("--anio", type=int, default=hoy.year, help="Año del estado (por defecto el actual).")
+        destino = parser.add_mutually_exclusive_group(required=True)
+        destino.add_argument("--salida", help="Directorio donde escribir los PDF y manifiesto.json.")
+        destino.add_argument("--zip", dest="zip_destino", help="Archivo ZIP a generar.")
+        parser.add_argument("--procesos", type=int,
+                            help="Procesos para dibujar los PDF (por defecto ESTADOS_CUENTA_PROCESOS).")
+        parser.add_argument("--propiedad", type=int, action="append", dest="propiedades",
+                            help="Solo esta propiedad (se puede repetir).")
+
+    def handle(self, *args, **opts):
+        if not 1 <= opts["mes"] <= 12:
+            raise CommandError("--mes debe estar entre 1 y 12.")
+
+        def progreso(hechos, total, segundos):
+            por_segundo = hechos / segundos if segundos else 0
+            self.stdout.write(f"{hechos}/{total} estados ({por_segundo:.1f}/s)")
+
+        resultado = generar_estados(
+            opts["mes"], opts["anio"],
+            directorio=opts["salida"],
+            zip_destino=opts["zip_destino"],
+            procesos=opts["procesos"],
+            propiedades_ids=opts["propiedades"],
+            progreso=progreso,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.generados} estados de cuenta {resultado.mes:02d}/{resultado.anio} en "
+            f"{resultado.segundos:.1f}s ({resultado.por_segundo:.1f}/s): {resultado.salida}"
+        ))
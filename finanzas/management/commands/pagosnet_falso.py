@@ -0,0 +1,50 @@
+# finanzas/management/commands/pagosnet_falso.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from finanzas.pagosnet import ClientePagosNet
+from finanzas.pagosnet_falso import PasarelaFalsa
+
+
+class Command(BaseCommand):
+    help = (
+        "Levanta una pasarela PagosNet falsa en local (PAGOSNET_API_URL=http://127.0.0.1:<puerto>/api/v2/). "
+        "Con --benchmark mide el cliente contra ella y termina."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--puerto", type=int, default=8765)
+        parser.add_argument("--latencia", type=float, default=0.0, help="Segundos que tarda cada respuesta.")
+        parser.add_argument("--benchmark", type=int, metavar="N",
+                            help="Crear N transacciones QR con el cliente y mostrar el rendimiento.")
+
+    def handle(self, *args, **opts):
+        pasarela = PasarelaFalsa(puerto=opts["puerto"], latencia=opts["latencia"])
+        if not opts["benchmark"]:
+            self.stdout.write(f"Pasarela falsa en {pasarela.url} (Ctrl+C para terminar)")
+            try:
+                pasarela.servidor.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                pasarela.servidor.server_close()
+            return
+
+        pasarela.iniciar()
+        try:
+            with override_settings(PAGOSNET_API_URL=pasarela.url):
+                cliente = ClientePagosNet()
+                inicio = time.monotonic()
+                for i in range(opts["benchmark"]):
+                    cliente.crear_transaccion_qr({"monto": 10.0, "idExterno": str(i)})
+                segundos = time.monotonic() - inicio
+        finally:
+            pasarela.detener()
+        n = opts["benchmark"]
+        self.stdout.write(self.style.SUCCESS(
+            f"{n} transacciones en {segundos:.2f}s ({n / segundos:.0f}/s, {segundos / n * 1000:.1f} ms c/u); "
+            f"logins: {pasarela.llamadas['login']}, conexiones: {len(pasarela.conexiones)}"
+        ))
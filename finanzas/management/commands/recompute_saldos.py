@@ -0,0 +1,70 @@
+# finanzas/management/commands/recompute_saldos.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from finanzas.estado_cuenta import recalcular_saldos
+from finanzas.models import Gasto, Multa, Pago, PagoMulta
+
+
+def _suma(modelo_pago, campo):
+    pagos = (modelo_pago.objects
+             .filter(**{campo: OuterRef('pk')})
+             .order_by()
+             .values(campo)
+             .annotate(total=Sum('monto_pagado'))
+             .values('total'))
+    return Coalesce(Subquery(pagos), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+# Lo que debería valer ``monto_pagado_acumulado`` según los pagos registrados
+ACUMULADO_REAL = {
+    Gasto: lambda: _suma(Pago, 'gasto'),
+    Multa: lambda: _suma(Pago, 'multa') + _suma(PagoMulta, 'multa'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula monto_pagado_acumulado (y con él el saldo) de gastos y multas "
+        "a partir de sus pagos, y después el saldo por propiedad. Con --verificar "
+        "solo informa las diferencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verificar", action="store_true",
+                            help="No corrige: lista las deudas descuadradas y sale con error si hay alguna.")
+        parser.add_argument("--pagado", action="store_true",
+                            help="Además, recalcula 'pagado' como saldo <= 0 (pisa las marcas manuales).")
+
+    def handle(self, *args, **opts):
+        descuadradas = 0
+        with transaction.atomic():
+            for modelo, real in ACUMULADO_REAL.items():
+                nombre = modelo._meta.verbose_name_plural
+                diferentes = (modelo.objects
+                              .annotate(real=real())
+                              .exclude(monto_pagado_acumulado=F('real')))
+                if opts["verificar"]:
+                    for pk, guardado, calculado in diferentes.values_list('pk', 'monto_pagado_acumulado', 'real')[:50]:
+                        self.stdout.write(f"  {modelo.__name__} #{pk}: guardado {guardado}, según pagos {calculado}")
+                    total = diferentes.count()
+                    descuadradas += total
+                    self.stdout.write(f"{nombre}: {total} descuadradas.")
+                    continue
+
+                corregidas = modelo.objects.filter(pk__in=diferentes.values('pk')).update(monto_pagado_acumulado=real())
+                self.stdout.write(f"{nombre}: {corregidas} corregidas.")
+                if opts["pagado"]:
+                    modelo.objects.filter(saldo__lte=0, pagado=False).update(pagado=True)
+                    modelo.objects.filter(saldo__gt=0, pagado=True).update(pagado=False)
+
+        if opts["verificar"]:
+            if descuadradas:
+                raise CommandError(f"{descuadradas} deudas con el acumulado descuadrado.")
+        else:
+            # Los update() no pasan por las señales: se rehace SaldoPropiedad completo
+            self.stdout.write(f"Saldos por propiedad: {recalcular_saldos()} recalculados.")
+        self.stdout.write(self.style.SUCCESS("Saldos al día."))
@@ -0,0 +1,17 @@
+# finanzas/management/commands/reconstruir_resumenes_mensuales.py
+
+from django.core.management.base import BaseCommand
+
+from finanzas.models import Egreso, Ingreso
+from finanzas.resumenes import recalcular_resumenes
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los resúmenes mensuales de ingresos y egresos a partir de los movimientos."
+
+    def handle(self, *args, **opts):
+        for modelo in (Ingreso, Egreso):
+            filas = recalcular_resumenes(modelo)
+            self.stdout.write(self.style.SUCCESS(
+                f"{modelo._meta.verbose_name_plural}: {filas} resúmenes mensuales reconstruidos."
+            ))
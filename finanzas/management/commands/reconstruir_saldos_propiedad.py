@@ -0,0 +1,19 @@
+# finanzas/management/commands/reconstruir_saldos_propiedad.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from finanzas.estado_cuenta import recalcular_saldos
+
+
+class Command(BaseCommand):
+    help = "Reconstruye la tabla SaldoPropiedad (estado de cuenta) a partir de gastos y multas pendientes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--propiedad", type=int, action="append", dest="propiedades",
+                            help="Solo esta propiedad (se puede repetir).")
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            total = recalcular_saldos(opts["propiedades"])
+        self.stdout.write(self.style.SUCCESS(f"{total} saldos de propiedad reconstruidos."))
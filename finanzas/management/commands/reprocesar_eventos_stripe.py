@@ -0,0 +1,42 @@
+# finanzas/management/commands/reprocesar_eventos_stripe.py
+
+from django.core.management.base import BaseCommand
+
+from finanzas.eventos_stripe import encolar_evento, procesar
+from finanzas.models import EventoStripe
+
+
+class Command(BaseCommand):
+    help = ("Vuelve a procesar eventos de Stripe de la bandeja de entrada: por defecto los que quedaron "
+            "sin procesar (RECIBIDO/ENCOLADO).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--evento", action="append", dest="eventos",
+                            help="Solo este id de evento (evt_…, se puede repetir); incluye los ya procesados.")
+        parser.add_argument("--tipo", help="Solo eventos de este tipo (p. ej. payment_intent.succeeded).")
+        parser.add_argument("--desde", help="Solo eventos recibidos desde esta fecha (AAAA-MM-DD).")
+        parser.add_argument("--sincrono", action="store_true",
+                            help="Procesa en este proceso en lugar de encolar en los workers.")
+
+    def handle(self, *args, **opts):
+        eventos = EventoStripe.objects.order_by('recibido')
+        if opts["eventos"]:
+            eventos = eventos.filter(evento_id__in=opts["eventos"])
+        else:
+            eventos = eventos.filter(estado__in=[EventoStripe.Estado.RECIBIDO, EventoStripe.Estado.ENCOLADO])
+        if opts["tipo"]:
+            eventos = eventos.filter(tipo=opts["tipo"])
+        if opts["desde"]:
+            eventos = eventos.filter(recibido__date__gte=opts["desde"])
+
+        ids = list(eventos.values_list('evento_id', flat=True))
+        # Procesar es idempotente: un evento ya aplicado no vuelve a crear pagos
+        EventoStripe.objects.filter(evento_id__in=ids).update(estado=EventoStripe.Estado.RECIBIDO, procesado=None)
+        for evento_id in ids:
+            if opts["sincrono"]:
+                estado = procesar(evento_id)
+                self.stdout.write(f"{evento_id}: {estado}")
+            else:
+                encolar_evento(evento_id)
+        accion = "reprocesados" if opts["sincrono"] else "encolados"
+        self.stdout.write(self.style.SUCCESS(f"{len(ids)} eventos de Stripe {accion}."))
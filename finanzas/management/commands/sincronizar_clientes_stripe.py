@@ -0,0 +1,71 @@
+# finanzas/management/commands/sincronizar_clientes_stripe.py
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from finanzas.models import ClienteStripe, Pago
+from finanzas.stripe_service import cliente, customer_de
+
+TAMANO_LOTE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Completa ClienteStripe (usuario -> customer de Stripe): primero desde los pagos guardados, "
+        "con --desde-stripe leyendo los customers de la cuenta (metadata user_id) y con --crear "
+        "creando el customer de los usuarios que sigan sin uno."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde-stripe", action="store_true",
+                            help="Leer los customers de la cuenta de Stripe (100 por llamada).")
+        parser.add_argument("--crear", action="store_true",
+                            help="Crear en Stripe el customer de los usuarios activos con email que no tienen.")
+        parser.add_argument("--limite", type=int, help="Máximo de customers a crear con --crear.")
+
+    def _guardar(self, pares):
+        """Inserta los pares (usuario_id, customer_id) nuevos; devuelve cuántos."""
+        antes = ClienteStripe.objects.count()
+        ClienteStripe.objects.bulk_create(
+            [ClienteStripe(usuario_id=usuario_id, customer_id=customer_id) for usuario_id, customer_id in pares],
+            ignore_conflicts=True, batch_size=TAMANO_LOTE,
+        )
+        return ClienteStripe.objects.count() - antes
+
+    def _guardar_existentes(self, lote):
+        # Solo usuarios que existen (la cuenta puede tener customers de otros entornos)
+        existentes = set(User.objects.filter(pk__in=lote).values_list('pk', flat=True))
+        return self._guardar((pk, customer_id) for pk, customer_id in lote.items() if pk in existentes)
+
+    def handle(self, *args, **opts):
+        # 1. Customers ya usados en pagos (el más reciente de cada usuario), sin llamar a Stripe
+        sin_cliente = Pago.objects.filter(usuario__cliente_stripe__isnull=True).exclude(stripe_customer_id__isnull=True) \
+            .exclude(stripe_customer_id='')
+        pares = dict(sin_cliente.order_by('usuario_id', 'id').values_list('usuario_id', 'stripe_customer_id'))
+        self.stdout.write(f"Desde pagos: {self._guardar(pares.items())} clientes.")
+
+        # 2. Customers de la cuenta creados con metadata user_id
+        if opts["desde_stripe"]:
+            guardados, lote = 0, {}
+            for customer in cliente().v1.customers.list({'limit': 100}).auto_paging_iter():
+                usuario_id = (customer.metadata or {}).get('user_id')
+                if usuario_id and usuario_id.isdigit():
+                    lote.setdefault(int(usuario_id), customer.id)
+                if len(lote) >= TAMANO_LOTE:
+                    guardados += self._guardar_existentes(lote)
+                    lote = {}
+            guardados += self._guardar_existentes(lote)
+            self.stdout.write(f"Desde Stripe: {guardados} clientes.")
+
+        # 3. Usuarios que siguen sin customer: una llamada cada uno
+        if opts["crear"]:
+            pendientes = User.objects.filter(is_active=True, cliente_stripe__isnull=True).exclude(email='').order_by('pk')
+            if opts["limite"]:
+                pendientes = pendientes[:opts["limite"]]
+            creados = 0
+            for usuario in pendientes.iterator(chunk_size=TAMANO_LOTE):
+                customer_de(usuario)
+                creados += 1
+            self.stdout.write(f"Creados en Stripe: {creados} clientes.")
+
+        self.stdout.write(self.style.SUCCESS(f"{ClienteStripe.objects.count()} usuarios con customer de Stripe."))
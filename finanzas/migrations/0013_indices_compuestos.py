@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0005_alter_aviso_options_aviso_activo_aviso_dirigido_a_and_more'),
+        ('finanzas', '0012_pago_descripcion_pago_estado_pago_stripe_customer_id_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['propiedad', 'pagado', 'anio', 'mes'], name='gasto_prop_pagado_periodo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['anio', 'mes', 'pagado'], name='gasto_periodo_pagado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(condition=models.Q(('pagado', False)), fields=['propiedad', 'fecha_vencimiento'], name='gasto_pendiente_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='multa',
+            index=models.Index(fields=['propiedad', 'pagado'], name='multa_prop_pagado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['area_comun', 'fecha_reserva', 'hora_inicio'], name='reserva_area_fecha_hora_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:12
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def marcar_expensas_existentes(apps, schema_editor):
+    """
+    Marca como ``expensa_mensual`` las expensas ya generadas, para que volver
+    a generar un periodo existente no las duplique. Una generación anterior
+    se reconoce por su forma: la misma descripción y fecha de emisión en el
+    mismo periodo para al menos la mitad de las propiedades. Se marca un
+    gasto por propiedad y periodo (el primero; el lote más antiguo gana).
+    """
+    Gasto = apps.get_model('finanzas', 'Gasto')
+    Propiedad = apps.get_model('condominio', 'Propiedad')
+    minimo = max(2, (Propiedad.objects.count() + 1) // 2)
+    lotes = (
+        Gasto.objects.values('anio', 'mes', 'descripcion', 'fecha_emision')
+        .annotate(propiedades=Count('propiedad', distinct=True), primero=Min('id'))
+        .filter(propiedades__gte=minimo)
+        .order_by('primero')
+    )
+    marcadas = set()
+    ids = []
+    for lote in lotes:
+        primeros = (
+            Gasto.objects.filter(anio=lote['anio'], mes=lote['mes'], descripcion=lote['descripcion'],
+                                 fecha_emision=lote['fecha_emision'])
+            .values('propiedad_id').annotate(primero=Min('id')).values_list('propiedad_id', 'primero')
+        )
+        for propiedad_id, pk in primeros:
+            if (propiedad_id, lote['mes'], lote['anio']) not in marcadas:
+                marcadas.add((propiedad_id, lote['mes'], lote['anio']))
+                ids.append(pk)
+    for inicio in range(0, len(ids), 1000):
+        Gasto.objects.filter(pk__in=ids[inicio:inicio + 1000]).update(expensa_mensual=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0005_alter_aviso_options_aviso_activo_aviso_dirigido_a_and_more'),
+        ('finanzas', '0013_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gasto',
+            name='expensa_mensual',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(marcar_expensas_existentes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='gasto',
+            constraint=models.UniqueConstraint(condition=models.Q(('expensa_mensual', True)), fields=('propiedad', 'mes', 'anio'), name='gasto_expensa_unica_periodo'),
+        ),
+    ]
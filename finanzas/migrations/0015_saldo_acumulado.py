@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:18
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def _suma(modelo_pago, campo):
+    pagos = (modelo_pago.objects
+             .filter(**{campo: OuterRef('pk')})
+             .order_by()
+             .values(campo)
+             .annotate(total=Sum('monto_pagado'))
+             .values('total'))
+    return Coalesce(Subquery(pagos), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def llenar_acumulados(apps, schema_editor):
+    Gasto = apps.get_model('finanzas', 'Gasto')
+    Multa = apps.get_model('finanzas', 'Multa')
+    Pago = apps.get_model('finanzas', 'Pago')
+    PagoMulta = apps.get_model('finanzas', 'PagoMulta')
+    Gasto.objects.update(monto_pagado_acumulado=_suma(Pago, 'gasto'))
+    Multa.objects.update(monto_pagado_acumulado=_suma(Pago, 'multa') + _suma(PagoMulta, 'multa'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0014_expensa_mensual_unica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gasto',
+            name='monto_pagado_acumulado',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Suma de los pagos imputados (lo mantienen los pagos).', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='multa',
+            name='monto_pagado_acumulado',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Suma de los pagos imputados (lo mantienen los pagos).', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='gasto',
+            name='saldo',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('monto'), '-', models.F('monto_pagado_acumulado')), output_field=models.DecimalField(decimal_places=2, max_digits=12)),
+        ),
+        migrations.AddField(
+            model_name='multa',
+            name='saldo',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('monto'), '-', models.F('monto_pagado_acumulado')), output_field=models.DecimalField(decimal_places=2, max_digits=12)),
+        ),
+        migrations.RunPython(llenar_acumulados, migrations.RunPython.noop),
+    ]
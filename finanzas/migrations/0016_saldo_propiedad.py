@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def llenar_saldos(apps, schema_editor):
+    Propiedad = apps.get_model('condominio', 'Propiedad')
+    SaldoPropiedad = apps.get_model('finanzas', 'SaldoPropiedad')
+    saldos = {pk: SaldoPropiedad(propiedad_id=pk) for pk in Propiedad.objects.values_list('pk', flat=True)}
+    for nombre, cantidad, saldo in (('Gasto', 'gastos_pendientes', 'saldo_gastos'),
+                                    ('Multa', 'multas_pendientes', 'saldo_multas')):
+        filas = (apps.get_model('finanzas', nombre).objects.filter(pagado=False).order_by()
+                 .values('propiedad_id').annotate(n=Count('id'), total=Sum('saldo'), vence=Min('fecha_vencimiento')))
+        for fila in filas:
+            fila_saldo = saldos[fila['propiedad_id']]
+            setattr(fila_saldo, cantidad, fila['n'])
+            setattr(fila_saldo, saldo, fila['total'] or 0)
+            if fila['vence'] and (fila_saldo.vencimiento_mas_antiguo is None or fila['vence'] < fila_saldo.vencimiento_mas_antiguo):
+                fila_saldo.vencimiento_mas_antiguo = fila['vence']
+    SaldoPropiedad.objects.bulk_create(saldos.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0005_alter_aviso_options_aviso_activo_aviso_dirigido_a_and_more'),
+        ('finanzas', '0015_saldo_acumulado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoPropiedad',
+            fields=[
+                ('propiedad', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saldo_cuenta', serialize=False, to='condominio.propiedad')),
+                ('gastos_pendientes', models.PositiveIntegerField(default=0)),
+                ('saldo_gastos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('multas_pendientes', models.PositiveIntegerField(default=0)),
+                ('saldo_multas', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('vencimiento_mas_antiguo', models.DateField(blank=True, null=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Saldo de propiedad',
+                'verbose_name_plural': 'Saldos de propiedades',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['usuario', 'pagada'], name='reserva_usuario_pagada_idx'),
+        ),
+        migrations.RunPython(llenar_saldos, migrations.RunPython.noop),
+    ]
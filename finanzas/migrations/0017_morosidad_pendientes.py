@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0005_alter_aviso_options_aviso_activo_aviso_dirigido_a_and_more'),
+        ('finanzas', '0016_saldo_propiedad'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='multa',
+            index=models.Index(condition=models.Q(('pagado', False)), fields=['propiedad', 'fecha_vencimiento'], name='multa_pendiente_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('pagada', False)), fields=['fecha_reserva'], name='reserva_pendiente_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:40
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def llenar_resumenes(apps, schema_editor):
+    for movimiento, resumen, clave in (('Ingreso', 'ResumenMensualIngreso', 'concepto'),
+                                       ('Egreso', 'ResumenMensualEgreso', 'categoria')):
+        Resumen = apps.get_model('finanzas', resumen)
+        filas = (apps.get_model('finanzas', movimiento).objects.order_by()
+                 .annotate(anio_mov=ExtractYear('fecha'), mes_mov=ExtractMonth('fecha'))
+                 .values('anio_mov', 'mes_mov', clave)
+                 .annotate(suma=Sum('monto'), n=Count('id')))
+        Resumen.objects.bulk_create([
+            Resumen(anio=f['anio_mov'], mes=f['mes_mov'], total=f['suma'] or 0, cantidad=f['n'], **{clave: f[clave]})
+            for f in filas
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0017_morosidad_pendientes'),
+        ('mantenimiento', '0005_solicitudmantenimiento_fecha_resolucion_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenMensualEgreso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.PositiveIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('categoria', models.CharField(choices=[('MANTENIMIENTO', 'Mantenimiento y Reparaciones'), ('SERVICIOS', 'Servicios Públicos (Agua, Luz)'), ('SUELDOS', 'Sueldos y Salarios'), ('ADMIN', 'Gastos Administrativos'), ('LIMPIEZA', 'Limpieza y Jardinería'), ('SEGURIDAD', 'Seguridad'), ('OTROS', 'Otros')], max_length=20)),
+            ],
+            options={
+                'verbose_name': 'Resumen mensual de egresos',
+                'verbose_name_plural': 'Resúmenes mensuales de egresos',
+                'ordering': ('anio', 'mes'),
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenMensualIngreso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.PositiveIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('concepto', models.CharField(max_length=255)),
+            ],
+            options={
+                'verbose_name': 'Resumen mensual de ingresos',
+                'verbose_name_plural': 'Resúmenes mensuales de ingresos',
+                'ordering': ('anio', 'mes'),
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='egreso',
+            index=models.Index(fields=['fecha'], name='egreso_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingreso',
+            index=models.Index(fields=['fecha'], name='ingreso_fecha_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumenmensualegreso',
+            constraint=models.UniqueConstraint(fields=('anio', 'mes', 'categoria'), name='resumen_egreso_periodo_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumenmensualingreso',
+            constraint=models.UniqueConstraint(fields=('anio', 'mes', 'concepto'), name='resumen_ingreso_periodo_unico'),
+        ),
+        migrations.RunPython(llenar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:40
+
+from django.db import migrations, models
+from django.db.models import Min
+from django.utils import timezone
+
+
+def llenar_banderas(apps, schema_editor):
+    Gasto = apps.get_model('finanzas', 'Gasto')
+    SaldoPropiedad = apps.get_model('finanzas', 'SaldoPropiedad')
+    vencimientos = dict(
+        Gasto.objects.filter(pagado=False).order_by().values('propiedad_id')
+        .annotate(vence=Min('fecha_vencimiento')).values_list('propiedad_id', 'vence')
+    )
+    hoy, ahora = timezone.localdate(), timezone.now()
+    saldos = list(SaldoPropiedad.objects.all())
+    for saldo in saldos:
+        saldo.vencimiento_gasto_mas_antiguo = vencimientos.get(saldo.propiedad_id)
+        saldo.moroso = saldo.vencimiento_gasto_mas_antiguo is not None and saldo.vencimiento_gasto_mas_antiguo < hoy
+        saldo.moroso_calculado = ahora
+    SaldoPropiedad.objects.bulk_update(
+        saldos, ['vencimiento_gasto_mas_antiguo', 'moroso', 'moroso_calculado'], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0018_resumenes_mensuales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saldopropiedad',
+            name='vencimiento_gasto_mas_antiguo',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='saldopropiedad',
+            name='moroso',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='saldopropiedad',
+            name='moroso_calculado',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(llenar_banderas, migrations.RunPython.noop),
+    ]
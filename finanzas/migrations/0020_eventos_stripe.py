@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 22:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0019_saldopropiedad_moroso'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pago',
+            name='stripe_payment_intent_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.CreateModel(
+            name='EventoStripe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('evento_id', models.CharField(max_length=255, unique=True)),
+                ('tipo', models.CharField(max_length=100)),
+                ('payment_intent_id', models.CharField(blank=True, db_index=True, max_length=255, null=True)),
+                ('payload', models.JSONField()),
+                ('estado', models.CharField(choices=[('RECIBIDO', 'Recibido'), ('ENCOLADO', 'Encolado'), ('PROCESADO', 'Procesado'), ('IGNORADO', 'Ignorado')], default='RECIBIDO', max_length=10)),
+                ('recibido', models.DateTimeField(auto_now_add=True)),
+                ('procesado', models.DateTimeField(blank=True, null=True)),
+                ('pago', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='eventos_stripe', to='finanzas.pago')),
+            ],
+            options={
+                'verbose_name': 'Evento de Stripe',
+                'verbose_name_plural': 'Eventos de Stripe',
+                'ordering': ['-recibido'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 22:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0020_eventos_stripe'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClienteStripe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_id', models.CharField(max_length=255, unique=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cliente_stripe', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Cliente de Stripe',
+                'verbose_name_plural': 'Clientes de Stripe',
+            },
+        ),
+    ]
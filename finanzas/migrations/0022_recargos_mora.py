@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 22:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0005_alter_aviso_options_aviso_activo_aviso_dirigido_a_and_more'),
+        ('finanzas', '0021_clientes_stripe'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='multa',
+            name='gasto_origen',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recargos', to='finanzas.gasto'),
+        ),
+        migrations.AddConstraint(
+            model_name='multa',
+            constraint=models.UniqueConstraint(condition=models.Q(('gasto_origen__isnull', False)), fields=('gasto_origen', 'mes', 'anio'), name='multa_recargo_unico_periodo'),
+        ),
+    ]
@@ -1,10 +1,88 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from condominio.models import Propiedad, AreaComun
-from django.db.models.signals import post_save
-from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+from django.db.models import BooleanField, Case, DecimalField, ExpressionWrapper, F, Q, Value, When
 from django.dispatch import receiver
 
+
+# ===================================================================
+# Saldo de las deudas (Gasto, Multa)
+#    ``monto_pagado_acumulado`` lo mueven solo los pagos, con UPDATE … F();
+#    ``saldo`` lo calcula la base de datos. Ver ``ajustar_acumulados``.
+# ===================================================================
+
+_DECIMAL = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _campo_acumulado():
+    return models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False,
+        help_text="Suma de los pagos imputados (lo mantienen los pagos).",
+    )
+
+
+def _campo_saldo():
+    return models.GeneratedField(
+        expression=F('monto') - F('monto_pagado_acumulado'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        db_persist=True,
+    )
+
+
+def _guardar_sin_pisar_acumulado(instancia, guardar, kwargs):
+    """
+    En un save() completo de una deuda que ya existe no se escriben el
+    acumulado ni ``pagado``: el valor en memoria puede ser anterior a un pago
+    concurrente. Si cambió el monto, ``pagado`` se recalcula en la base contra
+    el acumulado vigente.
+    """
+    recalcular = False
+    if not instancia._state.adding and not kwargs.get('force_insert'):
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in instancia._meta.concrete_fields
+                if not f.primary_key and not f.generated and f.name not in ('monto_pagado_acumulado', 'pagado')
+            ]
+        recalcular = ('monto' in kwargs['update_fields']
+                      and instancia.monto != getattr(instancia, '_monto_anterior', instancia.monto))
+    guardar(**kwargs)
+    if recalcular:
+        modelo = type(instancia)
+        modelo.objects.filter(pk=instancia.pk).update(
+            pagado=ExpressionWrapper(Q(monto__lte=F('monto_pagado_acumulado')), output_field=BooleanField()),
+        )
+        instancia.pagado = modelo.objects.values_list('pagado', flat=True).get(pk=instancia.pk)
+    instancia._monto_anterior = instancia.monto
+
+
+def ajustar_acumulados(modelo, deltas):
+    """
+    Suma ``deltas`` ({id: importe}) al acumulado de cada deuda de ``modelo`` y
+    recalcula ``pagado`` (saldo <= 0), todo en un solo UPDATE.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if len(set(deltas.values())) == 1:
+        delta = Value(next(iter(deltas.values())), output_field=_DECIMAL)
+    else:
+        delta = Case(
+            *[When(pk=pk, then=Value(importe, output_field=_DECIMAL)) for pk, importe in deltas.items()],
+            output_field=_DECIMAL,
+        )
+    nuevo = F('monto_pagado_acumulado') + delta
+    modelo.objects.filter(pk__in=list(deltas)).update(
+        monto_pagado_acumulado=nuevo,
+        pagado=ExpressionWrapper(Q(monto__lte=nuevo), output_field=BooleanField()),
+    )
+
+    from .estado_cuenta import marcar_deudas
+    marcar_deudas(modelo, deltas)
+
+
 # ===================================================================
 # 1. MODELOS PRINCIPALES (los que se pagan)
 #    Definimos Gasto, Multa y Reserva primero.
@@ -19,20 +97,51 @@ class Gasto(models.Model):
     pagado = models.BooleanField(default=False)
     mes = models.PositiveSmallIntegerField()
     anio = models.PositiveIntegerField()
+    # Cuota mensual generada de forma masiva (una por propiedad y periodo);
+    # los gastos extraordinarios quedan en False y no tienen ese límite
+    expensa_mensual = models.BooleanField(default=False)
+    monto_pagado_acumulado = _campo_acumulado()
+    saldo = _campo_saldo()
 
-    def save(self, *args, **kwargs):
+    def save(self, **kwargs):
         if self.fecha_emision and not self.mes:
             self.mes = self.fecha_emision.month
         if self.fecha_emision and not self.anio:
             self.anio = self.fecha_emision.year
-        super().save(*args, **kwargs)
+        _guardar_sin_pisar_acumulado(self, super().save, kwargs)
 
     class Meta:
         ordering = ('-anio', '-mes', 'propiedad_id')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['propiedad', 'mes', 'anio'],
+                condition=models.Q(expensa_mensual=True),
+                name='gasto_expensa_unica_periodo',
+            ),
+        ]
+        indexes = [
+            # Estado de cuenta / mis gastos: propiedad + pagado (+ periodo)
+            models.Index(fields=['propiedad', 'pagado', 'anio', 'mes'], name='gasto_prop_pagado_periodo_idx'),
+            # Reportes por periodo (morosidad, generación mensual)
+            models.Index(fields=['anio', 'mes', 'pagado'], name='gasto_periodo_pagado_idx'),
+            # Deuda pendiente por antigüedad: solo indexa lo que no está pagado
+            models.Index(
+                fields=['propiedad', 'fecha_vencimiento'],
+                condition=models.Q(pagado=False),
+                name='gasto_pendiente_venc_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Gasto {self.propiedad} {self.mes}/{self.anio} - {self.monto}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._propiedad_anterior = instancia.__dict__.get('propiedad_id')
+        instancia._monto_anterior = instancia.__dict__.get('monto')
+        return instancia
+
 
 class Multa(models.Model):
     propiedad = models.ForeignKey(Propiedad, on_delete=models.CASCADE, related_name='multas')
@@ -45,20 +154,48 @@ class Multa(models.Model):
     mes = models.PositiveSmallIntegerField()
     anio = models.PositiveIntegerField()
     creado_por = models.ForeignKey(User, on_delete=models.PROTECT, related_name='multas_creadas', null=True, blank=True)
+    # Recargo por mora de ese gasto (finanzas.recargos); None en las multas manuales
+    gasto_origen = models.ForeignKey(Gasto, on_delete=models.CASCADE, related_name='recargos', null=True, blank=True)
+    # Incluye Pago.multa y PagoMulta
+    monto_pagado_acumulado = _campo_acumulado()
+    saldo = _campo_saldo()
 
-    def save(self, *args, **kwargs):
+    def save(self, **kwargs):
         if self.fecha_emision and not self.mes:
             self.mes = self.fecha_emision.month
         if self.fecha_emision and not self.anio:
             self.anio = self.fecha_emision.year
-        super().save(*args, **kwargs)
+        _guardar_sin_pisar_acumulado(self, super().save, kwargs)
 
     class Meta:
         ordering = ('-anio', '-mes', 'propiedad_id')
+        constraints = [
+            # Un recargo por gasto y mes de corte: repetir el corte no cobra dos veces
+            models.UniqueConstraint(
+                fields=['gasto_origen', 'mes', 'anio'],
+                condition=models.Q(gasto_origen__isnull=False),
+                name='multa_recargo_unico_periodo',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['propiedad', 'pagado'], name='multa_prop_pagado_idx'),
+            models.Index(
+                fields=['propiedad', 'fecha_vencimiento'],
+                condition=models.Q(pagado=False),
+                name='multa_pendiente_venc_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Multa {self.propiedad} {self.concepto} {self.mes}/{self.anio} - {self.monto}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._propiedad_anterior = instancia.__dict__.get('propiedad_id')
+        instancia._monto_anterior = instancia.__dict__.get('monto')
+        return instancia
+
 
 class Reserva(models.Model):
     area_comun = models.ForeignKey(AreaComun, on_delete=models.CASCADE, related_name='reservas')
@@ -69,9 +206,57 @@ class Reserva(models.Model):
     costo_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     pagada = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Detección de choques de horario y reporte de uso por área
+            models.Index(fields=['area_comun', 'fecha_reserva', 'hora_inicio'], name='reserva_area_fecha_hora_idx'),
+            # Reservas pendientes del usuario (estado de cuenta)
+            models.Index(fields=['usuario', 'pagada'], name='reserva_usuario_pagada_idx'),
+            # Reservas impagas (reporte de morosidad)
+            models.Index(
+                fields=['fecha_reserva'],
+                condition=models.Q(pagada=False),
+                name='reserva_pendiente_fecha_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"Reserva {self.area_comun} {self.fecha_reserva} {self.hora_inicio}-{self.hora_fin}"
 
+class SaldoPropiedad(models.Model):
+    """
+    Deuda pendiente de una propiedad (gastos y multas sin pagar), para
+    responder el estado de cuenta sin recorrer sus deudas. La mantiene
+    ``finanzas.estado_cuenta`` en cada escritura; se reconstruye con
+    ``manage.py reconstruir_saldos_propiedad``.
+    """
+    propiedad = models.OneToOneField(Propiedad, on_delete=models.CASCADE, primary_key=True, related_name='saldo_cuenta')
+    gastos_pendientes = models.PositiveIntegerField(default=0)
+    saldo_gastos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    multas_pendientes = models.PositiveIntegerField(default=0)
+    saldo_multas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    vencimiento_mas_antiguo = models.DateField(null=True, blank=True)
+    # Bandera de morosidad (ver finanzas.morosos): gasto sin pagar ya vencido
+    vencimiento_gasto_mas_antiguo = models.DateField(null=True, blank=True)
+    moroso = models.BooleanField(default=False)
+    moroso_calculado = models.DateTimeField(null=True, blank=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Saldo de propiedad"
+        verbose_name_plural = "Saldos de propiedades"
+
+    def __str__(self):
+        return f"Saldo {self.propiedad_id}: {self.total_pendiente}"
+
+    @property
+    def items_pendientes(self):
+        return self.gastos_pendientes + self.multas_pendientes
+
+    @property
+    def total_pendiente(self):
+        return self.saldo_gastos + self.saldo_multas
+
 # ===================================================================
 # 2. MODELOS DE PAGO (los que referencian a los anteriores)
 #    Definimos Pago y PagoMulta al final.
@@ -103,7 +288,8 @@ class Pago(models.Model):
     qr_data = models.TextField(blank=True, null=True)
     
     # Campos de Stripe
-    stripe_payment_intent_id = models.CharField(max_length=255, blank=True, null=True)
+    # Indexado: los eventos de Stripe ubican el pago por su PaymentIntent
+    stripe_payment_intent_id = models.CharField(max_length=255, blank=True, null=True, db_index=True)
     stripe_customer_id = models.CharField(max_length=255, blank=True, null=True)
     descripcion = models.TextField(blank=True, null=True)
 
@@ -118,17 +304,21 @@ class Pago(models.Model):
             return f"Pago {self.monto_pagado} de {self.reserva}"
         return f"Pago {self.id} por {self.monto_pagado}"
 
-    # --- AÑADE ESTE MÉTODO ---
+    # Deudas con saldo a las que se imputa el pago
+    DEUDAS = (('gasto', Gasto), ('multa', Multa))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._imputado = _imputaciones(instancia)
+        return instancia
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs) # Guarda el pago primero
-        # Ahora, actualiza el estado del gasto asociado
-        if self.gasto:
-            total_pagado = self.gasto.pagos.aggregate(total=Sum('monto_pagado'))['total'] or 0
-            if total_pagado >= self.gasto.monto:
-                self.gasto.pagado = True
-            else:
-                self.gasto.pagado = False
-            self.gasto.save()
+        # El acumulado (y ``pagado``) de la deuda se ajusta por la diferencia
+        # con lo imputado antes; sin volver a sumar sus pagos
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            _reimputar(self)
 
 # ... (el resto de tus modelos)
 
@@ -143,11 +333,64 @@ class PagoMulta(models.Model):
     fecha_pago = models.DateField(auto_now_add=True)
     comprobante = models.FileField(upload_to='comprobantes_multas/', null=True, blank=True)
 
+    DEUDAS = (('multa', Multa),)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._imputado = _imputaciones(instancia)
+        return instancia
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            _reimputar(self)
+
     def __str__(self):
         return f"PagoMulta {self.monto_pagado} de {self.multa}"
+
+
+def _imputaciones(pago):
+    """{(modelo, id_deuda): monto} de un pago (vacío si faltan los campos)."""
+    monto = pago.__dict__.get('monto_pagado')
+    if monto is None:
+        return {}
+    return {
+        (modelo, pago.__dict__[f'{campo}_id']): Decimal(str(monto))
+        for campo, modelo in pago.DEUDAS
+        if pago.__dict__.get(f'{campo}_id')
+    }
+
+
+def _reimputar(pago, borrado=False):
+    anterior = getattr(pago, '_imputado', {})
+    actual = {} if borrado else _imputaciones(pago)
+    deltas = {}
+    for clave in anterior.keys() | actual.keys():
+        delta = actual.get(clave, 0) - anterior.get(clave, 0)
+        if delta:
+            deltas.setdefault(clave[0], {})[clave[1]] = delta
+    for modelo, por_deuda in deltas.items():
+        ajustar_acumulados(modelo, por_deuda)
+    pago._imputado = actual
+
+
+@receiver(post_delete, sender=Pago)
+@receiver(post_delete, sender=PagoMulta)
+def descontar_pago_borrado(sender, instance, **kwargs):
+    """Resta del acumulado lo que el pago borrado tenía imputado."""
+    if not hasattr(instance, '_imputado'):
+        instance._imputado = _imputaciones(instance)
+    _reimputar(instance, borrado=True)
     
 
 
+def _periodo(movimiento):
+    """(año, mes) de un Ingreso/Egreso, o None si no se cargó la fecha."""
+    fecha = movimiento.__dict__.get('fecha')
+    return (fecha.year, fecha.month) if fecha else None
+
+
 class Egreso(models.Model):
     """
     Representa las salidas de dinero del condominio.
@@ -180,10 +423,20 @@ class Egreso(models.Model):
         verbose_name = "Egreso"
         verbose_name_plural = "Egresos"
         ordering = ['-fecha']
+        indexes = [
+            # Meses incompletos del reporte financiero y recálculo de resúmenes
+            models.Index(fields=['fecha'], name='egreso_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Egreso: {self.concepto} - ${self.monto}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._periodo = _periodo(instancia)
+        return instancia
+
 
 class Ingreso(models.Model):
     """
@@ -206,10 +459,111 @@ class Ingreso(models.Model):
         verbose_name = "Ingreso"
         verbose_name_plural = "Ingresos"
         ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['fecha'], name='ingreso_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Ingreso: {self.concepto} - ${self.monto}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._periodo = _periodo(instancia)
+        return instancia
+
+
+# ===================================================================
+# Resúmenes mensuales de ingresos y egresos
+#    Una fila por (año, mes, concepto/categoría). Las mantiene
+#    ``finanzas.resumenes`` en cada escritura; se reconstruyen con
+#    ``manage.py reconstruir_resumenes_mensuales``.
+# ===================================================================
+
+class ResumenMensual(models.Model):
+    anio = models.PositiveIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cantidad = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ('anio', 'mes')
+
+
+class ResumenMensualIngreso(ResumenMensual):
+    concepto = models.CharField(max_length=255)
+
+    class Meta(ResumenMensual.Meta):
+        verbose_name = "Resumen mensual de ingresos"
+        verbose_name_plural = "Resúmenes mensuales de ingresos"
+        constraints = [
+            models.UniqueConstraint(fields=['anio', 'mes', 'concepto'], name='resumen_ingreso_periodo_unico'),
+        ]
+
+    def __str__(self):
+        return f"Ingresos {self.mes}/{self.anio} {self.concepto}: {self.total}"
+
+
+class ResumenMensualEgreso(ResumenMensual):
+    categoria = models.CharField(max_length=20, choices=Egreso.CATEGORIA_CHOICES)
+
+    class Meta(ResumenMensual.Meta):
+        verbose_name = "Resumen mensual de egresos"
+        verbose_name_plural = "Resúmenes mensuales de egresos"
+        constraints = [
+            models.UniqueConstraint(fields=['anio', 'mes', 'categoria'], name='resumen_egreso_periodo_unico'),
+        ]
+
+    def __str__(self):
+        return f"Egresos {self.mes}/{self.anio} {self.categoria}: {self.total}"
+
+
+class EventoStripe(models.Model):
+    """
+    Evento de webhook de Stripe tal como llegó (ver ``finanzas.eventos_stripe``).
+    El id del evento es único: los reintentos de Stripe no se duplican.
+    """
+    class Estado(models.TextChoices):
+        RECIBIDO = 'RECIBIDO', 'Recibido'
+        ENCOLADO = 'ENCOLADO', 'Encolado'
+        PROCESADO = 'PROCESADO', 'Procesado'
+        IGNORADO = 'IGNORADO', 'Ignorado'
+
+    evento_id = models.CharField(max_length=255, unique=True)
+    tipo = models.CharField(max_length=100)
+    payment_intent_id = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+    payload = models.JSONField()
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.RECIBIDO)
+    pago = models.ForeignKey(Pago, on_delete=models.SET_NULL, null=True, blank=True, related_name='eventos_stripe')
+    recibido = models.DateTimeField(auto_now_add=True)
+    procesado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Evento de Stripe"
+        verbose_name_plural = "Eventos de Stripe"
+        ordering = ['-recibido']
+
+    def __str__(self):
+        return f"{self.evento_id} {self.tipo} ({self.estado})"
+
+
+class ClienteStripe(models.Model):
+    """
+    Customer de Stripe de cada usuario (ver ``finanzas.stripe_service.customer_de``).
+    Se crea una sola vez y se reutiliza en cada setup/payment intent.
+    """
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cliente_stripe')
+    customer_id = models.CharField(max_length=255, unique=True)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Cliente de Stripe"
+        verbose_name_plural = "Clientes de Stripe"
+
+    def __str__(self):
+        return f"{self.usuario_id} -> {self.customer_id}"
+
 
 # ========= SIGNALS PARA INGRESOS AUTOMÁTICOS =========
 # en finanzas/models.py
@@ -242,4 +596,37 @@ def crear_ingreso_desde_pago(sender, instance, created, **kwargs):
                 'concepto': concepto,
                 'descripcion': f"Ingreso automático generado desde el pago ID {instance.id}"
             }
-        )
\ No newline at end of file
+        )
+
+
+@receiver(post_save, sender=Gasto)
+@receiver(post_save, sender=Multa)
+@receiver(post_delete, sender=Gasto)
+@receiver(post_delete, sender=Multa)
+def actualizar_saldo_propiedad(sender, instance, **kwargs):
+    """Toda escritura de una deuda refresca el saldo de su propiedad (y el de la anterior, si cambió)."""
+    from .estado_cuenta import marcar_propiedades
+    marcar_propiedades([getattr(instance, '_propiedad_anterior', None), instance.propiedad_id])
+    instance._propiedad_anterior = instance.propiedad_id
+
+
+@receiver(post_save, sender=Propiedad)
+def invalidar_bandera_moroso(sender, instance, **kwargs):
+    """
+    La propiedad pudo cambiar de dueño: se vuelven a leer la bandera del
+    actual y la del anterior (lo guarda ``usuarios.signals.recordar_propietario_anterior``).
+    """
+    from .morosos import invalidar_usuarios
+    invalidar_usuarios([instance.propietario_id, getattr(instance, '_propietario_anterior_id', None)])
+
+
+@receiver(post_save, sender=Ingreso)
+@receiver(post_save, sender=Egreso)
+@receiver(post_delete, sender=Ingreso)
+@receiver(post_delete, sender=Egreso)
+def actualizar_resumen_mensual(sender, instance, **kwargs):
+    """Recalcula el mes del movimiento (y el anterior, si cambió de fecha)."""
+    from .resumenes import marcar_periodos
+    actual = _periodo(instance)
+    marcar_periodos(sender, {getattr(instance, '_periodo', None), actual})
+    instance._periodo = actual
@@ -0,0 +1,118 @@
+# finanzas/morosidad.py
+"""
+Morosidad por propiedad con antigüedad de la deuda.
+
+Suma lo pendiente de gastos, multas y reservas (éstas se imputan a la
+propiedad donde vive quien reservó) y lo reparte por días de atraso respecto
+de una fecha de corte: por vencer, 0–30, 31–60, 61–90 y más de 90.
+
+Todo sale de una sola consulta agrupada sobre un ``UNION ALL`` de las tres
+fuentes; las filas se leen por bloques con el cursor por lotes de Django (el
+mismo que usa ``QuerySet.iterator(chunk_size=…)``; en PostgreSQL, un cursor
+del lado del servidor), de modo que ``filas_morosidad`` y los generadores
+CSV/JSON recorren cualquier número de propiedades en memoria constante.
+"""
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import CharField, DecimalField, F, Value
+from django.db.models.functions import Coalesce
+
+from condominio.models import Propiedad
+from config.exportacion import lineas_csv
+
+from .models import Gasto, Multa, Reserva
+
+TAMANO_BLOQUE = 2000
+
+# (columna, días de atraso desde, hasta); ``None`` = sin límite
+TRAMOS = (
+    ('d0_30', 0, 30),
+    ('d31_60', 31, 60),
+    ('d61_90', 61, 90),
+    ('mas_90', 91, None),
+)
+
+COLUMNAS = ('propiedad_id', 'numero_casa', 'items', 'por_vencer') + tuple(t[0] for t in TRAMOS) + ('total',)
+_IMPORTES = ('por_vencer',) + tuple(t[0] for t in TRAMOS) + ('total',)
+
+
+def deudas_pendientes():
+    """``UNION ALL`` de lo pendiente: (tipo, prop_id, pendiente, vence) por deuda."""
+    ramas = (
+        Gasto.objects.filter(pagado=False, saldo__gt=0).annotate(
+            tipo=Value('gasto', output_field=CharField()), prop_id=F('propiedad_id'),
+            pendiente=F('saldo'), vence=Coalesce('fecha_vencimiento', 'fecha_emision'),
+        ),
+        Multa.objects.filter(pagado=False, saldo__gt=0).annotate(
+            tipo=Value('multa', output_field=CharField()), prop_id=F('propiedad_id'),
+            pendiente=F('saldo'), vence=Coalesce('fecha_vencimiento', 'fecha_emision'),
+        ),
+        Reserva.objects.filter(pagada=False, costo_total__gt=0).annotate(
+            tipo=Value('reserva', output_field=CharField()), prop_id=F('usuario__residente__propiedad_id'),
+            pendiente=F('costo_total'), vence=F('fecha_reserva'),
+        ),
+    )
+    consultas = [rama.order_by().values('tipo', 'prop_id', 'pendiente', 'vence') for rama in ramas]
+    return consultas[0].union(*consultas[1:], all=True)
+
+
+def consulta_morosidad(fecha_corte):
+    """SQL y parámetros de la consulta agrupada por propiedad."""
+    union_sql, union_params = deudas_pendientes().query.sql_with_params()
+    casos, params = ["SUM(CASE WHEN d.vence > %s THEN d.pendiente ELSE 0 END)"], [fecha_corte]
+    for _, desde, hasta in TRAMOS:
+        # Atraso = fecha_corte - vence, así que el tramo [desde, hasta] es un rango de vencimientos
+        condiciones = ["d.vence <= %s"]
+        params.append(fecha_corte - timedelta(days=desde))
+        if hasta is not None:
+            condiciones.append("d.vence >= %s")
+            params.append(fecha_corte - timedelta(days=hasta))
+        casos.append(f"SUM(CASE WHEN {' AND '.join(condiciones)} THEN d.pendiente ELSE 0 END)")
+
+    tabla_propiedad = connection.ops.quote_name(Propiedad._meta.db_table)
+    sql = (
+        f"SELECT d.prop_id, p.numero_casa, COUNT(*), {', '.join(casos)}, SUM(d.pendiente) "
+        f"FROM ({union_sql}) d LEFT JOIN {tabla_propiedad} p ON p.id = d.prop_id "
+        f"GROUP BY d.prop_id, p.numero_casa "
+        f"ORDER BY d.prop_id"
+    )
+    return sql, tuple(params) + tuple(union_params)
+
+
+def filas_morosidad(fecha_corte, chunk_size=TAMANO_BLOQUE):
+    """
+    Itera una fila (dict con ``COLUMNAS``) por propiedad con deuda. Las
+    reservas de quien no vive en ninguna propiedad salen con ``propiedad_id``
+    None.
+    """
+    sql, params = consulta_morosidad(fecha_corte)
+    convertir = DecimalField(max_digits=14, decimal_places=2).to_python
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            bloque = cursor.fetchmany(chunk_size)
+            if not bloque:
+                break
+            for fila in bloque:
+                fila = dict(zip(COLUMNAS, fila))
+                for columna in _IMPORTES:
+                    # SQLite devuelve las sumas como float
+                    fila[columna] = convertir(fila[columna] or Decimal('0')).quantize(Decimal('0.01'))
+                yield fila
+
+
+def csv_morosidad(filas):
+    return lineas_csv(COLUMNAS, ([fila[c] for c in COLUMNAS] for fila in filas))
+
+
+def json_morosidad(filas, fecha_corte):
+    yield '{"fecha_corte": "%s", "items": [' % fecha_corte.isoformat()
+    separador = ''
+    for fila in filas:
+        yield separador + json.dumps(fila, cls=DjangoJSONEncoder)
+        separador = ', '
+    yield ']}'
@@ -0,0 +1,135 @@
+# finanzas/morosos.py
+"""
+Bandera de morosidad por propiedad y por usuario.
+
+- ``SaldoPropiedad`` guarda el vencimiento más antiguo de los gastos sin pagar
+  de la propiedad y la bandera ``moroso`` (ese vencimiento ya pasó) con la
+  hora en que se calculó. ``estado_cuenta.recalcular_saldos`` la recalcula en
+  cada escritura de gastos, multas y pagos; ``actualizar_morosos`` (comando
+  ``actualizar_morosos``, una vez por noche) cambia la de las propiedades
+  cuyos gastos vencieron desde entonces (cron ``actualizar-morosos`` en
+  render.yaml). Las lecturas comparan ese vencimiento con la fecha del día
+  (``Bandera.vencido``), así que no dependen de que el cron haya corrido.
+- La bandera de un usuario (moroso si alguna de sus propiedades lo es) se
+  guarda en la caché compartida. ``banderas_de_usuarios`` responde muchos
+  usuarios con un ``get_many`` y una sola consulta para los que falten; toda
+  escritura que cambia un saldo borra la entrada de su propietario, y un
+  cambio de dueño también la del anterior. Sin caché compartida
+  (``MOROSOS_CACHE_TTL`` es 0 sin ``REDIS_URL``) el borrado no llegaría a los
+  demás procesos: se consulta siempre.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, Q, Value, When
+from django.utils import timezone
+
+from .models import SaldoPropiedad
+
+
+@dataclass(frozen=True)
+class Bandera:
+    usuario_id: int
+    moroso: bool = False
+    # Cuándo se calculó la bandera de la propiedad más reciente (None: sin propiedades)
+    calculado: datetime | None = None
+    # Vencimiento más antiguo de sus gastos sin pagar
+    vencimiento: date | None = None
+
+    def vencido(self, hoy=None, meses_limite=None):
+        """¿Tiene un gasto sin pagar vencido (hace más de ``meses_limite`` meses)?"""
+        if self.vencimiento is None:
+            return False
+        limite = hoy or timezone.localdate()
+        if meses_limite:
+            limite -= timedelta(days=30 * meses_limite)
+        return self.vencimiento < limite
+
+    def como_dict(self):
+        return {
+            'usuario_id': self.usuario_id,
+            # Con la fecha de hoy: no depende de que haya corrido la actualización nocturna
+            'moroso': self.vencido(),
+            'calculado': self.calculado,
+            'vencimiento': self.vencimiento,
+        }
+
+
+def es_moroso(vencimiento_gasto, hoy=None):
+    return vencimiento_gasto is not None and vencimiento_gasto < (hoy or timezone.localdate())
+
+
+def _clave(usuario_id):
+    return f"finanzas:moroso:{usuario_id}"
+
+
+def invalidar_usuarios(usuarios_ids):
+    """Borra de la caché la bandera de esos usuarios."""
+    claves = [_clave(pk) for pk in set(usuarios_ids) - {None}]
+    if claves:
+        cache.delete_many(claves)
+
+
+# ---------------------------------------------------------------------------
+# Lectura
+# ---------------------------------------------------------------------------
+
+def banderas_de_usuarios(usuarios_ids):
+    """``{usuario_id: Bandera}`` de todos esos usuarios: caché y, para los que falten, una consulta."""
+    usuarios_ids = set(usuarios_ids)
+    ttl = getattr(settings, 'MOROSOS_CACHE_TTL', 3600)
+    guardadas = cache.get_many([_clave(pk) for pk in usuarios_ids]) if ttl else {}
+    banderas = {}
+    for pk in usuarios_ids:
+        if (valor := guardadas.get(_clave(pk))) is not None:
+            banderas[pk] = Bandera(pk, *valor)
+
+    faltantes = usuarios_ids - banderas.keys()
+    if faltantes:
+        calculadas = {pk: Bandera(pk) for pk in faltantes}
+        filas = (SaldoPropiedad.objects.filter(propiedad__propietario_id__in=faltantes)
+                 .values_list('propiedad__propietario_id', 'moroso', 'moroso_calculado', 'vencimiento_gasto_mas_antiguo'))
+        for pk, moroso, calculado, vencimiento in filas:
+            actual = calculadas[pk]
+            calculadas[pk] = Bandera(
+                pk,
+                moroso=actual.moroso or moroso,
+                calculado=max(filter(None, (actual.calculado, calculado)), default=None),
+                vencimiento=min(filter(None, (actual.vencimiento, vencimiento)), default=None),
+            )
+        if ttl:
+            cache.set_many(
+                {_clave(pk): (b.moroso, b.calculado, b.vencimiento) for pk, b in calculadas.items()},
+                ttl,
+            )
+        banderas.update(calculadas)
+    return banderas
+
+
+def bandera_de(usuario):
+    return banderas_de_usuarios([usuario.pk])[usuario.pk]
+
+
+# ---------------------------------------------------------------------------
+# Actualización nocturna
+# ---------------------------------------------------------------------------
+
+def actualizar_morosos(hoy=None):
+    """
+    Cambia la bandera de las propiedades cuyo estado cambió con la fecha
+    (gastos que vencieron desde el último cálculo) en un solo UPDATE.
+    Devuelve cuántas cambió.
+    """
+    vencido = Q(vencimiento_gasto_mas_antiguo__lt=hoy or timezone.localdate())
+    cambian = SaldoPropiedad.objects.filter((vencido & Q(moroso=False)) | (~vencido & Q(moroso=True)))
+    propietarios = set(cambian.values_list('propiedad__propietario_id', flat=True))
+    if not propietarios:
+        return 0
+    cambiadas = cambian.update(
+        moroso=Case(When(vencido, then=Value(True)), default=Value(False), output_field=BooleanField()),
+        moroso_calculado=timezone.now(),
+    )
+    invalidar_usuarios(propietarios)
+    return cambiadas
@@ -0,0 +1,129 @@
+# finanzas/pagos.py
+"""
+Pago en lote de gastos y multas.
+
+Todo ocurre en una transacción: se bloquean las deudas pedidas (y se lee su
+``saldo``) con un solo ``SELECT … FOR UPDATE``, se insertan los pagos con
+``bulk_create`` y se suman al acumulado de cada deuda, marcándolas como
+pagadas, con un solo ``UPDATE … WHERE id IN``. Si algo falla no queda ningún
+pago a medias.
+
+Con ``monto`` se reparte una suma fija entre las deudas, de la más antigua a
+la más nueva (FIFO por vencimiento); la última puede quedar pagada en parte.
+"""
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+
+from auditoria.services import registrar_evento
+
+from .estado_cuenta import marcar_deudas
+from .models import Gasto, Multa, Pago, PagoMulta, ajustar_acumulados
+
+
+@dataclass(frozen=True)
+class TipoDeuda:
+    modelo: type
+    modelo_pago: type
+    # FK del pago hacia la deuda ('gasto' / 'multa')
+    campo: str
+
+
+GASTOS = TipoDeuda(Gasto, Pago, 'gasto')
+MULTAS = TipoDeuda(Multa, PagoMulta, 'multa')
+
+# Orden en que se cubren las deudas: primero lo que vence antes (sin
+# vencimiento, al final)
+ORDEN_FIFO = (F('fecha_vencimiento').asc(nulls_last=True), 'fecha_emision', 'id')
+
+
+@dataclass
+class ResultadoPagoLote:
+    pagados: list = field(default_factory=list)
+    parciales: list = field(default_factory=list)
+    ya_pagados: list = field(default_factory=list)
+    no_encontrados: list = field(default_factory=list)
+    pagos_ids: list = field(default_factory=list)
+    monto_aplicado: Decimal = Decimal('0')
+    # Parte del ``monto`` que no cubrió ninguna deuda
+    sobrante: Decimal = Decimal('0')
+
+    def como_dict(self):
+        return {
+            'pagados': len(self.pagados),
+            'pagados_ids': self.pagados,
+            'parciales_ids': self.parciales,
+            'ya_pagados': self.ya_pagados,
+            'no_encontrados': self.no_encontrados,
+            'pagos_ids': self.pagos_ids,
+            'monto_aplicado': str(self.monto_aplicado),
+            'sobrante': str(self.sobrante),
+        }
+
+
+def pagar_en_lote(tipo, queryset, usuario, ids=None, monto=None, *, ip_address=None, accion=None):
+    """
+    Paga las deudas ``ids`` de ``queryset`` (o, sin ids, todas las pendientes
+    de ``queryset``). Sin ``monto`` cada deuda se salda por completo; con
+    ``monto`` se reparte FIFO hasta agotarlo. Devuelve un ``ResultadoPagoLote``.
+    """
+    usuario = usuario if getattr(usuario, 'is_authenticated', False) else None
+    resultado = ResultadoPagoLote()
+    restante = monto
+
+    with transaction.atomic():
+        deudas = queryset.order_by(*ORDEN_FIFO)
+        if ids is not None:
+            deudas = deudas.filter(pk__in=ids)
+        else:
+            deudas = deudas.filter(pagado=False)
+        bloqueadas = list(deudas.select_for_update().values_list('pk', 'saldo', 'pagado'))
+
+        encontradas = {pk for pk, _, _ in bloqueadas}
+        if ids is not None:
+            resultado.no_encontrados = [pk for pk in ids if pk not in encontradas]
+
+        pendientes = [(pk, saldo) for pk, saldo, pagado in bloqueadas if not pagado]
+        resultado.ya_pagados = [pk for pk, _, pagado in bloqueadas if pagado]
+
+        pagos = []
+        for pk, saldo in pendientes:
+            saldo = max(saldo, Decimal('0'))
+            if restante is not None:
+                if restante <= 0:
+                    break
+                pagar = min(saldo, restante)
+                restante -= pagar
+            else:
+                pagar = saldo
+            if pagar > 0:
+                pagos.append(tipo.modelo_pago(**{f'{tipo.campo}_id': pk}, usuario=usuario, monto_pagado=pagar))
+                resultado.monto_aplicado += pagar
+            (resultado.pagados if pagar >= saldo else resultado.parciales).append(pk)
+
+        # bulk_create no pasa por Pago.save(): el acumulado se ajusta aquí
+        resultado.pagos_ids = [p.pk for p in tipo.modelo_pago.objects.bulk_create(pagos)]
+        abonos = {getattr(p, f'{tipo.campo}_id'): p.monto_pagado for p in pagos}
+        ajustar_acumulados(tipo.modelo, abonos)
+        # Saldadas con pagos anteriores pero aún sin marcar
+        sin_abono = [pk for pk in resultado.pagados if pk not in abonos]
+        if sin_abono:
+            tipo.modelo.objects.filter(pk__in=sin_abono).update(pagado=True)
+            marcar_deudas(tipo.modelo, sin_abono)
+        resultado.sobrante = restante if restante is not None else Decimal('0')
+
+        if accion:
+            registrar_evento(
+                usuario=usuario,
+                accion=accion,
+                ip_address=ip_address,
+                descripcion=json.dumps({
+                    'solicitados_ids': ids,
+                    'monto': monto,
+                    **resultado.como_dict(),
+                }, indent=4, default=str)
+            )
+    return resultado
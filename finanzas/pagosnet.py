@@ -0,0 +1,208 @@
+# finanzas/pagosnet.py
+"""
+Cliente de la pasarela PagosNet (pagos con QR).
+
+- Una ``requests.Session`` por proceso, con su pool de conexiones: las
+  llamadas reutilizan la conexión TLS en vez de abrir una nueva cada vez.
+- El token de ``authentication/login`` se guarda en la caché compartida
+  hasta poco antes de vencer; todos los workers lo reutilizan. Si la
+  pasarela responde 401 se pide uno nuevo y se repite la llamada una vez.
+- Toda llamada lleva timeout de conexión y de lectura
+  (``PAGOSNET_TIMEOUT_CONEXION``/``PAGOSNET_TIMEOUT_LECTURA``): una pasarela
+  lenta ya no deja colgado a un worker de gunicorn.
+- Los errores transitorios (no se pudo conectar, 502/503/504) se reintentan
+  con espera exponencial y variación aleatoria. Un timeout de lectura al
+  crear una transacción no se reintenta: la pasarela pudo haberla creado.
+- Tras ``PAGOSNET_CIRCUITO_FALLOS`` fallos seguidos el circuito se abre
+  (estado en la caché compartida) y durante ``PAGOSNET_CIRCUITO_ESPERA``
+  segundos las llamadas fallan enseguida con ``PasarelaNoDisponible``. Luego
+  una sola llamada de prueba decide si se cierra o vuelve a abrirse.
+
+``finanzas.pagosnet_falso`` levanta una pasarela falsa local para tests y
+benchmarks (``manage.py pagosnet_falso``).
+"""
+import logging
+import os
+import random
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+_CLAVE_TOKEN = "pagosnet:token"
+_CLAVE_FALLOS = "pagosnet:circuito:fallos"
+_CLAVE_ABIERTO = "pagosnet:circuito:abierto"
+_CLAVE_PRUEBA = "pagosnet:circuito:prueba"
+
+# Respuestas que indican una caída pasajera de la pasarela
+_ESTADOS_TRANSITORIOS = {502, 503, 504}
+# El token se descarta este margen (segundos) antes de su vencimiento
+_MARGEN_TOKEN = 60
+
+
+def _ajuste(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+class ErrorPasarela(Exception):
+    """La pasarela rechazó la operación o respondió algo inesperado."""
+
+    def __init__(self, mensaje, respuesta=None):
+        super().__init__(mensaje)
+        self.respuesta = respuesta
+
+    @property
+    def detalle(self):
+        if self.respuesta is None:
+            return None
+        try:
+            return self.respuesta.json()
+        except ValueError:
+            return self.respuesta.text[:500]
+
+
+class PasarelaNoDisponible(ErrorPasarela):
+    """Caída, timeout o circuito abierto: vale la pena intentar más tarde."""
+
+
+# ---------------------------------------------------------------------------
+# Circuito
+# ---------------------------------------------------------------------------
+
+class Circuito:
+    """Cortacircuitos compartido entre procesos (estado en la caché)."""
+
+    def __init__(self, umbral=None, espera=None):
+        self.umbral = umbral or _ajuste("PAGOSNET_CIRCUITO_FALLOS", 5)
+        self.espera = espera or _ajuste("PAGOSNET_CIRCUITO_ESPERA", 30)
+
+    def permitir(self):
+        """Lanza ``PasarelaNoDisponible`` si el circuito está abierto."""
+        if cache.get(_CLAVE_ABIERTO):
+            raise PasarelaNoDisponible("La pasarela de pagos no está disponible; intente en unos minutos.")
+        if (cache.get(_CLAVE_FALLOS) or 0) >= self.umbral and not cache.add(_CLAVE_PRUEBA, 1, self.espera):
+            # Medio abierto: otra petición ya está probando la pasarela
+            raise PasarelaNoDisponible("La pasarela de pagos no está disponible; intente en unos minutos.")
+
+    def exito(self):
+        cache.delete_many([_CLAVE_FALLOS, _CLAVE_ABIERTO, _CLAVE_PRUEBA])
+
+    def fallo(self):
+        try:
+            fallos = cache.incr(_CLAVE_FALLOS)
+        except ValueError:
+            fallos = 1
+            cache.set(_CLAVE_FALLOS, fallos, self.espera * 10)
+        if fallos >= self.umbral:
+            if not cache.get(_CLAVE_ABIERTO):
+                logger.error("PagosNet: %s fallos seguidos, circuito abierto por %ss", fallos, self.espera)
+            cache.set(_CLAVE_ABIERTO, True, self.espera)
+            cache.delete(_CLAVE_PRUEBA)
+
+    @property
+    def abierto(self):
+        return bool(cache.get(_CLAVE_ABIERTO))
+
+
+# ---------------------------------------------------------------------------
+# Cliente
+# ---------------------------------------------------------------------------
+
+class ClientePagosNet:
+    def __init__(self, url=None, email=None, password=None, circuito=None):
+        self.url = url or settings.PAGOSNET_API_URL
+        self.email = email or settings.PAGOSNET_EMAIL
+        self.password = password or settings.PAGOSNET_PASSWORD
+        self.timeout = (_ajuste("PAGOSNET_TIMEOUT_CONEXION", 3), _ajuste("PAGOSNET_TIMEOUT_LECTURA", 10))
+        self.reintentos = _ajuste("PAGOSNET_REINTENTOS", 2)
+        self.circuito = circuito or Circuito()
+        self.pid = os.getpid()
+        self.sesion = requests.Session()
+        # Los reintentos los maneja el cliente (con variación aleatoria), no urllib3
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=_ajuste("PAGOSNET_POOL", 10), max_retries=0)
+        self.sesion.mount("https://", adaptador)
+        self.sesion.mount("http://", adaptador)
+
+    # --- Token --------------------------------------------------------------
+
+    def _login(self):
+        respuesta = self._enviar("authentication/login", {"email": self.email, "password": self.password},
+                                 reintentar_lectura=True)
+        if respuesta.status_code != 200:
+            raise ErrorPasarela("Fallo de autenticación con la pasarela.", respuesta)
+        datos = respuesta.json()
+        token = datos.get("token")
+        if not token:
+            raise ErrorPasarela("La pasarela no devolvió un token.", respuesta)
+        vigencia = datos.get("expiresIn") or datos.get("expires_in") or _ajuste("PAGOSNET_TOKEN_TTL", 3000)
+        cache.set(_CLAVE_TOKEN, token, max(int(vigencia) - _MARGEN_TOKEN, 1))
+        return token
+
+    def token(self, renovar=False):
+        token = None if renovar else cache.get(_CLAVE_TOKEN)
+        return token or self._login()
+
+    # --- Llamadas ----------------------------------------------------------
+
+    def _espera(self, intento):
+        base = _ajuste("PAGOSNET_BACKOFF_BASE", 0.2)
+        # Espera exponencial con variación aleatoria completa
+        return random.uniform(0, base * 2 ** intento)
+
+    def _enviar(self, ruta, datos, token=None, reintentar_lectura=False):
+        """
+        POST a la pasarela pasando por el circuito, con timeouts y reintentos
+        de los errores transitorios. ``reintentar_lectura`` también reintenta
+        los timeouts de lectura (solo para operaciones sin efectos).
+        """
+        self.circuito.permitir()
+        cabeceras = {"Authorization": f"Bearer {token}"} if token else {}
+        for intento in range(self.reintentos + 1):
+            ultimo = intento == self.reintentos
+            try:
+                respuesta = self.sesion.post(f"{self.url}{ruta}", json=datos, headers=cabeceras, timeout=self.timeout)
+            except requests.ReadTimeout as error:
+                if not reintentar_lectura or ultimo:
+                    self.circuito.fallo()
+                    raise PasarelaNoDisponible("La pasarela de pagos no respondió a tiempo.") from error
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if ultimo:
+                    self.circuito.fallo()
+                    raise PasarelaNoDisponible("No se pudo conectar con la pasarela de pagos.") from error
+            else:
+                if respuesta.status_code not in _ESTADOS_TRANSITORIOS:
+                    self.circuito.exito()
+                    return respuesta
+                if ultimo:
+                    self.circuito.fallo()
+                    raise PasarelaNoDisponible("La pasarela de pagos no está disponible.", respuesta)
+            time.sleep(self._espera(intento))
+
+    def _autenticado(self, ruta, datos):
+        respuesta = self._enviar(ruta, datos, token=self.token())
+        if respuesta.status_code == 401:
+            # Token revocado o vencido antes de lo anunciado
+            respuesta = self._enviar(ruta, datos, token=self.token(renovar=True))
+        return respuesta
+
+    def crear_transaccion_qr(self, datos):
+        """Crea la transacción QR; devuelve ``data`` de la respuesta (``qr``, ``idTrn``…)."""
+        respuesta = self._autenticado("transaction/qrpago", datos)
+        if respuesta.status_code != 200:
+            raise ErrorPasarela("No se pudo generar el QR.", respuesta)
+        return respuesta.json().get("data") or {}
+
+
+_cliente = None
+
+
+def cliente():
+    """El cliente del proceso (uno nuevo tras un fork, para no compartir sockets)."""
+    global _cliente
+    if _cliente is None or _cliente.pid != os.getpid() or _cliente.url != settings.PAGOSNET_API_URL:
+        _cliente = ClientePagosNet()
+    return _cliente
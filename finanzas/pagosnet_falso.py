@@ -0,0 +1,112 @@
+# finanzas/pagosnet_falso.py
+"""
+Pasarela PagosNet falsa, local, para tests y benchmarks.
+
+Responde ``authentication/login`` y ``transaction/qrpago`` como la real y
+lleva la cuenta de las llamadas. ``modo`` simula fallas: ``'caida'`` (503),
+``'lenta'`` (tarda ``latencia_lenta`` segundos) o ``'token_vencido'`` (401
+una vez, para forzar un nuevo login)::
+
+    with servidor_falso() as pasarela:
+        with override_settings(PAGOSNET_API_URL=pasarela.url):
+            ...
+        pasarela.modo = 'caida'
+        pasarela.llamadas['login']
+"""
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # conexiones persistentes, como la pasarela real
+    # Sin Nagle: cada respuesta sale entera, sin esperar el ACK retardado del cliente
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, estado, datos):
+        cuerpo = json.dumps(datos).encode()
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_POST(self):
+        pasarela = self.server.pasarela
+        datos = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        ruta = self.path.rsplit("/api/v2/", 1)[-1]
+        pasarela.conexiones.add(self.client_address)
+        if pasarela.latencia:
+            time.sleep(pasarela.latencia)
+
+        if pasarela.modo == "caida":
+            pasarela.llamadas["caida"] += 1
+            return self._responder(503, {"error": "Servicio no disponible"})
+        if pasarela.modo == "lenta":
+            time.sleep(pasarela.latencia_lenta)
+
+        if ruta == "authentication/login":
+            pasarela.llamadas["login"] += 1
+            token = uuid.uuid4().hex
+            pasarela.tokens.add(token)
+            return self._responder(200, {"token": token, "expiresIn": pasarela.vigencia_token})
+
+        if ruta == "transaction/qrpago":
+            pasarela.llamadas["qrpago"] += 1
+            token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+            if pasarela.modo == "token_vencido":
+                pasarela.modo = None
+                pasarela.tokens.discard(token)
+            if token not in pasarela.tokens:
+                return self._responder(401, {"error": "Token inválido"})
+            id_trn = f"trn_{datos.get('idExterno')}_{uuid.uuid4().hex[:8]}"
+            return self._responder(200, {"data": {"qr": "iVBORw0KGgo=", "idTrn": id_trn}})
+
+        return self._responder(404, {"error": f"Ruta desconocida: {ruta}"})
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # El cliente cortó por timeout: es justo lo que se está probando
+        pass
+
+
+class PasarelaFalsa:
+    def __init__(self, puerto=0, latencia=0, vigencia_token=3600):
+        self.modo = None
+        self.latencia = latencia
+        self.latencia_lenta = 5
+        self.vigencia_token = vigencia_token
+        self.llamadas = Counter()
+        self.tokens = set()
+        # (host, puerto) de cada cliente: muestra si las conexiones se reutilizan
+        self.conexiones = set()
+        self.servidor = _Servidor(("127.0.0.1", puerto), _Manejador)
+        self.servidor.pasarela = self
+        self.url = f"http://127.0.0.1:{self.servidor.server_port}/api/v2/"
+
+    def iniciar(self):
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+@contextmanager
+def servidor_falso(**opciones):
+    pasarela = PasarelaFalsa(**opciones).iniciar()
+    try:
+        yield pasarela
+    finally:
+        pasarela.detener()
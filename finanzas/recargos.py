@@ -0,0 +1,216 @@
+# finanzas/recargos.py
+"""
+Recargos por mora sobre gastos vencidos.
+
+``aplicar_recargos(corte)`` (comando ``aplicar_recargos``, una vez al mes o
+por noche) calcula el recargo de todos los gastos sin pagar vencidos a la
+fecha de corte en una sola pasada con NumPy:
+
+1. Dos consultas cargan los gastos vencidos (id, propiedad, saldo en
+   centavos, días de atraso) y lo ya cobrado en recargos de cada uno, como
+   arreglos.
+2. ``Regla.devengado`` calcula el recargo total que le corresponde a cada
+   gasto a la fecha (diario o mensual sobre el saldo, con tope) y se le
+   resta lo ya cobrado: cada corte solo cobra lo nuevo.
+3. Los recargos se insertan como ``Multa`` (``gasto_origen`` = el gasto)
+   con ``bulk_create`` contra la restricción ``multa_recargo_unico_periodo``
+   (un recargo por gasto y mes de corte): repetir el corte de un mes no
+   cobra dos veces.
+
+Los saldos de las propiedades se recalculan al commit, y se registra un
+solo evento de auditoría y una sola notificación para todas las afectadas.
+"""
+import json
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+
+from auditoria.services import registrar_evento
+
+from .estado_cuenta import marcar_propiedades
+from .models import Gasto, Multa
+
+CONCEPTO = "Recargo por mora"
+TAMANO_LOTE = 5000
+TIPOS = ("diario", "mensual")
+
+
+@dataclass(frozen=True)
+class Regla:
+    # 'diario': tasa por cada día de atraso; 'mensual': por cada mes (o fracción)
+    tipo: str = "mensual"
+    # Fracción del saldo (0.02 = 2 %)
+    tasa: Decimal = Decimal("0.02")
+    dias_gracia: int = 0
+    # Máximo acumulado por gasto, como fracción del saldo (None: sin tope)
+    tope: Decimal | None = None
+    # Recargos menores a este monto no se cobran (todavía)
+    minimo: Decimal = Decimal("0")
+
+    def __post_init__(self):
+        if self.tipo not in TIPOS:
+            raise ValueError(f"Tipo de recargo desconocido: {self.tipo!r} (use {' o '.join(TIPOS)})")
+
+    @classmethod
+    def desde_ajustes(cls, **cambios):
+        regla = {
+            "tipo": getattr(settings, "RECARGOS_TIPO", "mensual"),
+            "tasa": Decimal(str(getattr(settings, "RECARGOS_TASA", "0.02"))),
+            "dias_gracia": getattr(settings, "RECARGOS_DIAS_GRACIA", 0),
+            "tope": getattr(settings, "RECARGOS_TOPE", None),
+            "minimo": Decimal(str(getattr(settings, "RECARGOS_MINIMO", "0"))),
+        }
+        regla.update({clave: valor for clave, valor in cambios.items() if valor is not None})
+        if regla["tope"] in ("", None):
+            regla["tope"] = None
+        else:
+            regla["tope"] = Decimal(str(regla["tope"]))
+        return cls(**regla)
+
+    def devengado(self, saldos, dias):
+        """Recargo total a la fecha (centavos, float) de cada saldo (centavos) con ``dias`` de atraso."""
+        dias = np.maximum(dias - self.dias_gracia, 0)
+        periodos = dias if self.tipo == "diario" else -(-dias // 30)  # meses o fracción
+        total = saldos * float(self.tasa) * periodos
+        if self.tope is not None:
+            total = np.minimum(total, saldos * float(self.tope))
+        return total
+
+    def describir(self):
+        tope = f", tope {self.tope:%}" if self.tope is not None else ""
+        return f"{self.tasa:%} {self.tipo} sobre el saldo{tope}"
+
+
+@dataclass(frozen=True)
+class ResultadoRecargos:
+    corte: date
+    evaluados: int
+    creados: int
+    # Recargos que ya existían para este corte (no se duplicaron)
+    omitidos: int
+    total: Decimal
+    propiedades_ids: tuple
+
+    def como_dict(self):
+        return {
+            "corte": self.corte.isoformat(),
+            "evaluados": self.evaluados,
+            "creados": self.creados,
+            "omitidos": self.omitidos,
+            "total": str(self.total),
+        }
+
+
+def cargar_vencidos(corte, regla):
+    """
+    Gastos sin pagar vencidos al ``corte`` como arreglos:
+    ``(ids, propiedades, saldos en centavos, días de atraso, ya cobrado en centavos)``.
+    """
+    filas = list(
+        Gasto.objects
+        .filter(pagado=False, saldo__gt=0, fecha_vencimiento__lt=corte - timedelta(days=regla.dias_gracia))
+        .order_by("id")
+        .values_list("id", "propiedad_id", "saldo", "fecha_vencimiento")
+    )
+    n = len(filas)
+    ids = np.fromiter((f[0] for f in filas), dtype=np.int64, count=n)
+    propiedades = np.fromiter((f[1] for f in filas), dtype=np.int64, count=n)
+    saldos = np.fromiter((int(f[2] * 100) for f in filas), dtype=np.int64, count=n)
+    vencimientos = np.array([f[3] for f in filas], dtype="datetime64[D]")
+    dias = (np.datetime64(corte, "D") - vencimientos).astype(np.int64)
+
+    # Recargos de cortes anteriores (el del mismo mes no cuenta: un re-corte da lo mismo)
+    cobrado = np.zeros(n, dtype=np.int64)
+    if n:
+        previos = (
+            Multa.objects
+            .filter(gasto_origen__pagado=False, gasto_origen__saldo__gt=0)
+            .exclude(mes=corte.month, anio=corte.year)
+            .values("gasto_origen_id")
+            .annotate(total=Sum("monto"))
+            .values_list("gasto_origen_id", "total")
+        )
+        previos = list(previos)
+        if previos:
+            gastos_previos = np.fromiter((p[0] for p in previos), dtype=np.int64, count=len(previos))
+            montos_previos = np.fromiter((int(p[1] * 100) for p in previos), dtype=np.int64, count=len(previos))
+            # ``ids`` está ordenado: ubicar cada gasto con búsqueda binaria
+            posiciones = np.searchsorted(ids, gastos_previos)
+            encontrados = (posiciones < n) & (ids[np.minimum(posiciones, n - 1)] == gastos_previos)
+            cobrado[posiciones[encontrados]] = montos_previos[encontrados]
+    return ids, propiedades, saldos, dias, cobrado
+
+
+def calcular(corte, regla):
+    """``(ids, propiedades, centavos a cobrar, días)`` de los gastos que generan recargo en este corte."""
+    ids, propiedades, saldos, dias, cobrado = cargar_vencidos(corte, regla)
+    cargos = np.rint(regla.devengado(saldos, dias)).astype(np.int64) - cobrado
+    cobrar = cargos >= max(int(regla.minimo * 100), 1)
+    return ids[cobrar], propiedades[cobrar], cargos[cobrar], dias[cobrar]
+
+
+def aplicar_recargos(corte=None, regla=None, *, usuario=None, ip_address=None, notificar=True, simular=False):
+    """
+    Cobra los recargos del corte (hoy por defecto). Con ``simular`` solo
+    calcula. Devuelve un ``ResultadoRecargos``.
+    """
+    corte = corte or date.today()
+    regla = regla or Regla.desde_ajustes()
+    ids, propiedades, cargos, dias = calcular(corte, regla)
+    total = Decimal(int(cargos.sum())) / 100
+    del_corte = Multa.objects.filter(gasto_origen__isnull=False, mes=corte.month, anio=corte.year)
+
+    if simular or not len(ids):
+        return ResultadoRecargos(corte, len(ids), 0, 0, total, tuple(np.unique(propiedades).tolist()))
+
+    descripcion = regla.describir()
+    with transaction.atomic():
+        antes = del_corte.count()
+        # bulk_create no llama a save(): mes y año van explícitos
+        Multa.objects.bulk_create(
+            (
+                Multa(
+                    propiedad_id=propiedad,
+                    gasto_origen_id=gasto,
+                    concepto=CONCEPTO,
+                    monto=Decimal(cargo) / 100,
+                    fecha_emision=corte,
+                    fecha_vencimiento=corte + timedelta(days=30),
+                    descripcion=f"{descripcion}: gasto {gasto} con {dia} días de atraso al {corte:%d/%m/%Y}.",
+                    mes=corte.month,
+                    anio=corte.year,
+                    creado_por=usuario,
+                )
+                for gasto, propiedad, cargo, dia in zip(ids.tolist(), propiedades.tolist(), cargos.tolist(), dias.tolist())
+            ),
+            batch_size=TAMANO_LOTE,
+            # Los recargos de este corte que ya estaban se conservan
+            ignore_conflicts=True,
+        )
+        creados = del_corte.count() - antes
+        afectadas = tuple(np.unique(propiedades).tolist())
+        marcar_propiedades(afectadas)
+
+    resultado = ResultadoRecargos(corte, len(ids), creados, len(ids) - creados, total, afectadas)
+    registrar_evento(
+        usuario=usuario,
+        accion="Aplicación de Recargos por Mora",
+        ip_address=ip_address,
+        descripcion=json.dumps({**resultado.como_dict(), "regla": descripcion}, indent=4),
+    )
+    if notificar and creados:
+        from tareas.registro import encolar
+
+        encolar(
+            "notificaciones.notificar_propiedades",
+            propiedades_ids=list(afectadas),
+            titulo="⚠️ Recargo por mora",
+            mensaje=f"Se aplicó un recargo por mora a los gastos vencidos al {corte:%d/%m/%Y}.",
+            data={"tipo_evento": "RECARGO_MORA", "corte": corte.isoformat()},
+        )
+    return resultado
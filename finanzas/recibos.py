@@ -0,0 +1,254 @@
+# finanzas/recibos.py
+"""
+Recibos de pago en PDF, con caché en disco direccionada por contenido.
+
+Un ``Recibo`` es solo datos (título y líneas). Su ``huella`` (SHA-256 de esos
+datos y de ``VERSION_PLANTILLA``) nombra el archivo en
+``RECIBOS_CACHE_DIR``: si el pago no cambió, la segunda descarga no vuelve a
+dibujar el PDF y se sirve el archivo con ``FileResponse`` y la huella como
+ETag (``If-None-Match`` responde 304). Si el pago cambia, cambia la huella y
+el recibo viejo simplemente deja de usarse.
+
+En lote (todos los recibos de un mes, para la administración) los que faltan
+en caché se dibujan en un pool de procesos y se entregan en un ZIP generado
+mientras se envía, o en un único PDF de una página por recibo.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+from .models import Pago, PagoMulta
+
+# Cambiarla invalida todos los recibos guardados (p. ej. al rediseñar la página)
+VERSION_PLANTILLA = 1
+
+# Con menos recibos por dibujar no compensa arrancar procesos
+MINIMO_PARA_POOL = 8
+
+
+@dataclass(frozen=True)
+class Recibo:
+    # Nombre del archivo descargado, sin extensión
+    nombre: str
+    titulo: str
+    lineas: tuple
+
+    @property
+    def huella(self):
+        datos = json.dumps([VERSION_PLANTILLA, self.titulo, list(self.lineas)], ensure_ascii=False)
+        return hashlib.sha256(datos.encode()).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Datos
+# ---------------------------------------------------------------------------
+
+def pagos():
+    return Pago.objects.select_related(
+        'usuario', 'gasto__propiedad', 'multa__propiedad', 'reserva__area_comun',
+    )
+
+
+def pagos_multa():
+    return PagoMulta.objects.select_related('usuario', 'multa__propiedad')
+
+
+def recibo_de_pago(pago):
+    if pago.gasto_id:
+        concepto, propiedad = f"Gasto: {pago.gasto.descripcion}", pago.gasto.propiedad
+    elif pago.multa_id:
+        concepto, propiedad = f"Multa: {pago.multa.concepto}", pago.multa.propiedad
+    elif pago.reserva_id:
+        concepto, propiedad = f"Reserva: {pago.reserva.area_comun.nombre} ({pago.reserva.fecha_reserva})", None
+    else:
+        concepto, propiedad = pago.descripcion or "Pago", None
+    return Recibo(
+        nombre=f"recibo_pago_{pago.pk}",
+        titulo=f"Recibo de pago #{pago.pk}",
+        lineas=(
+            f"Fecha: {pago.fecha_pago}",
+            f"Monto: {pago.monto_pagado}",
+            f"Concepto: {concepto}",
+            f"Propiedad: {propiedad.numero_casa if propiedad else 'N/D'}",
+            f"Pagado por: {pago.usuario.username}",
+            f"Estado: {pago.estado_pago}",
+        ),
+    )
+
+
+def recibo_de_pago_multa(pago_multa):
+    multa = pago_multa.multa
+    return Recibo(
+        nombre=f"recibo_pago_multa_{pago_multa.pk}",
+        titulo=f"Recibo de pago de multa #{pago_multa.pk}",
+        lineas=(
+            f"Fecha: {pago_multa.fecha_pago}",
+            f"Monto: {pago_multa.monto_pagado}",
+            f"Multa: {multa.concepto} ({multa.mes}/{multa.anio})",
+            f"Propiedad: {multa.propiedad.numero_casa}",
+            f"Pagado por: {pago_multa.usuario.username if pago_multa.usuario_id else 'N/D'}",
+        ),
+    )
+
+
+def recibos_del_periodo(mes, anio):
+    """Recibos de todos los pagos y pagos de multas de ese mes, por fecha."""
+    filtro = {'fecha_pago__year': anio, 'fecha_pago__month': mes}
+    recibos = [recibo_de_pago(p) for p in pagos().filter(**filtro).order_by('fecha_pago', 'pk').iterator(chunk_size=500)]
+    recibos += [recibo_de_pago_multa(p) for p in
+                pagos_multa().filter(**filtro).order_by('fecha_pago', 'pk').iterator(chunk_size=500)]
+    return recibos
+
+
+# ---------------------------------------------------------------------------
+# Dibujo
+# ---------------------------------------------------------------------------
+
+def _dibujar_pagina(lienzo, titulo, lineas):
+    from reportlab.lib.pagesizes import letter
+
+    _, alto = letter
+    y = alto - 72
+    lienzo.setFont("Helvetica-Bold", 16)
+    lienzo.drawString(72, y, titulo)
+    y -= 28
+    lienzo.setFont("Helvetica", 12)
+    for linea in lineas:
+        lienzo.drawString(72, y, str(linea))
+        y -= 18
+    lienzo.showPage()
+
+
+def dibujar(paginas):
+    """PDF (bytes) con una página por ``(titulo, lineas)``. Sin Django: corre en el pool."""
+    import io
+
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    lienzo = canvas.Canvas(buffer, pagesize=letter)
+    for titulo, lineas in paginas:
+        _dibujar_pagina(lienzo, titulo, lineas)
+    lienzo.save()
+    return buffer.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# Caché en disco
+# ---------------------------------------------------------------------------
+
+def ruta_en_cache(huella):
+    return Path(settings.RECIBOS_CACHE_DIR) / huella[:2] / f"{huella}.pdf"
+
+
+def _guardar(ruta, contenido):
+    # Escritura atómica: otro proceso nunca ve un PDF a medias
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, suffix=".tmp")
+    with os.fdopen(descriptor, "wb") as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, ruta)
+
+
+def pdf_de(recibo):
+    """Ruta del PDF de ``recibo``; lo dibuja solo si no está en caché."""
+    ruta = ruta_en_cache(recibo.huella)
+    if not ruta.exists():
+        _guardar(ruta, dibujar([(recibo.titulo, recibo.lineas)]))
+    return ruta
+
+
+def _dibujar_uno(pagina):
+    return dibujar([pagina])
+
+
+def asegurar_en_cache(recibos):
+    """Dibuja los recibos que faltan en caché; en paralelo si son muchos."""
+    faltantes = {}
+    for recibo in recibos:
+        ruta = ruta_en_cache(recibo.huella)
+        if not ruta.exists():
+            faltantes[ruta] = (recibo.titulo, recibo.lineas)
+    if not faltantes:
+        return
+    procesos = getattr(settings, 'RECIBOS_PROCESOS', 1)
+    if procesos > 1 and len(faltantes) >= MINIMO_PARA_POOL:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            dibujados = pool.map(_dibujar_uno, faltantes.values(), chunksize=16)
+            for ruta, contenido in zip(faltantes, dibujados):
+                _guardar(ruta, contenido)
+    else:
+        for ruta, pagina in faltantes.items():
+            _guardar(ruta, _dibujar_uno(pagina))
+
+
+def pdf_de_lote(recibos):
+    """Un PDF con una página por recibo, guardado con la huella del conjunto."""
+    huella = hashlib.sha256("".join(r.huella for r in recibos).encode()).hexdigest()
+    ruta = ruta_en_cache(huella)
+    if not ruta.exists():
+        _guardar(ruta, dibujar([(r.titulo, r.lineas) for r in recibos]))
+    return ruta, huella
+
+
+class _Tubo:
+    """Destino de ``zipfile`` que acumula lo escrito hasta que se lo pide el generador."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos, self.partes = b"".join(self.partes), []
+        return datos
+
+
+def zip_de_lote(recibos):
+    """Genera el ZIP de los recibos (ya en caché) a medida que se envía."""
+    tubo = _Tubo()
+    # Los PDF ya van comprimidos: se guardan tal cual
+    with zipfile.ZipFile(tubo, mode="w", compression=zipfile.ZIP_STORED) as archivo_zip:
+        for recibo in recibos:
+            with open(ruta_en_cache(recibo.huella), "rb") as origen, \
+                    archivo_zip.open(f"{recibo.nombre}.pdf", mode="w") as destino:
+                while bloque := origen.read(64 * 1024):
+                    destino.write(bloque)
+            yield tubo.vaciar()
+    # Directorio central del ZIP
+    yield tubo.vaciar()
+
+
+# ---------------------------------------------------------------------------
+# Respuesta HTTP
+# ---------------------------------------------------------------------------
+
+def respuesta_pdf(request, ruta, huella, nombre):
+    """``FileResponse`` del PDF con ETag; 304 si el cliente ya lo tiene."""
+    etag = f'"{huella}"'
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and etag in [e.removeprefix('W/') for e in parse_etags(if_none_match)]:
+        respuesta = HttpResponseNotModified()
+    else:
+        respuesta = FileResponse(open(ruta, "rb"), as_attachment=True, filename=f"{nombre}.pdf",
+                                 content_type="application/pdf")
+    respuesta['ETag'] = etag
+    # Recibos de un usuario: el navegador puede guardarlos, los proxies no
+    patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
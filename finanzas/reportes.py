@@ -1,13 +1,14 @@
 # finanzas/reportes.py
 from __future__ import annotations
 
+import calendar
 import csv
 import io
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 
 from django.db.models import Sum
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.core.exceptions import FieldDoesNotExist, FieldError
 
@@ -17,8 +18,9 @@ from rest_framework.response import Response
 from rest_framework import status
 
 # Importa tus modelos reales
-from finanzas.models import Gasto, Pago, PagoMulta  # Multa/Reserva no son necesarias aquí
+from finanzas.models import Gasto, Pago, PagoMulta, Ingreso, Egreso  # Multa/Reserva no son necesarias aquí
 from condominio.models import Propiedad
+from finanzas import morosidad, resumenes
 
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
@@ -180,53 +182,68 @@ class ReciboPagoMultaPDFView(APIView):
 
 class ReporteMorosidadView(APIView):
     """
-    GET ?mes=9&anio=2025&fmt=csv|json (json por defecto)
-    Calcula deuda = suma de Gasto.pagado=False por propiedad.
+    GET ?fecha_corte=2025-09-30 | ?mes=9&anio=2025, &fmt=csv|json (json por defecto)
+    Deuda pendiente por propiedad (gastos, multas y reservas) por antigüedad
+    al corte (por defecto hoy; con mes/anio, el último día de ese mes). La
+    respuesta se genera mientras se envía (ver ``finanzas.morosidad``).
     """
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        mes = request.GET.get("mes")
-        anio = request.GET.get("anio")
         fmt = (request.GET.get("fmt") or "json").lower()
+        try:
+            fecha_corte = fecha_corte_de(request.GET)
+        except ValueError:
+            return Response(
+                {"detail": "Use fecha_corte=AAAA-MM-DD o mes (1-12) y anio."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        qs = Gasto.objects.all()
-        # Filtrado tolerante (si existen esos campos en tu modelo)
-        if mes:
-            qs = safe_filter(qs, mes=int(mes))
-        if anio:
-            qs = safe_filter(qs, anio=int(anio))
-
-        qs_no_pagado = safe_filter(qs, pagado=False)
-        agg = (
-            qs_no_pagado
-            .values("propiedad_id")
-            .annotate(deuda=Sum("monto"))
-            .order_by("-deuda")
-        )
-
-        rows = []
-        for item in agg:
-            prop_id = item["propiedad_id"]
-            deuda = item["deuda"] or Decimal("0")
-            rows.append({"propiedad_id": prop_id, "deuda": str(deuda)})
-
+        filas = morosidad.filas_morosidad(fecha_corte)
         if fmt == "csv":
-            resp = HttpResponse(content_type="text/csv")
-            resp["Content-Disposition"] = 'attachment; filename="reporte_morosidad.csv"'
-            w = csv.writer(resp)
-            w.writerow(["propiedad_id", "deuda"])
-            for r in rows:
-                w.writerow([r["propiedad_id"], r["deuda"]])
+            resp = StreamingHttpResponse(morosidad.csv_morosidad(filas), content_type="text/csv")
+            resp["Content-Disposition"] = f'attachment; filename="reporte_morosidad_{fecha_corte.isoformat()}.csv"'
             return resp
+        return StreamingHttpResponse(morosidad.json_morosidad(filas, fecha_corte), content_type="application/json")
+
 
-        return JsonResponse({"result": rows})
+def fecha_corte_de(parametros):
+    """``fecha_corte`` o fin del ``mes``/``anio`` pedidos; hoy si no hay ninguno."""
+    if parametros.get("fecha_corte"):
+        return date.fromisoformat(parametros["fecha_corte"])
+    mes, anio = parametros.get("mes"), parametros.get("anio")
+    if mes or anio:
+        hoy = timezone.localdate()
+        mes, anio = int(mes or hoy.month), int(anio or hoy.year)
+        return date(anio, mes, calendar.monthrange(anio, mes)[1])
+    return timezone.localdate()
 
 
 # ---------------------------
 # 2b) Resumen financiero (JSON o CSV)
 # ---------------------------
 
+def datos_reporte_financiero(fecha_inicio, fecha_fin):
+    """
+    Ingresos, egresos y balance entre dos fechas (incluidas). Los meses
+    completos salen de los resúmenes mensuales (ver ``finanzas.resumenes``).
+    """
+    ingresos_por_concepto = resumenes.subtotales(Ingreso, fecha_inicio, fecha_fin)
+    total_ingresos = sum(item['subtotal'] for item in ingresos_por_concepto)
+
+    egresos_por_categoria = resumenes.subtotales(Egreso, fecha_inicio, fecha_fin)
+    total_egresos = sum(item['subtotal'] for item in egresos_por_categoria)
+
+    balance = total_ingresos - total_egresos
+
+    return {
+        'rango_fechas': {'inicio': fecha_inicio.isoformat(), 'fin': fecha_fin.isoformat()},
+        'resumen': {'total_ingresos': total_ingresos, 'total_egresos': total_egresos, 'balance': balance},
+        'detalle_ingresos': ingresos_por_concepto,
+        'detalle_egresos': egresos_por_categoria,
+    }
+
+
 def generar_reporte_financiero_pdf(response, data):
     """
     Toma los datos del reporte financiero y genera un documento PDF.
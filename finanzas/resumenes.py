@@ -0,0 +1,178 @@
+# finanzas/resumenes.py
+"""
+Resúmenes mensuales de ingresos y egresos.
+
+- ``ResumenMensualIngreso``/``ResumenMensualEgreso`` guardan el total y la
+  cantidad de movimientos por (año, mes, concepto/categoría). Cada escritura
+  de un ``Ingreso``/``Egreso`` marca su mes con ``marcar_periodos``; dentro de
+  una transacción los meses se acumulan y se recalculan una sola vez en el
+  commit.
+- ``subtotales`` responde un rango cualquiera sumando los meses completos
+  desde los resúmenes y recorriendo solo los días sueltos de los meses de
+  los extremos: cinco años son ~60 filas por concepto, no cada movimiento.
+"""
+import calendar
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .models import Egreso, Ingreso, ResumenMensualEgreso, ResumenMensualIngreso
+
+
+@dataclass(frozen=True)
+class _Fuente:
+    modelo: type
+    resumen: type
+    # Columna por la que se agrupa ('concepto' / 'categoria')
+    clave: str
+
+
+FUENTES = {
+    Ingreso: _Fuente(Ingreso, ResumenMensualIngreso, 'concepto'),
+    Egreso: _Fuente(Egreso, ResumenMensualEgreso, 'categoria'),
+}
+
+
+def _primer_dia_siguiente_mes(anio, mes):
+    return date(anio + 1, 1, 1) if mes == 12 else date(anio, mes + 1, 1)
+
+
+def _en_periodos(periodos):
+    """Movimientos cuya ``fecha`` cae en alguno de los (año, mes) dados."""
+    return reduce(or_, (
+        Q(fecha__gte=date(anio, mes, 1), fecha__lt=_primer_dia_siguiente_mes(anio, mes))
+        for anio, mes in periodos
+    ))
+
+
+# ---------------------------------------------------------------------------
+# Mantenimiento
+# ---------------------------------------------------------------------------
+
+def recalcular_resumenes(modelo, periodos=None):
+    """
+    Recalcula los resúmenes de ``modelo`` (``Ingreso``/``Egreso``) para esos
+    (año, mes), o todos si ``periodos`` es None: una consulta agrupada y un
+    upsert en bloque. Devuelve cuántas filas escribió.
+    """
+    fuente = FUENTES[modelo]
+    movimientos = modelo.objects.order_by()
+    resumenes = fuente.resumen.objects.all()
+    if periodos is not None:
+        periodos = set(periodos) - {None}
+        if not periodos:
+            return 0
+        movimientos = movimientos.filter(_en_periodos(periodos))
+        resumenes = resumenes.filter(reduce(or_, (Q(anio=anio, mes=mes) for anio, mes in periodos)))
+
+    filas = (movimientos
+             .annotate(anio_mov=ExtractYear('fecha'), mes_mov=ExtractMonth('fecha'))
+             .values('anio_mov', 'mes_mov', fuente.clave)
+             .annotate(suma=Sum('monto'), n=Count('id')))
+    nuevos = [
+        fuente.resumen(anio=fila['anio_mov'], mes=fila['mes_mov'], total=fila['suma'] or 0, cantidad=fila['n'],
+                       **{fuente.clave: fila[fuente.clave]})
+        for fila in filas
+    ]
+
+    with transaction.atomic():
+        # Conceptos que ya no tienen movimientos en esos meses
+        vigentes = [Q(anio=r.anio, mes=r.mes, **{fuente.clave: getattr(r, fuente.clave)}) for r in nuevos]
+        if periodos is not None and vigentes:
+            resumenes = resumenes.exclude(reduce(or_, vigentes))
+        resumenes.delete()
+        fuente.resumen.objects.bulk_create(
+            nuevos,
+            update_conflicts=True,
+            unique_fields=['anio', 'mes', fuente.clave],
+            update_fields=['total', 'cantidad'],
+            batch_size=1000,
+        )
+    return len(nuevos)
+
+
+class _Pendientes:
+    """Meses a recalcular al hacer commit la transacción en curso."""
+
+    def __init__(self):
+        self.periodos = {}
+
+    def al_commit(self):
+        if connection.__dict__.get('_resumenes_pendientes') is self:
+            del connection._resumenes_pendientes
+        for modelo, periodos in self.periodos.items():
+            recalcular_resumenes(modelo, periodos)
+
+
+def _pendientes():
+    pendientes = getattr(connection, '_resumenes_pendientes', None)
+    vigente = pendientes is not None and any(
+        callback is pendientes.al_commit for _, callback, _ in connection.run_on_commit
+    )
+    if not vigente:
+        pendientes = _Pendientes()
+        connection._resumenes_pendientes = pendientes
+        transaction.on_commit(pendientes.al_commit)
+    return pendientes
+
+
+def marcar_periodos(modelo, periodos):
+    """Recalcula (ahora o al commit) esos (año, mes) de ``modelo``."""
+    periodos = set(periodos) - {None}
+    if not periodos:
+        return
+    if not connection.in_atomic_block:
+        recalcular_resumenes(modelo, periodos)
+        return
+    _pendientes().periodos.setdefault(modelo, set()).update(periodos)
+
+
+# ---------------------------------------------------------------------------
+# Lectura
+# ---------------------------------------------------------------------------
+
+def _meses_completos(inicio, fin):
+    """Primer y último día del tramo de meses enteros dentro de [inicio, fin], o None."""
+    primero = inicio if inicio.day == 1 else _primer_dia_siguiente_mes(inicio.year, inicio.month)
+    ultimo_del_mes = calendar.monthrange(fin.year, fin.month)[1]
+    ultimo = fin if fin.day == ultimo_del_mes else fin.replace(day=1) - timedelta(days=1)
+    return (primero, ultimo) if primero <= ultimo else None
+
+
+def subtotales(modelo, inicio, fin):
+    """
+    ``[{clave: valor, 'subtotal': Decimal}]`` de ``modelo`` entre ``inicio`` y
+    ``fin`` (incluidos), de mayor a menor: resúmenes para los meses completos
+    y movimientos solo para los días sueltos de los extremos.
+    """
+    fuente = FUENTES[modelo]
+    acumulado = defaultdict(Decimal)
+
+    completos = _meses_completos(inicio, fin)
+    if completos:
+        primero, ultimo = completos
+        filas = (fuente.resumen.objects
+                 .filter(Q(anio__gt=primero.year) | Q(anio=primero.year, mes__gte=primero.month))
+                 .filter(Q(anio__lt=ultimo.year) | Q(anio=ultimo.year, mes__lte=ultimo.month))
+                 .order_by().values(fuente.clave).annotate(suma=Sum('total')))
+        for fila in filas:
+            acumulado[fila[fuente.clave]] += fila['suma'] or 0
+        bordes = [(a, b) for a, b in ((inicio, primero - timedelta(days=1)), (ultimo + timedelta(days=1), fin)) if a <= b]
+    else:
+        bordes = [(inicio, fin)]
+
+    if bordes:
+        filas = (modelo.objects.filter(reduce(or_, (Q(fecha__range=borde) for borde in bordes)))
+                 .order_by().values(fuente.clave).annotate(suma=Sum('monto')))
+        for fila in filas:
+            acumulado[fila[fuente.clave]] += fila['suma'] or 0
+
+    ordenados = sorted(acumulado.items(), key=lambda item: (-item[1], item[0]))
+    return [{fuente.clave: clave, 'subtotal': subtotal} for clave, subtotal in ordenados]
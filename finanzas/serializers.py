@@ -1,5 +1,3 @@
-import requests
-from django.conf import settings
 from django.db import models
 from .models import Pago
 from rest_framework import serializers
@@ -8,61 +6,18 @@ from .models import Gasto, Pago, Multa
 from .models import Gasto, Pago, Multa, Reserva, Egreso, Ingreso # Importar nuevos modelos
 
 from condominio.models import Reserva # <-- AÑADE ESTA LÍNEA
-def iniciar_pago_qr(pago_id):
-    """
-    Se comunica con PagosNet para generar una transacción QR.
-    """
-    try:
-        pago = Pago.objects.select_related('gasto', 'usuario').get(id=pago_id)
-    except Pago.DoesNotExist:
-        return {"error": "El pago no existe."}
-
-    # 1. Autenticación (asume que tienes las credenciales en settings.py)
-    auth_url = f"{settings.PAGOSNET_API_URL}authentication/login"
-    auth_payload = {
-        "email": settings.PAGOSNET_EMAIL,
-        "password": settings.PAGOSNET_PASSWORD
-    }
-    auth_response = requests.post(auth_url, json=auth_payload)
-    if auth_response.status_code != 200:
-        return {"error": "Fallo de autenticación con la pasarela."}
-    
-    token = auth_response.json().get('token')
-    headers = {'Authorization': f'Bearer {token}'}
-
-    # 2. Creación de la transacción
-    transaction_url = f"{settings.PAGOSNET_API_URL}transaction/qrpago"
-    transaction_payload = {
-        # --- CORRECCIONES AQUÍ ---
-        "monto": float(pago.monto_pagado), # Usamos monto_pagado
-        "glosa": f"Pago: {pago.gasto.descripcion or 'Gasto General'}", # Usamos descripcion
-        "nombreCompleto": pago.usuario.get_full_name() or pago.usuario.username,
-        "carnetIdentidad": "0000000",
-        "celular": "77777777",
-        "email": pago.usuario.email,
-        "empresa": "SmartCondominium",
-        "tipoServicio": "Servicios Varios",
-        "idExterno": str(pago.id)
-    }
-
-    qr_response = requests.post(transaction_url, json=transaction_payload, headers=headers)
-    
-    if qr_response.status_code == 200:
-        qr_data = qr_response.json().get('data')
-        pago.qr_data = qr_data.get('qr')
-        pago.id_transaccion_pasarela = qr_data.get('idTrn')
-        pago.save()
-        return {"qr_image_base64": pago.qr_data}
-    
-    return {"error": "No se pudo generar el QR.", "details": qr_response.json()}
-
 from django.utils import timezone
 from datetime import timedelta
 
 class GastoSerializer(serializers.ModelSerializer):
+    # Columna generada: declarada para que el esquema OpenAPI conozca su tipo
+    saldo = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
     class Meta:
         model = Gasto
         fields = '__all__'
+        # Solo lo marca la generación masiva (finanzas.expensas)
+        read_only_fields = ['expensa_mensual']
 
 
 class PagoMultaSerializer(serializers.ModelSerializer):
@@ -104,24 +59,15 @@ class PagoSerializer(serializers.ModelSerializer):
         
         saldo_pendiente = 0
         
+        # Gastos y multas guardan su saldo; solo las reservas se suman aquí
         if gasto:
-            try:
-                gasto_obj = Gasto.objects.get(id=gasto)
-                pagos_previos = Pago.objects.filter(gasto=gasto_obj).aggregate(
-                    total=models.Sum('monto_pagado')
-                )['total'] or 0
-                saldo_pendiente = gasto_obj.monto - pagos_previos
-            except Gasto.DoesNotExist:
+            saldo_pendiente = Gasto.objects.filter(id=gasto).values_list('saldo', flat=True).first()
+            if saldo_pendiente is None:
                 raise serializers.ValidationError("El gasto especificado no existe.")
                 
         elif multa:
-            try:
-                multa_obj = Multa.objects.get(id=multa)
-                pagos_previos = Pago.objects.filter(multa=multa_obj).aggregate(
-                    total=models.Sum('monto_pagado')
-                )['total'] or 0
-                saldo_pendiente = multa_obj.monto - pagos_previos
-            except Multa.DoesNotExist:
+            saldo_pendiente = Multa.objects.filter(id=multa).values_list('saldo', flat=True).first()
+            if saldo_pendiente is None:
                 raise serializers.ValidationError("La multa especificada no existe.")
                 
         elif reserva:
@@ -156,9 +102,13 @@ class PagoSerializer(serializers.ModelSerializer):
         return data
 
 class MultaSerializer(serializers.ModelSerializer):
+    saldo = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
     class Meta:
         model = Multa
         fields = '__all__'
+        # Solo lo asigna el cálculo de recargos (finanzas.recargos)
+        read_only_fields = ['gasto_origen']
     
 
 # Al final de finanzas/serializers.py
@@ -193,16 +143,51 @@ class GenerarExpensasRequestSerializer(serializers.Serializer):
 class GenerarExpensasResponseSerializer(serializers.Serializer):
     """Serializer para la respuesta de generar expensas masivas"""
     mensaje = serializers.CharField(help_text="Mensaje de confirmación")
+    tarea_id = serializers.IntegerField(help_text="Tarea en segundo plano que genera las expensas")
+    estado = serializers.CharField()
+    estado_url = serializers.URLField(help_text="GET para consultar el estado y el resultado")
+
+class GenerarEstadosDeCuentaRequestSerializer(serializers.Serializer):
+    """Serializer para la solicitud de estados de cuenta de fin de mes"""
+    mes = serializers.IntegerField(min_value=1, max_value=12, help_text="Mes de los estados (1-12)")
+    anio = serializers.IntegerField(min_value=2000, max_value=2100, help_text="Año de los estados")
+
+class GenerarEstadosDeCuentaResponseSerializer(serializers.Serializer):
+    """Serializer para la respuesta de estados de cuenta de fin de mes"""
+    mensaje = serializers.CharField(help_text="Mensaje de confirmación")
+    tarea_id = serializers.IntegerField(help_text="Tarea que genera el ZIP; se descarga desde /api/tareas/{id}/archivo/")
+    estado = serializers.CharField()
+    estado_url = serializers.URLField(help_text="GET para consultar el avance y el resultado")
+
+class EstadoDeCuentaItemSerializer(serializers.Serializer):
+    """Una deuda pendiente del estado de cuenta"""
+    id = serializers.IntegerField(source='item_id')
+    tipo_deuda = serializers.CharField(help_text="Tipo de deuda: gasto, multa o reserva")
+    propiedad = serializers.IntegerField(source='prop_id', allow_null=True)
+    monto = serializers.DecimalField(max_digits=12, decimal_places=2, source='importe')
+    saldo = serializers.DecimalField(max_digits=12, decimal_places=2, source='pendiente', help_text="Lo que falta pagar")
+    descripcion = serializers.CharField(source='detalle')
+    fecha_emision = serializers.DateField(source='emision')
+    fecha_vencimiento = serializers.DateField(source='vence', help_text="Vencimiento (o emisión si no tiene)")
+
+
+class ResumenEstadoDeCuentaSerializer(serializers.Serializer):
+    items_pendientes = serializers.IntegerField()
+    total_pendiente = serializers.DecimalField(max_digits=14, decimal_places=2)
+    gastos_pendientes = serializers.IntegerField()
+    saldo_gastos = serializers.DecimalField(max_digits=14, decimal_places=2)
+    multas_pendientes = serializers.IntegerField()
+    saldo_multas = serializers.DecimalField(max_digits=14, decimal_places=2)
+    reservas_pendientes = serializers.IntegerField()
+    saldo_reservas = serializers.DecimalField(max_digits=14, decimal_places=2)
+    vencimiento_mas_antiguo = serializers.DateField(allow_null=True)
+
 
 class EstadoDeCuentaResponseSerializer(serializers.Serializer):
     """Serializer para la respuesta del estado de cuenta"""
-    id = serializers.IntegerField()
-    propiedad = serializers.IntegerField(required=False)
-    monto = serializers.DecimalField(max_digits=10, decimal_places=2)
-    descripcion = serializers.CharField()
-    fecha_emision = serializers.DateField(required=False)
-    fecha_vencimiento = serializers.DateField(required=False)
-    tipo_deuda = serializers.CharField(help_text="Tipo de deuda: gasto, multa o reserva")
+    resumen = ResumenEstadoDeCuentaSerializer()
+    next = serializers.URLField(allow_null=True, help_text="Siguiente página (cursor)")
+    results = EstadoDeCuentaItemSerializer(many=True)
 
 # =============================================================================
 # SERIALIZERS PARA DOCUMENTACIÓN DE VISTAS PROBLEMÁTICAS
@@ -226,10 +211,33 @@ class SimularPagoResponseSerializer(serializers.Serializer):
     qr_data = serializers.CharField(help_text="Datos del código QR")
     monto = serializers.DecimalField(max_digits=10, decimal_places=2, help_text="Monto del pago")
 
+class MorosidadPropiedadSerializer(serializers.Serializer):
+    """Deuda pendiente de una propiedad por días de atraso"""
+    propiedad_id = serializers.IntegerField(allow_null=True, help_text="Nulo: reservas de usuarios sin propiedad")
+    numero_casa = serializers.CharField(allow_null=True)
+    items = serializers.IntegerField(help_text="Deudas pendientes (gastos, multas y reservas)")
+    por_vencer = serializers.DecimalField(max_digits=14, decimal_places=2)
+    d0_30 = serializers.DecimalField(max_digits=14, decimal_places=2, help_text="0 a 30 días de atraso")
+    d31_60 = serializers.DecimalField(max_digits=14, decimal_places=2)
+    d61_90 = serializers.DecimalField(max_digits=14, decimal_places=2)
+    mas_90 = serializers.DecimalField(max_digits=14, decimal_places=2)
+    total = serializers.DecimalField(max_digits=14, decimal_places=2)
+
 class ReporteMorosidadResponseSerializer(serializers.Serializer):
     """Serializer para reporte de morosidad"""
-    propiedades_morosas = serializers.IntegerField(help_text="Número de propiedades morosas")
-    monto_total_deuda = serializers.DecimalField(max_digits=10, decimal_places=2, help_text="Monto total adeudado")
+    fecha_corte = serializers.DateField()
+    items = MorosidadPropiedadSerializer(many=True)
+
+class BanderaMorosoSerializer(serializers.Serializer):
+    """Bandera de morosidad de un usuario"""
+    usuario_id = serializers.IntegerField()
+    moroso = serializers.BooleanField(help_text="Alguna de sus propiedades tiene gastos vencidos sin pagar")
+    calculado = serializers.DateTimeField(allow_null=True, help_text="Cuándo se calculó la bandera")
+    vencimiento = serializers.DateField(allow_null=True, help_text="Vencimiento más antiguo de sus gastos sin pagar")
+
+class BanderasMorososResponseSerializer(serializers.Serializer):
+    """Serializer para las banderas de morosidad de varios usuarios"""
+    results = BanderaMorosoSerializer(many=True)
 
 class WebhookStripeSerializer(serializers.Serializer):
     """Serializer para webhooks de Stripe"""
@@ -1,29 +1,93 @@
 # finanzas/stripe_service.py
+"""
+Llamadas a la API de Stripe.
+
+- ``cliente()`` es el ``StripeClient`` del proceso: una ``requests.Session``
+  con pool de conexiones (la conexión TLS se reutiliza entre peticiones),
+  timeouts de conexión y lectura (``STRIPE_TIMEOUT_CONEXION``/
+  ``STRIPE_TIMEOUT_LECTURA``) y ``STRIPE_REINTENTOS`` reintentos de red.
+- ``customer_de(usuario)`` devuelve el customer de Stripe del usuario,
+  guardado en ``ClienteStripe``. Solo la primera vez cuesta una llamada; si
+  dos peticiones lo crean a la vez, la idempotency key hace que Stripe
+  devuelva el mismo customer y el índice único deja una sola fila.
+
+``manage.py sincronizar_clientes_stripe`` completa la tabla para los
+usuarios existentes.
+"""
+import logging
+import os
+
+import requests
 import stripe
 from django.conf import settings
-from decimal import Decimal
-import logging
+from requests.adapters import HTTPAdapter
+
+from .models import ClienteStripe
 
-stripe.api_key = getattr(settings, 'STRIPE_SECRET_KEY', 'sk_test_...')
 logger = logging.getLogger(__name__)
 
+_cliente = None
+
+
+def cliente():
+    """El ``StripeClient`` del proceso (uno nuevo tras un fork, para no compartir sockets)."""
+    global _cliente
+    if _cliente is None or _cliente.pid != os.getpid():
+        sesion = requests.Session()
+        sesion.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=10))
+        http = stripe.RequestsClient(
+            session=sesion,
+            timeout=(getattr(settings, 'STRIPE_TIMEOUT_CONEXION', 3), getattr(settings, 'STRIPE_TIMEOUT_LECTURA', 20)),
+        )
+        _cliente = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY,
+            http_client=http,
+            max_network_retries=getattr(settings, 'STRIPE_REINTENTOS', 2),
+        )
+        _cliente.pid = os.getpid()
+    return _cliente
+
+
+def customer_de(usuario):
+    """customer_id de Stripe del usuario; lo crea (una sola vez) si aún no tiene."""
+    customer_id = ClienteStripe.objects.filter(usuario=usuario).values_list('customer_id', flat=True).first()
+    if customer_id:
+        return customer_id
+
+    customer = cliente().v1.customers.create(
+        {
+            'email': usuario.email,
+            'name': usuario.get_full_name() or usuario.username,
+            'metadata': {'user_id': str(usuario.pk)},
+        },
+        # Dos peticiones simultáneas del mismo usuario reciben el mismo customer
+        {'idempotency_key': f"customer-usuario-{usuario.pk}"},
+    )
+    ClienteStripe.objects.bulk_create(
+        [ClienteStripe(usuario=usuario, customer_id=customer.id)], ignore_conflicts=True,
+    )
+    # Si otra petición lo guardó primero, vale el suyo
+    return ClienteStripe.objects.values_list('customer_id', flat=True).get(usuario=usuario)
+
+
 class StripePaymentService:
-    
+
     @staticmethod
-    def create_payment_intent(amount_cents, currency='usd', metadata=None):
+    def create_payment_intent(amount_cents, currency='usd', metadata=None, customer_id=None):
         """
         Crea un Payment Intent en Stripe
         amount_cents: Monto en centavos (ej: 1500 = $15.00)
         """
+        params = {
+            'amount': int(amount_cents),
+            'currency': currency,
+            'metadata': metadata or {},
+            'automatic_payment_methods': {'enabled': True},
+        }
+        if customer_id:
+            params['customer'] = customer_id
         try:
-            intent = stripe.PaymentIntent.create(
-                amount=int(amount_cents),
-                currency=currency,
-                metadata=metadata or {},
-                automatic_payment_methods={
-                    'enabled': True,
-                },
-            )
+            intent = cliente().v1.payment_intents.create(params)
             return {
                 'success': True,
                 'client_secret': intent.client_secret,
@@ -31,66 +95,59 @@ class StripePaymentService:
                 'amount': intent.amount,
                 'currency': intent.currency
             }
-        except stripe.error.StripeError as e:
+        except stripe.StripeError as e:
             logger.error(f"Stripe error: {e}")
             return {
                 'success': False,
                 'error': str(e)
             }
-    
+
     @staticmethod
     def create_setup_intent(customer_id=None, metadata=None):
         """
         Crea un Setup Intent para guardar métodos de pago
         """
+        params = {'usage': 'off_session', 'metadata': metadata or {}}
+        if customer_id:
+            params['customer'] = customer_id
         try:
-            setup_intent = stripe.SetupIntent.create(
-                customer=customer_id,
-                usage='off_session',
-                metadata=metadata or {}
-            )
+            setup_intent = cliente().v1.setup_intents.create(params)
             return {
                 'success': True,
                 'client_secret': setup_intent.client_secret,
                 'setup_intent_id': setup_intent.id
             }
-        except stripe.error.StripeError as e:
+        except stripe.StripeError as e:
             logger.error(f"Stripe Setup Intent error: {e}")
             return {
                 'success': False,
                 'error': str(e)
             }
-    
+
     @staticmethod
-    def create_customer(email, name, metadata=None):
+    def get_or_create_customer(usuario):
         """
-        Crea un cliente en Stripe
+        customer_id del usuario (ver ``customer_de``)
         """
         try:
-            customer = stripe.Customer.create(
-                email=email,
-                name=name,
-                metadata=metadata or {}
-            )
             return {
                 'success': True,
-                'customer_id': customer.id,
-                'customer': customer
+                'customer_id': customer_de(usuario),
             }
-        except stripe.error.StripeError as e:
+        except stripe.StripeError as e:
             logger.error(f"Stripe Customer error: {e}")
             return {
                 'success': False,
                 'error': str(e)
             }
-    
+
     @staticmethod
     def retrieve_payment_intent(payment_intent_id):
         """
         Obtiene información de un Payment Intent
         """
         try:
-            intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+            intent = cliente().v1.payment_intents.retrieve(payment_intent_id)
             return {
                 'success': True,
                 'payment_intent': intent,
@@ -98,9 +155,9 @@ class StripePaymentService:
                 'amount': intent.amount,
                 'currency': intent.currency
             }
-        except stripe.error.StripeError as e:
+        except stripe.StripeError as e:
             logger.error(f"Stripe retrieve error: {e}")
             return {
                 'success': False,
                 'error': str(e)
-            }
\ No newline at end of file
+            }
@@ -13,6 +13,7 @@ import stripe
 import json
 import logging
 
+from . import eventos_stripe
 from .stripe_service import StripePaymentService
 from .models import Pago
 from .serializers import PagoSerializer
@@ -48,9 +49,17 @@ class CreatePaymentIntentView(APIView):
                 'description': description
             }
             
+            # El intent queda asociado al customer guardado del usuario
+            customer_result = StripePaymentService.get_or_create_customer(request.user)
+            if not customer_result['success']:
+                return Response({
+                    'error': customer_result['error']
+                }, status=status.HTTP_400_BAD_REQUEST)
+
             result = StripePaymentService.create_payment_intent(
                 amount_cents=amount,
-                metadata=metadata
+                metadata=metadata,
+                customer_id=customer_result['customer_id']
             )
             
             if result['success']:
@@ -80,26 +89,14 @@ class CreateSetupIntentView(APIView):
         POST /api/finanzas/stripe/setup-intent/
         """
         try:
-            # Crear o obtener customer de Stripe
+            # Customer de Stripe del usuario: se crea solo la primera vez
             user = request.user
-            stripe_customer_id = getattr(user, 'stripe_customer_id', None)
-            
-            if not stripe_customer_id:
-                customer_result = StripePaymentService.create_customer(
-                    email=user.email,
-                    name=f"{user.first_name} {user.last_name}",
-                    metadata={'user_id': str(user.id)}
-                )
-                
-                if customer_result['success']:
-                    stripe_customer_id = customer_result['customer_id']
-                    # Aquí guardarías el customer_id en el modelo User
-                    # user.stripe_customer_id = stripe_customer_id
-                    # user.save()
-                else:
-                    return Response({
-                        'error': customer_result['error']
-                    }, status=status.HTTP_400_BAD_REQUEST)
+            customer_result = StripePaymentService.get_or_create_customer(user)
+            if not customer_result['success']:
+                return Response({
+                    'error': customer_result['error']
+                }, status=status.HTTP_400_BAD_REQUEST)
+            stripe_customer_id = customer_result['customer_id']
             
             result = StripePaymentService.create_setup_intent(
                 customer_id=stripe_customer_id,
@@ -127,91 +124,33 @@ class StripeWebhookView(APIView):
     """
     Maneja los webhooks de Stripe
     POST /api/finanzas/stripe/webhook/
+
+    Solo verifica la firma y guarda el evento (ver finanzas.eventos_stripe);
+    un worker lo procesa después. Los reintentos del mismo evento responden
+    200 sin volver a encolarlo.
     """
     permission_classes = []  # Sin autenticación para webhooks
-    
+
     def post(self, request):
         payload = request.body
         sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
         endpoint_secret = getattr(settings, 'STRIPE_WEBHOOK_SECRET', '')
         
         try:
-            event = stripe.Webhook.construct_event(
+            stripe.Webhook.construct_event(
                 payload, sig_header, endpoint_secret
             )
         except ValueError:
             logger.error("Invalid payload")
             return HttpResponse(status=400)
-        except stripe.error.SignatureVerificationError:
+        except stripe.SignatureVerificationError:
             logger.error("Invalid signature")
             return HttpResponse(status=400)
-        
-        # Manejar diferentes tipos de eventos
-        if event['type'] == 'payment_intent.succeeded':
-            payment_intent = event['data']['object']
-            self.handle_successful_payment(payment_intent)
-            
-        elif event['type'] == 'payment_intent.payment_failed':
-            payment_intent = event['data']['object']
-            self.handle_failed_payment(payment_intent)
-            
-        elif event['type'] == 'setup_intent.succeeded':
-            setup_intent = event['data']['object']
-            self.handle_setup_intent_succeeded(setup_intent)
-        
+
+        evento = json.loads(payload)
+        if not eventos_stripe.registrar(evento):
+            logger.info("Evento de Stripe repetido: %s", evento['id'])
         return HttpResponse(status=200)
-    
-    def handle_successful_payment(self, payment_intent):
-        """
-        Maneja pagos exitosos
-        """
-        try:
-            metadata = payment_intent.get('metadata', {})
-            user_id = metadata.get('user_id')
-            description = metadata.get('description', '')
-            
-            if user_id:
-                user = User.objects.get(id=user_id)
-                
-                # Crear registro de pago en la base de datos
-                pago = Pago.objects.create(
-                    usuario=user,
-                    monto=payment_intent['amount'] / 100,  # Convertir de centavos
-                    descripcion=description,
-                    stripe_payment_intent_id=payment_intent['id'],
-                    estado='COMPLETADO'
-                )
-                
-                logger.info(f"Pago exitoso registrado: {pago.id}")
-                
-        except Exception as e:
-            logger.error(f"Error handling successful payment: {e}")
-    
-    def handle_failed_payment(self, payment_intent):
-        """
-        Maneja pagos fallidos
-        """
-        try:
-            metadata = payment_intent.get('metadata', {})
-            user_id = metadata.get('user_id')
-            
-            logger.warning(f"Pago fallido para usuario {user_id}: {payment_intent['id']}")
-            
-        except Exception as e:
-            logger.error(f"Error handling failed payment: {e}")
-    
-    def handle_setup_intent_succeeded(self, setup_intent):
-        """
-        Maneja setup intent exitoso (método de pago guardado)
-        """
-        try:
-            metadata = setup_intent.get('metadata', {})
-            user_id = metadata.get('user_id')
-            
-            logger.info(f"Setup Intent exitoso para usuario {user_id}: {setup_intent['id']}")
-            
-        except Exception as e:
-            logger.error(f"Error handling setup intent: {e}")
 
 class PaymentStatusView(APIView):
     permission_classes = [IsAuthenticated]
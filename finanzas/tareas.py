@@ -0,0 +1,72 @@
+# finanzas/tareas.py
+"""Tareas en segundo plano de finanzas (ver tareas.registro)."""
+import io
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.files.base import ContentFile
+
+from tareas.models import Tarea
+from tareas.registro import tarea
+
+from . import estados_mensuales, eventos_stripe, expensas
+from .reportes import datos_reporte_financiero, generar_reporte_financiero_pdf
+
+
+# La restricción de expensa única por periodo hace seguro reintentar
+@tarea("finanzas.generar_expensas")
+def generar_expensas(monto, descripcion, fecha_vencimiento, fecha_emision=None, usuario_id=None, ip_address=None):
+    """Crea la expensa del periodo para cada propiedad que aún no la tiene."""
+    resultado = expensas.generar_expensas(
+        monto=Decimal(str(monto)),
+        descripcion=descripcion,
+        fecha_emision=date.fromisoformat(fecha_emision) if fecha_emision else None,
+        fecha_vencimiento=date.fromisoformat(fecha_vencimiento),
+        usuario=User.objects.filter(pk=usuario_id).first() if usuario_id else None,
+        ip_address=ip_address,
+    )
+    return {
+        **resultado.como_dict(),
+        "mensaje": f"{resultado.creados} gastos de expensas generados, {resultado.omitidos} ya existían.",
+    }
+
+
+@tarea("finanzas.reporte_financiero_pdf", pasar_tarea=True)
+def reporte_financiero_pdf(fecha_inicio, fecha_fin, tarea):
+    """Genera el PDF del reporte financiero y lo adjunta a la tarea."""
+    data = datos_reporte_financiero(date.fromisoformat(fecha_inicio), date.fromisoformat(fecha_fin))
+    buffer = io.BytesIO()
+    generar_reporte_financiero_pdf(buffer, data)
+    nombre = f"reporte_financiero_{fecha_inicio}_a_{fecha_fin}.pdf"
+    tarea.archivo.save(nombre, ContentFile(buffer.getvalue()), save=False)
+    return {"rango_fechas": data['rango_fechas'], "resumen": data['resumen']}
+
+
+@tarea("finanzas.estados_de_cuenta", pasar_tarea=True, duracion_maxima=3600)
+def estados_de_cuenta(mes, anio, tarea):
+    """ZIP con el estado de cuenta de cada propiedad y su manifiesto, adjunto a la tarea."""
+    def progreso(hechos, total, segundos):
+        # El avance se ve en GET /api/tareas/{id}/ mientras corre
+        Tarea.objects.filter(pk=tarea.pk).update(resultado={
+            'hechos': hechos, 'total': total, 'por_segundo': round(hechos / segundos, 1) if segundos else None,
+        })
+
+    descriptor, ruta = tempfile.mkstemp(suffix='.zip')
+    os.close(descriptor)
+    try:
+        resultado = estados_mensuales.generar_estados(mes, anio, zip_destino=ruta, progreso=progreso)
+        with open(ruta, 'rb') as archivo:
+            tarea.archivo.save(f"estados_de_cuenta_{anio}_{mes:02d}.zip", File(archivo), save=False)
+    finally:
+        os.remove(ruta)
+    return {**resultado.como_dict(), 'salida': tarea.archivo.name}
+
+
+@tarea("finanzas.evento_stripe", max_intentos=5)
+def evento_stripe(evento_id):
+    """Aplica un evento del webhook de Stripe guardado en la bandeja de entrada."""
+    return {"evento_id": evento_id, "estado": eventos_stripe.procesar(evento_id)}
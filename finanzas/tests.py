@@ -1,13 +1,28 @@
 # en finanzas/tests.py
 
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APIRequestFactory, force_authenticate
 from rest_framework import status
 from django.urls import reverse
+from django.test import override_settings
+from django.utils import timezone
 from django.contrib.auth.models import User
 from .models import Gasto, Pago
-from condominio.models import Propiedad
-from usuarios.models import UserProfile
-from datetime import date
+from condominio.models import AreaComun, Propiedad
+from usuarios.models import UserProfile, Residente
+from config.testing import PlanDeConsultasMixin, PresupuestoConsultasMixin
+from .models import Multa, PagoMulta, Reserva, SaldoPropiedad
+from .models import Egreso, Ingreso, ResumenMensualEgreso, ResumenMensualIngreso
+from .models import ClienteStripe
+from .reportes import ReporteMorosidadView
+from .estado_cuenta import recalcular_saldos
+import io
+import json
+import tempfile
+import zipfile
+from unittest import mock
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db.models import Sum
 
 class FinanzasAPITests(APITestCase):
 
@@ -81,4 +96,1108 @@ class FinanzasAPITests(APITestCase):
         self.client.post(self.pago_list_url, data, format='json')
         
         gasto.refresh_from_db()
-        self.assertFalse(gasto.pagado)
\ No newline at end of file
+        self.assertFalse(gasto.pagado)
+
+
+class PlanDeConsultasFinanzasTests(PlanDeConsultasMixin, APITestCase):
+    """Las consultas de estado de cuenta y morosidad deben usar índices."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.propietario = User.objects.create_user(username='propietario', password='x')
+        self.inquilino = User.objects.create_user(username='inquilino', password='x')
+        for i in range(20):
+            propiedad = Propiedad.objects.create(numero_casa=f'Q-{i}', propietario=self.propietario, metros_cuadrados=100)
+            for mes in (1, 2, 3):
+                Gasto.objects.create(
+                    propiedad=propiedad, monto='100.00', fecha_emision=date(2025, mes, 1),
+                    fecha_vencimiento=date(2025, mes, 10), descripcion='Expensa', mes=mes, anio=2025,
+                    pagado=(mes == 1),
+                )
+            Multa.objects.create(
+                propiedad=propiedad, concepto='Ruido', monto='50.00', fecha_emision=date(2025, 1, 1),
+                fecha_vencimiento=date(2025, 1, 10), mes=1, anio=2025,
+            )
+        Residente.objects.create(usuario=self.inquilino, propiedad=propiedad, rol='inquilino')
+
+    def test_estado_de_cuenta_sin_escaneo_completo(self):
+        self.client.force_authenticate(user=self.inquilino)
+        with self.assertSinEscaneoCompleto():
+            response = self.client.get(reverse('estado-de-cuenta'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len([d for d in response.data['results'] if d['tipo_deuda'] == 'gasto']), 2)
+
+    def test_reporte_morosidad_sin_escaneo_completo(self):
+        request = APIRequestFactory().get('/reportes/morosidad/', {'mes': 2, 'anio': 2025})
+        force_authenticate(request, user=self.admin)
+        with self.assertSinEscaneoCompleto():
+            response = ReporteMorosidadView.as_view()(request)
+            contenido = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(contenido)['items']), 20)
+
+
+class GeneracionExpensasTests(APITestCase):
+    """La generación mensual es idempotente e inserta en bloque."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.dueno = User.objects.create_user(username='dueno', password='x')
+        for i in range(5):
+            Propiedad.objects.create(numero_casa=f'E-{i}', propietario=self.dueno, metros_cuadrados=90)
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse('gasto-crear-mensual')
+        self.datos = {'monto': '120.00', 'descripcion': 'Expensa mayo', 'fecha': '2030-05-01'}
+
+    def test_segundo_pedido_no_duplica(self):
+        primera = self.client.post(self.url, self.datos, format='json')
+        self.assertEqual(primera.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((primera.data['creados'], primera.data['omitidos']), (5, 0))
+
+        segunda = self.client.post(self.url, self.datos, format='json')
+        self.assertEqual(segunda.status_code, status.HTTP_200_OK)
+        self.assertEqual((segunda.data['creados'], segunda.data['omitidos']), (0, 5))
+        self.assertEqual(sorted(segunda.data['duplicados']), sorted(Propiedad.objects.values_list('pk', flat=True)))
+        self.assertEqual(segunda.data['errores'], [])
+        self.assertEqual(Gasto.objects.filter(mes=5, anio=2030, expensa_mensual=True).count(), 5)
+
+    def test_solo_completa_las_propiedades_faltantes(self):
+        self.client.post(self.url, self.datos, format='json')
+        Propiedad.objects.create(numero_casa='E-nueva', propietario=self.dueno, metros_cuadrados=60)
+        respuesta = self.client.post(self.url, self.datos, format='json')
+        self.assertEqual((respuesta.data['creados'], respuesta.data['omitidos']), (1, 5))
+
+    def test_migracion_marca_las_expensas_generadas_antes(self):
+        from importlib import import_module
+
+        from django.apps import apps
+
+        migracion = import_module('finanzas.migrations.0014_expensa_mensual_unica')
+        propiedades = list(Propiedad.objects.all())
+        for propiedad in propiedades:
+            Gasto.objects.create(propiedad=propiedad, monto='120.00', fecha_emision=date(2030, 5, 1),
+                                 descripcion='Expensa mayo', mes=5, anio=2030)
+        extra = Gasto.objects.create(propiedad=propiedades[0], monto='40.00', fecha_emision=date(2030, 5, 15),
+                                     descripcion='Reparación portón', mes=5, anio=2030)
+
+        migracion.marcar_expensas_existentes(apps, None)
+        self.assertEqual(Gasto.objects.filter(expensa_mensual=True).count(), 5)
+        self.assertFalse(Gasto.objects.get(pk=extra.pk).expensa_mensual)
+        respuesta = self.client.post(self.url, self.datos, format='json')
+        self.assertEqual((respuesta.data['creados'], respuesta.data['omitidos']), (0, 5))
+
+    def test_gastos_extraordinarios_no_chocan_con_la_expensa(self):
+        self.client.post(self.url, self.datos, format='json')
+        propiedad = Propiedad.objects.first()
+        Gasto.objects.create(
+            propiedad=propiedad, monto='40.00', fecha_emision=date(2030, 5, 15),
+            descripcion='Reparación portón', mes=5, anio=2030,
+        )
+        self.assertEqual(Gasto.objects.filter(propiedad=propiedad, mes=5, anio=2030).count(), 2)
+
+    def test_el_estado_de_cuenta_incluye_la_expensa_generada(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, self.datos, format='json')
+        self.client.force_authenticate(user=self.dueno)
+        respuesta = self.client.get(reverse('estado-de-cuenta'))
+        self.assertEqual(respuesta.data['resumen']['gastos_pendientes'], 5)
+        self.assertEqual(Decimal(str(respuesta.data['resumen']['saldo_gastos'])), Decimal('600.00'))
+
+    def test_un_insert_un_evento_y_una_notificacion(self):
+        from auditoria.models import Bitacora
+        from tareas.models import Tarea
+
+        with self.assertNumQueries(7):
+            self.client.post(self.url, self.datos, format='json')
+        self.assertEqual(Bitacora.objects.filter(accion="Creación Masiva de Gastos Mensuales").count(), 1)
+        notificaciones = Tarea.objects.filter(nombre="notificaciones.notificar_propiedades")
+        self.assertEqual(notificaciones.count(), 1)
+        self.assertEqual(len(notificaciones.get().argumentos['propiedades_ids']), 5)
+
+
+class PagoEnLoteTests(APITestCase):
+    """El pago en lote es atómico, en bloque y reparte montos FIFO."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.admin.profile.role = UserProfile.Role.PROPIETARIO
+        self.admin.profile.save()
+        self.propiedad = Propiedad.objects.create(numero_casa='L-1', propietario=self.admin, metros_cuadrados=80)
+        self.gastos = [
+            Gasto.objects.create(
+                propiedad=self.propiedad, monto=Decimal('100.00'), fecha_emision=date(2030, mes, 1),
+                fecha_vencimiento=date(2030, mes, 10), descripcion=f'Expensa {mes}', mes=mes, anio=2030,
+            )
+            for mes in (3, 1, 2)
+        ]
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse('gasto-pagar-en-lote')
+
+    def test_paga_cincuenta_con_consultas_constantes(self):
+        for mes in range(4, 51):
+            Gasto.objects.create(
+                propiedad=self.propiedad, monto='10.00', fecha_emision=date(2031, 1, 1),
+                descripcion='Extra', mes=mes % 12 + 1, anio=2031,
+            )
+        ids = list(Gasto.objects.values_list('id', flat=True))
+        with self.assertNumQueries(7):
+            respuesta = self.client.post(self.url, {'ids': ids}, format='json')
+        self.assertEqual(respuesta.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(respuesta.data['pagados'], 50)
+        self.assertFalse(Gasto.objects.filter(pagado=False).exists())
+        self.assertEqual(Pago.objects.count(), 50)
+
+    def test_descuenta_abonos_previos_y_reporta_ya_pagados(self):
+        enero, febrero, marzo = sorted(self.gastos, key=lambda g: g.mes)
+        Pago.objects.create(gasto=enero, usuario=self.admin, monto_pagado='30.00')
+        Gasto.objects.filter(pk=marzo.pk).update(pagado=True)
+
+        respuesta = self.client.post(self.url, {'ids': [enero.pk, febrero.pk, marzo.pk, 9999]}, format='json')
+        self.assertEqual(respuesta.data['ya_pagados'], [marzo.pk])
+        self.assertEqual(respuesta.data['no_encontrados'], [9999])
+        self.assertEqual(respuesta.data['monto_aplicado'], '170.00')
+
+    def test_saldadas_sin_marcar_actualizan_el_saldo_de_la_propiedad(self):
+        enero = min(self.gastos, key=lambda g: g.mes)
+        Pago.objects.create(gasto=enero, usuario=self.admin, monto_pagado='100.00')
+        Gasto.objects.filter(pk=enero.pk).update(pagado=False)
+        SaldoPropiedad.objects.filter(propiedad=self.propiedad).update(gastos_pendientes=0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(self.url, {'ids': [enero.pk]}, format='json')
+        self.assertEqual(respuesta.data['pagados'], 1)
+        self.assertEqual(Decimal(respuesta.data['monto_aplicado']), 0)
+        self.assertEqual(SaldoPropiedad.objects.get(propiedad=self.propiedad).gastos_pendientes, 2)
+
+    def test_monto_se_reparte_fifo(self):
+        enero, febrero, marzo = sorted(self.gastos, key=lambda g: g.mes)
+        respuesta = self.client.post(self.url, {'monto': '150.00', 'propiedad': self.propiedad.pk}, format='json')
+        self.assertEqual(respuesta.data['pagados_ids'], [enero.pk])
+        self.assertEqual(respuesta.data['parciales_ids'], [febrero.pk])
+        self.assertEqual(respuesta.data['sobrante'], '0.00')
+        febrero.refresh_from_db()
+        marzo.refresh_from_db()
+        self.assertFalse(febrero.pagado)
+        self.assertEqual(febrero.pagos.get().monto_pagado, Decimal('50.00'))
+        self.assertFalse(marzo.pagos.exists())
+
+        respuesta = self.client.post(self.url, {'monto': '200.00', 'propiedad': self.propiedad.pk}, format='json')
+        self.assertEqual(respuesta.data['pagados_ids'], [febrero.pk, marzo.pk])
+        self.assertEqual(respuesta.data['sobrante'], '50.00')
+
+    def test_todo_o_nada(self):
+        from unittest import mock
+
+        with mock.patch('finanzas.pagos.registrar_evento', side_effect=RuntimeError('bitácora caída')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(self.url, {'ids': [g.pk for g in self.gastos]}, format='json')
+        self.assertFalse(Pago.objects.exists())
+        self.assertFalse(Gasto.objects.filter(pagado=True).exists())
+
+    def test_multas_en_lote(self):
+        multa = Multa.objects.create(
+            propiedad=self.propiedad, concepto='Ruido', monto='40.00', fecha_emision=date(2030, 1, 1), mes=1, anio=2030,
+        )
+        respuesta = self.client.post(reverse('multa-pagar-en-lote'), {'ids': [multa.pk]}, format='json')
+        self.assertEqual(respuesta.data['pagados'], 1)
+        multa.refresh_from_db()
+        self.assertTrue(multa.pagado)
+        self.assertEqual(multa.pagos_multa.get().monto_pagado, Decimal('40.00'))
+
+
+class SaldoAcumuladoTests(APITestCase):
+    """El saldo de gastos y multas se mantiene con incrementos, sin re-sumar pagos."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='cajero', password='x')
+        self.propiedad = Propiedad.objects.create(numero_casa='S-1', propietario=self.usuario, metros_cuadrados=70)
+        self.gasto = Gasto.objects.create(
+            propiedad=self.propiedad, monto=Decimal('300.00'), fecha_emision=date(2030, 6, 1),
+            descripcion='Expensa junio', mes=6, anio=2030,
+        )
+
+    def _saldo(self, deuda):
+        deuda.refresh_from_db()
+        return deuda.monto_pagado_acumulado, deuda.saldo, deuda.pagado
+
+    def test_crear_editar_y_borrar_pagos(self):
+        with self.assertNumQueries(4):
+            pago = Pago.objects.create(gasto=self.gasto, usuario=self.usuario, monto_pagado=Decimal('100.00'))
+        self.assertEqual(self._saldo(self.gasto), (Decimal('100.00'), Decimal('200.00'), False))
+
+        otro = Pago.objects.create(gasto=self.gasto, usuario=self.usuario, monto_pagado=Decimal('200.00'))
+        self.assertEqual(self._saldo(self.gasto), (Decimal('300.00'), Decimal('0.00'), True))
+
+        otro.monto_pagado = Decimal('150.00')
+        otro.save()
+        self.assertEqual(self._saldo(self.gasto), (Decimal('250.00'), Decimal('50.00'), False))
+
+        pago.delete()
+        self.assertEqual(self._saldo(self.gasto), (Decimal('150.00'), Decimal('150.00'), False))
+
+    def test_mover_un_pago_a_otra_deuda(self):
+        multa = Multa.objects.create(
+            propiedad=self.propiedad, concepto='Ruido', monto=Decimal('80.00'), fecha_emision=date(2030, 6, 1), mes=6, anio=2030,
+        )
+        pago = Pago.objects.create(gasto=self.gasto, usuario=self.usuario, monto_pagado=Decimal('80.00'))
+        pago = Pago.objects.get(pk=pago.pk)
+        pago.gasto, pago.multa = None, multa
+        pago.save()
+        self.assertEqual(self._saldo(self.gasto)[0], Decimal('0.00'))
+        self.assertEqual(self._saldo(multa), (Decimal('80.00'), Decimal('0.00'), True))
+
+        PagoMulta.objects.create(multa=multa, usuario=self.usuario, monto_pagado=Decimal('5.00'))
+        self.assertEqual(self._saldo(multa)[1], Decimal('-5.00'))
+
+    def test_guardar_la_deuda_no_pisa_el_acumulado(self):
+        gasto_en_memoria = Gasto.objects.get(pk=self.gasto.pk)
+        Pago.objects.create(gasto=self.gasto, usuario=self.usuario, monto_pagado=Decimal('100.00'))
+        gasto_en_memoria.descripcion = 'Expensa junio (corregida)'
+        gasto_en_memoria.save()
+        self.assertEqual(self._saldo(self.gasto)[0], Decimal('100.00'))
+
+    def test_pagado_lo_mantiene_el_acumulado(self):
+        gasto_en_memoria = Gasto.objects.get(pk=self.gasto.pk)
+        Pago.objects.create(gasto=self.gasto, usuario=self.usuario, monto_pagado=Decimal('300.00'))
+        # Un save() con el ``pagado`` viejo en memoria no lo vuelve a False
+        gasto_en_memoria.descripcion = 'Expensa junio (corregida)'
+        gasto_en_memoria.save()
+        self.assertEqual(self._saldo(self.gasto), (Decimal('300.00'), Decimal('0.00'), True))
+
+        # Subir el monto reabre la deuda; bajarlo la vuelve a cerrar
+        gasto_en_memoria.monto = Decimal('350.00')
+        gasto_en_memoria.save()
+        self.assertFalse(gasto_en_memoria.pagado)
+        self.assertEqual(self._saldo(self.gasto), (Decimal('300.00'), Decimal('50.00'), False))
+        gasto_en_memoria.monto = Decimal('300.00')
+        gasto_en_memoria.save()
+        self.assertTrue(gasto_en_memoria.pagado)
+
+    def test_registrar_pago_parcial_no_marca_pagado(self):
+        admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        admin.profile.role = UserProfile.Role.PROPIETARIO
+        admin.profile.save()
+        self.client.force_authenticate(user=admin)
+        url = reverse('gasto-registrar-pago', kwargs={'pk': self.gasto.pk})
+        respuesta = self.client.post(url, {'monto_pagado': '100.00'}, format='json')
+        self.assertEqual(respuesta.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._saldo(self.gasto), (Decimal('100.00'), Decimal('200.00'), False))
+
+        self.client.post(url, {'monto_pagado': '200.00'}, format='json')
+        self.assertEqual(self._saldo(self.gasto), (Decimal('300.00'), Decimal('0.00'), True))
+
+    def test_validacion_usa_el_saldo_guardado(self):
+        admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        Pago.objects.create(gasto=self.gasto, usuario=self.usuario, monto_pagado=Decimal('250.00'))
+        respuesta = self.client.post(reverse('pago-list'), {'gasto': self.gasto.pk, 'monto_pagado': '60.00'}, format='json')
+        self.assertEqual(respuesta.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('$50.00', str(respuesta.data['monto_pagado']))
+
+    def test_recompute_saldos_detecta_y_corrige(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        Pago.objects.create(gasto=self.gasto, usuario=self.usuario, monto_pagado=Decimal('100.00'))
+        Gasto.objects.filter(pk=self.gasto.pk).update(monto_pagado_acumulado=Decimal('0'))
+        SaldoPropiedad.objects.filter(propiedad=self.propiedad).update(saldo_gastos=Decimal('300.00'))
+
+        with self.assertRaises(CommandError):
+            call_command('recompute_saldos', '--verificar', stdout=StringIO())
+        call_command('recompute_saldos', stdout=StringIO())
+        self.assertEqual(self._saldo(self.gasto)[:2], (Decimal('100.00'), Decimal('200.00')))
+        self.assertEqual(SaldoPropiedad.objects.get(propiedad=self.propiedad).saldo_gastos, Decimal('200.00'))
+        call_command('recompute_saldos', '--verificar', stdout=StringIO())
+
+
+class EstadoDeCuentaTests(PresupuestoConsultasMixin, APITestCase):
+    """El estado de cuenta lee el saldo materializado y pagina el detalle por keyset."""
+
+    def setUp(self):
+        self.propietario = User.objects.create_user(username='dueno', password='x')
+        self.propiedad = Propiedad.objects.create(numero_casa='E-1', propietario=self.propietario, metros_cuadrados=90)
+        self.client.force_authenticate(user=self.propietario)
+
+    def _gasto(self, dia, monto='100.00'):
+        return Gasto.objects.create(
+            propiedad=self.propiedad, monto=Decimal(monto), fecha_emision=date(2030, 1, 1),
+            fecha_vencimiento=date(2030, 1, dia), descripcion=f'Gasto {dia}', mes=1, anio=2030,
+        )
+
+    def _sembrar(self, n):
+        for _ in range(n):
+            self._gasto(5)
+        recalcular_saldos([self.propiedad.pk])
+
+    def test_saldo_se_actualiza_al_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            gasto = self._gasto(10, '300.00')
+            Multa.objects.create(
+                propiedad=self.propiedad, concepto='Ruido', monto=Decimal('40.00'), fecha_emision=date(2030, 1, 1),
+                fecha_vencimiento=date(2030, 1, 3), mes=1, anio=2030,
+            )
+        saldo = SaldoPropiedad.objects.get(propiedad=self.propiedad)
+        self.assertEqual((saldo.gastos_pendientes, saldo.multas_pendientes), (1, 1))
+        self.assertEqual(saldo.total_pendiente, Decimal('340.00'))
+        self.assertEqual(saldo.vencimiento_mas_antiguo, date(2030, 1, 3))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Pago.objects.create(gasto=gasto, usuario=self.propietario, monto_pagado=Decimal('300.00'))
+        saldo.refresh_from_db()
+        self.assertEqual((saldo.gastos_pendientes, saldo.saldo_gastos), (0, Decimal('0.00')))
+
+    def test_mover_una_deuda_refresca_ambas_propiedades(self):
+        otra = Propiedad.objects.create(numero_casa='E-2', propietario=self.propietario, metros_cuadrados=90)
+        with self.captureOnCommitCallbacks(execute=True):
+            gasto = self._gasto(10, '300.00')
+        gasto = Gasto.objects.get(pk=gasto.pk)
+        gasto.propiedad = otra
+        with self.captureOnCommitCallbacks(execute=True):
+            gasto.save()
+        saldos = dict(SaldoPropiedad.objects.values_list('propiedad_id', 'gastos_pendientes'))
+        self.assertEqual(saldos, {self.propiedad.pk: 0, otra.pk: 1})
+
+    def test_paginacion_por_cursor(self):
+        ids = [self._gasto(dia).pk for dia in (3, 1, 2, 2, 4)]
+        recalcular_saldos([self.propiedad.pk])
+        vistos, url = [], reverse('estado-de-cuenta')
+        datos = {'page_size': 2}
+        while url:
+            respuesta = self.client.get(url, datos)
+            self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+            self.assertEqual(respuesta.data['resumen']['gastos_pendientes'], 5)
+            vistos += [fila['id'] for fila in respuesta.data['results']]
+            url, datos = respuesta.data['next'], None
+        self.assertEqual(vistos, [ids[1], ids[2], ids[3], ids[0], ids[4]])
+
+    def test_cursor_invalido(self):
+        respuesta = self.client.get(reverse('estado-de-cuenta'), {'cursor': 'x'})
+        self.assertEqual(respuesta.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_presupuesto_de_consultas(self):
+        self.assertPresupuestoConsultas('estado-de-cuenta', self._sembrar)
+
+
+class MorosidadTests(APITestCase):
+    """Deuda por antigüedad: una consulta agrupada, respuesta en streaming."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.dueno = User.objects.create_user(username='dueno', password='x')
+        self.propiedad = Propiedad.objects.create(numero_casa='M-1', propietario=self.dueno, metros_cuadrados=80)
+        self.otra = Propiedad.objects.create(numero_casa='M-2', propietario=self.dueno, metros_cuadrados=80)
+        for vence, monto in ((date(2030, 6, 10), '10.00'), (date(2030, 5, 20), '20.00'),
+                             (date(2030, 4, 20), '40.00'), (date(2030, 1, 1), '80.00')):
+            Gasto.objects.create(
+                propiedad=self.propiedad, monto=Decimal(monto), fecha_emision=vence.replace(day=1),
+                fecha_vencimiento=vence, descripcion='Expensa', mes=vence.month, anio=vence.year,
+            )
+        parcial = Multa.objects.create(
+            propiedad=self.propiedad, concepto='Ruido', monto=Decimal('50.00'), fecha_emision=date(2030, 6, 1),
+            fecha_vencimiento=date(2030, 7, 15), mes=6, anio=2030,
+        )
+        PagoMulta.objects.create(multa=parcial, usuario=self.dueno, monto_pagado=Decimal('15.00'))
+        Gasto.objects.create(
+            propiedad=self.otra, monto=Decimal('99.00'), fecha_emision=date(2030, 6, 1), descripcion='Pagado',
+            mes=6, anio=2030, pagado=True,
+        )
+        inquilino = User.objects.create_user(username='inquilino', password='x')
+        Residente.objects.create(usuario=inquilino, propiedad=self.propiedad, rol='inquilino')
+        area = AreaComun.objects.create(nombre='Salón', descripcion='', capacidad=20)
+        Reserva.objects.create(
+            area_comun=area, usuario=inquilino, fecha_reserva=date(2030, 6, 25),
+            hora_inicio='10:00', hora_fin='12:00', costo_total=Decimal('5.00'),
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def _contenido(self, respuesta):
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertTrue(respuesta.streaming)
+        return b''.join(respuesta.streaming_content).decode()
+
+    def test_tramos_por_propiedad_en_una_consulta(self):
+        from .morosidad import filas_morosidad
+
+        with self.assertNumQueries(1):
+            filas = list(filas_morosidad(date(2030, 6, 30), chunk_size=1))
+        self.assertEqual(len(filas), 1)
+        fila = filas[0]
+        self.assertEqual((fila['propiedad_id'], fila['numero_casa'], fila['items']), (self.propiedad.pk, 'M-1', 6))
+        self.assertEqual(
+            [fila[c] for c in ('por_vencer', 'd0_30', 'd31_60', 'd61_90', 'mas_90', 'total')],
+            [Decimal(v) for v in ('35.00', '15.00', '20.00', '40.00', '80.00', '190.00')],
+        )
+
+    def test_csv_y_json(self):
+        url = reverse('finanzas-reporte-morosidad')
+        lineas = self._contenido(self.client.get(url, {'mes': 6, 'anio': 2030, 'fmt': 'csv'})).splitlines()
+        self.assertEqual(lineas[0], 'propiedad_id,numero_casa,items,por_vencer,d0_30,d31_60,d61_90,mas_90,total')
+        self.assertEqual(lineas[1], f'{self.propiedad.pk},M-1,6,35.00,15.00,20.00,40.00,80.00,190.00')
+
+        datos = json.loads(self._contenido(self.client.get(url, {'fecha_corte': '2030-08-01'})))
+        self.assertEqual(datos['fecha_corte'], '2030-08-01')
+        self.assertEqual(datos['items'][0]['por_vencer'], '0.00')
+        self.assertEqual(datos['items'][0]['total'], '190.00')
+
+    def test_solo_administradores(self):
+        self.client.force_authenticate(user=self.dueno)
+        respuesta = self.client.get(reverse('finanzas-reporte-morosidad'))
+        self.assertEqual(respuesta.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.admin)
+        respuesta = self.client.get(reverse('finanzas-reporte-morosidad'), {'mes': 13, 'anio': 2030})
+        self.assertEqual(respuesta.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ResumenesMensualesTests(APITestCase):
+    """Los reportes financieros suman meses completos desde los resúmenes."""
+
+    def _movimiento(self, modelo, fecha, monto, **campos):
+        movimiento = modelo.objects.create(monto=Decimal(monto), **campos)
+        # ``fecha`` es auto_now_add: se corrige después de crear
+        movimiento.fecha = fecha
+        movimiento.save()
+        return movimiento
+
+    def _sembrar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for mes in range(1, 13):
+                for dia in (1, 15, 28):
+                    self._movimiento(Ingreso, date(2029, mes, dia), '100.00', concepto='Expensas')
+                    self._movimiento(Egreso, date(2029, mes, dia), '30.00', concepto='Luz', categoria='SERVICIOS')
+            self._movimiento(Ingreso, date(2029, 3, 10), '7.50', concepto='Alquiler salón')
+
+    def test_resumen_se_mantiene_al_commit(self):
+        self._sembrar()
+        resumen = ResumenMensualIngreso.objects.get(anio=2029, mes=3, concepto='Expensas')
+        self.assertEqual((resumen.total, resumen.cantidad), (Decimal('300.00'), 3))
+
+        ingreso = Ingreso.objects.get(concepto='Alquiler salón')
+        with self.captureOnCommitCallbacks(execute=True):
+            ingreso.fecha = date(2029, 4, 2)
+            ingreso.save()
+        self.assertFalse(ResumenMensualIngreso.objects.filter(mes=3, concepto='Alquiler salón').exists())
+        self.assertEqual(ResumenMensualIngreso.objects.get(mes=4, concepto='Alquiler salón').total, Decimal('7.50'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingreso.delete()
+        self.assertFalse(ResumenMensualIngreso.objects.filter(concepto='Alquiler salón').exists())
+
+    def test_rango_combina_resumenes_y_extremos(self):
+        from .reportes import datos_reporte_financiero
+
+        self._sembrar()
+        inicio, fin = date(2029, 2, 10), date(2029, 11, 20)
+        with self.assertNumQueries(4):
+            datos = datos_reporte_financiero(inicio, fin)
+
+        esperado = Ingreso.objects.filter(fecha__range=[inicio, fin]).aggregate(total=Sum('monto'))['total']
+        self.assertEqual(datos['resumen']['total_ingresos'], esperado)
+        self.assertEqual(datos['detalle_ingresos'][0], {'concepto': 'Expensas', 'subtotal': Decimal('2800.00')})
+        self.assertEqual(datos['detalle_egresos'], [{'categoria': 'SERVICIOS', 'subtotal': Decimal('840.00')}])
+        self.assertEqual(datos['resumen']['balance'], esperado - Decimal('840.00'))
+
+        dentro_de_un_mes = datos_reporte_financiero(date(2029, 3, 2), date(2029, 3, 20))
+        self.assertEqual(dentro_de_un_mes['resumen']['total_ingresos'], Decimal('107.50'))
+
+    def test_reconstruir_resumenes(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        self._sembrar()
+        ResumenMensualEgreso.objects.all().delete()
+        call_command('reconstruir_resumenes_mensuales', stdout=StringIO())
+        self.assertEqual(ResumenMensualEgreso.objects.count(), 12)
+        self.assertEqual(ResumenMensualEgreso.objects.aggregate(t=Sum('total'))['t'], Decimal('1080.00'))
+
+
+class RecibosTests(APITestCase):
+    """Recibos en PDF: caché en disco por huella, ETag y descarga en lote."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(RECIBOS_CACHE_DIR=directorio.name, RECIBOS_PROCESOS=2)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.dueno = User.objects.create_user(username='dueno', password='x')
+        self.propiedad = Propiedad.objects.create(numero_casa='R-1', propietario=self.dueno, metros_cuadrados=60)
+        gasto = Gasto.objects.create(
+            propiedad=self.propiedad, monto=Decimal('500.00'), fecha_emision=date(2030, 3, 1),
+            descripcion='Expensa marzo', mes=3, anio=2030,
+        )
+        self.pagos = [
+            Pago.objects.create(gasto=gasto, usuario=self.dueno, monto_pagado=Decimal('50.00')) for _ in range(3)
+        ]
+        multa = Multa.objects.create(
+            propiedad=self.propiedad, concepto='Ruido', monto=Decimal('20.00'), fecha_emision=date(2030, 3, 1),
+            mes=3, anio=2030,
+        )
+        self.pago_multa = PagoMulta.objects.create(multa=multa, usuario=self.dueno, monto_pagado=Decimal('20.00'))
+        hoy = timezone.localdate()
+        self.periodo = {'mes': hoy.month, 'anio': hoy.year}
+
+    def test_descarga_usa_la_cache_y_el_etag(self):
+        from . import recibos
+
+        url = reverse('finanzas-pago-comprobante', kwargs={'pago_id': self.pagos[0].pk})
+        self.client.force_authenticate(user=self.dueno)
+        with mock.patch.object(recibos, 'dibujar', wraps=recibos.dibujar) as dibujar:
+            primera = self.client.get(url)
+            self.assertEqual(primera.status_code, status.HTTP_200_OK)
+            self.assertTrue(b''.join(primera.streaming_content).startswith(b'%PDF'))
+            segunda = self.client.get(url)
+            b''.join(segunda.streaming_content)
+        self.assertEqual(dibujar.call_count, 1)
+        self.assertEqual(primera['ETag'], segunda['ETag'])
+
+        no_modificado = self.client.get(url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(no_modificado.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Si el pago cambia, cambia la huella
+        Pago.objects.filter(pk=self.pagos[0].pk).update(estado_pago='COMPLETADO')
+        self.assertNotEqual(self.client.get(url)['ETag'], primera['ETag'])
+
+    def test_solo_quien_puede_ver_el_pago(self):
+        url = reverse('finanzas-pago-multa-comprobante', kwargs={'pago_multa_id': self.pago_multa.pk})
+        self.assertIn(self.client.get(url).status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.client.force_authenticate(user=User.objects.create_user(username='vecino', password='x'))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(user=self.admin)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_lote_en_zip_y_en_un_pdf(self):
+        from . import recibos
+
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('finanzas-recibos-periodo')
+        with mock.patch.object(recibos, 'MINIMO_PARA_POOL', 2):
+            respuesta = self.client.get(url, self.periodo)
+            contenido = b''.join(respuesta.streaming_content)
+        self.assertEqual(respuesta['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(contenido)) as archivo:
+            nombres = archivo.namelist()
+            self.assertTrue(all(archivo.read(n).startswith(b'%PDF') for n in nombres))
+        self.assertEqual(sorted(nombres), sorted(
+            [f'recibo_pago_{p.pk}.pdf' for p in self.pagos] + [f'recibo_pago_multa_{self.pago_multa.pk}.pdf']
+        ))
+
+        respuesta = self.client.get(url, {**self.periodo, 'formato': 'pdf'})
+        self.assertIn(b'/Count 4', b''.join(respuesta.streaming_content))
+
+        self.client.force_authenticate(user=self.dueno)
+        self.assertEqual(self.client.get(url, self.periodo).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class EstadosMensualesTests(APITestCase):
+    """Estados de cuenta de fin de mes: datos en pocas consultas, PDFs en paralelo y manifiesto."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+        ajustes = override_settings(MEDIA_ROOT=self.directorio, ESTADOS_CUENTA_PROCESOS=2)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.dueno = User.objects.create_user(username='dueno', password='x', first_name='Ana', last_name='Rojas')
+        hoy = timezone.localdate()
+        self.mes, self.anio = hoy.month, hoy.year
+        self.propiedades = [
+            Propiedad.objects.create(numero_casa=f'M-{i}', propietario=self.dueno, metros_cuadrados=80)
+            for i in range(3)
+        ]
+        gasto = Gasto.objects.create(
+            propiedad=self.propiedades[0], monto=Decimal('300.00'), fecha_emision=hoy.replace(day=1),
+            descripcion='Expensa del mes', mes=self.mes, anio=self.anio,
+        )
+        Pago.objects.create(gasto=gasto, usuario=self.dueno, monto_pagado=Decimal('100.00'))
+        # Deuda vieja todavía pendiente
+        Multa.objects.create(
+            propiedad=self.propiedades[1], concepto='Ruido', monto=Decimal('40.00'), fecha_emision=date(2020, 1, 10),
+            mes=1, anio=2020,
+        )
+
+    def test_datos_del_periodo_en_cinco_consultas(self):
+        from .estados_mensuales import datos_del_periodo
+
+        with self.assertNumQueries(5):
+            estados = datos_del_periodo(self.mes, self.anio)
+        self.assertEqual([e['numero_casa'] for e in estados], ['M-0', 'M-1', 'M-2'])
+        self.assertEqual(estados[0]['propietario'], 'Ana Rojas')
+        self.assertEqual((estados[0]['total_pagado'], estados[0]['total_pendiente']),
+                         (Decimal('100.00'), Decimal('200.00')))
+        self.assertEqual([d[0] for d in estados[1]['deudas']], ['multa'])
+        self.assertEqual((estados[2]['deudas'], estados[2]['pagos']), ([], []))
+
+    def test_directorio_con_manifiesto_y_progreso(self):
+        from .estados_mensuales import MANIFIESTO, generar_estados
+
+        avances = []
+        resultado = generar_estados(self.mes, self.anio, directorio=self.directorio, tamano_particion=1,
+                                    progreso=lambda hechos, total, _: avances.append((hechos, total)))
+        self.assertEqual(resultado.generados, 3)
+        self.assertEqual(sorted(avances), [(1, 3), (2, 3), (3, 3)])
+        with open(f"{self.directorio}/{MANIFIESTO}", encoding='utf-8') as archivo:
+            manifiesto = json.load(archivo)
+        self.assertEqual([e['numero_casa'] for e in manifiesto['estados']], ['M-0', 'M-1', 'M-2'])
+        for entrada in manifiesto['estados']:
+            with open(f"{self.directorio}/{entrada['archivo']}", 'rb') as pdf:
+                self.assertTrue(pdf.read().startswith(b'%PDF'))
+        self.assertEqual(manifiesto['estados'][1]['total_pendiente'], '40.00')
+
+    def test_casas_con_el_mismo_nombre_saneado_no_comparten_archivo(self):
+        from .estados_mensuales import nombre_de_archivo
+
+        nombres = {
+            nombre_de_archivo({'propiedad_id': pk, 'numero_casa': casa, 'mes': 5, 'anio': 2030})
+            for pk, casa in ((1, 'A/1'), (2, 'A.1'), (3, '///'))
+        }
+        self.assertEqual(nombres, {'estado_1_A_1_2030_05.pdf', 'estado_2_A_1_2030_05.pdf', 'estado_3_2030_05.pdf'})
+
+    def test_comando_genera_zip(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        destino = f"{self.directorio}/estados.zip"
+        salida = StringIO()
+        call_command('generar_estados_de_cuenta', '--mes', str(self.mes), '--anio', str(self.anio),
+                     '--zip', destino, '--propiedad', str(self.propiedades[0].pk), stdout=salida)
+        self.assertIn('1/1 estados', salida.getvalue())
+        with zipfile.ZipFile(destino) as archivo:
+            nombres = archivo.namelist()
+            manifiesto = json.loads(archivo.read('manifiesto.json'))
+        self.assertEqual(len(nombres), 2)
+        self.assertIn(manifiesto['estados'][0]['archivo'], nombres)
+
+    def test_endpoint_encola_y_la_tarea_adjunta_el_zip(self):
+        from tareas.models import Tarea
+        from tareas.worker import ejecutar_pendientes
+
+        url = reverse('generar-estados-de-cuenta')
+        self.client.force_authenticate(user=self.dueno)
+        self.assertEqual(self.client.post(url, {'mes': self.mes, 'anio': self.anio}).status_code,
+                         status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        self.assertEqual(self.client.post(url, {'mes': 13, 'anio': self.anio}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        respuesta = self.client.post(url, {'mes': self.mes, 'anio': self.anio}, format='json')
+        self.assertEqual(respuesta.status_code, status.HTTP_202_ACCEPTED)
+
+        ejecutar_pendientes()
+        tarea = Tarea.objects.get(pk=respuesta.data['tarea_id'])
+        self.assertEqual(tarea.estado, Tarea.Estado.COMPLETADA, tarea.error)
+        self.assertEqual(tarea.resultado['generados'], 3)
+        with tarea.archivo.open('rb') as archivo, zipfile.ZipFile(archivo) as archivo_zip:
+            self.assertEqual(len(archivo_zip.namelist()), 4)
+
+
+@override_settings(MOROSOS_CACHE_TTL=3600)
+class MorososTests(APITestCase):
+    """Bandera de morosidad: se mantiene con las escrituras, se lee de la caché y se refresca de noche."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.dueno = User.objects.create_user(username='dueno', password='x')
+        self.vecino = User.objects.create_user(username='vecino', password='x')
+        self.propiedad = Propiedad.objects.create(numero_casa='D-1', propietario=self.dueno, metros_cuadrados=70)
+        Propiedad.objects.create(numero_casa='D-2', propietario=self.vecino, metros_cuadrados=70)
+        self.hoy = timezone.localdate()
+
+    def _gasto(self, vence):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Gasto.objects.create(
+                propiedad=self.propiedad, monto=Decimal('80.00'), fecha_emision=date(2020, 1, 1),
+                fecha_vencimiento=vence, descripcion='Expensa', mes=1, anio=2020,
+            )
+
+    def test_la_bandera_sigue_a_gastos_y_pagos(self):
+        from .morosos import bandera_de
+        from .services import es_residente_moroso
+
+        gasto = self._gasto(date(2020, 1, 10))
+        self.assertTrue(SaldoPropiedad.objects.get(propiedad=self.propiedad).moroso)
+        self.assertTrue(es_residente_moroso(self.dueno))
+        self.assertTrue(es_residente_moroso(self.dueno, meses_limite=2))
+        with self.assertNumQueries(0):
+            self.assertTrue(es_residente_moroso(self.dueno))
+        self.assertFalse(es_residente_moroso(self.vecino))
+
+        # El pago borra la bandera en caché del propietario
+        with self.captureOnCommitCallbacks(execute=True):
+            Pago.objects.create(gasto=gasto, usuario=self.dueno, monto_pagado=Decimal('80.00'))
+        bandera = bandera_de(self.dueno)
+        self.assertFalse(bandera.moroso)
+        self.assertIsNotNone(bandera.calculado)
+
+    def test_cambio_de_dueno_invalida_al_anterior(self):
+        from .morosos import bandera_de
+
+        self._gasto(date(2020, 1, 10))
+        self.assertTrue(bandera_de(self.dueno).moroso)
+        self.assertFalse(bandera_de(self.vecino).moroso)
+
+        self.propiedad.propietario = self.vecino
+        self.propiedad.save()
+        self.assertFalse(bandera_de(self.dueno).moroso)
+        self.assertTrue(bandera_de(self.vecino).moroso)
+
+    @override_settings(MOROSOS_CACHE_TTL=0)
+    def test_sin_cache_compartida_se_consulta_siempre(self):
+        from .morosos import bandera_de
+
+        self._gasto(date(2020, 1, 10))
+        self.assertTrue(bandera_de(self.dueno).moroso)
+        # Un cambio que no pasa por las señales se ve en la lectura siguiente
+        SaldoPropiedad.objects.update(moroso=False, vencimiento_gasto_mas_antiguo=None)
+        with self.assertNumQueries(1):
+            self.assertFalse(bandera_de(self.dueno).moroso)
+
+    def test_expensa_generada_y_vencida_marca_moroso(self):
+        from .expensas import generar_expensas
+        from .services import es_residente_moroso
+
+        with self.captureOnCommitCallbacks(execute=True):
+            generar_expensas(Decimal('80.00'), 'Expensa', date(2020, 1, 1), date(2020, 1, 10))
+        self.assertTrue(es_residente_moroso(self.dueno))
+        self.assertTrue(es_residente_moroso(self.vecino))
+
+    def test_actualizacion_nocturna_al_vencer(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from .morosos import actualizar_morosos, bandera_de
+
+        self._gasto(self.hoy + timedelta(days=5))
+        self.assertFalse(bandera_de(self.dueno).moroso)
+        self.assertEqual(actualizar_morosos(), 0)
+
+        self.assertEqual(actualizar_morosos(hoy=self.hoy + timedelta(days=6)), 1)
+        self.assertTrue(bandera_de(self.dueno).moroso)
+        # Con la fecha de hoy vuelve a no estar vencido
+        call_command('actualizar_morosos', stdout=StringIO())
+        self.assertFalse(bandera_de(self.dueno).moroso)
+
+    def test_endpoint_en_lote(self):
+        from . import morosos
+
+        self._gasto(date(2020, 1, 10))
+        url = reverse('finanzas-morosos')
+        self.client.force_authenticate(user=self.dueno)
+        self.assertEqual(self.client.get(url, {'usuarios': self.dueno.pk}).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        self.assertEqual(self.client.get(url, {'usuarios': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+        usuarios = f"{self.dueno.pk},{self.vecino.pk},{self.admin.pk}"
+        respuesta = self.client.get(url, {'usuarios': usuarios})
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertEqual({f['usuario_id']: f['moroso'] for f in respuesta.data['results']},
+                         {self.dueno.pk: True, self.vecino.pk: False, self.admin.pk: False})
+        with self.assertNumQueries(0):
+            morosos.banderas_de_usuarios([self.dueno.pk, self.vecino.pk, self.admin.pk])
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_prueba')
+class WebhookStripeTests(APITestCase):
+    """El webhook guarda cada evento una sola vez y un worker lo vincula con su pago."""
+
+    def setUp(self):
+        self.url = reverse('stripe-webhook')
+        self.dueno = User.objects.create_user(username='dueno', password='x')
+
+    def _enviar(self, payload, firma):
+        return self.client.post(self.url, data=payload, content_type='application/json', HTTP_STRIPE_SIGNATURE=firma)
+
+    def _intent(self, intent_id='pi_prueba', **extra):
+        return {'id': intent_id, 'object': 'payment_intent', 'amount': 1500,
+                'metadata': {'user_id': str(self.dueno.pk), 'description': 'Expensa'}, **extra}
+
+    def test_firma_invalida(self):
+        from .eventos_stripe import evento_firmado
+        from .models import EventoStripe
+
+        payload, firma = evento_firmado('payment_intent.succeeded', self._intent(), secreto='otro')
+        self.assertEqual(self._enviar(payload, firma).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(EventoStripe.objects.exists())
+
+    def test_reintentos_no_duplican_y_el_worker_crea_el_pago(self):
+        from tareas.models import Tarea
+        from tareas.worker import ejecutar_pendientes
+
+        from .eventos_stripe import evento_firmado
+        from .models import EventoStripe
+
+        payload, firma = evento_firmado('payment_intent.succeeded', self._intent(), evento_id='evt_1')
+        for _ in range(3):
+            self.assertEqual(self._enviar(payload, firma).status_code, status.HTTP_200_OK)
+        self.assertEqual(EventoStripe.objects.count(), 1)
+        self.assertEqual(Tarea.objects.filter(nombre='finanzas.evento_stripe').count(), 1)
+        self.assertFalse(Pago.objects.exists())
+
+        ejecutar_pendientes()
+        evento = EventoStripe.objects.get()
+        pago = Pago.objects.get(stripe_payment_intent_id='pi_prueba')
+        self.assertEqual((evento.estado, evento.pago_id), (EventoStripe.Estado.PROCESADO, pago.pk))
+        self.assertEqual((pago.monto_pagado, pago.estado_pago, pago.usuario), (Decimal('15.00'), 'COMPLETADO', self.dueno))
+
+    def test_vincula_el_pago_existente_y_se_puede_reprocesar(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+        from tareas.worker import ejecutar_pendientes
+
+        from .eventos_stripe import evento_firmado
+        from .models import EventoStripe
+
+        pago = Pago.objects.create(usuario=self.dueno, monto_pagado=Decimal('15.00'), stripe_payment_intent_id='pi_2')
+        payload, firma = evento_firmado('payment_intent.succeeded', self._intent('pi_2'), evento_id='evt_2')
+        self._enviar(payload, firma)
+        payload, firma = evento_firmado('customer.created', {'id': 'cus_1', 'object': 'customer'}, evento_id='evt_3')
+        self._enviar(payload, firma)
+        ejecutar_pendientes()
+
+        pago.refresh_from_db()
+        self.assertEqual(pago.estado_pago, 'COMPLETADO')
+        self.assertEqual(EventoStripe.objects.get(evento_id='evt_3').estado, EventoStripe.Estado.IGNORADO)
+
+        call_command('reprocesar_eventos_stripe', '--evento', 'evt_2', '--sincrono', stdout=StringIO())
+        self.assertEqual(Pago.objects.filter(stripe_payment_intent_id='pi_2').count(), 1)
+        self.assertEqual(EventoStripe.objects.get(evento_id='evt_2').pago, pago)
+
+
+class ExportacionFinanzasTests(APITestCase):
+    """Las tablas de finanzas se exportan con los filtros de su listado."""
+
+    def test_gastos_filtrados(self):
+        admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        propiedad = Propiedad.objects.create(numero_casa='X-1', propietario=admin, metros_cuadrados=50)
+        Residente.objects.create(usuario=admin, propiedad=propiedad, rol='propietario')
+        for mes in (1, 2, 3):
+            Gasto.objects.create(propiedad=propiedad, monto=Decimal('10.00'), fecha_emision=date(2030, mes, 1),
+                                 descripcion=f'Expensa {mes}', mes=mes, anio=2030)
+        self.client.force_authenticate(user=admin)
+        respuesta = self.client.get(reverse('gasto-exportar'), {'mes__gte': 2, 'ordering': 'mes'})
+        lineas = b''.join(respuesta.streaming_content).decode().splitlines()
+        self.assertEqual(len(lineas), 3)
+        self.assertEqual(lineas[1].split(',')[2], 'Expensa 2')
+
+
+@override_settings(PAGOSNET_TIMEOUT_CONEXION=1, PAGOSNET_TIMEOUT_LECTURA=0.3, PAGOSNET_REINTENTOS=2,
+                   PAGOSNET_BACKOFF_BASE=0.01, PAGOSNET_CIRCUITO_FALLOS=2, PAGOSNET_CIRCUITO_ESPERA=60)
+class PagosNetTests(APITestCase):
+    """Cliente de PagosNet (finanzas.pagosnet) contra la pasarela falsa local."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from .pagosnet_falso import PasarelaFalsa
+        cls.pasarela = PasarelaFalsa().iniciar()
+        cls.addClassCleanup(cls.pasarela.detener)
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.pasarela.modo = None
+        self.pasarela.llamadas.clear()
+        self.pasarela.conexiones.clear()
+        ajustes = override_settings(PAGOSNET_API_URL=self.pasarela.url)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.user = User.objects.create_user(username='qr', password='x', email='qr@example.com')
+        propiedad = Propiedad.objects.create(numero_casa='Q-1', propietario=self.user, metros_cuadrados=90)
+        gasto = Gasto.objects.create(propiedad=propiedad, monto=Decimal('100'), fecha_emision=date(2025, 1, 1),
+                                     descripcion='Expensa enero')
+        self.pago = Pago.objects.create(usuario=self.user, gasto=gasto, monto_pagado=Decimal('100'))
+
+    def _nueva_sesion_de_proceso(self):
+        # Como un worker nuevo: el cliente (y su pool) se crea de nuevo, la caché sigue
+        from . import pagosnet
+        pagosnet._cliente = None
+
+    def test_reutiliza_token_y_conexion(self):
+        from .services import iniciar_pago_qr
+        self._nueva_sesion_de_proceso()
+        for _ in range(3):
+            resultado = iniciar_pago_qr(self.pago.pk)
+            self.assertIn('qr_image_base64', resultado)
+        self.assertEqual(self.pasarela.llamadas['login'], 1)
+        self.assertEqual(self.pasarela.llamadas['qrpago'], 3)
+        self.assertEqual(len(self.pasarela.conexiones), 1)
+        self.pago.refresh_from_db()
+        self.assertTrue(self.pago.id_transaccion_pasarela.startswith(f"trn_{self.pago.pk}_"))
+
+        # Otro proceso usa el token de la caché compartida
+        self._nueva_sesion_de_proceso()
+        iniciar_pago_qr(self.pago.pk)
+        self.assertEqual(self.pasarela.llamadas['login'], 1)
+
+    def test_token_vencido_se_renueva_una_vez(self):
+        from .services import iniciar_pago_qr
+        iniciar_pago_qr(self.pago.pk)
+        self.pasarela.modo = 'token_vencido'
+        self.assertIn('qr_image_base64', iniciar_pago_qr(self.pago.pk))
+        self.assertEqual(self.pasarela.llamadas['login'], 2)
+
+    def test_circuito_falla_rapido_mientras_la_pasarela_cae(self):
+        from . import pagosnet
+        from .services import iniciar_pago_qr
+        self.pasarela.modo = 'caida'
+        self.assertEqual(iniciar_pago_qr(self.pago.pk)['error'], "La pasarela de pagos no está disponible.")
+        self.assertEqual(self.pasarela.llamadas['caida'], 3)  # intento + 2 reintentos
+        with self.assertLogs('finanzas.pagosnet', 'ERROR'):
+            iniciar_pago_qr(self.pago.pk)
+        self.assertTrue(pagosnet.cliente().circuito.abierto)
+
+        # Circuito abierto: ni siquiera llama a la pasarela
+        llamadas = self.pasarela.llamadas['caida']
+        self.assertIn('error', iniciar_pago_qr(self.pago.pk))
+        self.assertEqual(self.pasarela.llamadas['caida'], llamadas)
+
+        # Pasada la espera, una llamada de prueba exitosa lo cierra
+        from django.core.cache import cache
+        cache.delete(pagosnet._CLAVE_ABIERTO)
+        self.pasarela.modo = None
+        self.assertIn('qr_image_base64', iniciar_pago_qr(self.pago.pk))
+        self.assertFalse(pagosnet.cliente().circuito.abierto)
+
+    def test_timeout_de_lectura_no_cuelga_ni_reintenta_la_transaccion(self):
+        import time
+        from .services import iniciar_pago_qr
+        iniciar_pago_qr(self.pago.pk)
+        self.pasarela.modo, self.pasarela.latencia_lenta = 'lenta', 1
+        inicio = time.monotonic()
+        resultado = iniciar_pago_qr(self.pago.pk)
+        self.assertEqual(resultado['error'], "La pasarela de pagos no respondió a tiempo.")
+        self.assertLess(time.monotonic() - inicio, 0.9)
+
+
+class ClientesStripeTests(APITestCase):
+    """Customer de Stripe persistido por usuario (finanzas.stripe_service)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='cliente', password='x', email='cliente@example.com')
+        self.client.force_authenticate(user=self.user)
+        self.stripe = mock.MagicMock()
+        self.stripe.v1.customers.create.return_value = mock.Mock(id='cus_1')
+        self.stripe.v1.setup_intents.create.return_value = mock.Mock(client_secret='seti_secret', id='seti_1')
+        self.stripe.v1.payment_intents.create.return_value = mock.Mock(
+            client_secret='pi_secret', id='pi_1', amount=1500, currency='usd')
+        parche = mock.patch('finanzas.stripe_service.cliente', return_value=self.stripe)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_el_customer_se_crea_una_sola_vez(self):
+        for _ in range(2):
+            respuesta = self.client.post(reverse('stripe-setup-intent'))
+            self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        respuesta = self.client.post(reverse('stripe-payment-intent'), {'amount': 1500}, format='json')
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+
+        self.stripe.v1.customers.create.assert_called_once()
+        opciones = self.stripe.v1.customers.create.call_args.args[1]
+        self.assertEqual(opciones['idempotency_key'], f"customer-usuario-{self.user.pk}")
+        self.assertEqual(self.stripe.v1.setup_intents.create.call_args.args[0]['customer'], 'cus_1')
+        self.assertEqual(self.stripe.v1.payment_intents.create.call_args.args[0]['customer'], 'cus_1')
+        self.assertEqual(ClienteStripe.objects.get(usuario=self.user).customer_id, 'cus_1')
+
+    def test_carrera_deja_el_customer_de_la_primera_fila(self):
+        from .stripe_service import customer_de
+
+        def crear_en_paralelo(*args, **kwargs):
+            # Otra petición guardó su fila mientras esta esperaba a Stripe
+            ClienteStripe.objects.create(usuario=self.user, customer_id='cus_otro')
+            return mock.Mock(id='cus_1')
+
+        self.stripe.v1.customers.create.side_effect = crear_en_paralelo
+        self.assertEqual(customer_de(self.user), 'cus_otro')
+        self.assertEqual(ClienteStripe.objects.filter(usuario=self.user).count(), 1)
+
+    def test_comando_completa_desde_pagos_stripe_y_creando(self):
+        from io import StringIO
+        from django.core.management import call_command
+        de_pagos = User.objects.create_user(username='con_pago', email='p@example.com')
+        Pago.objects.create(usuario=de_pagos, monto_pagado=Decimal('1'), stripe_customer_id='cus_viejo')
+        Pago.objects.create(usuario=de_pagos, monto_pagado=Decimal('1'), stripe_customer_id='cus_pagos')
+        de_stripe = User.objects.create_user(username='en_stripe', email='s@example.com')
+        self.stripe.v1.customers.list.return_value.auto_paging_iter.return_value = [
+            mock.Mock(id='cus_stripe', metadata={'user_id': str(de_stripe.pk)}),
+            mock.Mock(id='cus_ajeno', metadata={'user_id': '999999'}),
+            mock.Mock(id='cus_sin_metadata', metadata={}),
+        ]
+
+        call_command('sincronizar_clientes_stripe', '--desde-stripe', '--crear', stdout=StringIO())
+
+        self.assertEqual(dict(ClienteStripe.objects.values_list('usuario__username', 'customer_id')), {
+            'con_pago': 'cus_pagos', 'en_stripe': 'cus_stripe', 'cliente': 'cus_1',
+        })
+        self.stripe.v1.customers.create.assert_called_once()
+
+
+class RecargosTests(APITestCase):
+    """Recargos por mora calculados en lote (finanzas.recargos)."""
+
+    def setUp(self):
+        self.dueno = User.objects.create_user(username='moroso_rec', password='x')
+        self.casa = Propiedad.objects.create(numero_casa='R-1', propietario=self.dueno, metros_cuadrados=70)
+        otra = Propiedad.objects.create(numero_casa='R-2', propietario=self.dueno, metros_cuadrados=70)
+        self.corte = date(2025, 6, 30)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gasto = Gasto.objects.create(propiedad=self.casa, monto=Decimal('1000'), fecha_emision=date(2025, 5, 1),
+                                              fecha_vencimiento=date(2025, 5, 21))  # 40 días de atraso
+            Gasto.objects.create(propiedad=otra, monto=Decimal('500'), fecha_emision=date(2025, 5, 1),
+                                 fecha_vencimiento=date(2025, 5, 21), pagado=True)
+            Gasto.objects.create(propiedad=otra, monto=Decimal('500'), fecha_emision=date(2025, 6, 1),
+                                 fecha_vencimiento=date(2025, 7, 10))  # aún no vence
+
+    def _aplicar(self, corte, **regla):
+        from .recargos import Regla, aplicar_recargos
+        with self.captureOnCommitCallbacks(execute=True):
+            return aplicar_recargos(corte, Regla(**regla))
+
+    def test_recargo_mensual_idempotente_y_acumulado_con_tope(self):
+        from tareas.models import Tarea
+        resultado = self._aplicar(self.corte, tipo='mensual', tasa=Decimal('0.02'), tope=Decimal('0.05'))
+        self.assertEqual((resultado.creados, resultado.total), (1, Decimal('40')))  # 2 meses (o fracción)
+        recargo = Multa.objects.get(gasto_origen=self.gasto)
+        self.assertEqual((recargo.propiedad, recargo.mes, recargo.anio), (self.casa, 6, 2025))
+        self.assertEqual(SaldoPropiedad.objects.get(propiedad=self.casa).saldo_multas, Decimal('40'))
+        self.assertEqual(Tarea.objects.filter(nombre='notificaciones.notificar_propiedades').count(), 1)
+
+        # Repetir el corte del mismo mes no cobra de nuevo
+        resultado = self._aplicar(self.corte, tipo='mensual', tasa=Decimal('0.02'), tope=Decimal('0.05'))
+        self.assertEqual((resultado.creados, resultado.omitidos), (0, 1))
+
+        # Un mes después: 3 meses = 60, con tope del 5 % = 50; se cobra solo la diferencia
+        self._aplicar(date(2025, 7, 30), tipo='mensual', tasa=Decimal('0.02'), tope=Decimal('0.05'))
+        self.assertEqual(
+            list(Multa.objects.filter(gasto_origen=self.gasto).order_by('mes').values_list('monto', flat=True)),
+            [Decimal('40.00'), Decimal('10.00')],
+        )
+        # Al tope: el gasto ya no genera recargos
+        self._aplicar(date(2025, 9, 30), tipo='mensual', tasa=Decimal('0.02'), tope=Decimal('0.05'))
+        self.assertEqual(Multa.objects.filter(gasto_origen=self.gasto).count(), 2)
+
+    def test_recargo_diario_con_dias_de_gracia(self):
+        self._aplicar(self.corte, tipo='diario', tasa=Decimal('0.001'), dias_gracia=10)
+        self.assertEqual(Multa.objects.get(gasto_origen=self.gasto).monto, Decimal('30.00'))  # 30 días x 1
+
+    def test_comando_simula_y_aplica(self):
+        from io import StringIO
+        from django.core.management import call_command
+        salida = StringIO()
+        call_command('aplicar_recargos', '--corte', '2025-06-30', '--simular', stdout=salida)
+        self.assertIn('1 gastos con recargo', salida.getvalue())
+        self.assertFalse(Multa.objects.exists())
+        call_command('aplicar_recargos', '--corte', '2025-06-30', '--tipo', 'diario', '--tasa', '0.001',
+                     '--dias-gracia', '0', '--sin-notificar', stdout=StringIO())
+        self.assertEqual(Multa.objects.get(gasto_origen=self.gasto).monto, Decimal('40.00'))
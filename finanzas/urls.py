@@ -5,13 +5,13 @@ from .views import (
     # viewsets
     GastoViewSet, PagoViewSet, MultaViewSet, PagoMultaViewSet, ReservaViewSet,
     # comprobantes
-    ReciboPagoPDFView, ReciboPagoMultaPDFView,
+    ReciboPagoPDFView, ReciboPagoMultaPDFView, RecibosDelPeriodoView,
     # reportes
-    ReporteMorosidadView, ReporteResumenView,
+    ReporteMorosidadView, ReporteResumenView, BanderasMorososView,
     # pagos / reservas
     IniciarPagoView, SimularPagoView, WebhookConfirmacionPagoView, PagarReservaView,
     # utilidades finanzas
-    GenerarExpensasView, EstadoDeCuentaView,
+    GenerarExpensasView, GenerarEstadosDeCuentaView, EstadoDeCuentaView,
     EgresoViewSet, IngresoViewSet, ReporteFinancieroView,ReporteUsoAreasComunesView 
 )
 
@@ -38,10 +38,12 @@ urlpatterns = [
     # Comprobantes
     path("pagos/<int:pago_id>/comprobante/", ReciboPagoPDFView.as_view(), name="finanzas-pago-comprobante"),
     path("pagos-multas/<int:pago_multa_id>/comprobante/", ReciboPagoMultaPDFView.as_view(), name="finanzas-pago-multa-comprobante"),
+    path("recibos/periodo/", RecibosDelPeriodoView.as_view(), name="finanzas-recibos-periodo"),
 
     # Reportes
     path("reportes/estado-morosidad/", ReporteMorosidadView.as_view(), name="finanzas-reporte-morosidad"),
     path("reportes/resumen/", ReporteResumenView.as_view(), name="finanzas-reporte-resumen"),
+    path("morosos/", BanderasMorososView.as_view(), name="finanzas-morosos"),
 
     # Pasarela (demo)
    # path("pagos/<int:pago_id>/iniciar/", IniciarPagoView.as_view(), name="iniciar-pago"),
@@ -54,6 +56,7 @@ urlpatterns = [
     # Utilidades admin/usuario
     path("expensas/generar/", GenerarExpensasView.as_view(), name="generar-expensas"),
     path("estado-de-cuenta/", EstadoDeCuentaView.as_view(), name="estado-de-cuenta"),
+    path("estados-de-cuenta/generar/", GenerarEstadosDeCuentaView.as_view(), name="generar-estados-de-cuenta"),
     
     # URLs para Flutter App
     path("estado-cuenta-unificado/", EstadoDeCuentaView.as_view(), name="estado-cuenta-unificado"),
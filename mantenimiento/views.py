@@ -7,6 +7,7 @@ from .serializers import (
     PersonalMantenimientoSerializer,
     SolicitudMantenimientoSerializer,
 )
+from usuarios.contexto import contexto_de
 from usuarios.permissions import IsPropietario, IsPersonalMantenimiento
 
 
@@ -66,25 +67,18 @@ class SolicitudMantenimientoViewSet(viewsets.ModelViewSet):
         - RESIDENTE: Ve solo solicitudes que él creó
         """
         user = self.request.user
-        
-        try:
-            if user.profile.role == 'PROPIETARIO':
-                # El propietario ve todas las solicitudes
-                return SolicitudMantenimiento.objects.select_related(
-                    "propiedad", "asignado_a", "solicitado_por"
-                ).all()
-            elif user.profile.role == 'MANTENIMIENTO':
-                # Personal de mantenimiento ve solicitudes asignadas a él
-                return SolicitudMantenimiento.objects.select_related(
-                    "propiedad", "asignado_a", "solicitado_por"
-                ).filter(asignado_a=user)
-            else:
-                # Residentes ven solo las solicitudes que crearon
-                return SolicitudMantenimiento.objects.select_related(
-                    "propiedad", "asignado_a", "solicitado_por"
-                ).filter(solicitado_por=user)
-        except:
-            return SolicitudMantenimiento.objects.none()
+        ctx = contexto_de(self.request)
+        queryset = SolicitudMantenimiento.objects.select_related(
+            "propiedad", "asignado_a", "solicitado_por"
+        )
+        if ctx.es_propietario:
+            # El propietario ve todas las solicitudes
+            return queryset.all()
+        if ctx.es_mantenimiento:
+            # Personal de mantenimiento ve solicitudes asignadas a él
+            return queryset.filter(asignado_a=user)
+        # Residentes ven solo las solicitudes que crearon
+        return queryset.filter(solicitado_por=user)
 
     def get_permissions(self):
         # Personal de mantenimiento puede gestionar solicitudes asignadas
@@ -0,0 +1,48 @@
+# notificaciones/tareas.py
+"""Tareas en segundo plano de notificaciones (ver tareas.registro)."""
+from django.db.models import Q
+
+from tareas.registro import tarea
+
+from .models import DeviceToken
+from .services import send_push
+
+# Máximo de destinatarios por envío (límite de multicast de FCM)
+LOTE_TOKENS = 500
+
+
+def _enviar_por_lotes(tokens, titulo, mensaje, data):
+    tokens = list(tokens)
+    enviados = 0
+    for i in range(0, len(tokens), LOTE_TOKENS):
+        enviados += send_push(tokens[i:i + LOTE_TOKENS], titulo, mensaje, data or {}).get("sent", 0)
+    return {"dispositivos": len(tokens), "enviados": enviados}
+
+
+@tarea("notificaciones.notificar_todos")
+def notificar_todos(titulo, mensaje, data=None):
+    """Envía un push a todos los dispositivos activos de usuarios activos."""
+    tokens = (
+        DeviceToken.objects
+        .filter(active=True, user__is_active=True)
+        .values_list("token", flat=True)
+        .order_by("id")
+    )
+    return _enviar_por_lotes(tokens, titulo, mensaje, data)
+
+
+@tarea("notificaciones.notificar_propiedades")
+def notificar_propiedades(propiedades_ids, titulo, mensaje, data=None):
+    """
+    Envía un mismo push a propietarios y residentes de varias propiedades,
+    con una sola consulta de tokens (p. ej. tras generar las expensas).
+    """
+    tokens = (
+        DeviceToken.objects
+        .filter(active=True, user__is_active=True)
+        .filter(Q(user__propiedad__in=propiedades_ids) | Q(user__residente__propiedad__in=propiedades_ids))
+        .values_list("token", flat=True)
+        .order_by("id")
+        .distinct()
+    )
+    return _enviar_por_lotes(tokens, titulo, mensaje, data)
@@ -0,0 +1,42 @@
+# seguridad/consumers.py
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .services.gate import GRUPO_GATE, resumen_gate
+
+
+class GateDashboardConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Dashboard del gate en tiempo real.
+    ws://<host>/ws/seguridad/gate/?token=<key>
+
+    Al conectar envía ``{"tipo": "resumen", "resumen": {...}}`` (lo mismo que
+    GET /api/seguridad/gate/dashboard/) y después un ``{"tipo": "evento", ...}``
+    por cada EventoSeguridad nuevo, con el incremento de los contadores del
+    día en ``delta``. El cliente puede pedir otra foto completa enviando
+    ``{"accion": "resumen"}``.
+    """
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        await self.channel_layer.group_add(GRUPO_GATE, self.channel_name)
+        await self.accept()
+        await self._enviar_resumen()
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(GRUPO_GATE, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get("accion") == "resumen":
+            await self._enviar_resumen()
+
+    async def gate_evento(self, event):
+        await self.send_json(event["mensaje"])
+
+    async def _enviar_resumen(self):
+        resumen = await database_sync_to_async(resumen_gate)()
+        await self.send_json({"tipo": "resumen", "resumen": resumen})
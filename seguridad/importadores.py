@@ -0,0 +1,44 @@
+# seguridad/importadores.py
+"""Importadores de CSV de seguridad (ver config.importacion)."""
+from condominio.models import Propiedad
+from config.importacion import FilaInvalida, Importador, buscar, mapa, obligatorio, registrar
+
+from .models import Vehiculo
+
+
+def _placa(texto):
+    # Igual que Vehiculo.save, que bulk_create no llama
+    return texto.strip().upper()
+
+
+@registrar
+class ImportadorVehiculos(Importador):
+    """Vehículos de residentes: ``placa,numero_casa``."""
+    tipo = 'vehiculos'
+    columnas = ('placa', 'numero_casa')
+
+    def __init__(self):
+        # placa -> línea donde apareció por primera vez en el archivo
+        self.placas_vistas = {}
+
+    def preparar(self, filas):
+        placas = {_placa(fila['placa']) for fila in filas} - {''}
+        return {
+            'casas': mapa(Propiedad, 'numero_casa', filas),
+            'registradas': set(Vehiculo.objects.filter(placa__in=placas).values_list('placa', flat=True)),
+        }
+
+    def convertir(self, fila, lote):
+        placa = _placa(obligatorio(fila, 'placa'))
+        if len(placa) > Vehiculo._meta.get_field('placa').max_length:
+            raise FilaInvalida(f"La placa '{placa}' es demasiado larga.")
+        if placa in lote['registradas']:
+            raise FilaInvalida(f"La placa '{placa}' ya está registrada.")
+        if placa in self.placas_vistas:
+            raise FilaInvalida(f"La placa '{placa}' está repetida (línea {self.placas_vistas[placa]}).")
+        propiedad_id = buscar(lote['casas'], fila, 'numero_casa', 'la casa')
+        self.placas_vistas[placa] = fila.linea
+        return Vehiculo(placa=placa, propiedad_id=propiedad_id)
+
+    def guardar(self, vehiculos):
+        return len(Vehiculo.objects.bulk_create(vehiculos))
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:12
+
+from django.db import migrations, models
+
+
+def normalizar_placas(apps, schema_editor):
+    """
+    Pasa las placas existentes a mayúsculas. Las que solo difieren en
+    mayúsculas son el mismo vehículo: se fusionan en la que ya estaba en
+    mayúsculas (o la más antigua), que hereda sus eventos y, si no tenía, su
+    propiedad o visitante.
+
+    Si las de un grupo están asignadas a distintas propiedades o visitantes no
+    se puede elegir una sin perder datos: la migración se aborta antes de tocar
+    ninguna fila y lista esas placas para resolverlas a mano.
+    """
+    Vehiculo = apps.get_model('seguridad', 'Vehiculo')
+    EventoSeguridad = apps.get_model('seguridad', 'EventoSeguridad')
+    grupos = {}
+    for vehiculo in Vehiculo.objects.order_by('id'):
+        grupos.setdefault((vehiculo.placa or '').strip().upper(), []).append(vehiculo)
+
+    conflictos = {
+        placa: vehiculos for placa, vehiculos in grupos.items()
+        if len({(v.propiedad_id, v.visitante_id) for v in vehiculos} - {(None, None)}) > 1
+    }
+    if conflictos:
+        detalle = "; ".join(
+            f"{placa}: " + ", ".join(
+                f"#{v.pk} {v.placa!r} (propiedad={v.propiedad_id}, visitante={v.visitante_id})" for v in vehiculos
+            )
+            for placa, vehiculos in sorted(conflictos.items())
+        )
+        raise RuntimeError(
+            "Placas que solo difieren en mayúsculas pero están asignadas a distintas propiedades o "
+            f"visitantes; unifíquelas o corríjalas a mano antes de migrar: {detalle}"
+        )
+
+    for placa, vehiculos in grupos.items():
+        if len(vehiculos) == 1:
+            if vehiculos[0].placa != placa:
+                Vehiculo.objects.filter(pk=vehiculos[0].pk).update(placa=placa)
+            continue
+        vehiculos.sort(key=lambda v: (v.placa != placa, v.pk))
+        principal, duplicados = vehiculos[0], vehiculos[1:]
+        asignaciones = {(v.propiedad_id, v.visitante_id) for v in vehiculos} - {(None, None)}
+        if asignaciones and (principal.propiedad_id, principal.visitante_id) == (None, None):
+            principal.propiedad_id, principal.visitante_id = asignaciones.pop()
+        ids = [v.pk for v in duplicados]
+        EventoSeguridad.objects.filter(vehiculo_registrado_id__in=ids).update(vehiculo_registrado_id=principal.pk)
+        Vehiculo.objects.filter(pk__in=ids).delete()
+        Vehiculo.objects.filter(pk=principal.pk).update(
+            placa=placa, propiedad_id=principal.propiedad_id, visitante_id=principal.visitante_id,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0005_alter_aviso_options_aviso_activo_aviso_dirigido_a_and_more'),
+        ('seguridad', '0006_visita_estado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventoseguridad',
+            index=models.Index(fields=['fecha_hora', 'accion'], name='evento_fecha_accion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visita',
+            index=models.Index(fields=['ingreso_real', 'salida_real'], name='visita_ingreso_salida_idx'),
+        ),
+        migrations.RunPython(normalizar_placas, migrations.RunPython.noop),
+    ]
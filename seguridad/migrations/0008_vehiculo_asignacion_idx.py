@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0005_alter_aviso_options_aviso_activo_aviso_dirigido_a_and_more'),
+        ('seguridad', '0007_indices_y_placas_mayusculas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['propiedad', 'visitante'], name='vehiculo_asignacion_idx'),
+        ),
+    ]
@@ -25,6 +25,18 @@ class Vehiculo(models.Model):
         related_name="vehiculos"
     )
 
+    class Meta:
+        indexes = [
+            # Conteo de vehículos por tipo (gate dashboard) solo desde el índice
+            models.Index(fields=["propiedad", "visitante"], name="vehiculo_asignacion_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Placas siempre en mayúsculas: permite buscarlas por igualdad (con índice)
+        if self.placa:
+            self.placa = self.placa.strip().upper()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.placa
 
@@ -68,6 +80,10 @@ class Visita(models.Model):
 
     class Meta:
         ordering = ("-fecha_ingreso_programado",)
+        indexes = [
+            # Visitas abiertas / vencidas: ingreso_real no nulo y salida_real nula
+            models.Index(fields=["ingreso_real", "salida_real"], name="visita_ingreso_salida_idx"),
+        ]
 
     def __str__(self):
         return f"{self.visitante} → {self.propiedad} ({self.estado})"
@@ -108,6 +124,9 @@ class EventoSeguridad(models.Model):
         verbose_name = "Evento de Seguridad IA"
         verbose_name_plural = "Eventos de Seguridad IA"
         ordering = ['-fecha_hora']
+        indexes = [
+            models.Index(fields=['fecha_hora', 'accion'], name='evento_fecha_accion_idx'),
+        ]
 
     def __str__(self):
         return f"[{self.fecha_hora.strftime('%Y-%m-%d %H:%M')}] {self.accion}: {self.placa_detectada}"
@@ -0,0 +1,9 @@
+# seguridad/routing.py
+
+from django.urls import path
+
+from .consumers import GateDashboardConsumer
+
+websocket_urlpatterns = [
+    path("ws/seguridad/gate/", GateDashboardConsumer.as_asgi()),
+]
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from .models import Visitante, Vehiculo, Visita
 
 
@@ -14,7 +15,17 @@ class VisitanteSerializer(serializers.ModelSerializer):
         fields = ["id", "nombre_completo", "documento", "telefono", "email"]
 
 
+class PlacaField(serializers.CharField):
+    """Placa en mayúsculas, como la guarda ``Vehiculo.save``, antes de sus validadores."""
+
+    def to_internal_value(self, data):
+        return super().to_internal_value(data).upper()
+
+
 class VehiculoSerializer(serializers.ModelSerializer):
+    # La unicidad se comprueba con la placa ya normalizada: "abc123" choca con "ABC123"
+    placa = PlacaField(max_length=20, validators=[UniqueValidator(queryset=Vehiculo.objects.all())])
+
     class Meta:
         model = Vehiculo
         fields = ["id", "placa", "propiedad", "visitante"]
@@ -0,0 +1,165 @@
+# seguridad/services/gate.py
+"""
+Estado del dashboard del gate y su publicación en tiempo real.
+
+``resumen_gate`` calcula la foto completa que devuelve ``GateDashboardView``
+(y que recibe un socket al conectarse). Después, cada ``EventoSeguridad``
+nuevo se publica al grupo ``GRUPO_GATE`` junto con el incremento de los
+contadores del día, para que las pantallas de guardia se actualicen sin
+volver a consultar.
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import async_to_sync
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ..models import EventoSeguridad, Vehiculo
+
+logger = logging.getLogger(__name__)
+
+GRUPO_GATE = "gate_dashboard"
+
+_EVENTOS_CON_VEHICULO = ('vehiculo_registrado__propiedad', 'vehiculo_registrado__visitante')
+
+
+def rango_del_dia(fecha):
+    """
+    ``(inicio, fin)`` del día local como datetimes aware. Filtrar por rango en
+    vez de ``__date`` permite usar los índices sobre la columna.
+    """
+    inicio = timezone.make_aware(datetime.combine(fecha, time.min))
+    return inicio, inicio + timedelta(days=1)
+
+
+def tiempo_relativo(fecha_evento, ahora):
+    """Convierte timestamp a tiempo relativo legible"""
+    diff = ahora - fecha_evento
+
+    if diff.total_seconds() < 60:
+        return f"Hace {int(diff.total_seconds())} segundos"
+    elif diff.total_seconds() < 3600:
+        return f"Hace {int(diff.total_seconds() / 60)} minutos"
+    elif diff.total_seconds() < 86400:
+        return f"Hace {int(diff.total_seconds() / 3600)} horas"
+    else:
+        return f"Hace {diff.days} días"
+
+
+def evento_a_dict(evento, ahora):
+    """Evento como aparece en ``ultimos_eventos`` (espera el vehículo con select_related)."""
+    vehiculo_info = "No registrado"
+    if evento.vehiculo_registrado:
+        if evento.vehiculo_registrado.propiedad:
+            vehiculo_info = f"Residente - {evento.vehiculo_registrado.propiedad.numero_casa}"
+        elif evento.vehiculo_registrado.visitante:
+            vehiculo_info = f"Visitante - {evento.vehiculo_registrado.visitante.nombre_completo}"
+        else:
+            vehiculo_info = "Vehículo sin asignar"
+
+    return {
+        "id": evento.id,
+        "timestamp": evento.fecha_hora.isoformat(),
+        "placa": evento.placa_detectada,
+        "tipo_evento": evento.tipo_evento,
+        "accion": evento.accion,
+        "motivo": evento.motivo,
+        "vehiculo_info": vehiculo_info,
+        "tiempo_relativo": tiempo_relativo(evento.fecha_hora, ahora),
+    }
+
+
+def resumen_gate(modo="PRODUCCION"):
+    """Estado completo del gate (4 consultas)."""
+    ahora = timezone.now()
+    inicio_hoy, fin_hoy = rango_del_dia(timezone.localdate())
+
+    # Estadísticas de hoy (una sola consulta)
+    eventos_hoy = EventoSeguridad.objects.filter(fecha_hora__gte=inicio_hoy, fecha_hora__lt=fin_hoy)
+    stats_hoy = eventos_hoy.aggregate(
+        total=Count('id'),
+        permitidos=Count('id', filter=Q(accion='PERMITIDO')),
+        denegados=Count('id', filter=Q(accion='DENEGADO')),
+    )
+
+    # Últimos eventos (últimos 10)
+    ultimos_eventos = (EventoSeguridad.objects
+                       .select_related(*_EVENTOS_CON_VEHICULO)
+                       .order_by('-fecha_hora')[:10])
+
+    # Estadísticas por placas más frecuentes
+    placas_frecuentes = (eventos_hoy
+                         .values('placa_detectada')
+                         .annotate(total=Count('id'))
+                         .order_by('-total')[:5])
+
+    # Vehículos registrados (una sola consulta)
+    vehiculos = Vehiculo.objects.aggregate(
+        total=Count('id'),
+        residentes=Count('id', filter=Q(propiedad__isnull=False)),
+        visitantes=Count('id', filter=Q(visitante__isnull=False)),
+    )
+
+    return {
+        "timestamp": ahora.isoformat(),
+        "fecha": timezone.localdate().isoformat(),
+        "estadisticas_hoy": {
+            "total_eventos": stats_hoy['total'],
+            "accesos_permitidos": stats_hoy['permitidos'],
+            "accesos_denegados": stats_hoy['denegados'],
+            "porcentaje_exito": round((stats_hoy['permitidos'] / max(stats_hoy['total'], 1)) * 100, 2)
+        },
+        "vehiculos_registrados": {
+            "total": vehiculos['total'],
+            "residentes": vehiculos['residentes'],
+            "visitantes": vehiculos['visitantes'],
+            "sin_asignar": vehiculos['total'] - vehiculos['residentes'] - vehiculos['visitantes']
+        },
+        "ultimos_eventos": [evento_a_dict(evento, ahora) for evento in ultimos_eventos],
+        "placas_frecuentes_hoy": list(placas_frecuentes),
+        "sistema": {
+            "estado": "ACTIVO",
+            "version": "1.0.0",
+            "modo": modo,
+        }
+    }
+
+
+def mensaje_evento(evento):
+    """
+    Mensaje para los dashboards suscritos: el evento y cuánto suma a los
+    contadores de ``estadisticas_hoy``. ``fecha`` permite al cliente reiniciar
+    los contadores al cambiar de día.
+    """
+    return {
+        "tipo": "evento",
+        "fecha": timezone.localtime(evento.fecha_hora).date().isoformat(),
+        "evento": evento_a_dict(evento, timezone.now()),
+        "delta": {
+            "total_eventos": 1,
+            "accesos_permitidos": int(evento.accion == EventoSeguridad.AccionTomada.PERMITIDO),
+            "accesos_denegados": int(evento.accion == EventoSeguridad.AccionTomada.DENEGADO),
+            "placa": evento.placa_detectada,
+        },
+    }
+
+
+def publicar_evento(evento_id):
+    """Envía el evento al grupo del gate. Sin capa de canales configurada no hace nada."""
+    from channels.layers import get_channel_layer
+
+    capa = get_channel_layer()
+    if capa is None:
+        return
+    evento = (EventoSeguridad.objects
+              .select_related(*_EVENTOS_CON_VEHICULO)
+              .filter(pk=evento_id)
+              .first())
+    if evento is None:
+        return
+    try:
+        async_to_sync(capa.group_send)(GRUPO_GATE, {"type": "gate.evento", "mensaje": mensaje_evento(evento)})
+    except Exception:
+        # El dashboard es secundario: un Redis caído no debe romper el registro del acceso
+        logger.exception("No se pudo publicar el evento de seguridad %s", evento_id)
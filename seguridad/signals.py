@@ -0,0 +1,15 @@
+# seguridad/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import EventoSeguridad
+from .services.gate import publicar_evento
+
+
+@receiver(post_save, sender=EventoSeguridad)
+def publicar_evento_en_gate(sender, instance, created, **kwargs):
+    """Empuja cada evento nuevo a los dashboards conectados (tras el commit)."""
+    if created:
+        transaction.on_commit(lambda: publicar_evento(instance.pk))
@@ -0,0 +1,14 @@
+# seguridad/tareas.py
+"""Tareas en segundo plano de seguridad (ver tareas.registro)."""
+import io
+
+from django.core.management import call_command
+
+from tareas.registro import tarea
+
+
+@tarea("seguridad.cerrar_visitas_vencidas")
+def cerrar_visitas_vencidas():
+    salida = io.StringIO()
+    call_command('cerrar_visitas_vencidas', stdout=salida)
+    return {"detalle": salida.getvalue().strip()}
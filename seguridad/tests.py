@@ -1,13 +1,21 @@
 # en seguridad/tests.py
 
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from django.test import TransactionTestCase
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.utils import timezone
-from .models import Visita, Visitante
-from usuarios.models import Residente
+from datetime import timedelta
+from django.conf import settings
+from config.testing import PlanDeConsultasMixin, PresupuestoConsultasMixin
+from .models import Visita, Visitante, Vehiculo, EventoSeguridad
+from usuarios.models import Residente, UserProfile
 from condominio.models import Propiedad
+from config.asgi import application
 
 class SeguridadAPITests(APITestCase):
 
@@ -46,4 +54,206 @@ class SeguridadAPITests(APITestCase):
         response = self.client.patch(detail_url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         visita.refresh_from_db()
-        self.assertIsNotNone(visita.ingreso_real)
\ No newline at end of file
+        self.assertIsNotNone(visita.ingreso_real)
+
+
+class PlanDeConsultasSeguridadTests(PlanDeConsultasMixin, APITestCase):
+    """El gate y el control por IA no deben recorrer tablas completas."""
+
+    def setUp(self):
+        self.guardia = User.objects.create_user(username='guardia', password='x', is_staff=True)
+        self.propiedad = Propiedad.objects.create(numero_casa='G-1', propietario=self.guardia, metros_cuadrados=90)
+        self.visitante = Visitante.objects.create(nombre_completo='Visitante', documento='111')
+        Vehiculo.objects.create(placa='res001', propiedad=self.propiedad)
+        Vehiculo.objects.create(placa='VIS001', visitante=self.visitante)
+        ahora = timezone.now()
+        Visita.objects.create(
+            visitante=self.visitante, propiedad=self.propiedad,
+            fecha_ingreso_programado=ahora - timedelta(hours=1),
+            fecha_salida_programada=ahora + timedelta(hours=1),
+        )
+        for i in range(30):
+            EventoSeguridad.objects.create(
+                tipo_evento='INGRESO', placa_detectada=f'P{i % 5}',
+                accion='PERMITIDO' if i % 2 else 'DENEGADO', motivo='test',
+            )
+
+    def test_placa_se_guarda_en_mayusculas(self):
+        self.assertTrue(Vehiculo.objects.filter(placa='RES001').exists())
+
+    def test_placa_repetida_en_minusculas_es_un_400(self):
+        self.guardia.profile.role = UserProfile.Role.PROPIETARIO
+        self.guardia.profile.save()
+        self.client.force_authenticate(user=self.guardia)
+        respuesta = self.client.post(reverse('seguridad:vehiculo-list'), {'placa': ' vis001 '}, format='json')
+        self.assertEqual(respuesta.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('placa', respuesta.data)
+
+    def test_migracion_fusiona_placas_que_solo_difieren_en_mayusculas(self):
+        from importlib import import_module
+
+        from django.apps import apps
+
+        migracion = import_module('seguridad.migrations.0007_indices_y_placas_mayusculas')
+        principal = Vehiculo.objects.get(placa='VIS001')
+        # Filas anteriores a la normalización (save() las pasaría a mayúsculas)
+        Vehiculo.objects.filter(placa='RES001').update(placa='res002')
+        Vehiculo.objects.bulk_create([Vehiculo(placa='vis001'), Vehiculo(placa='Vis001')])
+        duplicado = Vehiculo.objects.get(placa='vis001')
+        evento = EventoSeguridad.objects.create(tipo_evento='INGRESO', placa_detectada='vis001', accion='PERMITIDO',
+                                                motivo='test', vehiculo_registrado=duplicado)
+
+        migracion.normalizar_placas(apps, None)
+        self.assertEqual(sorted(Vehiculo.objects.values_list('placa', flat=True)), ['RES002', 'VIS001'])
+        evento.refresh_from_db()
+        self.assertEqual(evento.vehiculo_registrado_id, principal.pk)
+
+    def test_migracion_no_fusiona_placas_de_distintos_duenos(self):
+        from importlib import import_module
+
+        from django.apps import apps
+
+        migracion = import_module('seguridad.migrations.0007_indices_y_placas_mayusculas')
+        otra = Propiedad.objects.create(numero_casa='G-2', propietario=self.guardia, metros_cuadrados=80)
+        Vehiculo.objects.bulk_create([Vehiculo(placa='res001', propiedad=otra), Vehiculo(placa='vis001')])
+        antes = sorted(Vehiculo.objects.values_list('pk', 'placa'))
+
+        with self.assertRaisesMessage(RuntimeError, 'RES001'):
+            migracion.normalizar_placas(apps, None)
+        self.assertEqual(sorted(Vehiculo.objects.values_list('pk', 'placa')), antes)
+
+    def test_gate_dashboard_sin_escaneo_completo(self):
+        self.client.force_authenticate(user=self.guardia)
+        with self.assertSinEscaneoCompleto():
+            response = self.client.get(reverse('seguridad:gate-dashboard'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['estadisticas_hoy']['total_eventos'], 30)
+
+    def test_ia_control_vehicular_sin_escaneo_completo(self):
+        url = reverse('seguridad:ia-control-vehicular')
+        headers = {'HTTP_X_API_KEY': settings.SECURITY_API_KEY}
+        with self.assertSinEscaneoCompleto():
+            residente = self.client.post(url, {'placa': 'res001', 'tipo': 'INGRESO'}, format='json', **headers)
+            visitante = self.client.post(url, {'placa': 'VIS001', 'tipo': 'INGRESO'}, format='json', **headers)
+        self.assertEqual(residente.status_code, status.HTTP_200_OK)
+        self.assertEqual(visitante.status_code, status.HTTP_200_OK)
+
+
+class PresupuestoConsultasSeguridadTests(PresupuestoConsultasMixin, APITestCase):
+
+    def setUp(self):
+        self.guardia = User.objects.create_user(username='guardia', password='x', is_staff=True)
+        self.propiedad = Propiedad.objects.create(numero_casa='G-1', propietario=self.guardia, metros_cuadrados=90)
+        self.client.force_authenticate(user=self.guardia)
+        self.creados = 0
+
+    def _sembrar_eventos(self, n):
+        for _ in range(n):
+            self.creados += 1
+            visitante = Visitante.objects.create(nombre_completo=f'Visitante {self.creados}', documento=str(self.creados))
+            de_residente = Vehiculo.objects.create(placa=f'R{self.creados}', propiedad=self.propiedad)
+            de_visitante = Vehiculo.objects.create(placa=f'V{self.creados}', visitante=visitante)
+            for vehiculo in (de_residente, de_visitante):
+                EventoSeguridad.objects.create(
+                    tipo_evento='INGRESO', placa_detectada=vehiculo.placa,
+                    accion='PERMITIDO', motivo='test', vehiculo_registrado=vehiculo,
+                )
+
+    def test_presupuesto_gate_dashboard(self):
+        self.assertPresupuestoConsultas('seguridad:gate-dashboard', self._sembrar_eventos)
+
+
+class GateDashboardWebSocketTests(TransactionTestCase):
+    """Dashboard del gate por WebSocket (capa de canales en memoria)."""
+
+    def setUp(self):
+        self.guardia = User.objects.create_user(username='guardia', password='x', is_staff=True)
+        self.token = Token.objects.create(user=self.guardia)
+
+    def _conectar(self, token):
+        return WebsocketCommunicator(application, f'/ws/seguridad/gate/?token={token}')
+
+    async def test_rechaza_sin_token_valido(self):
+        comunicador = self._conectar('no-existe')
+        conectado, _ = await comunicador.connect()
+        self.assertFalse(conectado)
+
+    async def test_recibe_resumen_y_eventos_nuevos(self):
+        comunicador = self._conectar(self.token.key)
+        conectado, _ = await comunicador.connect()
+        self.assertTrue(conectado)
+
+        inicial = await comunicador.receive_json_from()
+        self.assertEqual(inicial['tipo'], 'resumen')
+        self.assertEqual(inicial['resumen']['estadisticas_hoy']['total_eventos'], 0)
+
+        await database_sync_to_async(EventoSeguridad.objects.create)(
+            tipo_evento='INGRESO', placa_detectada='ABC123', accion='DENEGADO', motivo='Placa no encontrada'
+        )
+        mensaje = await comunicador.receive_json_from()
+        self.assertEqual(mensaje['tipo'], 'evento')
+        self.assertEqual(mensaje['evento']['placa'], 'ABC123')
+        self.assertEqual(mensaje['delta'], {
+            'total_eventos': 1, 'accesos_permitidos': 0, 'accesos_denegados': 1, 'placa': 'ABC123',
+        })
+
+        await comunicador.send_json_to({'accion': 'resumen'})
+        resumen = await comunicador.receive_json_from()
+        self.assertEqual(resumen['resumen']['estadisticas_hoy']['accesos_denegados'], 1)
+        await comunicador.disconnect()
+
+
+class ExportacionTests(APITestCase):
+    """Exportación en streaming (CSV, NDJSON, gzip) con los filtros del listado."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.url = reverse('seguridad:eventoseguridad-exportar')
+        for i in range(5):
+            EventoSeguridad.objects.create(
+                tipo_evento='INGRESO', placa_detectada=f'ABC{i}', motivo='Placa registrada',
+                accion='PERMITIDO' if i % 2 else 'DENEGADO',
+            )
+
+    def _contenido(self, respuesta):
+        return b''.join(respuesta.streaming_content)
+
+    def test_csv_con_filtros_del_listado(self):
+        import csv
+        import io
+
+        self.client.force_authenticate(user=self.admin)
+        respuesta = self.client.get(self.url, {'accion': 'DENEGADO', 'ordering': 'fecha_hora'})
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertTrue(respuesta.streaming)
+        self.assertIn('eventoseguridad.csv', respuesta['Content-Disposition'])
+        filas = list(csv.reader(io.StringIO(self._contenido(respuesta).decode())))
+        self.assertEqual(filas[0][:3], ['id', 'fecha_hora', 'tipo_evento'])
+        self.assertEqual([f[4] for f in filas[1:]], ['ABC0', 'ABC2', 'ABC4'])
+
+    def test_ndjson_comprimido(self):
+        import gzip
+        import json
+
+        self.client.force_authenticate(user=self.admin)
+        respuesta = self.client.get(self.url, {'formato': 'ndjson', 'gzip': '1'})
+        self.assertEqual(respuesta['Content-Type'], 'application/gzip')
+        lineas = gzip.decompress(self._contenido(respuesta)).decode().splitlines()
+        self.assertEqual(len(lineas), 5)
+        self.assertEqual(json.loads(lineas[0])['tipo_evento'], 'INGRESO')
+
+    def test_solo_administradores(self):
+        self.client.force_authenticate(user=User.objects.create_user(username='vecino', password='x'))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_visitas_csv_en_streaming(self):
+        propietario = User.objects.create_user(username='dueno', password='x')
+        propiedad = Propiedad.objects.create(numero_casa='V-1', propietario=propietario, metros_cuadrados=90)
+        visitante = Visitante.objects.create(nombre_completo='Ana Pérez', documento='99 LP')
+        Visita.objects.create(visitante=visitante, propiedad=propiedad,
+                              fecha_ingreso_programado=timezone.now(), fecha_salida_programada=timezone.now())
+        self.client.force_authenticate(user=self.admin)
+        respuesta = self.client.get(reverse('seguridad:export-visitas-csv'))
+        lineas = self._contenido(respuesta).decode().splitlines()
+        self.assertEqual(lineas[0], 'ID,Visitante,Documento,Propiedad,Ingreso Real,Salida Programada')
+        self.assertIn('Ana Pérez,99 LP,V-1', lineas[1])
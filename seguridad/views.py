@@ -1,10 +1,8 @@
 # en seguridad/views.py
 
-import csv
 import boto3
 from datetime import timedelta
-from django.db.models import Count
-from django.http import HttpResponse
+from django.db.models import Count, Q
 from django.utils import timezone
 from django.conf import settings
 from rest_framework import status, viewsets, generics, permissions
@@ -30,7 +28,13 @@ from .serializers import (
 )
 from auditoria.eventos import notificar_visitante_registrado, notificar_acceso_vehicular
 from .permissions import HasAPIKey
+from .services.gate import rango_del_dia, resumen_gate
+from config.exportacion import ExportacionMixin, TAMANO_BLOQUE, respuesta_exportacion
+from config.presupuestos import presupuesto_consultas
+from tareas.registro import encolar
+from tareas.views import respuesta_encolada
 from usuarios.models import Residente
+from usuarios.contexto import contexto_de
 from usuarios.permissions import IsPropietario, IsPersonalSeguridad
 
 # --- Vistas de Control de Acceso y Personalizadas ---
@@ -43,7 +47,7 @@ class ControlAccesoVehicularView(APIView):
     def _handle_ingreso(self, placa):
         ahora = timezone.now()
         try:
-            vehiculo = Vehiculo.objects.get(placa__iexact=placa)
+            vehiculo = Vehiculo.objects.get(placa=placa.strip().upper())
         except Vehiculo.DoesNotExist:
             return Response({"detail": f"Placa '{placa}' no encontrada."}, status=status.HTTP_403_FORBIDDEN)
 
@@ -78,7 +82,7 @@ class ControlSalidaVehicularView(APIView):
 
     def _handle_salida(self, placa):
         try:
-            vehiculo = Vehiculo.objects.get(placa__iexact=placa)
+            vehiculo = Vehiculo.objects.get(placa=placa.strip().upper())
         except Vehiculo.DoesNotExist:
             return Response({"detail": "Vehículo no encontrado."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -117,23 +121,20 @@ class ExportVisitasCSVView(APIView):
     permission_classes = [IsAdminUser]
     serializer_class = SimpleOperationResponseSerializer  # Para documentación
     def get(self, request, *args, **kwargs):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="visitas.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['ID', 'Visitante', 'Documento', 'Propiedad', 'Ingreso Real', 'Salida Programada'])
-        visitas = Visita.objects.select_related('visitante', 'propiedad').all()
-        for v in visitas:
-            writer.writerow([v.id, v.visitante.nombre_completo, v.visitante.documento, v.propiedad.numero_casa, v.ingreso_real, v.fecha_salida_programada])
-        return response
+        filas = Visita.objects.order_by('pk').values_list(
+            'id', 'visitante__nombre_completo', 'visitante__documento', 'propiedad__numero_casa',
+            'ingreso_real', 'fecha_salida_programada',
+        ).iterator(chunk_size=TAMANO_BLOQUE)
+        encabezados = ['ID', 'Visitante', 'Documento', 'Propiedad', 'Ingreso Real', 'Salida Programada']
+        return respuesta_exportacion(encabezados, filas, 'visitas')
 
 
 class CerrarVisitasVencidasView(APIView):
     permission_classes = [IsAdminUser]
     serializer_class = SimpleOperationResponseSerializer  # Para documentación
     def post(self, request, *args, **kwargs):
-        from django.core.management import call_command
-        call_command('cerrar_visitas_vencidas')
-        return Response({"detail": "Comando para cerrar visitas vencidas ejecutado."}, status=status.HTTP_200_OK)
+        tarea = encolar("seguridad.cerrar_visitas_vencidas", usuario=request.user)
+        return respuesta_encolada(request, tarea, detail="Cierre de visitas vencidas encolado.")
 
 
 class DashboardResumenView(APIView):
@@ -141,7 +142,8 @@ class DashboardResumenView(APIView):
     serializer_class = DashboardResumenResponseSerializer  # Para documentación
     def get(self, request, *args, **kwargs):
         abiertas = Visita.objects.filter(ingreso_real__isnull=False, salida_real__isnull=True).count()
-        total_hoy = Visita.objects.filter(ingreso_real__date=timezone.now().date()).count()
+        inicio, fin = rango_del_dia(timezone.localdate())
+        total_hoy = Visita.objects.filter(ingreso_real__gte=inicio, ingreso_real__lt=fin).count()
         return Response({"visitas_abiertas": abiertas, "total_ingresos_hoy": total_hoy})
 
 
@@ -203,7 +205,7 @@ class IAControlVehicularView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Buscar vehículo en la base de datos
-        vehiculo = Vehiculo.objects.filter(placa__iexact=placa).first()
+        vehiculo = Vehiculo.objects.filter(placa=placa).first()
         
         # Determinar información del vehículo
         vehiculo_info = None
@@ -341,7 +343,7 @@ class IAProcesarImagenView(APIView):
         placa_detectada = "DEBUG-VIDEO-001"  # Placa simulada
         
         # Usar la misma lógica que IAControlVehicularView
-        vehiculo = Vehiculo.objects.filter(placa__iexact=placa_detectada).first()
+        vehiculo = Vehiculo.objects.filter(placa=placa_detectada).first()
         
         if vehiculo:
             acceso_permitido = True
@@ -382,6 +384,7 @@ class IAProcesarImagenView(APIView):
         
         return Response(response_data, status=status_code)
 
+@presupuesto_consultas(4, 'seguridad:gate-dashboard')
 class GateDashboardView(APIView):
     """
     Endpoint para el dashboard del gate
@@ -391,92 +394,8 @@ class GateDashboardView(APIView):
     
     def get(self, request):
         """Obtiene el estado actual del sistema de gate"""
-        from django.db.models import Count
-        from datetime import timedelta
-        
-        ahora = timezone.now()
-        hoy = ahora.date()
-        ayer = hoy - timedelta(days=1)
-        
-        # Estadísticas de hoy
-        eventos_hoy = EventoSeguridad.objects.filter(fecha_hora__date=hoy)
-        eventos_permitidos_hoy = eventos_hoy.filter(accion='PERMITIDO').count()
-        eventos_denegados_hoy = eventos_hoy.filter(accion='DENEGADO').count()
-        
-        # Últimos eventos (últimos 10)
-        ultimos_eventos = EventoSeguridad.objects.select_related('vehiculo_registrado', 'vehiculo_registrado__propiedad').order_by('-fecha_hora')[:10]
-        
-        eventos_data = []
-        for evento in ultimos_eventos:
-            vehiculo_info = "No registrado"
-            if evento.vehiculo_registrado:
-                if evento.vehiculo_registrado.propiedad:
-                    vehiculo_info = f"Residente - {evento.vehiculo_registrado.propiedad.numero_casa}"
-                elif evento.vehiculo_registrado.visitante:
-                    vehiculo_info = f"Visitante - {evento.vehiculo_registrado.visitante.nombre_completo}"
-                else:
-                    vehiculo_info = "Vehículo sin asignar"
-            
-            eventos_data.append({
-                "id": evento.id,
-                "timestamp": evento.fecha_hora.isoformat(),
-                "placa": evento.placa_detectada,
-                "tipo_evento": evento.tipo_evento,
-                "accion": evento.accion,
-                "motivo": evento.motivo,
-                "vehiculo_info": vehiculo_info,
-                "tiempo_relativo": self._tiempo_relativo(evento.fecha_hora, ahora)
-            })
-        
-        # Estadísticas por placas más frecuentes
-        placas_frecuentes = (EventoSeguridad.objects
-                           .filter(fecha_hora__date=hoy)
-                           .values('placa_detectada')
-                           .annotate(total=Count('id'))
-                           .order_by('-total')[:5])
-        
-        # Vehículos registrados
-        total_vehiculos = Vehiculo.objects.count()
-        vehiculos_residentes = Vehiculo.objects.filter(propiedad__isnull=False).count()
-        vehiculos_visitantes = Vehiculo.objects.filter(visitante__isnull=False).count()
-        
-        response_data = {
-            "timestamp": ahora.isoformat(),
-            "estadisticas_hoy": {
-                "total_eventos": eventos_hoy.count(),
-                "accesos_permitidos": eventos_permitidos_hoy,
-                "accesos_denegados": eventos_denegados_hoy,
-                "porcentaje_exito": round((eventos_permitidos_hoy / max(eventos_hoy.count(), 1)) * 100, 2)
-            },
-            "vehiculos_registrados": {
-                "total": total_vehiculos,
-                "residentes": vehiculos_residentes,
-                "visitantes": vehiculos_visitantes,
-                "sin_asignar": total_vehiculos - vehiculos_residentes - vehiculos_visitantes
-            },
-            "ultimos_eventos": eventos_data,
-            "placas_frecuentes_hoy": list(placas_frecuentes),
-            "sistema": {
-                "estado": "ACTIVO",
-                "version": "1.0.0",
-                "modo": "SIMULACION" if 'test_video' in str(request.path) else "PRODUCCION"
-            }
-        }
-        
-        return Response(response_data)
-    
-    def _tiempo_relativo(self, fecha_evento, ahora):
-        """Convierte timestamp a tiempo relativo legible"""
-        diff = ahora - fecha_evento
-        
-        if diff.total_seconds() < 60:
-            return f"Hace {int(diff.total_seconds())} segundos"
-        elif diff.total_seconds() < 3600:
-            return f"Hace {int(diff.total_seconds() / 60)} minutos"
-        elif diff.total_seconds() < 86400:
-            return f"Hace {int(diff.total_seconds() / 3600)} horas"
-        else:
-            return f"Hace {diff.days} días"
+        modo = "SIMULACION" if 'test_video' in str(request.path) else "PRODUCCION"
+        return Response(resumen_gate(modo))
 
 class VerificarRostroView(APIView):
     permission_classes = [HasAPIKey]
@@ -558,27 +477,14 @@ class VisitaViewSet(viewsets.ModelViewSet):
         - SEGURIDAD: Ve todas las visitas (necesario para control de acceso)
         - RESIDENTE: Solo ve visitas a propiedades donde es residente
         """
-        user = self.request.user
-        
-        try:
-            if user.profile.role in ['PROPIETARIO', 'SEGURIDAD']:
-                # Propietarios y personal de seguridad ven todas las visitas
-                return Visita.objects.select_related('visitante', 'propiedad').all()
-            else:
-                # Residentes ven solo visitas a sus propiedades
-                from usuarios.models import Residente
-                try:
-                    residente = Residente.objects.get(usuario=user)
-                    if residente.propiedad:
-                        return Visita.objects.select_related('visitante', 'propiedad').filter(
-                            propiedad=residente.propiedad
-                        )
-                    else:
-                        return Visita.objects.none()
-                except Residente.DoesNotExist:
-                    return Visita.objects.none()
-        except:
-            return Visita.objects.none()
+        ctx = contexto_de(self.request)
+        if ctx.es_propietario or ctx.es_seguridad:
+            # Propietarios y personal de seguridad ven todas las visitas
+            return Visita.objects.select_related('visitante', 'propiedad').all()
+        if ctx.propiedad_id:
+            # Residentes ven solo visitas de sus propiedades
+            return Visita.objects.select_related('visitante', 'propiedad').filter(propiedad_id=ctx.propiedad_id)
+        return Visita.objects.none()
 
     def get_permissions(self):
         # Solo propietarios pueden crear, actualizar o eliminar visitas
@@ -608,27 +514,14 @@ class VehiculoViewSet(viewsets.ModelViewSet):
         - SEGURIDAD: Ve todos los vehículos (necesario para control de acceso)
         - RESIDENTE: Solo ve vehículos de propiedades donde es residente
         """
-        user = self.request.user
-        
-        try:
-            if user.profile.role in ['PROPIETARIO', 'SEGURIDAD']:
-                # Propietarios y personal de seguridad ven todos los vehículos
-                return Vehiculo.objects.select_related('propiedad').all()
-            else:
-                # Residentes ven solo vehículos de sus propiedades
-                from usuarios.models import Residente
-                try:
-                    residente = Residente.objects.get(usuario=user)
-                    if residente.propiedad:
-                        return Vehiculo.objects.select_related('propiedad').filter(
-                            propiedad=residente.propiedad
-                        )
-                    else:
-                        return Vehiculo.objects.none()
-                except Residente.DoesNotExist:
-                    return Vehiculo.objects.none()
-        except:
-            return Vehiculo.objects.none()
+        ctx = contexto_de(self.request)
+        if ctx.es_propietario or ctx.es_seguridad:
+            # Propietarios y personal de seguridad ven todos los vehículos
+            return Vehiculo.objects.select_related('propiedad').all()
+        if ctx.propiedad_id:
+            # Residentes ven solo vehículos de sus propiedades
+            return Vehiculo.objects.select_related('propiedad').filter(propiedad_id=ctx.propiedad_id)
+        return Vehiculo.objects.none()
 
     def get_permissions(self):
         # Solo propietarios pueden crear, actualizar o eliminar vehículos
@@ -680,9 +573,14 @@ class VisitanteViewSet(viewsets.ModelViewSet):
                 nombre_visitante=nombre_completo
             )
 
-class EventoSeguridadViewSet(viewsets.ModelViewSet):
+class EventoSeguridadViewSet(ExportacionMixin, viewsets.ModelViewSet):
     queryset = EventoSeguridad.objects.all()
     serializer_class = EventoSeguridadSerializer
+    columnas_exportacion = (
+        ('id', 'id'), ('fecha_hora', 'fecha_hora'), ('tipo_evento', 'tipo_evento'), ('accion', 'accion'),
+        ('placa_detectada', 'placa_detectada'), ('motivo', 'motivo'),
+        ('vehiculo_registrado_id', 'vehiculo_registrado_id'),
+    )
     # Filtros avanzados - CORREGIDOS para coincidir con el modelo real
     filterset_fields = {
         'tipo_evento': ['exact'],  # Campo correcto del modelo
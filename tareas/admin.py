@@ -0,0 +1,13 @@
+# tareas/admin.py
+from django.contrib import admin
+
+from .models import Tarea
+
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ("id", "nombre", "estado", "prioridad", "intentos", "creada", "terminada", "creado_por")
+    list_filter = ("estado", "nombre")
+    search_fields = ("nombre", "error")
+    date_hierarchy = "creada"
+    readonly_fields = ("creada", "iniciada", "terminada", "vence_en", "worker")
@@ -0,0 +1,55 @@
+# tareas/almacenamiento.py
+"""
+Almacenamiento de ``Tarea.archivo`` en la base de datos.
+
+La web y los workers corren en servicios distintos, cada uno con su disco:
+el CSV que sube la web tiene que leerlo un worker, y el PDF o ZIP que genera
+un worker lo descarga la web. La base es lo único que comparten, así que el
+contenido de cada archivo se guarda en ``ArchivoTarea`` y el ``FileField``
+solo guarda el nombre, como con cualquier otro ``Storage``.
+"""
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible(path="tareas.almacenamiento.AlmacenamientoBD")
+class AlmacenamientoBD(Storage):
+
+    @staticmethod
+    def _archivos():
+        from .models import ArchivoTarea
+        return ArchivoTarea.objects
+
+    def _open(self, name, mode='rb'):
+        contenido = self._archivos().filter(nombre=name).values_list('contenido', flat=True).first()
+        if contenido is None:
+            raise FileNotFoundError(f"No existe el archivo de tarea {name!r}.")
+        archivo = ContentFile(bytes(contenido), name=name)
+        archivo.mode = mode
+        return archivo
+
+    def _save(self, name, content):
+        if hasattr(content, 'seek') and getattr(content, 'seekable', lambda: True)():
+            content.seek(0)
+        self._archivos().create(nombre=name, contenido=b''.join(content.chunks()))
+        return name
+
+    def exists(self, name):
+        return self._archivos().filter(nombre=name).exists()
+
+    def delete(self, name):
+        self._archivos().filter(nombre=name).delete()
+
+    def size(self, name):
+        from django.db.models.functions import Length
+
+        tamano = (self._archivos().filter(nombre=name)
+                  .annotate(tamano=Length('contenido')).values_list('tamano', flat=True).first())
+        if tamano is None:
+            raise FileNotFoundError(f"No existe el archivo de tarea {name!r}.")
+        return tamano
+
+    def url(self, name):
+        # Se descargan por GET /api/tareas/{id}/archivo/
+        raise NotImplementedError("Los archivos de tareas no tienen URL pública.")
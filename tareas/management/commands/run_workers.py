@@ -0,0 +1,67 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tareas.worker import bucle, ejecutar_pendientes, identificador_worker
+
+
+def _proceso_worker(detener, intervalo):
+    # Ctrl+C lo gestiona el proceso padre; aquí solo se termina la tarea en curso
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: detener.set())
+    bucle(detener, intervalo=intervalo)
+
+
+class Command(BaseCommand):
+    help = (
+        "Lanza N procesos worker que ejecutan las tareas en segundo plano "
+        "(tareas.Tarea). SIGTERM/Ctrl+C: terminan la tarea en curso y salen."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=1, help="Número de procesos worker (por defecto 1).")
+        parser.add_argument("--intervalo", type=float, default=None,
+                            help="Segundos de espera cuando la cola está vacía (por defecto TAREAS_INTERVALO).")
+        parser.add_argument("--una-vez", action="store_true",
+                            help="Ejecuta lo pendiente en este proceso y sale (útil para cron o pruebas).")
+
+    def handle(self, *args, **opts):
+        if opts["una_vez"]:
+            total = ejecutar_pendientes()
+            self.stdout.write(self.style.SUCCESS(f"{total} tareas ejecutadas."))
+            return
+
+        procesos = max(1, opts["procesos"])
+        intervalo = opts["intervalo"]
+
+        if procesos == 1:
+            detener = threading.Event()
+            for senal in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(senal, lambda *_: detener.set())
+            self.stdout.write(f"Worker {identificador_worker()} esperando tareas...")
+            bucle(detener, intervalo=intervalo)
+            return
+
+        contexto = multiprocessing.get_context("fork")
+        detener = contexto.Event()
+        # Cada hijo debe abrir su propia conexión a la base de datos
+        connections.close_all()
+        hijos = [
+            contexto.Process(target=_proceso_worker, args=(detener, intervalo), name=f"tareas-worker-{i}")
+            for i in range(procesos)
+        ]
+        for hijo in hijos:
+            hijo.start()
+        self.stdout.write(f"{procesos} workers esperando tareas (pids {', '.join(str(h.pid) for h in hijos)})...")
+
+        def terminar(*_):
+            detener.set()
+
+        signal.signal(signal.SIGINT, terminar)
+        signal.signal(signal.SIGTERM, terminar)
+        for hijo in hijos:
+            hijo.join()
+        self.stdout.write("Workers detenidos.")
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:16
+
+import django.utils.timezone
+import tareas.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tareas', '0001_inicial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoTarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255, unique=True)),
+                ('contenido', models.BinaryField()),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+            ],
+            options={
+                'verbose_name': 'Archivo de tarea',
+                'verbose_name_plural': 'Archivos de tareas',
+            },
+        ),
+        migrations.AlterField(
+            model_name='tarea',
+            name='archivo',
+            field=models.FileField(blank=True, null=True, storage=tareas.almacenamiento.AlmacenamientoBD(), upload_to='tareas/%Y/%m/'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# tareas/models.py
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from .almacenamiento import AlmacenamientoBD
+
+
+class Tarea(models.Model):
+    """
+    Trabajo en segundo plano. Se crea con ``tareas.registro.encolar`` y lo
+    ejecuta un proceso de ``run_workers``.
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        EN_CURSO = 'EN_CURSO', 'En curso'
+        COMPLETADA = 'COMPLETADA', 'Completada'
+        FALLIDA = 'FALLIDA', 'Fallida'
+
+    nombre = models.CharField(max_length=100, help_text="Nombre con el que se registró la tarea, ej: 'finanzas.generar_expensas'.")
+    argumentos = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PENDIENTE)
+    # Mayor número = se atiende antes
+    prioridad = models.SmallIntegerField(default=0)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=3)
+    ejecutar_despues = models.DateTimeField(default=timezone.now, help_text="No se ejecuta antes de esta hora (reintentos con espera).")
+
+    resultado = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    # En la base (tareas.almacenamiento): lo sube la web y lo lee un worker, o al revés
+    archivo = models.FileField(upload_to='tareas/%Y/%m/', storage=AlmacenamientoBD(), null=True, blank=True)
+
+    creado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='tareas')
+    creada = models.DateTimeField(default=timezone.now, editable=False)
+    iniciada = models.DateTimeField(null=True, blank=True)
+    terminada = models.DateTimeField(null=True, blank=True)
+    # Mientras está EN_CURSO: si pasa esta hora sin terminar se da el worker por muerto
+    vence_en = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        verbose_name = "Tarea en segundo plano"
+        verbose_name_plural = "Tareas en segundo plano"
+        ordering = ['-creada']
+        indexes = [
+            # Cola: solo las pendientes, en el orden en que se reclaman
+            models.Index(
+                fields=['-prioridad', 'ejecutar_despues', 'id'],
+                name='tarea_cola_idx',
+                condition=Q(estado='PENDIENTE'),
+            ),
+            models.Index(fields=['estado', 'vence_en'], name='tarea_estado_vence_idx'),
+            models.Index(fields=['creado_por', 'creada'], name='tarea_usuario_creada_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.nombre} ({self.estado})"
+
+    @property
+    def terminal(self):
+        return self.estado in (self.Estado.COMPLETADA, self.Estado.FALLIDA)
+
+
+class ArchivoTarea(models.Model):
+    """Contenido de un ``Tarea.archivo`` (ver ``tareas.almacenamiento``)."""
+    nombre = models.CharField(max_length=255, unique=True)
+    contenido = models.BinaryField()
+    creado = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        verbose_name = "Archivo de tarea"
+        verbose_name_plural = "Archivos de tareas"
+
+    def __str__(self):
+        return self.nombre
@@ -0,0 +1,82 @@
+# tareas/registro.py
+"""
+Registro de tareas y API para encolarlas.
+
+Cada app declara sus tareas en su módulo ``tareas.py`` (se importan solos al
+arrancar)::
+
+    @tarea("finanzas.generar_expensas", max_intentos=1)
+    def generar_expensas(monto, descripcion, ...):
+        ...
+        return {"creados": n}        # queda en Tarea.resultado
+
+y las vistas las encolan en lugar de ejecutarlas en la petición::
+
+    t = encolar("finanzas.generar_expensas", usuario=request.user, monto=...)
+    return respuesta_encolada(request, t)
+
+Los argumentos y el resultado se guardan como JSON: pasar ids, cadenas y
+números, no instancias de modelos.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Tarea
+
+REGISTRO = {}
+
+
+@dataclass(frozen=True)
+class DefinicionTarea:
+    nombre: str
+    funcion: object
+    max_intentos: int
+    # Segundos antes de considerar muerto al worker que la ejecuta
+    duracion_maxima: int
+    # Si es True la función recibe ``tarea=<Tarea>`` (p. ej. para guardar un archivo)
+    pasar_tarea: bool
+
+
+def tarea(nombre, max_intentos=3, duracion_maxima=None, pasar_tarea=False):
+    """Registra la función decorada como tarea con ``nombre``."""
+    def decorador(funcion):
+        if nombre in REGISTRO and REGISTRO[nombre].funcion is not funcion:
+            raise ValueError(f"Ya hay una tarea registrada como '{nombre}'")
+        REGISTRO[nombre] = DefinicionTarea(
+            nombre=nombre,
+            funcion=funcion,
+            max_intentos=max_intentos,
+            duracion_maxima=duracion_maxima or getattr(settings, 'TAREAS_DURACION_MAXIMA', 900),
+            pasar_tarea=pasar_tarea,
+        )
+        funcion.nombre_tarea = nombre
+        return funcion
+    return decorador
+
+
+def definicion(nombre):
+    try:
+        return REGISTRO[nombre]
+    except KeyError:
+        raise LookupError(f"No hay ninguna tarea registrada como '{nombre}'") from None
+
+
+def encolar(nombre, *, usuario=None, prioridad=0, retraso=None, max_intentos=None, **argumentos):
+    """
+    Crea la tarea ``nombre`` (o la función decorada) en estado PENDIENTE y la
+    devuelve. Dentro de una transacción, los workers no la ven hasta el commit.
+    """
+    nombre = getattr(nombre, 'nombre_tarea', nombre)
+    defin = definicion(nombre)
+    ahora = timezone.now()
+    return Tarea.objects.create(
+        nombre=nombre,
+        argumentos=argumentos,
+        prioridad=prioridad,
+        max_intentos=max_intentos or defin.max_intentos,
+        ejecutar_despues=ahora + timedelta(seconds=retraso) if retraso else ahora,
+        creado_por=usuario if getattr(usuario, 'is_authenticated', False) else None,
+    )
@@ -0,0 +1,31 @@
+# tareas/serializers.py
+from rest_framework import serializers
+from rest_framework.reverse import reverse
+
+from .models import Tarea
+
+
+class TareaSerializer(serializers.ModelSerializer):
+    """Estado de una tarea en segundo plano (para consultar desde el cliente)."""
+    archivo_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Tarea
+        fields = [
+            'id', 'nombre', 'estado', 'prioridad', 'intentos', 'max_intentos',
+            'resultado', 'error', 'archivo_url', 'creada', 'iniciada', 'terminada',
+        ]
+        read_only_fields = fields
+
+    def get_archivo_url(self, obj):
+        if not obj.archivo:
+            return None
+        return reverse('tarea-archivo', kwargs={'pk': obj.pk}, request=self.context.get('request'))
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        request = self.context.get('request')
+        # El traceback es para administradores
+        if data['error'] and not (request and request.user.is_staff):
+            data['error'] = 'La tarea falló.' if instance.estado == Tarea.Estado.FALLIDA else 'Falló un intento; se reintentará.'
+        return data
@@ -0,0 +1,204 @@
+# tareas/tests.py
+
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from condominio.models import Propiedad
+from finanzas.models import Gasto
+
+from .models import ArchivoTarea, Tarea
+from .registro import REGISTRO, encolar, tarea
+from .worker import Latido, ejecutar, ejecutar_pendientes, reclamar, recuperar_vencidas
+
+LLAMADAS = []
+
+
+@tarea("tests.sumar")
+def sumar(a, b):
+    LLAMADAS.append((a, b))
+    return {"total": a + b}
+
+
+@tarea("tests.falla", max_intentos=2)
+def falla():
+    raise RuntimeError("sin conexión")
+
+
+class ColaDeTareasTests(TestCase):
+
+    def setUp(self):
+        LLAMADAS.clear()
+
+    def test_reclama_por_prioridad_y_antiguedad(self):
+        baja = encolar("tests.sumar", a=1, b=1)
+        alta = encolar("tests.sumar", prioridad=5, a=2, b=2)
+        encolar("tests.sumar", retraso=3600, prioridad=9, a=3, b=3)  # aún no toca
+
+        primera = reclamar("w1")
+        self.assertEqual(primera.pk, alta.pk)
+        self.assertEqual(primera.estado, Tarea.Estado.EN_CURSO)
+        self.assertEqual(primera.intentos, 1)
+        self.assertEqual(primera.worker, "w1")
+        self.assertEqual(reclamar("w2").pk, baja.pk)
+        self.assertIsNone(reclamar("w3"))
+
+    def test_ejecuta_y_guarda_resultado(self):
+        t = encolar(sumar, a=2, b=3)
+        self.assertEqual(ejecutar_pendientes(), 1)
+        t.refresh_from_db()
+        self.assertEqual(t.estado, Tarea.Estado.COMPLETADA)
+        self.assertEqual(t.resultado, {"total": 5})
+        self.assertIsNotNone(t.terminada)
+        self.assertEqual(LLAMADAS, [(2, 3)])
+
+    @override_settings(TAREAS_BACKOFF_BASE=10)
+    def test_reintenta_con_espera_y_luego_falla(self):
+        t = encolar("tests.falla")
+        with self.assertLogs('tareas.worker', 'WARNING'):
+            ejecutar(reclamar())
+        t.refresh_from_db()
+        self.assertEqual(t.estado, Tarea.Estado.PENDIENTE)
+        self.assertIn("sin conexión", t.error)
+        self.assertGreater(t.ejecutar_despues, timezone.now() + timedelta(seconds=5))
+        self.assertIsNone(reclamar())
+
+        Tarea.objects.filter(pk=t.pk).update(ejecutar_despues=timezone.now())
+        with self.assertLogs('tareas.worker', 'ERROR'):
+            ejecutar(reclamar())
+        t.refresh_from_db()
+        self.assertEqual(t.estado, Tarea.Estado.FALLIDA)
+        self.assertEqual(t.intentos, 2)
+
+    def test_recupera_tareas_de_workers_muertos(self):
+        t = encolar("tests.sumar", a=1, b=2)
+        reclamar()
+        Tarea.objects.filter(pk=t.pk).update(vence_en=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(recuperar_vencidas(), 1)
+        t.refresh_from_db()
+        self.assertEqual(t.estado, Tarea.Estado.PENDIENTE)
+
+    def test_el_latido_extiende_el_plazo(self):
+        t = encolar("tests.sumar", a=1, b=2)
+        reclamada = reclamar("w1")
+        Tarea.objects.filter(pk=t.pk).update(vence_en=timezone.now() + timedelta(seconds=1))
+        self.assertTrue(Latido(reclamada).latir())
+        t.refresh_from_db()
+        self.assertGreater(t.vence_en, timezone.now() + timedelta(seconds=60))
+        self.assertEqual(recuperar_vencidas(), 0)
+
+    def test_worker_recuperado_no_pisa_al_nuevo(self):
+        t = encolar("tests.sumar", a=1, b=2)
+        lenta = reclamar("w1")
+        Tarea.objects.filter(pk=t.pk).update(vence_en=timezone.now() - timedelta(seconds=1))
+        recuperar_vencidas()
+        nueva = reclamar("w2")
+        self.assertFalse(Latido(lenta).latir())
+
+        with self.assertLogs('tareas.worker', 'WARNING'):
+            ejecutar(lenta)
+        t.refresh_from_db()
+        self.assertEqual((t.estado, t.worker), (Tarea.Estado.EN_CURSO, "w2"))
+        ejecutar(nueva)
+        t.refresh_from_db()
+        self.assertEqual(t.estado, Tarea.Estado.COMPLETADA)
+
+    def test_encolar_tarea_desconocida(self):
+        with self.assertRaises(LookupError):
+            encolar("no.existe")
+
+    def test_comando_una_vez(self):
+        encolar("tests.sumar", a=1, b=1)
+        salida = StringIO()
+        call_command("run_workers", "--una-vez", stdout=salida)
+        self.assertIn("1 tareas ejecutadas", salida.getvalue())
+
+    def test_tareas_de_las_apps_registradas(self):
+        for nombre in ("finanzas.generar_expensas", "finanzas.reporte_financiero_pdf",
+                       "seguridad.cerrar_visitas_vencidas", "notificaciones.notificar_todos"):
+            self.assertIn(nombre, REGISTRO)
+
+
+class AlmacenamientoBDTests(TestCase):
+
+    def test_guarda_y_reabre_el_archivo_desde_la_base(self):
+        tarea = encolar("tests.sumar", a=1, b=2)
+        tarea.archivo.save("datos.csv", ContentFile(b"a,b\n1,2\n"))
+        nombre = tarea.archivo.name
+        self.assertTrue(nombre.startswith("tareas/"))
+
+        # Otro proceso solo ve la fila: vuelve a leerla de la base
+        otra = Tarea.objects.get(pk=tarea.pk)
+        with otra.archivo.open('rb') as archivo:
+            self.assertEqual(archivo.read(), b"a,b\n1,2\n")
+        self.assertEqual(otra.archivo.size, 8)
+
+        # Mismo nombre: el storage elige otro en vez de pisar el anterior
+        otra.archivo.save("datos.csv", ContentFile(b"x"))
+        self.assertNotEqual(otra.archivo.name, nombre)
+        self.assertEqual(ArchivoTarea.objects.count(), 2)
+
+        otra.archivo.delete(save=False)
+        self.assertEqual(ArchivoTarea.objects.count(), 1)
+
+
+class EndpointsEncoladosTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+        self.client.force_authenticate(user=self.admin)
+
+    def test_generar_expensas_devuelve_tarea_y_la_ejecuta_el_worker(self):
+        for i in range(3):
+            dueno = User.objects.create_user(username=f'd{i}', password='x')
+            Propiedad.objects.create(numero_casa=f'A-{i}', propietario=dueno, metros_cuadrados=80)
+
+        respuesta = self.client.post(reverse('generar-expensas'), {
+            'monto': '150.00', 'descripcion': 'Expensa marzo', 'fecha_vencimiento': '2030-03-31',
+        }, format='json')
+        self.assertEqual(respuesta.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Gasto.objects.count(), 0)
+        self.assertEqual(respuesta['Location'], respuesta.data['estado_url'])
+
+        ejecutar_pendientes()
+
+        estado = self.client.get(respuesta.data['estado_url'])
+        self.assertEqual(estado.data['estado'], Tarea.Estado.COMPLETADA)
+        self.assertEqual(estado.data['resultado']['creados'], 3)
+        self.assertEqual(Gasto.objects.filter(monto=Decimal('150.00')).count(), 3)
+
+    def test_reporte_pdf_asincrono_adjunta_el_archivo(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            respuesta = self.client.get(reverse('reporte-financiero'), {
+                'formato': 'pdf', 'asincrono': '1', 'fecha_inicio': '2030-01-01', 'fecha_fin': '2030-01-31',
+            })
+            self.assertEqual(respuesta.status_code, status.HTTP_202_ACCEPTED)
+            ejecutar_pendientes()
+
+            estado = self.client.get(respuesta.data['estado_url'])
+            self.assertEqual(estado.data['estado'], Tarea.Estado.COMPLETADA)
+            archivo = self.client.get(estado.data['archivo_url'])
+            self.assertEqual(archivo.status_code, status.HTTP_200_OK)
+            self.assertTrue(b''.join(archivo.streaming_content).startswith(b'%PDF'))
+            archivo.close()
+            # El worker no comparte disco con la web: el PDF queda en la base
+            self.assertEqual(os.listdir(media), [])
+            self.assertTrue(ArchivoTarea.objects.filter(nombre=Tarea.objects.get().archivo.name).exists())
+
+    def test_usuario_solo_ve_sus_tareas(self):
+        ajena = encolar("tests.sumar", usuario=self.admin, a=1, b=1)
+        otro = User.objects.create_user(username='otro', password='x')
+        self.client.force_authenticate(user=otro)
+        respuesta = self.client.get(reverse('tarea-detail', kwargs={'pk': ajena.pk}))
+        self.assertEqual(respuesta.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,9 @@
+# tareas/urls.py
+from rest_framework.routers import SimpleRouter
+
+from .views import TareaViewSet
+
+router = SimpleRouter()
+router.register(r'', TareaViewSet, basename='tarea')
+
+urlpatterns = router.urls
@@ -0,0 +1,50 @@
+# tareas/views.py
+from django.http import FileResponse, Http404
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from .models import Tarea
+from .serializers import TareaSerializer
+
+
+def respuesta_encolada(request, tarea, **extra):
+    """
+    Respuesta 202 de un endpoint que encoló trabajo: id de la tarea y URL para
+    consultar su estado (también en la cabecera ``Location``).
+    """
+    url = reverse('tarea-detail', kwargs={'pk': tarea.pk}, request=request)
+    datos = {'tarea_id': tarea.pk, 'estado': tarea.estado, 'estado_url': url, **extra}
+    return Response(datos, status=status.HTTP_202_ACCEPTED, headers={'Location': url})
+
+
+class TareaViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Estado de las tareas en segundo plano.
+    GET /api/tareas/         -> tareas del usuario (todas para administradores)
+    GET /api/tareas/{id}/    -> estado, resultado y error
+    GET /api/tareas/{id}/archivo/ -> archivo generado (p. ej. un PDF)
+    """
+    serializer_class = TareaSerializer
+    permission_classes = [IsAuthenticated]
+    filterset_fields = {
+        'estado': ['exact'],
+        'nombre': ['exact'],
+    }
+    ordering_fields = ['creada', 'prioridad']
+    ordering = ['-creada']
+
+    def get_queryset(self):
+        queryset = Tarea.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(creado_por=self.request.user)
+        return queryset
+
+    @action(detail=True, methods=['get'])
+    def archivo(self, request, pk=None):
+        tarea = self.get_object()
+        if not tarea.archivo:
+            raise Http404("La tarea no generó ningún archivo.")
+        return FileResponse(tarea.archivo.open('rb'), as_attachment=True, filename=tarea.archivo.name.rsplit('/', 1)[-1])
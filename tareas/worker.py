@@ -0,0 +1,234 @@
+# tareas/worker.py
+"""
+Ejecución de tareas.
+
+Cada worker repite: reclamar la siguiente tarea pendiente (mayor prioridad,
+la más antigua), ejecutarla y guardar el resultado. El reclamo usa
+``SELECT … FOR UPDATE SKIP LOCKED`` donde la base de datos lo soporta
+(PostgreSQL), de modo que varios workers no se bloquean entre sí ni toman la
+misma fila; en SQLite basta el ``UPDATE`` condicional posterior.
+
+Si la tarea falla y le quedan intentos vuelve a PENDIENTE con una espera
+exponencial (``TAREAS_BACKOFF_BASE`` · 2^(intento-1), con tope
+``TAREAS_BACKOFF_MAX``); si no, queda FALLIDA con el traceback.
+
+Mientras una tarea corre, un hilo de latido renueva su ``vence_en`` cada
+``TAREAS_LATIDO`` segundos; las tareas EN_CURSO cuyo worker murió (sin
+latido) se recuperan al vencer ``vence_en``. El resultado solo se guarda si
+la tarea sigue EN_CURSO a nombre del mismo worker: si otro ya la recuperó,
+el primero no pisa su estado.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Tarea
+from .registro import REGISTRO, definicion
+
+logger = logging.getLogger(__name__)
+
+MAX_ERROR = 10000
+
+
+def identificador_worker():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def espera_reintento(intento):
+    """Segundos hasta el siguiente intento tras fallar el número ``intento``."""
+    base = getattr(settings, 'TAREAS_BACKOFF_BASE', 10)
+    maximo = getattr(settings, 'TAREAS_BACKOFF_MAX', 3600)
+    espera = min(base * 2 ** (intento - 1), maximo)
+    # Variación aleatoria para que los reintentos de un mismo fallo no coincidan
+    return espera * random.uniform(0.8, 1.2)
+
+
+def _duracion(nombre):
+    defin = REGISTRO.get(nombre)
+    return defin.duracion_maxima if defin else getattr(settings, 'TAREAS_DURACION_MAXIMA', 900)
+
+
+def _propia(tarea):
+    """La fila de la tarea mientras siga EN_CURSO a nombre del worker que la reclamó."""
+    return Tarea.objects.filter(pk=tarea.pk, estado=Tarea.Estado.EN_CURSO, worker=tarea.worker)
+
+
+class Latido(threading.Thread):
+    """Renueva el ``vence_en`` de una tarea en curso hasta que se detiene."""
+
+    def __init__(self, tarea, intervalo=None):
+        super().__init__(name=f"latido-tarea-{tarea.pk}", daemon=True)
+        self.tarea = tarea
+        self.intervalo = intervalo or getattr(settings, 'TAREAS_LATIDO', 30)
+        self.duracion = _duracion(tarea.nombre)
+        self._detener = threading.Event()
+
+    def latir(self):
+        """Extiende el plazo; False si la tarea ya no es de este worker."""
+        return bool(_propia(self.tarea).update(vence_en=timezone.now() + timedelta(seconds=self.duracion)))
+
+    def run(self):
+        try:
+            while not self._detener.wait(self.intervalo):
+                if not self.latir():
+                    break
+        except Exception:
+            logger.exception("Error renovando el plazo de la tarea %s", self.tarea)
+        finally:
+            # La conexión de este hilo no la cierra nadie más
+            connection.close()
+
+    def detener(self):
+        self._detener.set()
+        self.join()
+
+
+def reclamar(worker=None):
+    """Marca EN_CURSO la siguiente tarea pendiente y la devuelve (o None)."""
+    worker = worker or identificador_worker()
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            return _reclamar(worker, bloquear=True)
+    # Sin SKIP LOCKED (SQLite) no se abre transacción: una lectura que luego
+    # escribe choca con el otro worker ("database is locked"); el UPDATE
+    # condicional ya impide que dos workers tomen la misma fila.
+    return _reclamar(worker, bloquear=False)
+
+
+def _reclamar(worker, bloquear):
+    ahora = timezone.now()
+    pendientes = (Tarea.objects
+                  .filter(estado=Tarea.Estado.PENDIENTE, ejecutar_despues__lte=ahora)
+                  .order_by('-prioridad', 'ejecutar_despues', 'id'))
+    if bloquear:
+        pendientes = pendientes.select_for_update(skip_locked=True)
+    candidata = pendientes.values('pk', 'nombre').first()
+    if candidata is None:
+        return None
+    duracion = _duracion(candidata['nombre'])
+    reclamada = Tarea.objects.filter(pk=candidata['pk'], estado=Tarea.Estado.PENDIENTE).update(
+        estado=Tarea.Estado.EN_CURSO,
+        intentos=F('intentos') + 1,
+        iniciada=ahora,
+        vence_en=ahora + timedelta(seconds=duracion),
+        worker=worker,
+    )
+    if not reclamada:
+        # Otro worker la tomó entre el SELECT y el UPDATE
+        return None
+    return Tarea.objects.get(pk=candidata['pk'])
+
+
+def _guardar(tarea, campos):
+    """Guarda ``campos`` solo si la tarea sigue siendo de este worker."""
+    guardada = _propia(tarea).update(**{campo: getattr(tarea, campo) for campo in campos})
+    if not guardada:
+        logger.warning("Tarea %s: otro worker la recuperó por vencida, se descarta el resultado de %s",
+                       tarea, tarea.worker)
+    return bool(guardada)
+
+
+def ejecutar(tarea):
+    """Ejecuta una tarea ya reclamada y guarda su resultado o su error."""
+    latido = Latido(tarea)
+    latido.start()
+    try:
+        defin = definicion(tarea.nombre)
+        kwargs = dict(tarea.argumentos or {})
+        if defin.pasar_tarea:
+            kwargs['tarea'] = tarea
+        resultado = defin.funcion(**kwargs)
+    except Exception:
+        latido.detener()
+        _registrar_fallo(tarea, traceback.format_exc())
+        return tarea
+    latido.detener()
+
+    tarea.estado = Tarea.Estado.COMPLETADA
+    tarea.resultado = resultado
+    tarea.error = ''
+    tarea.terminada = timezone.now()
+    tarea.vence_en = None
+    _guardar(tarea, ['estado', 'resultado', 'error', 'terminada', 'vence_en', 'archivo'])
+    return tarea
+
+
+def _registrar_fallo(tarea, error):
+    tarea.error = error[-MAX_ERROR:]
+    tarea.vence_en = None
+    if tarea.intentos < tarea.max_intentos:
+        tarea.estado = Tarea.Estado.PENDIENTE
+        tarea.ejecutar_despues = timezone.now() + timedelta(seconds=espera_reintento(tarea.intentos))
+        logger.warning("Tarea %s falló (intento %s de %s), se reintentará", tarea, tarea.intentos, tarea.max_intentos)
+    else:
+        tarea.estado = Tarea.Estado.FALLIDA
+        tarea.terminada = timezone.now()
+        logger.error("Tarea %s falló definitivamente:\n%s", tarea, error)
+    _guardar(tarea, ['estado', 'error', 'vence_en', 'ejecutar_despues', 'terminada'])
+
+
+def recuperar_vencidas():
+    """
+    Devuelve a la cola (o da por fallidas si no les quedan intentos) las
+    tareas EN_CURSO cuyo worker dejó de responder. Devuelve cuántas tocó.
+    """
+    ahora = timezone.now()
+    vencidas = Tarea.objects.filter(estado=Tarea.Estado.EN_CURSO, vence_en__lt=ahora)
+    mensaje = "El worker no terminó la tarea antes de vencer su plazo."
+    fallidas = vencidas.filter(intentos__gte=F('max_intentos')).update(
+        estado=Tarea.Estado.FALLIDA, error=mensaje, terminada=ahora, vence_en=None,
+    )
+    reencoladas = vencidas.filter(~Q(intentos__gte=F('max_intentos'))).update(
+        estado=Tarea.Estado.PENDIENTE, error=mensaje, ejecutar_despues=ahora, vence_en=None,
+    )
+    return fallidas + reencoladas
+
+
+def ejecutar_pendientes(limite=None, worker=None):
+    """Ejecuta tareas hasta vaciar la cola (o hasta ``limite``). Devuelve cuántas."""
+    ejecutadas = 0
+    while limite is None or ejecutadas < limite:
+        tarea = reclamar(worker)
+        if tarea is None:
+            break
+        ejecutar(tarea)
+        ejecutadas += 1
+    return ejecutadas
+
+
+def bucle(detener, intervalo=None, worker=None):
+    """
+    Bucle de un worker hasta que ``detener`` (un ``Event``) se active. Entre
+    tarea y tarea cierra las conexiones caducadas, como hace Django entre
+    peticiones.
+    """
+    intervalo = intervalo or getattr(settings, 'TAREAS_INTERVALO', 1.0)
+    worker = worker or identificador_worker()
+    cada_recuperacion = 60
+    ultima_recuperacion = None
+    while not detener.is_set():
+        close_old_connections()
+        try:
+            ahora = timezone.now()
+            if ultima_recuperacion is None or (ahora - ultima_recuperacion).total_seconds() > cada_recuperacion:
+                recuperar_vencidas()
+                ultima_recuperacion = ahora
+            tarea = reclamar(worker)
+        except Exception:
+            logger.exception("Error consultando la cola de tareas")
+            detener.wait(intervalo)
+            continue
+        if tarea is None:
+            detener.wait(intervalo)
+            continue
+        ejecutar(tarea)
+    close_old_connections()
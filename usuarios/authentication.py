@@ -0,0 +1,209 @@
+# usuarios/authentication.py
+"""
+Autenticación por token con caché.
+
+``CachedTokenAuthentication`` sustituye a ``TokenAuthentication`` de DRF: la
+primera petición con un token hace el join token→usuario en la base de datos y
+guarda en la caché compartida lo necesario para identificar al usuario (datos
+básicos, rol, staff y el ``ContextoUsuario``). Las siguientes peticiones con
+ese token no tocan la base de datos.
+
+Invalidación:
+
+- cada usuario tiene un número de versión en caché; guardar el usuario
+  (cambio de contraseña, desactivación), su perfil, su residencia o sus
+  propiedades lo incrementa y deja obsoletas todas sus entradas
+  (``invalidar_usuario``);
+- al borrar el token (logout) se borra su entrada.
+
+La versión se lee antes de ir a la base de datos: una invalidación que
+llegue mientras se carga el usuario deja obsoleta la entrada que se guarde.
+La caché solo se usa con una caché compartida (``AUTH_TOKEN_CACHE_TTL`` es 0
+sin ``REDIS_URL``): con la de memoria local cada proceso tendría su propia
+versión y el desalojo de una versión podría revivir entradas obsoletas.
+
+Expiración opcional (``AUTH_TOKEN_EXPIRACION`` en segundos): el token deja de
+valer pasado ese tiempo desde ``Token.created``. Con
+``AUTH_TOKEN_DESLIZANTE`` la ventana se renueva con el uso; para no escribir en
+cada petición, ``created`` solo se actualiza cuando ha pasado
+``AUTH_TOKEN_RENOVAR_CADA`` segundos desde la última renovación.
+"""
+import hashlib
+from dataclasses import asdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .contexto import ContextoUsuario, fijar_contexto, resolver_contexto
+
+CAMPOS_USUARIO = ("id", "username", "email", "first_name", "last_name", "is_active", "is_staff", "is_superuser")
+
+
+def _ajuste(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _clave_token(key):
+    # No se guarda el token en claro como clave de caché
+    return "auth:token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _clave_version(usuario_id):
+    return f"auth:version:{usuario_id}"
+
+
+def _ahora_y_al_commit(funcion):
+    # Dentro de una transacción otra petición aún puede leer los datos viejos
+    # y guardarlos con la versión nueva: se invalida de nuevo al commit
+    funcion()
+    if connection.in_atomic_block:
+        transaction.on_commit(funcion)
+
+
+def invalidar_usuario(usuario_id):
+    """Deja obsoletas todas las entradas en caché de los tokens del usuario."""
+    clave = _clave_version(usuario_id)
+
+    def incrementar():
+        try:
+            cache.incr(clave)
+        except ValueError:
+            # Sin versión previa: las entradas guardaron None, cualquier número las invalida
+            cache.set(clave, 1, None)
+
+    _ahora_y_al_commit(incrementar)
+
+
+def invalidar_token(key):
+    clave = _clave_token(key)
+    _ahora_y_al_commit(lambda: cache.delete(clave))
+
+
+def token_expirado(creado, ahora=None):
+    expiracion = _ajuste("AUTH_TOKEN_EXPIRACION", None)
+    if not expiracion:
+        return False
+    ahora = ahora or timezone.now()
+    return (ahora - creado).total_seconds() > expiracion
+
+
+def emitir_token(user):
+    """Token vigente del usuario; si el actual expiró, se reemplaza por uno nuevo."""
+    token, creado = Token.objects.get_or_create(user=user)
+    if not creado and token_expirado(token.created):
+        token.delete()
+        token = Token.objects.create(user=user)
+    return token
+
+
+def _usuario_desde_cache(datos):
+    """
+    Instancia de ``User`` con solo los campos en caché. El resto quedan
+    diferidos: se cargan de la base de datos si alguien los lee, y ``save()``
+    solo escribe los campos cargados.
+    """
+    User = get_user_model()
+    return User.from_db(DEFAULT_DB_ALIAS, list(CAMPOS_USUARIO), [datos[c] for c in CAMPOS_USUARIO])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        clave_token = _clave_token(key)
+        datos = cache.get(clave_token) if _ajuste("AUTH_TOKEN_CACHE_TTL", 300) else None
+        if datos is not None:
+            version = cache.get(_clave_version(datos["usuario"]["id"]))
+            if version != datos["version"]:
+                datos = None
+
+        if datos is None:
+            datos = self._cargar(key)
+
+        ahora = timezone.now()
+        creado = datos["creado"]
+        if token_expirado(creado, ahora):
+            Token.objects.filter(key=key).delete()
+            invalidar_token(key)
+            raise exceptions.AuthenticationFailed("Token expirado.")
+        if _ajuste("AUTH_TOKEN_DESLIZANTE", False) and _ajuste("AUTH_TOKEN_EXPIRACION", None):
+            if (ahora - creado).total_seconds() > _ajuste("AUTH_TOKEN_RENOVAR_CADA", 3600):
+                Token.objects.filter(key=key).update(created=ahora)
+                datos["creado"] = ahora
+                self._guardar(clave_token, datos)
+
+        user = _usuario_desde_cache(datos["usuario"])
+        fijar_contexto(user, ContextoUsuario(**datos["contexto"]))
+        return (user, key)
+
+    def _cargar(self, key):
+        usuario_id = Token.objects.filter(key=key).values_list("user_id", flat=True).first()
+        if usuario_id is None:
+            raise exceptions.AuthenticationFailed("Token inválido.")
+        # Antes de leer el usuario: si cambia mientras tanto, la entrada se
+        # guarda con la versión anterior y ya nace obsoleta
+        version = cache.get(_clave_version(usuario_id))
+        try:
+            token = Token.objects.select_related("user").get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed("Token inválido.")
+        user = token.user
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed("Usuario inactivo o eliminado.")
+
+        contexto = resolver_contexto(user)
+        datos = {
+            "usuario": {campo: getattr(user, campo) for campo in CAMPOS_USUARIO},
+            "rol": contexto.rol,
+            "contexto": asdict(contexto),
+            "creado": token.created,
+            "version": version,
+        }
+        self._guardar(_clave_token(key), datos)
+        return datos
+
+    @staticmethod
+    def _guardar(clave, datos):
+        ttl = _ajuste("AUTH_TOKEN_CACHE_TTL", 300)
+        if ttl:
+            cache.set(clave, datos, ttl)
+
+
+# --- WebSockets (channels) ---
+
+def _usuario_por_token(key):
+    from django.contrib.auth.models import AnonymousUser
+
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except exceptions.AuthenticationFailed:
+        return AnonymousUser()
+    return user
+
+
+class TokenAuthMiddleware:
+    """
+    Middleware ASGI que autentica los WebSockets con el mismo token de la API,
+    pasado como ``?token=<key>`` (los navegadores no permiten cabeceras en el
+    handshake). Deja ``scope["user"]`` como ``AnonymousUser`` si falta o no
+    vale. No se usan cookies de sesión, así que otra web no puede abrir un
+    socket en nombre del usuario.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        from urllib.parse import parse_qs
+
+        from channels.db import database_sync_to_async
+        from django.contrib.auth.models import AnonymousUser
+
+        key = parse_qs(scope.get("query_string", b"").decode()).get("token", [None])[0]
+        user = await database_sync_to_async(_usuario_por_token)(key) if key else AnonymousUser()
+        return await self.app(dict(scope, user=user), receive, send)
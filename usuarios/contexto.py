@@ -0,0 +1,144 @@
+# usuarios/contexto.py
+"""
+Contexto de usuario por petición.
+
+Rol, residencia y propiedades del usuario autenticado, resueltos con una sola
+consulta la primera vez que se piden y reutilizados por permisos, vistas y
+querysets durante el resto de la petición::
+
+    ctx = contexto_de(request)
+    if ctx.es_propietario: ...
+    Gasto.objects.filter(propiedad_id=ctx.propiedad_id)
+
+``ContextoUsuarioMiddleware`` lo expone además como ``request.contexto``.
+"""
+from dataclasses import dataclass, field
+
+from django.contrib.auth import get_user_model
+
+from .models import UserProfile
+
+_ATRIBUTO_CACHE = "_contexto_usuario"
+
+
+@dataclass(frozen=True)
+class ContextoUsuario:
+    usuario_id: int = None
+    is_staff: bool = False
+    is_superuser: bool = False
+    rol: str = None
+    residente_id: int = None
+    rol_residente: str = None
+    # Propiedad donde vive (Residente.propiedad)
+    propiedad_id: int = None
+    # Propiedades de las que es dueño (Propiedad.propietario)
+    propiedades_propias_ids: frozenset = field(default_factory=frozenset)
+
+    @property
+    def autenticado(self):
+        return self.usuario_id is not None
+
+    @property
+    def es_propietario(self):
+        return self.rol == UserProfile.Role.PROPIETARIO
+
+    @property
+    def es_seguridad(self):
+        return self.rol == UserProfile.Role.SEGURIDAD
+
+    @property
+    def es_mantenimiento(self):
+        return self.rol == UserProfile.Role.MANTENIMIENTO
+
+    @property
+    def es_residente(self):
+        return self.rol == UserProfile.Role.RESIDENTE
+
+    @property
+    def propiedades_ids(self):
+        """Propiedades propias más la de residencia."""
+        if self.propiedad_id is None:
+            return self.propiedades_propias_ids
+        return self.propiedades_propias_ids | {self.propiedad_id}
+
+
+ANONIMO = ContextoUsuario()
+
+
+def resolver_contexto(user):
+    """Construye el contexto de ``user`` con una consulta (perfil, residente y propiedades)."""
+    if user is None or not user.is_authenticated:
+        return ANONIMO
+
+    filas = list(
+        get_user_model().objects
+        .filter(pk=user.pk)
+        .values(
+            "profile__role",
+            "residente__id",
+            "residente__rol",
+            "residente__propiedad_id",
+            "propiedad__id",
+        )
+    )
+    if not filas:
+        return ANONIMO
+    primera = filas[0]
+    return ContextoUsuario(
+        usuario_id=user.pk,
+        is_staff=user.is_staff,
+        is_superuser=user.is_superuser,
+        rol=primera["profile__role"],
+        residente_id=primera["residente__id"],
+        rol_residente=primera["residente__rol"],
+        propiedad_id=primera["residente__propiedad_id"],
+        propiedades_propias_ids=frozenset(f["propiedad__id"] for f in filas if f["propiedad__id"] is not None),
+    )
+
+
+def fijar_contexto(user, contexto):
+    """Asocia a ``user`` un contexto ya resuelto (p. ej. desde la caché de autenticación)."""
+    user._contexto_usuario = contexto
+
+
+def contexto_de(request):
+    """
+    Contexto del usuario de ``request`` (``HttpRequest`` o ``Request`` de DRF),
+    calculado una vez por petición y usuario. Con autenticación por token el
+    usuario se conoce recién dentro de la vista, por eso se resuelve de forma
+    perezosa y se recalcula si cambia.
+    """
+    base = getattr(request, "_request", request)
+    user = getattr(request, "user", None)
+    clave = getattr(user, "pk", None)
+    cache = getattr(base, _ATRIBUTO_CACHE, None)
+    if cache is None or cache[0] != clave:
+        contexto = getattr(user, _ATRIBUTO_CACHE, None) or resolver_contexto(user)
+        cache = (clave, contexto)
+        setattr(base, _ATRIBUTO_CACHE, cache)
+    return cache[1]
+
+
+class _ContextoDePeticion:
+    """Delegado de ``request.contexto``: siempre refleja el usuario actual."""
+    __slots__ = ("_request",)
+
+    def __init__(self, request):
+        self._request = request
+
+    def __getattr__(self, nombre):
+        return getattr(contexto_de(self._request), nombre)
+
+    def __repr__(self):
+        return repr(contexto_de(self._request))
+
+
+class ContextoUsuarioMiddleware:
+    """Expone ``request.contexto`` en todas las peticiones."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.contexto = _ContextoDePeticion(request)
+        return self.get_response(request)
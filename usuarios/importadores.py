@@ -0,0 +1,78 @@
+# usuarios/importadores.py
+"""Importadores de CSV de usuarios (ver config.importacion)."""
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from condominio.models import Propiedad
+from config.cache_condicional import invalidar_modelo
+from config.importacion import FilaInvalida, Importador, buscar, mapa, obligatorio, opcion, registrar
+
+from .models import Residente, UserProfile
+
+
+@registrar
+class ImportadorResidentes(Importador):
+    """
+    Residentes con su usuario: ``username,rol[,numero_casa,email,first_name,last_name,password]``.
+    Sin ``password`` el usuario queda sin contraseña utilizable.
+    """
+    tipo = 'residentes'
+    columnas = ('username', 'rol')
+    opcionales = ('numero_casa', 'email', 'first_name', 'last_name', 'password')
+    roles = [clave for clave, _ in Residente.ROL_CHOICES]
+
+    def __init__(self):
+        self.usuarios_vistos = {}
+
+    def preparar(self, filas):
+        nombres = {fila['username'] for fila in filas} - {''}
+        return {
+            'casas': mapa(Propiedad, 'numero_casa', filas),
+            'existentes': set(User.objects.filter(username__in=nombres).values_list('username', flat=True)),
+        }
+
+    def convertir(self, fila, lote):
+        username = obligatorio(fila, 'username')
+        try:
+            User.username_validator(username)
+            if fila.get('email'):
+                validate_email(fila['email'])
+        except ValidationError as error:
+            raise FilaInvalida(' '.join(error.messages)) from None
+        if len(username) > User._meta.get_field('username').max_length:
+            raise FilaInvalida(f"El usuario '{username}' es demasiado largo.")
+        if username in lote['existentes']:
+            raise FilaInvalida(f"Ya existe el usuario '{username}'.")
+        if username in self.usuarios_vistos:
+            raise FilaInvalida(f"El usuario '{username}' está repetido (línea {self.usuarios_vistos[username]}).")
+        rol = opcion(fila, 'rol', self.roles)
+        propiedad_id = buscar(lote['casas'], fila, 'numero_casa', 'la casa') if fila.get('numero_casa') else None
+
+        self.usuarios_vistos[username] = fila.linea
+        usuario = User(
+            username=username,
+            email=fila.get('email', ''),
+            first_name=fila.get('first_name', '')[:150],
+            last_name=fila.get('last_name', '')[:150],
+            password=make_password(fila.get('password') or None),
+        )
+        return usuario, rol, propiedad_id
+
+    def guardar(self, filas):
+        # bulk_create no dispara la señal que crea el UserProfile: se crean aquí
+        usuarios = User.objects.bulk_create([usuario for usuario, _, _ in filas])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=usuario, role=UserProfile.Role.RESIDENTE) for usuario in usuarios
+        ])
+        Residente.objects.bulk_create([
+            Residente(usuario=usuario, rol=rol, propiedad_id=propiedad_id)
+            for usuario, rol, propiedad_id in filas
+        ])
+        # Ni bulk_create ni el alta de perfiles disparan post_save: los catálogos
+        # que dependen de usuarios y residentes se invalidan al confirmar
+        transaction.on_commit(lambda: invalidar_modelo(User))
+        transaction.on_commit(lambda: invalidar_modelo(Residente))
+        return len(usuarios)
@@ -0,0 +1,54 @@
+# usuarios/management/commands/importar_csv.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from config.importacion import TAMANO_LOTE, ImportacionInterrumpida, ImportacionInvalida, importar, tipos
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa un CSV de gastos, egresos, vehículos o residentes en lotes validados. "
+        "Informa los errores por número de línea; si se corta, se retoma con --desde-linea."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("tipo", choices=tipos(), help="Qué se importa.")
+        parser.add_argument("archivo", help="Ruta del CSV (UTF-8, con encabezado).")
+        parser.add_argument("--desde-linea", type=int, default=1,
+                            help="Saltar las filas anteriores a esta línea (para retomar una importación).")
+        parser.add_argument("--delimitador", default=",", help="Separador de columnas (por defecto ',').")
+        parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help=f"Filas por lote (por defecto {TAMANO_LOTE}).")
+        parser.add_argument("--simular", action="store_true", help="Solo validar, sin guardar nada.")
+
+    def handle(self, *args, **opts):
+        def progreso(resultado):
+            self.stdout.write(
+                f"línea {resultado.ultima_linea}: {resultado.creadas} creadas, "
+                f"{len(resultado.errores)} errores ({resultado.por_segundo:.0f} filas/s)"
+            )
+
+        try:
+            with open(opts["archivo"], newline="", encoding="utf-8-sig") as archivo:
+                resultado = importar(
+                    archivo, opts["tipo"],
+                    desde_linea=opts["desde_linea"],
+                    delimitador=opts["delimitador"],
+                    simular=opts["simular"],
+                    tamano_lote=opts["lote"],
+                    progreso=progreso,
+                )
+        except OSError as error:
+            raise CommandError(f"No se pudo leer el archivo: {error}")
+        except ImportacionInvalida as error:
+            raise CommandError(str(error))
+        except ImportacionInterrumpida as error:
+            raise CommandError(f"{error}\nRetomar con --desde-linea {error.resultado.ultima_linea + 1}")
+
+        for linea, mensaje in resultado.errores:
+            self.stderr.write(f"línea {linea}: {mensaje}")
+        accion = "validadas (simulación)" if resultado.simulacion else "importadas"
+        estilo = self.style.WARNING if resultado.errores else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"{resultado.leidas} filas {accion} en {resultado.segundos:.1f}s: "
+            f"{resultado.creadas} {opts['tipo']} creados, {len(resultado.errores)} con errores."
+        ))
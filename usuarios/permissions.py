@@ -1,42 +1,29 @@
 # En usuarios/permissions.py
 from rest_framework.permissions import BasePermission
+from .contexto import contexto_de
 from .models import UserProfile
 
-class IsPropietario(BasePermission):
-    def has_permission(self, request, view):
-        if not request.user.is_authenticated:
-            return False
-        try:
-            return request.user.profile.role == UserProfile.Role.PROPIETARIO
-        except UserProfile.DoesNotExist:
-            return False
 
-class IsPersonalSeguridad(BasePermission):
-    def has_permission(self, request, view):
-        if not request.user.is_authenticated:
-            return False
-        try:
-            return request.user.profile.role == UserProfile.Role.SEGURIDAD
-        except UserProfile.DoesNotExist:
-            return False
+class _RolPermission(BasePermission):
+    """Permite el acceso a usuarios autenticados con el rol ``rol``."""
+    rol = None
 
-class IsPersonalMantenimiento(BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
-        try:
-            return request.user.profile.role == UserProfile.Role.MANTENIMIENTO
-        except UserProfile.DoesNotExist:
-            return False
+        return contexto_de(request).rol == self.rol
 
-class IsResidente(BasePermission):
-    def has_permission(self, request, view):
-        if not request.user.is_authenticated:
-            return False
-        try:
-            return request.user.profile.role == UserProfile.Role.RESIDENTE
-        except UserProfile.DoesNotExist:
-            return False
+class IsPropietario(_RolPermission):
+    rol = UserProfile.Role.PROPIETARIO
+
+class IsPersonalSeguridad(_RolPermission):
+    rol = UserProfile.Role.SEGURIDAD
+
+class IsPersonalMantenimiento(_RolPermission):
+    rol = UserProfile.Role.MANTENIMIENTO
+
+class IsResidente(_RolPermission):
+    rol = UserProfile.Role.RESIDENTE
 
 class IsPropietarioOrReadOnly(BasePermission):
     """
@@ -49,7 +36,4 @@ class IsPropietarioOrReadOnly(BasePermission):
         if request.method in ['GET', 'HEAD', 'OPTIONS']:
             return True
         
-        try:
-            return request.user.profile.role == UserProfile.Role.PROPIETARIO
-        except UserProfile.DoesNotExist:
-            return False
\ No newline at end of file
+        return contexto_de(request).es_propietario
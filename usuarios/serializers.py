@@ -1,8 +1,11 @@
+import csv
+
 from django.contrib.auth.models import User
 from rest_framework import serializers
 from .models import Residente
 from condominio.serializers import PropiedadSerializer
 from .common_serializers import UserReadSerializer
+from config.importacion import ImportacionInvalida, importador, tipos
 # --- SERIALIZADORES PARA LEER DATOS (GET) ---
 
 class ResidenteReadSerializer(serializers.ModelSerializer):
@@ -129,3 +132,30 @@ class RegistroSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
     
+
+
+class ImportarCSVSerializer(serializers.Serializer):
+    """Archivo CSV a importar (ver config.importacion); el encabezado se valida antes de encolar."""
+    tipo = serializers.ChoiceField(choices=[])
+    archivo = serializers.FileField()
+    delimitador = serializers.CharField(max_length=1, default=',', trim_whitespace=False)
+    simular = serializers.BooleanField(default=False, help_text="Solo validar, sin guardar nada.")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['tipo'].choices = tipos()
+
+    def validate(self, data):
+        archivo = data['archivo']
+        try:
+            primera = archivo.readline().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise serializers.ValidationError({'archivo': "El archivo debe estar en UTF-8."})
+        finally:
+            archivo.seek(0)
+        encabezados = next(csv.reader([primera], delimiter=data['delimitador']), [])
+        try:
+            importador(data['tipo']).validar_encabezados(encabezados)
+        except ImportacionInvalida as error:
+            raise serializers.ValidationError({'archivo': str(error)})
+        return data
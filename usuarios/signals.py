@@ -1,9 +1,12 @@
 # usuarios/signals.py
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from rest_framework.authtoken.models import Token
+from condominio.models import Propiedad
+from .authentication import invalidar_token, invalidar_usuario
+from .models import Residente, UserProfile
 
 @receiver(post_save, sender=User)
 def crear_user_profile(sender, instance, created, **kwargs):
@@ -14,4 +17,46 @@ def crear_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(
             user=instance,
             role=UserProfile.Role.RESIDENTE  # Por defecto todos son residentes
-        )
\ No newline at end of file
+        )
+
+
+# --- Invalidación de la caché de autenticación (usuarios.authentication) ---
+
+@receiver(post_save, sender=User)
+def invalidar_cache_usuario(sender, instance, created, **kwargs):
+    """Cambio de contraseña, desactivación o cualquier otro dato del usuario."""
+    if not created:
+        invalidar_usuario(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=Residente)
+@receiver(post_delete, sender=Residente)
+def invalidar_cache_por_rol_o_residencia(sender, instance, **kwargs):
+    usuario_id = instance.user_id if sender is UserProfile else instance.usuario_id
+    invalidar_usuario(usuario_id)
+
+
+@receiver(pre_save, sender=Propiedad)
+def recordar_propietario_anterior(sender, instance, **kwargs):
+    instance._propietario_anterior_id = None
+    if instance.pk:
+        instance._propietario_anterior_id = (
+            Propiedad.objects.filter(pk=instance.pk).values_list("propietario_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Propiedad)
+@receiver(post_delete, sender=Propiedad)
+def invalidar_cache_por_propiedad(sender, instance, **kwargs):
+    invalidar_usuario(instance.propietario_id)
+    anterior = getattr(instance, "_propietario_anterior_id", None)
+    if anterior and anterior != instance.propietario_id:
+        invalidar_usuario(anterior)
+
+
+@receiver(post_delete, sender=Token)
+def invalidar_cache_token(sender, instance, **kwargs):
+    """Logout (o token revocado desde el admin)."""
+    invalidar_token(instance.key)
@@ -0,0 +1,31 @@
+# usuarios/tareas.py
+"""Tareas en segundo plano de usuarios (ver tareas.registro)."""
+import io
+
+from config.importacion import importar
+from tareas.models import Tarea
+from tareas.registro import tarea
+
+
+@tarea("usuarios.importar_csv", pasar_tarea=True, duracion_maxima=3600)
+def importar_csv(tipo, tarea, delimitador=',', simular=False):
+    """Importa el CSV adjunto a la tarea; un reintento retoma después del último lote guardado."""
+    anterior = tarea.resultado or {}
+
+    def progreso(resultado):
+        # El avance (y la línea desde donde retomar) se ve en GET /api/tareas/{id}/
+        Tarea.objects.filter(pk=tarea.pk).update(resultado={
+            **resultado.como_dict(),
+            'creadas': anterior.get('creadas', 0) + resultado.creadas,
+        })
+
+    with tarea.archivo.open('rb') as crudo:
+        archivo = io.TextIOWrapper(crudo, encoding='utf-8-sig', newline='')
+        resultado = importar(
+            archivo, tipo,
+            desde_linea=anterior.get('ultima_linea', 0) + 1,
+            delimitador=delimitador,
+            simular=simular,
+            progreso=progreso,
+        )
+    return {**resultado.como_dict(), 'creadas': anterior.get('creadas', 0) + resultado.creadas}
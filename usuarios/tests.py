@@ -1,10 +1,29 @@
 # en usuarios/tests.py
 
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.urls import reverse
-from django.contrib.auth.models import User
-from .models import Residente
+from django.contrib.auth.models import AnonymousUser, User
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+from .authentication import CachedTokenAuthentication
+from .contexto import ANONIMO, contexto_de, resolver_contexto
+from .models import Residente, UserProfile
+from .permissions import IsPropietario
 from condominio.models import Propiedad
 
 class UsuariosAPITests(APITestCase):
@@ -72,8 +91,8 @@ class UsuariosAPITests(APITestCase):
         response = self.client.get(self.list_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1) # Solo hay un residente (el propietario)
-        self.assertEqual(response.data[0]['usuario']['username'], 'propietario')
+        self.assertEqual(len(response.data['results']), 1) # Solo hay un residente (el propietario)
+        self.assertEqual(response.data['results'][0]['usuario']['username'], 'propietario')
 
     def test_actualizar_residente_parcialmente(self):
         """
@@ -97,4 +116,266 @@ class UsuariosAPITests(APITestCase):
         
         # Recargamos el objeto User desde la BD para ver los cambios
         self.propietario_user.refresh_from_db()
-        self.assertEqual(self.propietario_user.email, 'nuevo.email@dominio.com')
\ No newline at end of file
+        self.assertEqual(self.propietario_user.email, 'nuevo.email@dominio.com')
+
+
+class ContextoUsuarioTests(APITestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='vecino', password='x')
+        self.usuario.profile.role = UserProfile.Role.PROPIETARIO
+        self.usuario.profile.save()
+        self.casa = Propiedad.objects.create(numero_casa='A-1', propietario=self.usuario, metros_cuadrados=100)
+        self.local = Propiedad.objects.create(numero_casa='A-2', propietario=self.usuario, metros_cuadrados=50)
+        otro = User.objects.create_user(username='otro', password='x')
+        self.vive_en = Propiedad.objects.create(numero_casa='B-1', propietario=otro, metros_cuadrados=80)
+        self.residente = Residente.objects.create(usuario=self.usuario, propiedad=self.vive_en, rol='inquilino')
+
+    def test_resuelve_todo_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            ctx = resolver_contexto(self.usuario)
+        self.assertTrue(ctx.es_propietario)
+        self.assertEqual(ctx.residente_id, self.residente.id)
+        self.assertEqual(ctx.rol_residente, 'inquilino')
+        self.assertEqual(ctx.propiedad_id, self.vive_en.id)
+        self.assertEqual(ctx.propiedades_propias_ids, {self.casa.id, self.local.id})
+        self.assertEqual(ctx.propiedades_ids, {self.casa.id, self.local.id, self.vive_en.id})
+
+    def test_usuario_sin_residencia_ni_propiedades(self):
+        solo = User.objects.create_user(username='solo', password='x')
+        ctx = resolver_contexto(solo)
+        self.assertTrue(ctx.es_residente)
+        self.assertIsNone(ctx.residente_id)
+        self.assertEqual(ctx.propiedades_ids, frozenset())
+
+    def test_se_calcula_una_vez_por_peticion(self):
+        request = APIRequestFactory().get('/')
+        request.user = self.usuario
+        with self.assertNumQueries(1):
+            self.assertTrue(IsPropietario().has_permission(request, None))
+            contexto_de(request)
+            contexto_de(request)
+
+    def test_anonimo(self):
+        request = APIRequestFactory().get('/')
+        request.user = AnonymousUser()
+        self.assertIs(contexto_de(request), ANONIMO)
+        self.assertFalse(IsPropietario().has_permission(request, None))
+
+
+@override_settings(AUTH_TOKEN_CACHE_TTL=300)
+class CachedTokenAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user(username='movil', password='clave-1')
+        self.token = Token.objects.create(user=self.usuario)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('user-profile')
+        Residente.objects.create(usuario=self.usuario, rol='inquilino')
+
+    def _consultas_de_autenticacion(self):
+        """Consultas a token/perfil hechas para identificar al usuario en una petición."""
+        with CaptureQueriesContext(connection) as capturadas:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [q['sql'] for q in capturadas.captured_queries if 'authtoken_token' in q['sql'] or 'usuarios_userprofile' in q['sql']]
+
+    def test_segunda_peticion_no_consulta_token_ni_rol(self):
+        self.assertTrue(self._consultas_de_autenticacion())
+        self.assertEqual(self._consultas_de_autenticacion(), [])
+
+    def test_cambio_de_contrasena_invalida_la_cache(self):
+        self._consultas_de_autenticacion()
+        self.usuario.set_password('clave-2')
+        self.usuario.save()
+        self.assertTrue(self._consultas_de_autenticacion())
+
+    def test_usuario_desactivado_pierde_acceso(self):
+        self._consultas_de_autenticacion()
+        self.usuario.is_active = False
+        self.usuario.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_desactivacion_durante_la_carga_no_queda_en_cache(self):
+        from unittest import mock
+
+        from . import authentication
+
+        resolver = authentication.resolver_contexto
+
+        def desactivar_en_medio(user):
+            User.objects.filter(pk=user.pk).update(is_active=False)
+            authentication.invalidar_usuario(user.pk)
+            return resolver(user)
+
+        with mock.patch.object(authentication, 'resolver_contexto', side_effect=desactivar_en_medio):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKEN_CACHE_TTL=0)
+    def test_sin_cache_compartida_siempre_consulta(self):
+        self.assertTrue(self._consultas_de_autenticacion())
+        self.assertTrue(self._consultas_de_autenticacion())
+
+    def test_logout_revoca_el_token(self):
+        self._consultas_de_autenticacion()
+        response = self.client.post(reverse('api_logout'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cambio_de_rol_invalida_la_cache(self):
+        self._consultas_de_autenticacion()
+        self.usuario.profile.role = UserProfile.Role.PROPIETARIO
+        self.usuario.profile.save()
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        user, _ = CachedTokenAuthentication().authenticate(request)
+        self.assertEqual(user._contexto_usuario.rol, UserProfile.Role.PROPIETARIO)
+
+    @override_settings(AUTH_TOKEN_EXPIRACION=3600)
+    def test_token_expirado_y_login_emite_uno_nuevo(self):
+        Token.objects.filter(pk=self.token.pk).update(created=timezone.now() - timedelta(hours=2))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials()
+        response = self.client.post(reverse('api_token_auth'), {'username': 'movil', 'password': 'clave-1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data['token'], self.token.key)
+
+    @override_settings(AUTH_TOKEN_EXPIRACION=3600, AUTH_TOKEN_DESLIZANTE=True, AUTH_TOKEN_RENOVAR_CADA=600)
+    def test_expiracion_deslizante_renueva_el_token(self):
+        Token.objects.filter(pk=self.token.pk).update(created=timezone.now() - timedelta(minutes=50))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.token.refresh_from_db()
+        self.assertLess(timezone.now() - self.token.created, timedelta(minutes=1))
+
+
+class ImportacionCSVTests(APITestCase):
+    """Importación masiva de CSV (config.importacion) por comando y por endpoint."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin_imp', password='x', is_staff=True)
+        dueno = User.objects.create_user(username='dueno_imp', password='x')
+        self.casa = Propiedad.objects.create(numero_casa='C-1', propietario=dueno, metros_cuadrados=80)
+        Propiedad.objects.create(numero_casa='C-2', propietario=dueno, metros_cuadrados=80)
+
+    def _csv(self, contenido):
+        archivo = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8')
+        archivo.write(contenido)
+        archivo.close()
+        self.addCleanup(os.remove, archivo.name)
+        return archivo.name
+
+    def _importar(self, tipo, contenido, *opciones):
+        salida, errores = StringIO(), StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('importar_csv', tipo, self._csv(contenido), *opciones, stdout=salida, stderr=errores)
+        return salida.getvalue(), errores.getvalue()
+
+    def test_vehiculos_duplicados_y_casas_inexistentes_por_linea(self):
+        from seguridad.models import Vehiculo
+        Vehiculo.objects.create(placa='EXI123', propiedad=self.casa)
+        _, errores = self._importar('vehiculos', (
+            "placa,numero_casa\n"
+            "abc123,C-1\n"       # 2
+            "ABC123,C-2\n"       # 3: repetida en el archivo
+            "exi123,C-1\n"       # 4: ya registrada
+            "XYZ789,NO-EXISTE\n"  # 5
+            "QWE456,C-2\n"       # 6
+        ), '--lote', '2')
+        self.assertEqual(set(Vehiculo.objects.values_list('placa', flat=True)), {'EXI123', 'ABC123', 'QWE456'})
+        self.assertIn("línea 3: La placa 'ABC123' está repetida (línea 2)", errores)
+        self.assertIn("línea 4: La placa 'EXI123' ya está registrada", errores)
+        self.assertIn("línea 5: No existe la casa 'NO-EXISTE'", errores)
+
+    def test_gastos_y_egresos_actualizan_saldos_y_resumenes(self):
+        from finanzas.models import Egreso, Gasto, ResumenMensualEgreso, SaldoPropiedad
+        _, errores = self._importar('gastos', (
+            "numero_casa,monto,fecha_emision,fecha_vencimiento,descripcion\n"
+            "C-1,150.50,2025-03-01,2025-03-10,Reparación portón\n"
+            "C-1,abc,2025-03-01,,\n"
+            "C-2,-5,01/03/2025,,\n"
+            "C-2,\"1200,25\",01/03/2025,,Pintura\n"
+        ))
+        self.assertEqual(Gasto.objects.count(), 2)
+        self.assertEqual(Gasto.objects.get(propiedad__numero_casa='C-2').mes, 3)
+        self.assertEqual(SaldoPropiedad.objects.get(propiedad=self.casa).saldo_gastos, Decimal('150.50'))
+        self.assertIn("línea 3: 'monto' no es un número", errores)
+        self.assertIn("línea 4: 'monto' debe ser mayor que cero", errores)
+
+        self._importar('egresos', (
+            "concepto,monto,categoria,fecha\n"
+            "Luz,300,servicios,2024-12-15\n"
+            "Jardín,100,INEXISTENTE,2024-12-15\n"
+        ))
+        egreso = Egreso.objects.get()
+        self.assertEqual(egreso.fecha, date(2024, 12, 15))
+        self.assertEqual(egreso.categoria, 'SERVICIOS')
+        resumen = ResumenMensualEgreso.objects.get(anio=2024, mes=12)
+        self.assertEqual(resumen.total, Decimal('300'))
+
+    def test_residentes_crea_usuario_perfil_y_residente(self):
+        self._importar('residentes', (
+            "username,rol,numero_casa,email,password\n"
+            "ana,inquilino,C-1,ana@example.com,clave-segura-1\n"
+            "dueno_imp,propietario,C-1,,\n"   # usuario existente
+            "luis,jefe,C-2,,\n"               # rol inválido
+            "sin_casa,otro,,,\n"
+        ))
+        ana = User.objects.get(username='ana')
+        self.assertTrue(ana.check_password('clave-segura-1'))
+        self.assertEqual(ana.profile.role, UserProfile.Role.RESIDENTE)
+        self.assertEqual(ana.residente.propiedad, self.casa)
+        self.assertFalse(User.objects.get(username='sin_casa').has_usable_password())
+        self.assertFalse(User.objects.filter(username='luis').exists())
+
+    def test_residentes_invalidan_los_catalogos(self):
+        from config.cache_condicional import versiones
+
+        antes, _ = versiones((User, Residente))
+        self._importar('residentes', "username,rol,numero_casa\nmarta,inquilino,C-2\n")
+        despues, _ = versiones((User, Residente))
+        self.assertNotEqual(despues[0], antes[0])
+        self.assertNotEqual(despues[1], antes[1])
+
+    def test_retomar_desde_linea_y_simular(self):
+        from seguridad.models import Vehiculo
+        contenido = "placa,numero_casa\nAAA111,C-1\nBBB222,C-1\nCCC333,C-2\n"
+        self._importar('vehiculos', contenido, '--simular')
+        self.assertFalse(Vehiculo.objects.exists())
+        salida, _ = self._importar('vehiculos', contenido, '--desde-linea', '3')
+        self.assertEqual(set(Vehiculo.objects.values_list('placa', flat=True)), {'BBB222', 'CCC333'})
+        self.assertIn("línea 4", salida)
+
+    def test_encabezado_incompleto(self):
+        with self.assertRaisesMessage(CommandError, 'numero_casa'):
+            self._importar('vehiculos', "placa\nAAA111\n")
+
+    def test_endpoint_encola_la_importacion(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from seguridad.models import Vehiculo
+        from tareas.models import Tarea
+        from tareas.worker import ejecutar_pendientes
+        url = reverse('importar-csv')
+        contenido = "placa,numero_casa\nAAA111,C-1\nAAA111,C-2\n".encode()
+
+        self.client.force_authenticate(user=User.objects.get(username='dueno_imp'))
+        self.assertEqual(self.client.post(url, {}).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        respuesta = self.client.post(url, {
+            'tipo': 'vehiculos', 'archivo': SimpleUploadedFile('v.csv', b"placa\nAAA111\n"),
+        }, format='multipart')
+        self.assertEqual(respuesta.status_code, status.HTTP_400_BAD_REQUEST)
+
+        respuesta = self.client.post(url, {
+            'tipo': 'vehiculos', 'archivo': SimpleUploadedFile('v.csv', contenido),
+        }, format='multipart')
+        self.assertEqual(respuesta.status_code, status.HTTP_202_ACCEPTED)
+        ejecutar_pendientes()
+        tarea = Tarea.objects.get(pk=respuesta.data['tarea_id'])
+        self.assertEqual(tarea.estado, Tarea.Estado.COMPLETADA)
+        self.assertEqual(tarea.resultado['creadas'], 1)
+        self.assertEqual(tarea.resultado['errores'][0]['linea'], 3)
+        self.assertTrue(Vehiculo.objects.filter(placa='AAA111').exists())
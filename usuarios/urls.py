@@ -3,7 +3,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import ResidenteViewSet, RegistroView, RegistrarDispositivoView, LoginView,RegistrarRostroView,PerfilUsuarioView,CrearAdminView    
+from .views import ResidenteViewSet, RegistroView, RegistrarDispositivoView, LoginView, LogoutView, RegistrarRostroView,PerfilUsuarioView,CrearAdminView,ImportarCSVView    
 
 router = DefaultRouter()
 router.register("residentes", ResidenteViewSet, basename="residente")
@@ -14,6 +14,7 @@ urlpatterns = [
 
     # Auth
     path("login/", LoginView.as_view(), name="api_token_auth"),            # /api/usuarios/login/
+    path("logout/", LogoutView.as_view(), name="api_logout"),              # /api/usuarios/logout/
     path("registro/", RegistroView.as_view(), name="api_registro"),        # /api/usuarios/registro/
 
     # Dispositivos
@@ -24,6 +25,7 @@ urlpatterns = [
   
 
     path('perfil/', PerfilUsuarioView.as_view(), name='user-profile'),
+    path('importar-csv/', ImportarCSVView.as_view(), name='importar-csv'),  # /api/usuarios/importar-csv/ (admin)
     path('', include(router.urls)),
   path("setup/crear-primer-admin/", CrearAdminView.as_view(), name="crear-admin"),
 ]
\ No newline at end of file
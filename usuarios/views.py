@@ -6,6 +6,7 @@ from rest_framework import viewsets, generics, permissions, status, serializers
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.serializers import AuthTokenSerializer
 import boto3
@@ -31,13 +32,19 @@ import boto3
 from django.conf import settings
 from rest_framework.parsers import MultiPartParser, FormParser
 # ...
+from .authentication import emitir_token
+from .contexto import contexto_de
 from .models import Residente
 from .serializers import (
+    ImportarCSVSerializer,
     ResidenteReadSerializer,
     ResidenteWriteSerializer,
     RegistroSerializer,
 )
 
+from django.db import transaction
+from tareas.registro import encolar
+from tareas.views import respuesta_encolada
 from notificaciones.services import notificar_usuario # <-- Servicio para enviar notificaciones
 from usuarios.models import User 
 # ---------------------------
@@ -116,7 +123,29 @@ class LoginView(ObtainAuthToken):
         ],
     )
     def post(self, request, *args, **kwargs):
-        return super().post(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Reemplaza el token si expiró (AUTH_TOKEN_EXPIRACION)
+        token = emitir_token(serializer.validated_data['user'])
+        return Response({'token': token.key})
+
+
+class LogoutView(APIView):
+    """
+    Revoca el token con el que se hizo la petición (y su entrada en caché).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        tags=["Auth"],
+        summary="Logout (revoca el token)",
+        request=None,
+        responses={204: OpenApiResponse(description="Token revocado")},
+    )
+    def post(self, request, *args, **kwargs):
+        if request.auth:
+            Token.objects.filter(key=request.auth).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 # ---------------------------
@@ -226,9 +255,8 @@ class RegistrarDispositivoView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        try:
-            residente = Residente.objects.get(usuario=request.user)
-        except Residente.DoesNotExist:
+        residente_id = contexto_de(request).residente_id
+        if not residente_id:
             return Response(
                 {"ok": False, "detail": "El usuario no es un residente."},
                 status=status.HTTP_404_NOT_FOUND,
@@ -236,8 +264,7 @@ class RegistrarDispositivoView(APIView):
 
         # Guarda el token en el campo que uses en tu modelo
         # (asumo 'fcm_token'; cámbialo si tu modelo usa otro nombre)
-        residente.fcm_token = token
-        residente.save(update_fields=["fcm_token"])
+        Residente.objects.filter(pk=residente_id).update(fcm_token=token)
 
         return Response({"ok": True, "detail": "Token registrado con éxito."}, status=status.HTTP_200_OK)
 
@@ -375,3 +402,35 @@ class CrearAdminView(APIView):
             )
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@extend_schema(
+    tags=["Importación"],
+    summary="Importar un CSV (gastos, egresos, vehículos o residentes)",
+    request={"multipart/form-data": ImportarCSVSerializer},
+)
+class ImportarCSVView(APIView):
+    """
+    Sube un CSV y lo importa en segundo plano (ver config.importacion). El
+    encabezado se valida enseguida; los errores de cada fila, con su número
+    de línea, quedan en el resultado de la tarea.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser, FormParser]
+    serializer_class = ImportarCSVSerializer
+
+    def post(self, request):
+        serializer = ImportarCSVSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        # Los workers no ven la tarea hasta el commit, con el archivo ya guardado
+        with transaction.atomic():
+            tarea = encolar(
+                "usuarios.importar_csv",
+                usuario=request.user,
+                tipo=datos["tipo"],
+                delimitador=datos["delimitador"],
+                simular=datos["simular"],
+            )
+            tarea.archivo.save(f"importacion_{datos['tipo']}.csv", datos["archivo"])
+        return respuesta_encolada(request, tarea, mensaje=f"Importación de {datos['tipo']} encolada.")